@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class TripmatefunctionsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'TripMateFunctions'
+
+    def ready(self):
+        from . import signals  # noqa: F401
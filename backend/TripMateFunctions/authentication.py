@@ -1,9 +1,76 @@
 # backend/TripMateFunctions/authentication.py
+import hashlib
+import time
+
 import jwt
 from django.conf import settings
 from rest_framework import authentication, exceptions
 
 from .models import AppUser  # IMPORTANT: use your AppUser, not Django auth.User
+from .services.cache import CacheNamespace, LocalLRU
+
+# Presence polls hit the API every 1-2 s with the same token, so both steps of
+# authenticate() are cached for a short time:
+#  - validated claims per token, in-process (bounded, never past the token's exp)
+#  - the AppUser per email, in the shared cache so every worker sees the
+#    invalidation done by signals.py when a user is saved (status/role change)
+#    or deleted. No L1 there: each request gets its own unpickled AppUser.
+AUTH_CACHE_SECONDS = getattr(settings, "AUTH_CACHE_SECONDS", 60)
+
+_CLAIMS_CACHE = LocalLRU(getattr(settings, "AUTH_CLAIMS_CACHE_SIZE", 1024))
+_USER_CACHE = CacheNamespace("auth_user", default_ttl=AUTH_CACHE_SECONDS, l1_size=0)
+
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _user_key(email: str) -> str:
+    return f"email={email}"
+
+
+def invalidate_cached_user(email):
+    if email:
+        _USER_CACHE.delete(_user_key(email))
+
+
+def _decode_token(token: str) -> dict:
+    key = _token_key(token)
+    payload = _CLAIMS_CACHE.get(key)
+    if isinstance(payload, dict):
+        return payload
+
+    try:
+        payload = jwt.decode(
+            token,
+            settings.SUPABASE_JWT_SECRET,
+            algorithms=["HS256"],
+            options={"verify_aud": False},
+        )
+    except jwt.ExpiredSignatureError:
+        raise exceptions.AuthenticationFailed("Token has expired")
+    except jwt.InvalidTokenError:
+        raise exceptions.AuthenticationFailed("Invalid token")
+
+    ttl = AUTH_CACHE_SECONDS
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)):
+        ttl = min(ttl, exp - time.time())
+    if ttl > 0:
+        _CLAIMS_CACHE.set(key, payload, ttl)
+    return payload
+
+
+def _resolve_user(email: str):
+    hit, user = _USER_CACHE.lookup(_user_key(email))
+    if hit:
+        return user
+
+    user = AppUser.objects.filter(email=email).first()
+    if user:
+        # Unknown emails are not cached: the user may register a moment later
+        _USER_CACHE.set(_user_key(email), user)
+    return user
 
 
 class SupabaseJWTAuthentication(authentication.BaseAuthentication):
@@ -31,17 +98,7 @@ class SupabaseJWTAuthentication(authentication.BaseAuthentication):
                 "Supabase JWT secret not configured on backend."
             )
 
-        try:
-            payload = jwt.decode(
-                token,
-                settings.SUPABASE_JWT_SECRET,
-                algorithms=["HS256"],
-                options={"verify_aud": False},
-            )
-        except jwt.ExpiredSignatureError:
-            raise exceptions.AuthenticationFailed("Token has expired")
-        except jwt.InvalidTokenError:
-            raise exceptions.AuthenticationFailed("Invalid token")
+        payload = _decode_token(token)
 
         email = payload.get("email")
         supabase_user_id = payload.get("sub")  # available if you want to log/debug
@@ -52,8 +109,8 @@ class SupabaseJWTAuthentication(authentication.BaseAuthentication):
                 "Invalid token payload: missing 'email' (cannot map to AppUser)."
             )
 
-        # Map to AppUser
-        user = AppUser.objects.filter(email=email).first()
+        # Map to AppUser (cached, see _resolve_user)
+        user = _resolve_user(email)
 
         if not user:
             # IMPORTANT: do NOT create users here
@@ -0,0 +1,123 @@
+# backend/TripMateFunctions/management/commands/bench_db_connections.py
+import importlib.util
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_finished, request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from TripMateFunctions.models import Trip
+from TripMateFunctions.serializers.f1_1_serializers import TripOverviewSerializer
+from TripMateFunctions.services.trip_snapshot import build_trip_view_snapshot
+
+MODES = ("none", "persistent", "pool")
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure per-request DB connection overhead for the hot read endpoints "
+        "(trip list, trip view) under each DB_POOL_MODE"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200, help="Simulated requests per mode")
+        parser.add_argument(
+            "--modes",
+            default="none,persistent,pool",
+            help="Comma separated subset of: none, persistent, pool",
+        )
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, **options):
+        modes = [m.strip() for m in options["modes"].split(",") if m.strip()]
+        unknown = [m for m in modes if m not in MODES]
+        if unknown:
+            raise CommandError(f"Unknown mode(s): {', '.join(unknown)}")
+
+        conn = connections[options["database"]]
+        trip_ids = list(Trip.objects.using(conn.alias).order_by("id").values_list("id", flat=True)[:20])
+        if not trip_ids:
+            raise CommandError("No trips in the database to read; create some trips first.")
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{conn.vendor} / {options['requests']} requests per mode / {len(trip_ids)} trips"
+        ))
+
+        original = {
+            "CONN_MAX_AGE": conn.settings_dict["CONN_MAX_AGE"],
+            "OPTIONS": dict(conn.settings_dict.get("OPTIONS", {})),
+        }
+        try:
+            for mode in modes:
+                if not self._configure(conn, mode):
+                    continue
+                self._report(mode, self._run(conn, trip_ids, options["requests"]))
+        finally:
+            self._reset(conn)
+            conn.settings_dict["CONN_MAX_AGE"] = original["CONN_MAX_AGE"]
+            conn.settings_dict["OPTIONS"] = original["OPTIONS"]
+
+    def _reset(self, conn):
+        conn.close()
+        if conn.vendor == "postgresql" and hasattr(conn, "close_pool"):
+            conn.close_pool()
+
+    def _configure(self, conn, mode: str) -> bool:
+        self._reset(conn)
+        opts = dict(conn.settings_dict.get("OPTIONS", {}))
+        opts.pop("pool", None)
+        conn.settings_dict["CONN_MAX_AGE"] = 0
+
+        if mode == "persistent":
+            conn.settings_dict["CONN_MAX_AGE"] = 60
+        elif mode == "pool":
+            if conn.vendor != "postgresql":
+                self.stdout.write(self.style.WARNING("pool: skipped (PostgreSQL only)"))
+                return False
+            if importlib.util.find_spec("psycopg_pool") is None:
+                self.stdout.write(self.style.WARNING("pool: skipped (install psycopg[pool])"))
+                return False
+            opts["pool"] = {"min_size": 1, "max_size": 4}
+
+        conn.settings_dict["OPTIONS"] = opts
+        return True
+
+    def _run(self, conn, trip_ids, n_requests: int) -> dict:
+        connects = []
+
+        def on_connect(sender, connection, **kwargs):
+            if connection.alias == conn.alias:
+                connects.append(connection)
+
+        connect_ms, request_ms = [], []
+        connection_created.connect(on_connect)
+        try:
+            for i in range(n_requests):
+                request_started.send(sender=self.__class__)
+                t0 = time.perf_counter()
+                conn.ensure_connection()
+                t1 = time.perf_counter()
+
+                # Same reads as GET /api/f1/trips/ and GET /api/f1/trip/<id>/view/
+                list(TripOverviewSerializer.setup_eager_loading(Trip.objects.using(conn.alias).all())[:20])
+                build_trip_view_snapshot(trip_ids[i % len(trip_ids)])
+
+                t2 = time.perf_counter()
+                request_finished.send(sender=self.__class__)
+                connect_ms.append((t1 - t0) * 1000)
+                request_ms.append((t2 - t0) * 1000)
+        finally:
+            connection_created.disconnect(on_connect)
+
+        return {"connects": len(connects), "connect_ms": connect_ms, "request_ms": request_ms}
+
+    def _report(self, mode: str, result: dict):
+        request_ms = sorted(result["request_ms"])
+        p95 = request_ms[min(len(request_ms) - 1, int(len(request_ms) * 0.95))]
+        self.stdout.write(
+            f"{mode:<11} connections opened: {result['connects']:>4}   "
+            f"connect avg {statistics.mean(result['connect_ms']):7.2f} ms   "
+            f"request avg {statistics.mean(request_ms):7.2f} ms   p95 {p95:7.2f} ms"
+        )
@@ -0,0 +1,196 @@
+# backend/TripMateFunctions/management/commands/bench_presence.py
+import asyncio
+import statistics
+import time
+from datetime import timedelta
+
+import httpx
+import jwt
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from TripMateFunctions.models import AppUser, ItineraryItem, Trip, TripCollaborator
+from TripMateFunctions.services import presence
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test trip presence: database work of one presence round (old per-poll UPDATE + "
+        "queries vs the cache-backed heartbeat), then N viewers long-polling a running channel "
+        "server over HTTP while the web server is probed for API latency. The first part runs "
+        "in a rolled-back transaction; the HTTP part needs committed rows and deletes them after."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--viewers", type=int, default=500, help="Concurrent viewers of one trip")
+        parser.add_argument("--settle", type=float, default=3.0, help="Seconds to let long-polls park")
+        parser.add_argument(
+            "--channel-url", default="http://127.0.0.1:8001/api",
+            help="API base of the channel process (gunicorn_channel.conf.py)",
+        )
+        parser.add_argument(
+            "--api-url", default="http://127.0.0.1:8000/api",
+            help="API base of the web process (gunicorn.conf.py)",
+        )
+        parser.add_argument("--probes", type=int, default=20, help="API requests timed before and while polls wait")
+
+    def handle(self, *args, **options):
+        viewers = max(2, options["viewers"])
+        if not getattr(settings, "SUPABASE_JWT_SECRET", ""):
+            raise CommandError("SUPABASE_JWT_SECRET is needed to sign the viewers' tokens")
+        self.stdout.write(self.style.MIGRATE_HEADING(f"{connection.vendor}: {viewers} viewers on one trip"))
+
+        with transaction.atomic():
+            trip, users = self._make_trip(viewers)
+            user_ids = [user.id for user in users]
+            legacy = self._measure(lambda: [self._legacy_poll(trip, uid) for uid in user_ids])
+            presence.invalidate_trip_members(trip.id)
+            cached = self._measure(lambda: [self._cached_poll(trip.id, uid) for uid in user_ids])
+            flushed = self._measure(presence.flush_active)
+            transaction.set_rollback(True)
+        presence.invalidate_trip_members(trip.id)
+
+        for label, (statements, writes, ms) in (
+            ("per-poll DB", legacy),
+            ("cache", cached),
+            ("batched flush", flushed),
+        ):
+            self.stdout.write(f"one round   {label:<13} statements {statements:>5}  writes {writes:>5}  {ms:8.1f} ms")
+
+        trip, users = self._make_trip(viewers)
+        try:
+            result = asyncio.run(self._broadcast(trip, users, options))
+        finally:
+            presence.invalidate_trip_members(trip.id)
+            trip.delete()
+            AppUser.objects.filter(id__in=[user.id for user in users]).delete()
+
+        idle, busy, latencies, failed, poll_after = result
+        self.stdout.write(
+            f"api probe   idle p50 {statistics.median(idle):.1f} ms  max {max(idle):.1f} ms   "
+            f"with {viewers} polls waiting p50 {statistics.median(busy):.1f} ms  max {max(busy):.1f} ms"
+        )
+        if poll_after:
+            self.stdout.write(self.style.WARNING(
+                f"channel answered with poll_after={poll_after}: it does not hold polls (not the ASGI channel process), "
+                "so wake-ups wait for the next poll"
+            ))
+        if failed:
+            self.stdout.write(self.style.ERROR(f"broadcast   {failed} long-polls failed or missed the new revision"))
+        if latencies:
+            latencies.sort()
+            p95 = latencies[max(int(len(latencies) * 0.95) - 1, 0)]
+            self.stdout.write(
+                f"broadcast   {len(latencies)} long-polls woke  "
+                f"p50 {statistics.median(latencies):.1f} ms  p95 {p95:.1f} ms  max {latencies[-1]:.1f} ms"
+            )
+
+    def _make_trip(self, viewers: int):
+        stamp = time.time_ns()
+        users = AppUser.objects.bulk_create([
+            AppUser(email=f"bench-presence-{stamp}-{i}@example.com", full_name=f"Viewer {i}")
+            for i in range(viewers)
+        ])
+        trip = Trip.objects.create(owner=users[0], title="Bench presence", visibility="private")
+        TripCollaborator.objects.bulk_create([
+            TripCollaborator(trip=trip, user=user, invited_email=user.email, status=TripCollaborator.Status.ACTIVE)
+            for user in users[1:]
+        ])
+        return trip, users
+
+    def _measure(self, fn):
+        with CaptureQueriesContext(connection) as ctx:
+            t0 = time.perf_counter()
+            fn()
+            elapsed_ms = (time.perf_counter() - t0) * 1000
+        statements = [q["sql"] for q in ctx.captured_queries if not q["sql"].startswith(("SAVEPOINT", "RELEASE"))]
+        writes = sum(1 for sql in statements if sql.lstrip().upper().startswith(("UPDATE", "INSERT")))
+        return len(statements), writes, elapsed_ms
+
+    def _legacy_poll(self, trip, user_id):
+        """What F21TripPresencePollView did per request before services/presence.py."""
+        TripCollaborator.objects.filter(trip=trip, user_id=user_id).exists()
+        now = timezone.now()
+        AppUser.objects.filter(id=user_id).update(last_active_at=now)
+        cutoff = now - timedelta(seconds=presence.PRESENCE_TTL_SECONDS)
+        online = set(AppUser.objects.filter(id=trip.owner_id, last_active_at__gte=cutoff).values_list("id", flat=True))
+        online.update(
+            TripCollaborator.objects.filter(
+                trip=trip, user__isnull=False, user__last_active_at__gte=cutoff
+            ).values_list("user_id", flat=True)
+        )
+
+    def _cached_poll(self, trip_id, user_id):
+        member_ids = presence.trip_member_ids(trip_id)
+        presence.heartbeat(trip_id, user_id)
+        presence.note_active(user_id)
+        presence.online_user_ids(trip_id, member_ids)
+
+    def _token(self, user):
+        claims = {"sub": str(user.id), "email": user.email, "exp": int(time.time()) + 600}
+        return jwt.encode(claims, settings.SUPABASE_JWT_SECRET, algorithm="HS256")
+
+    async def _probe(self, client, api_url, headers, count):
+        """Latencies (ms) of sequential GET /auth/whoami/ on the web process."""
+        timings = []
+        for _ in range(count):
+            t0 = time.perf_counter()
+            response = await client.get(f"{api_url}/auth/whoami/", headers=headers)
+            response.raise_for_status()
+            timings.append((time.perf_counter() - t0) * 1000)
+        return timings
+
+    async def _broadcast(self, trip, users, options):
+        """Park one long-poll per viewer on the channel server, record a change, time each wake-up."""
+        channel = f"{options['channel_url'].rstrip('/')}/f2/trips/{trip.id}/channel/"
+        api_url = options["api_url"].rstrip("/")
+        headers = [{"Authorization": f"Bearer {self._token(user)}"} for user in users]
+        # One small client per viewer, like separate browsers; a shared pool of
+        # hundreds of connections costs more client CPU than the server under test
+        ssl_context = httpx.create_ssl_context()
+        clients = [httpx.AsyncClient(timeout=60, verify=ssl_context) for _ in users]
+        try:
+            try:
+                idle = await self._probe(clients[0], api_url, headers[0], options["probes"])
+                # Everyone online first, so the presence tag stays put while polls wait
+                await asyncio.gather(*(
+                    client.get(channel, params={"wait": 0}, headers=h) for client, h in zip(clients, headers)
+                ))
+            except httpx.HTTPError as exc:
+                raise CommandError(f"servers not reachable ({exc}); start both processes first") from exc
+            first = (await clients[0].get(channel, params={"wait": 0}, headers=headers[0])).json()
+            since, tag = first["revision"], first["presence"]
+
+            woke = [None] * len(users)
+
+            async def listen(i):
+                params = {"revision": since, "presence": tag, "wait": presence.LONG_POLL_SECONDS}
+                # Like the frontend: a presence-only answer is followed by the next poll
+                deadline = time.perf_counter() + 2 * presence.LONG_POLL_SECONDS
+                while time.perf_counter() < deadline:
+                    response = await clients[i].get(channel, params=params, headers=headers[i])
+                    if response.status_code != 200:
+                        return
+                    data = response.json()
+                    if data["revision"] != since:
+                        if data["revision"] == since + 1:
+                            woke[i] = time.perf_counter()
+                        return
+                    params["presence"] = data["presence"]
+                    await asyncio.sleep(data.get("poll_after") or 0)
+
+            listeners = [asyncio.create_task(listen(i)) for i in range(len(users))]
+            await asyncio.sleep(options["settle"])  # let every poll reach the server
+            busy = await self._probe(clients[0], api_url, headers[0], options["probes"])
+
+            sent = time.perf_counter()
+            await asyncio.to_thread(ItineraryItem.objects.create, trip=trip, title="Bench change")
+            await asyncio.gather(*listeners, return_exceptions=True)
+        finally:
+            await asyncio.gather(*(client.aclose() for client in clients))
+
+        latencies = [(w - sent) * 1000 for w in woke if w is not None]
+        return idle, busy, latencies, len(users) - len(latencies), first.get("poll_after", 0)
@@ -0,0 +1,83 @@
+# backend/TripMateFunctions/management/commands/bench_trip_clone.py
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from TripMateFunctions.models import AppUser, ItineraryItem, ItineraryItemTag, Trip, TripDay
+from TripMateFunctions.services.trip_clone import clone_trip
+
+ITEMS_PER_DAY = 8
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the old row-by-row template copy with services.trip_clone.clone_trip "
+        "(statements and latency). Everything runs in a rolled-back transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="10,100,1000", help="Comma separated item counts")
+
+    def handle(self, *args, **options):
+        sizes = [int(s) for s in options["sizes"].split(",") if s.strip()]
+        self.stdout.write(self.style.MIGRATE_HEADING(f"{connection.vendor}: trip copy, items per trip {sizes}"))
+
+        for size in sizes:
+            with transaction.atomic():
+                source, owner = self._make_source(size)
+                legacy = self._measure(lambda: self._row_by_row_copy(source, owner))
+                bulk = self._measure(lambda: clone_trip(source, owner, copy_tags=True, visibility="private"))
+                transaction.set_rollback(True)
+
+            for label, (statements, inserts, ms) in (("row-by-row", legacy), ("clone_trip", bulk)):
+                self.stdout.write(
+                    f"{size:>5} items  {label:<11} statements {statements:>5}  inserts {inserts:>5}  {ms:8.1f} ms"
+                )
+
+    def _make_source(self, size: int):
+        owner = AppUser.objects.create(email=f"bench-clone-{time.time_ns()}@example.com", full_name="Bench")
+        source = Trip.objects.create(owner=owner, title=f"Bench {size}", main_city="Tokyo", visibility="public")
+        n_days = max(1, -(-size // ITEMS_PER_DAY))
+        days = TripDay.objects.bulk_create([TripDay(trip=source, day_index=i + 1) for i in range(n_days)])
+        items = ItineraryItem.objects.bulk_create([
+            ItineraryItem(
+                trip=source,
+                day=days[i // ITEMS_PER_DAY],
+                title=f"Stop {i}",
+                lat=35.0 + i / 1000,
+                lon=139.0 + i / 1000,
+                sort_order=i % ITEMS_PER_DAY,
+            )
+            for i in range(size)
+        ])
+        ItineraryItemTag.objects.bulk_create([ItineraryItemTag(item=item, tag="sight") for item in items])
+        return source, owner
+
+    def _measure(self, fn):
+        with CaptureQueriesContext(connection) as ctx:
+            t0 = time.perf_counter()
+            fn()
+            elapsed_ms = (time.perf_counter() - t0) * 1000
+        statements = [q["sql"] for q in ctx.captured_queries if not q["sql"].startswith(("SAVEPOINT", "RELEASE"))]
+        inserts = sum(1 for sql in statements if sql.lstrip().upper().startswith("INSERT"))
+        return len(statements), inserts, elapsed_ms
+
+    def _row_by_row_copy(self, source, owner):
+        """What F26ItineraryTemplateCopyView did before clone_trip (plus tags, for parity)."""
+        new_trip = Trip.objects.create(owner=owner, title=source.title, visibility="private")
+        day_map = {}
+        for day in source.days.all():
+            day_map[day.id] = TripDay.objects.create(trip=new_trip, date=day.date, day_index=day.day_index)
+        for item in source.items.all():
+            new_item = ItineraryItem.objects.create(
+                trip=new_trip,
+                day=day_map.get(item.day_id),
+                title=item.title,
+                lat=item.lat,
+                lon=item.lon,
+                sort_order=item.sort_order,
+            )
+            for tag in item.tags.all():
+                ItineraryItemTag.objects.create(item=new_item, tag=tag.tag)
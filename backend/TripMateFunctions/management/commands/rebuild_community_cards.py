@@ -0,0 +1,15 @@
+# backend/TripMateFunctions/management/commands/rebuild_community_cards.py
+from django.core.management.base import BaseCommand
+
+from TripMateFunctions.services.community_cards import rebuild_community_cards
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the F2.4 community feed cards from the trips. Run after editing data outside "
+        "Django (e.g. profile names changed in Supabase)."
+    )
+
+    def handle(self, *args, **options):
+        count = rebuild_community_cards()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} community card(s)"))
@@ -0,0 +1,16 @@
+# backend/TripMateFunctions/management/commands/rebuild_search_index.py
+from django.core.management.base import BaseCommand
+
+from TripMateFunctions.services.search import install_search_backend, rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the full-text search documents (public trips, community FAQs, destination "
+        "FAQ / Q&A). Run after editing those tables outside Django."
+    )
+
+    def handle(self, *args, **options):
+        install_search_backend()
+        count = rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} search document(s)"))
@@ -0,0 +1,32 @@
+# backend/TripMateFunctions/management/commands/rollup_analytics.py
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from TripMateFunctions.services.analytics import rebuild_rollups, refresh_profile_countries, refresh_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Update the F8 admin dashboard rollups: dirty, new and open days plus the profile "
+        "country snapshot. Run from cron; --rebuild recomputes every day (or those from --since)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rebuild", action="store_true", help="Recompute all days instead of the stale ones.")
+        parser.add_argument("--since", help="With --rebuild: first day to recompute (YYYY-MM-DD).")
+
+    def handle(self, *args, **options):
+        since = None
+        if options["since"]:
+            try:
+                since = datetime.strptime(options["since"], "%Y-%m-%d").date()
+            except ValueError:
+                raise CommandError("--since must be YYYY-MM-DD")
+
+        if options["rebuild"] or since:
+            count = rebuild_rollups(since=since)
+        else:
+            count = refresh_rollups()
+            refresh_profile_countries()
+        self.stdout.write(self.style.SUCCESS(f"Refreshed {count} analytics day(s)"))
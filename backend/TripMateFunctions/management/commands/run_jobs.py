@@ -0,0 +1,46 @@
+# backend/TripMateFunctions/management/commands/run_jobs.py
+import signal
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+
+from TripMateFunctions.services.jobs import JOB_KINDS, JobWorkerPool, run_pending_jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Run background jobs (AI itinerary generation, emails) from the background_job table. "
+        "Safe to run several copies: jobs are claimed with a lease."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=2, help="Worker threads")
+        parser.add_argument("--once", action="store_true", help="Run all due jobs, then exit")
+        parser.add_argument("--kinds", default="", help=f"Comma separated subset of: {', '.join(JOB_KINDS)}")
+        parser.add_argument("--poll", type=float, default=2.0, help="Seconds between polls when idle")
+
+    def handle(self, *args, **options):
+        kinds = [k.strip() for k in options["kinds"].split(",") if k.strip()] or None
+        unknown = [k for k in kinds or [] if k not in JOB_KINDS]
+        if unknown:
+            raise CommandError(f"Unknown job kind(s): {', '.join(unknown)}")
+
+        if options["once"]:
+            count = run_pending_jobs(kinds=kinds)
+            self.stdout.write(self.style.SUCCESS(f"Ran {count} job(s)"))
+            return
+
+        pool = JobWorkerPool(options["workers"], kinds=kinds, poll_seconds=options["poll"], name="run_jobs")
+        stopping = threading.Event()
+
+        def _stop(signum, frame):
+            stopping.set()
+
+        signal.signal(signal.SIGTERM, _stop)
+        signal.signal(signal.SIGINT, _stop)
+
+        pool.start()
+        self.stdout.write(self.style.SUCCESS(f"Job workers started ({pool.workers}); Ctrl+C to stop"))
+        stopping.wait()
+        self.stdout.write("Stopping after the running jobs finish...")
+        pool.stop()
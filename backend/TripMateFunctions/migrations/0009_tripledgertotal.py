@@ -0,0 +1,55 @@
+# Generated by Django 5.2.9 on 2026-10-16 10:00
+
+import django.db.models.deletion
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def backfill_ledger_totals(apps, schema_editor):
+    TripExpense = apps.get_model("TripMateFunctions", "TripExpense")
+    ExpenseSplit = apps.get_model("TripMateFunctions", "ExpenseSplit")
+    TripLedgerTotal = apps.get_model("TripMateFunctions", "TripLedgerTotal")
+
+    totals = defaultdict(lambda: [Decimal("0"), Decimal("0")])
+    for row in TripExpense.objects.values("trip_id", "payer_id", "currency").annotate(total=Sum("amount")):
+        totals[(row["trip_id"], row["payer_id"], row["currency"])][0] += row["total"] or 0
+    for row in ExpenseSplit.objects.values("expense__trip_id", "user_id", "expense__currency").annotate(total=Sum("amount")):
+        totals[(row["expense__trip_id"], row["user_id"], row["expense__currency"])][1] += row["total"] or 0
+
+    TripLedgerTotal.objects.bulk_create(
+        [
+            TripLedgerTotal(trip_id=trip_id, user_id=user_id, currency=currency, paid=paid, owed=owed)
+            for (trip_id, user_id, currency), (paid, owed) in totals.items()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TripMateFunctions', '0008_communityfaq_generalfaq_trip_flag_category_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TripLedgerTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(max_length=3)),
+                ('paid', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('owed', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('trip', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_totals', to='TripMateFunctions.trip')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='TripMateFunctions.appuser')),
+            ],
+            options={
+                'db_table': 'trip_ledger_total',
+                'unique_together': {('trip', 'user', 'currency')},
+            },
+        ),
+        migrations.RunPython(backfill_ledger_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.9 on 2026-10-17 12:00
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TripMateFunctions', '0010_backgroundjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trip',
+            name='sync_revision',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='TripChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('revision', models.BigIntegerField()),
+                ('entity', models.CharField(max_length=16)),
+                ('entity_id', models.BigIntegerField(blank=True, null=True)),
+                ('op', models.CharField(choices=[('upsert', 'Upsert'), ('delete', 'Delete'), ('reset', 'Reset')], max_length=8)),
+                ('data', models.JSONField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('trip', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sync_changes', to='TripMateFunctions.trip')),
+            ],
+            options={
+                'db_table': 'trip_change',
+                'unique_together': {('trip', 'revision')},
+            },
+        ),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 5.2.9 on 2026-10-17 12:00
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_cards(apps, schema_editor):
+    """Cards for the trips that are already public (same rules as services/community_cards.py)."""
+    Trip = apps.get_model("TripMateFunctions", "Trip")
+    TripDay = apps.get_model("TripMateFunctions", "TripDay")
+    ItineraryItem = apps.get_model("TripMateFunctions", "ItineraryItem")
+    ItineraryItemTag = apps.get_model("TripMateFunctions", "ItineraryItemTag")
+    TripPhoto = apps.get_model("TripMateFunctions", "TripPhoto")
+    Profile = apps.get_model("TripMateFunctions", "Profile")
+    CommunityTripCard = apps.get_model("TripMateFunctions", "CommunityTripCard")
+
+    has_profiles = "profiles" in schema_editor.connection.introspection.table_names()
+
+    cards = []
+    for trip in Trip.objects.filter(visibility="public", is_flagged=False).select_related("owner").iterator():
+        owner = trip.owner
+        name = None
+        if has_profiles:
+            name = Profile.objects.filter(id=owner.id).values_list("name", flat=True).first()
+        name = (name or "").strip() or (owner.full_name or "").strip() or owner.email
+
+        tags, seen = [], set()
+        for tag in ItineraryItemTag.objects.filter(item__trip_id=trip.id).order_by("id").values_list("tag", flat=True):
+            tag = str(tag or "").strip()
+            if tag and tag.lower() not in seen:
+                seen.add(tag.lower())
+                tags.append(tag)
+
+        photos = TripPhoto.objects.filter(trip_id=trip.id)
+        cards.append(CommunityTripCard(
+            trip_id=trip.id,
+            title=trip.title,
+            main_city=trip.main_city,
+            main_country=trip.main_country,
+            travel_type=trip.travel_type,
+            start_date=trip.start_date,
+            end_date=trip.end_date,
+            created_at=trip.created_at,
+            owner_name=name[:255],
+            cover_photo_url=photos.order_by("created_at", "id").values_list("file_url", flat=True).first(),
+            tags=tags[:12],
+            day_count=TripDay.objects.filter(trip_id=trip.id).count(),
+            stop_count=ItineraryItem.objects.filter(trip_id=trip.id).count(),
+            photo_count=photos.count(),
+        ))
+    CommunityTripCard.objects.bulk_create(cards, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TripMateFunctions', '0011_trip_sync_revision_tripchange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommunityTripCard',
+            fields=[
+                ('trip', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='community_card', serialize=False, to='TripMateFunctions.trip')),
+                ('title', models.CharField(max_length=255)),
+                ('main_city', models.CharField(blank=True, max_length=255, null=True)),
+                ('main_country', models.CharField(blank=True, max_length=255, null=True)),
+                ('travel_type', models.CharField(blank=True, max_length=64, null=True)),
+                ('start_date', models.DateField(blank=True, null=True)),
+                ('end_date', models.DateField(blank=True, null=True)),
+                ('owner_name', models.CharField(blank=True, default='', max_length=255)),
+                ('cover_photo_url', models.URLField(blank=True, null=True)),
+                ('tags', models.JSONField(blank=True, default=list)),
+                ('day_count', models.PositiveIntegerField(default=0)),
+                ('stop_count', models.PositiveIntegerField(default=0)),
+                ('photo_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField()),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'community_trip_card',
+                'indexes': [models.Index(fields=['-created_at', '-trip'], name='community_card_feed_idx')],
+            },
+        ),
+        migrations.RunPython(build_cards, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='tripchange',
+            name='data',
+            field=models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True),
+        ),
+    ]
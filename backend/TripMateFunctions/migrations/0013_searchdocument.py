@@ -0,0 +1,71 @@
+# Generated by Django 5.2.9 on 2026-10-17 12:00
+
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+from TripMateFunctions.services.search import (
+    document_text,
+    install_search_backend,
+    uninstall_search_backend,
+    update_vectors,
+)
+
+
+def install_backend(apps, schema_editor):
+    install_search_backend(schema_editor.connection)
+
+
+def uninstall_backend(apps, schema_editor):
+    uninstall_search_backend(schema_editor.connection)
+
+
+def build_documents(apps, schema_editor):
+    """Index the rows that already exist (document_text only reads plain fields)."""
+    SearchDocument = apps.get_model("TripMateFunctions", "SearchDocument")
+    ItineraryItem = apps.get_model("TripMateFunctions", "ItineraryItem")
+    sources = [
+        ("trip", apps.get_model("TripMateFunctions", "Trip")),
+        ("community_faq", apps.get_model("TripMateFunctions", "CommunityFAQ")),
+        ("destination_faq", apps.get_model("TripMateFunctions", "DestinationFAQ")),
+        ("destination_qa", apps.get_model("TripMateFunctions", "DestinationQA")),
+    ]
+
+    docs = []
+    for kind, model in sources:
+        for obj in model.objects.all().iterator():
+            titles = ()
+            if kind == "trip":
+                titles = ItineraryItem.objects.filter(trip_id=obj.id).order_by("id").values_list("title", flat=True)
+            text = document_text(kind, obj, titles)
+            if text is not None:
+                docs.append(SearchDocument(kind=kind, object_id=obj.pk, title=text[0], body=text[1]))
+    SearchDocument.objects.bulk_create(docs, batch_size=500)
+    update_vectors(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TripMateFunctions', '0012_communitytripcard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('trip', 'Trip'), ('community_faq', 'Community FAQ'), ('destination_faq', 'Destination FAQ'), ('destination_qa', 'Destination Q&A')], max_length=16)),
+                ('object_id', models.BigIntegerField()),
+                ('title', models.TextField()),
+                ('body', models.TextField(blank=True, default='')),
+                ('search_vector', django.contrib.postgres.search.SearchVectorField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'search_document',
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+        migrations.RunPython(install_backend, uninstall_backend),
+        migrations.RunPython(build_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.9 on 2026-10-17 12:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TripMateFunctions', '0014_geohash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalyticsDay',
+            fields=[
+                ('date', models.DateField(primary_key=True, serialize=False)),
+                ('signups', models.PositiveIntegerField(default=0)),
+                ('itineraries_created', models.PositiveIntegerField(default=0)),
+                ('demo_itineraries_created', models.PositiveIntegerField(default=0)),
+                ('active_sketch', models.BinaryField(blank=True, default=bytes)),
+                ('active_users', models.PositiveIntegerField(default=0)),
+                ('session_count', models.PositiveIntegerField(default=0)),
+                ('session_seconds', models.BigIntegerField(default=0)),
+                ('approved', models.PositiveIntegerField(default=0)),
+                ('rejected', models.PositiveIntegerField(default=0)),
+                ('flagged', models.PositiveIntegerField(default=0)),
+                ('flagged_pending', models.PositiveIntegerField(default=0)),
+                ('dirty', models.BooleanField(db_index=True, default=True)),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'analytics_day',
+                'ordering': ['date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='AnalyticsProfileCountry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('country', models.CharField(max_length=255, unique=True)),
+                ('profiles', models.PositiveIntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'analytics_profile_country',
+            },
+        ),
+        migrations.CreateModel(
+            name='AnalyticsDayPlace',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('place', models.CharField(max_length=255)),
+                ('trips', models.PositiveIntegerField(default=0)),
+                ('demo_trips', models.PositiveIntegerField(default=0)),
+                ('day', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='places', to='TripMateFunctions.analyticsday')),
+            ],
+            options={
+                'db_table': 'analytics_day_place',
+                'unique_together': {('day', 'place')},
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.9 on 2026-10-17 12:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TripMateFunctions', '0015_analytics_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OpenTripMapPlace',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('xid', models.CharField(max_length=64, unique=True)),
+                ('name', models.CharField(max_length=255)),
+                ('lat', models.FloatField()),
+                ('lon', models.FloatField()),
+                ('geohash', models.CharField(blank=True, db_index=True, editable=False, max_length=12, null=True)),
+                ('kinds', models.TextField(blank=True, null=True)),
+                ('address', models.TextField(blank=True, null=True)),
+                ('opening_hours', models.TextField(blank=True, null=True)),
+                ('fetched_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'opentripmap_place',
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.9 on 2026-10-17 12:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_active_users(apps, schema_editor):
+    # The sketches can't be read back into users; each user's last_active_at
+    # is the one active day that is still known
+    AnalyticsDay = apps.get_model("TripMateFunctions", "AnalyticsDay")
+    AnalyticsActiveUser = apps.get_model("TripMateFunctions", "AnalyticsActiveUser")
+    AppUser = apps.get_model("TripMateFunctions", "AppUser")
+
+    days = set(AnalyticsDay.objects.values_list("date", flat=True))
+    rows = []
+    for user_id, active_at in AppUser.objects.filter(last_active_at__isnull=False).values_list("id", "last_active_at").iterator():
+        day = timezone.localdate(active_at) if timezone.is_aware(active_at) else active_at.date()
+        if day in days:
+            rows.append(AnalyticsActiveUser(day_id=day, user_id=user_id))
+    AnalyticsActiveUser.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TripMateFunctions', '0016_opentripmapplace'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='analyticsday',
+            name='active_sketch',
+        ),
+        migrations.CreateModel(
+            name='AnalyticsActiveUser',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.UUIDField()),
+                ('day', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='active', to='TripMateFunctions.analyticsday')),
+            ],
+            options={
+                'db_table': 'analytics_active_user',
+                'unique_together': {('day', 'user_id')},
+            },
+        ),
+        migrations.RunPython(backfill_active_users, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,14 @@
 # models.py
 from django.db import models
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.search import SearchVectorField
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone as django_timezone
 import secrets
 import uuid
 
+from .services.geohash import encode_or_none
+
 # --------------------------------------------------
 # USERS & PROFILES
 # --------------------------------------------------
@@ -127,6 +131,14 @@ class CountryInfo(models.Model):
         return self.country_name
 
 
+def _stamp_geohash(instance, update_fields):
+    """Keep ``geohash`` in step with lat/lon; returns the update_fields to save."""
+    instance.geohash = encode_or_none(instance.lat, instance.lon)
+    if update_fields is not None and {"lat", "lon"} & set(update_fields):
+        update_fields = {*update_fields, "geohash"}
+    return update_fields
+
+
 class Destination(models.Model):
     name = models.CharField(max_length=255)
     address = models.TextField(blank=True, null=True)
@@ -136,6 +148,9 @@ class Destination(models.Model):
 
     lat = models.FloatField(blank=True, null=True)
     lon = models.FloatField(blank=True, null=True)
+    geohash = models.CharField(
+        max_length=12, blank=True, null=True, db_index=True, editable=False
+    )  # from lat/lon in save(); see services/nearby.py
     timezone = models.CharField(max_length=64, blank=True, null=True)
 
     category = models.CharField(max_length=128, blank=True, null=True)
@@ -206,6 +221,39 @@ class Destination(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        kwargs["update_fields"] = _stamp_geohash(self, kwargs.get("update_fields"))
+        super().save(*args, **kwargs)
+
+
+class OpenTripMapPlace(models.Model):
+    """
+    OpenTripMap places seen by the F1.4 replacement search, kept so the same
+    area needs no API calls next time. Separate from the curated Destination
+    catalogue: only replacement options read it (services/nearby.py).
+    """
+    xid = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=255)
+    lat = models.FloatField()
+    lon = models.FloatField()
+    geohash = models.CharField(
+        max_length=12, blank=True, null=True, db_index=True, editable=False
+    )
+    kinds = models.TextField(blank=True, null=True)
+    address = models.TextField(blank=True, null=True)
+    opening_hours = models.TextField(blank=True, null=True)
+    fetched_at = models.DateTimeField(default=django_timezone.now)
+
+    class Meta:
+        db_table = "opentripmap_place"
+
+    def __str__(self):
+        return f"{self.name} ({self.xid})"
+
+    def save(self, *args, **kwargs):
+        kwargs["update_fields"] = _stamp_geohash(self, kwargs.get("update_fields"))
+        super().save(*args, **kwargs)
+
 
 class LocalContextCache(models.Model):
     destination = models.ForeignKey(
@@ -278,12 +326,26 @@ class Trip(models.Model):
 
     moderation_status = models.CharField(max_length=50, null=True, blank=True)
     moderated_at = models.DateTimeField(null=True, blank=True)
+
+    # Last revision of the co-editing change journal (TripChange)
+    sync_revision = models.BigIntegerField(default=0)
+
     class Meta:
         db_table = "trip"
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        # sync_revision is only bumped by services/trip_sync.py; a plain save of
+        # an instance loaded earlier must not write its stale value back
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name != "sync_revision"
+            ]
+        super().save(*args, **kwargs)
+
 
 class TripCollaborator(models.Model):
     class Role(models.TextChoices):
@@ -446,6 +508,9 @@ class ItineraryItem(models.Model):
 
     lat = models.FloatField(blank=True, null=True)
     lon = models.FloatField(blank=True, null=True)
+    geohash = models.CharField(
+        max_length=12, blank=True, null=True, db_index=True, editable=False
+    )  # from lat/lon in save(); see services/nearby.py
     address = models.TextField(blank=True, null=True)
     thumbnail_url = models.URLField(max_length=2048, blank=True, null=True)  # Long URLs for image services
 
@@ -470,6 +535,10 @@ class ItineraryItem(models.Model):
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        kwargs["update_fields"] = _stamp_geohash(self, kwargs.get("update_fields"))
+        super().save(*args, **kwargs)
+
 
 class ItineraryItemNote(models.Model):
     item = models.ForeignKey(
@@ -612,6 +681,147 @@ class ExpenseSplit(models.Model):
         return f"{self.user_id} owes {self.amount} on expense {self.expense_id}"
 
 
+class TripLedgerTotal(models.Model):
+    """
+    Running paid/owed totals per trip member and currency, kept up to date by
+    signals on TripExpense / ExpenseSplit (services/ledger.py). ``user`` is
+    null for expenses whose payer was removed.
+    """
+    trip = models.ForeignKey(
+        Trip,
+        on_delete=models.CASCADE,
+        related_name="ledger_totals",
+    )
+    user = models.ForeignKey(
+        AppUser,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    currency = models.CharField(max_length=3)
+
+    paid = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    owed = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "trip_ledger_total"
+        unique_together = ("trip", "user", "currency")
+
+    def __str__(self):
+        return f"{self.user_id} on trip {self.trip_id}: paid {self.paid} / owed {self.owed} {self.currency}"
+
+
+# --------------------------------------------------
+# CO-EDITING SYNC JOURNAL (see services/trip_sync.py)
+# --------------------------------------------------
+
+
+class TripChange(models.Model):
+    """
+    One entry of a trip's co-editing change journal (services/trip_sync.py).
+    Revisions are consecutive per trip; Trip.sync_revision is the latest.
+    """
+
+    class Op(models.TextChoices):
+        UPSERT = "upsert", "Upsert"
+        DELETE = "delete", "Delete"
+        # Many rows changed at once: clients reload the whole trip
+        RESET = "reset", "Reset"
+
+    trip = models.ForeignKey(
+        Trip,
+        on_delete=models.CASCADE,
+        related_name="sync_changes",
+    )
+    revision = models.BigIntegerField()
+    entity = models.CharField(max_length=16)  # trip / day / item
+    entity_id = models.BigIntegerField(blank=True, null=True)
+    op = models.CharField(max_length=8, choices=Op.choices)
+    # Serializer output: may hold UUIDs (owner) and dates
+    data = models.JSONField(blank=True, null=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(default=django_timezone.now)
+
+    class Meta:
+        db_table = "trip_change"
+        unique_together = (("trip", "revision"),)
+
+    def __str__(self):
+        return f"{self.trip_id}@{self.revision} {self.op} {self.entity} {self.entity_id}"
+
+
+# --------------------------------------------------
+# BACKGROUND JOBS
+# --------------------------------------------------
+
+
+class BackgroundJob(models.Model):
+    """
+    A unit of work for the DB-backed job queue (services/jobs.py): AI itinerary
+    generation, invitation emails ... Workers claim rows with a lease, so a
+    restarted worker's jobs are picked up again once the lease expires.
+    """
+
+    class Status(models.TextChoices):
+        QUEUED = "queued", "Queued"
+        RUNNING = "running", "Running"
+        SUCCEEDED = "succeeded", "Succeeded"
+        FAILED = "failed", "Failed"
+
+    kind = models.CharField(max_length=64)
+    status = models.CharField(
+        max_length=16,
+        choices=Status.choices,
+        default=Status.QUEUED,
+    )
+    payload = models.JSONField(default=dict, blank=True)
+    result = models.JSONField(blank=True, null=True)
+    error = models.TextField(blank=True, null=True)
+
+    trip = models.ForeignKey(
+        Trip,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="jobs",
+    )
+    created_by = models.ForeignKey(
+        AppUser,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="jobs",
+    )
+
+    # Set while the job is queued/running so only one active job exists per key
+    active_key = models.CharField(max_length=191, unique=True, blank=True, null=True)
+
+    progress = models.PositiveSmallIntegerField(default=0)
+    progress_message = models.CharField(max_length=255, blank=True, default="")
+
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=django_timezone.now)
+    locked_by = models.CharField(max_length=128, blank=True, null=True)
+    locked_until = models.DateTimeField(blank=True, null=True)
+
+    created_at = models.DateTimeField(default=django_timezone.now)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "background_job"
+        indexes = [
+            models.Index(fields=["status", "run_after"], name="background_job_due_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.id} ({self.status})"
+
+
 # --------------------------------------------------
 # CHECKLISTS
 # --------------------------------------------------
@@ -742,6 +952,9 @@ class TripPhoto(models.Model):
     caption = models.TextField(blank=True, null=True)
     lat = models.FloatField(blank=True, null=True)
     lon = models.FloatField(blank=True, null=True)
+    geohash = models.CharField(
+        max_length=12, blank=True, null=True, db_index=True, editable=False
+    )  # from lat/lon in save(); see services/nearby.py
     taken_at = models.DateTimeField(blank=True, null=True)
 
     created_at = models.DateTimeField(default=django_timezone.now)
@@ -752,6 +965,10 @@ class TripPhoto(models.Model):
     def __str__(self):
         return f"Photo {self.id}"
 
+    def save(self, *args, **kwargs):
+        kwargs["update_fields"] = _stamp_geohash(self, kwargs.get("update_fields"))
+        super().save(*args, **kwargs)
+
 
 class TripMediaHighlight(models.Model):
     trip = models.ForeignKey(
@@ -811,6 +1028,77 @@ class TripHistoryEntry(models.Model):
 # COMMUNITY FAQ & Q&A
 # --------------------------------------------------
 
+class CommunityTripCard(models.Model):
+    """
+    Read model behind the F2.4 community feed: one row per public, unflagged
+    trip with everything a discovery card shows, refreshed by signals
+    (services/community_cards.py). Other trips have no card.
+    """
+    trip = models.OneToOneField(
+        Trip,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="community_card",
+    )
+    title = models.CharField(max_length=255)
+    main_city = models.CharField(max_length=255, blank=True, null=True)
+    main_country = models.CharField(max_length=255, blank=True, null=True)
+    travel_type = models.CharField(max_length=64, blank=True, null=True)
+    start_date = models.DateField(blank=True, null=True)
+    end_date = models.DateField(blank=True, null=True)
+
+    owner_name = models.CharField(max_length=255, blank=True, default="")
+    cover_photo_url = models.URLField(blank=True, null=True)
+    tags = models.JSONField(default=list, blank=True)
+
+    day_count = models.PositiveIntegerField(default=0)
+    stop_count = models.PositiveIntegerField(default=0)
+    photo_count = models.PositiveIntegerField(default=0)
+
+    # Copy of Trip.created_at: the feed's sort key
+    created_at = models.DateTimeField()
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "community_trip_card"
+        indexes = [
+            models.Index(fields=["-created_at", "-trip"], name="community_card_feed_idx"),
+        ]
+
+    def __str__(self):
+        return self.title
+
+
+class SearchDocument(models.Model):
+    """
+    One searchable row (public trip, community FAQ, destination FAQ / Q&A)
+    for services/search.py. The full-text index itself is backend specific:
+    ``search_vector`` + GIN on PostgreSQL, the search_document_fts FTS5
+    table on SQLite (both created by install_search_backend()).
+    """
+
+    class Kind(models.TextChoices):
+        TRIP = "trip", "Trip"
+        COMMUNITY_FAQ = "community_faq", "Community FAQ"
+        DESTINATION_FAQ = "destination_faq", "Destination FAQ"
+        DESTINATION_QA = "destination_qa", "Destination Q&A"
+
+    kind = models.CharField(max_length=16, choices=Kind.choices)
+    object_id = models.BigIntegerField()
+    title = models.TextField()
+    body = models.TextField(blank=True, default="")
+    # PostgreSQL only; null elsewhere
+    search_vector = SearchVectorField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "search_document"
+        unique_together = (("kind", "object_id"),)
+
+    def __str__(self):
+        return f"{self.kind}:{self.object_id} {self.title[:40]}"
+
+
 class CommunityFAQ(models.Model):
     """Community-contributed FAQs"""
     country = models.CharField(max_length=100, blank=True, null=True)
@@ -948,6 +1236,87 @@ class LegalDocument(models.Model):
         return f"{self.doc_type} v{self.version or '1.0'}"
 
 
+# --------------------------------------------------
+# ADMIN ANALYTICS (daily rollups, see services/analytics.py)
+# --------------------------------------------------
+
+
+class AnalyticsDay(models.Model):
+    """One row per calendar day (settings.TIME_ZONE) of admin dashboard metrics."""
+    date = models.DateField(primary_key=True)
+
+    signups = models.PositiveIntegerField(default=0)
+    itineraries_created = models.PositiveIntegerField(default=0)
+    demo_itineraries_created = models.PositiveIntegerField(default=0)
+
+    # Rows in AnalyticsActiveUser for the day (the series; ranges count distinct users)
+    active_users = models.PositiveIntegerField(default=0)
+
+    # Sessions that started that day and have a duration
+    session_count = models.PositiveIntegerField(default=0)
+    session_seconds = models.BigIntegerField(default=0)
+
+    approved = models.PositiveIntegerField(default=0)
+    rejected = models.PositiveIntegerField(default=0)
+    flagged = models.PositiveIntegerField(default=0)
+    flagged_pending = models.PositiveIntegerField(default=0)
+
+    # Set by save hooks; the next read or rollup run recomputes the day
+    dirty = models.BooleanField(default=True, db_index=True)
+    refreshed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        db_table = "analytics_day"
+        ordering = ["date"]
+
+    def __str__(self):
+        return f"Analytics {self.date}"
+
+
+class AnalyticsDayPlace(models.Model):
+    """Trips created on a day per place (main_country, else main_city, else "Others")."""
+    day = models.ForeignKey(
+        AnalyticsDay,
+        on_delete=models.CASCADE,
+        related_name="places",
+    )
+    place = models.CharField(max_length=255)
+    trips = models.PositiveIntegerField(default=0)
+    demo_trips = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = "analytics_day_place"
+        unique_together = (("day", "place"),)
+
+
+class AnalyticsActiveUser(models.Model):
+    """
+    A user seen active on a day. Refreshes only add rows, so a user who is
+    active again later (last_active_at moves on) still counts for the earlier day.
+    """
+    day = models.ForeignKey(
+        AnalyticsDay,
+        on_delete=models.CASCADE,
+        related_name="active",
+    )
+    # Not a foreign key: deleting a user doesn't rewrite past activity
+    user_id = models.UUIDField()
+
+    class Meta:
+        db_table = "analytics_active_user"
+        unique_together = (("day", "user_id"),)
+
+
+class AnalyticsProfileCountry(models.Model):
+    """Profiles per country (nationality, else location, else "Others"); a snapshot."""
+    country = models.CharField(max_length=255, unique=True)
+    profiles = models.PositiveIntegerField(default=0)
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "analytics_profile_country"
+
+
 # ============================================================================
 # ============================================================================
 # F1.5b - RECOMMENDATIONS SYSTEM MODELS
@@ -2,6 +2,8 @@
 from django.urls import path, include
 from django.http import JsonResponse
 from .views.auth_views import WhoAmIView
+from .views.job_views import JobStatusView
+from .views.search_views import SearchView
 
 
 def healthcheck(request):
@@ -38,4 +40,10 @@ urlpatterns = [
 
     # 🔐 Test Supabase-authenticated current user
     path("auth/whoami/", WhoAmIView.as_view(), name="auth-whoami"),
+
+    # Background job status (AI itinerary generation, emails)
+    path("jobs/<int:job_id>/", JobStatusView.as_view(), name="job-status"),
+
+    # Full-text search (trips, community FAQs, destination FAQ / Q&A)
+    path("search/", SearchView.as_view(), name="search"),
 ]
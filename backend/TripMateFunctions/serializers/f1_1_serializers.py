@@ -1,7 +1,8 @@
 # backend/TripMateFunctions/serializers/f1_1_serializers.py
 from decimal import Decimal
+from django.db.models import Count, IntegerField, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
 from rest_framework import serializers
-import uuid
 
 from ..models import (
     Trip,
@@ -142,7 +143,41 @@ class TripOverviewSerializer(serializers.ModelSerializer):
             "planned_total",
             "visibility",
         ]
-        
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """
+        Load everything the overview needs in a constant number of queries:
+        owner + budget joined, collaborators (with users) and city labels
+        prefetched, day count annotated. Getters below fall back to per-trip
+        queries when a trip was not loaded through here (e.g. overview action).
+        """
+        day_count = (
+            TripDay.objects.filter(trip=OuterRef("pk"))
+            .order_by()
+            .values("trip")
+            .annotate(c=Count("id"))
+            .values("c")
+        )
+        return (
+            queryset.select_related("owner", "budget")
+            .annotate(overview_day_count=Coalesce(Subquery(day_count, output_field=IntegerField()), 0))
+            .prefetch_related(
+                Prefetch(
+                    "collaborators",
+                    queryset=TripCollaborator.objects.select_related("user").order_by("-role", "invited_at"),
+                    to_attr="overview_collaborators",
+                ),
+                Prefetch(
+                    "items",
+                    queryset=ItineraryItem.objects.filter(destination__city__isnull=False)
+                    .select_related("destination")
+                    .only("id", "trip_id", "day_id", "sort_order", "start_time", "destination__city"),
+                    to_attr="overview_city_items",
+                ),
+            )
+        )
+
     def get_collaborators(self, obj: Trip):
         """
         Return all TripCollaborator users for this trip.
@@ -157,25 +192,19 @@ class TripOverviewSerializer(serializers.ModelSerializer):
                 request, "user", None
             )
 
-        collabs_qs = (
-            obj.collaborators.select_related("user")
-            .order_by("-role", "invited_at")  # owner first, then others
-        )
+        collabs_qs = getattr(obj, "overview_collaborators", None)
+        if collabs_qs is None:
+            collabs_qs = (
+                obj.collaborators.select_related("user")
+                .order_by("-role", "invited_at")  # owner first, then others
+            )
 
         out = []
         for c in collabs_qs:
             # If invited_email exists, always allow showing it
             invited_email = (getattr(c, "invited_email", "") or "").strip()
 
-            u = None
-            raw_user_id = getattr(c, "user_id", None)
-
-            if raw_user_id:
-                try:
-                    user_uuid = uuid.UUID(str(raw_user_id))
-                    u = AppUser.objects.filter(id=user_uuid).first()
-                except (ValueError, TypeError):
-                    u = None
+            u = c.user if c.user_id else None
 
             if u:        
                 initials = _initials_from_name(u.full_name, u.email)
@@ -228,11 +257,15 @@ class TripOverviewSerializer(serializers.ModelSerializer):
 
 
     def get_location_label(self, obj: Trip) :
-        qs = (
-            ItineraryItem.objects.filter(trip=obj, destination__city__isnull=False)
-            .values_list("destination__city", flat=True)
-            .distinct()
-        )
+        city_items = getattr(obj, "overview_city_items", None)
+        if city_items is not None:
+            qs = dict.fromkeys(it.destination.city for it in city_items)
+        else:
+            qs = (
+                ItineraryItem.objects.filter(trip=obj, destination__city__isnull=False)
+                .values_list("destination__city", flat=True)
+                .distinct()
+            )
         cities = [c for c in qs if c]
         if not cities and obj.main_city:
             cities = [obj.main_city]
@@ -244,7 +277,9 @@ class TripOverviewSerializer(serializers.ModelSerializer):
         # For AI-generated trips: duration comes from TripDay count (slider),
         # because start/end are just availability window.
         if obj.travel_type in ("solo_ai", "group_ai"):
-            day_count = obj.days.count()  # TripDay related_name="days"
+            day_count = getattr(obj, "overview_day_count", None)
+            if day_count is None:
+                day_count = obj.days.count()  # TripDay related_name="days"
             if day_count > 0:
                 nights = max(day_count - 1, 0)
                 return f"{day_count} days · {nights} nights"
@@ -322,3 +357,27 @@ class TripCollaboratorInviteSerializer(serializers.Serializer):
         required=False,
         default=TripCollaborator.Role.EDITOR,
     )
+
+
+class NearbyPlacesQuerySerializer(serializers.Serializer):
+    """Query string of GET /api/f1/places/nearby/ (a point + radius, or a bbox)."""
+    lat = serializers.FloatField(required=False, min_value=-90, max_value=90)
+    lon = serializers.FloatField(required=False, min_value=-180, max_value=180)
+    radius_m = serializers.IntegerField(required=False, default=2000, min_value=1, max_value=50_000)
+    bbox = serializers.CharField(required=False, help_text="south,west,north,east")
+    limit = serializers.IntegerField(required=False, default=20, min_value=1, max_value=100)
+    trip_id = serializers.IntegerField(required=False, help_text="Also return this trip's photos")
+
+    def validate(self, attrs):
+        bbox = attrs.get("bbox")
+        if bbox:
+            try:
+                south, west, north, east = (float(v) for v in bbox.split(","))
+            except ValueError:
+                raise serializers.ValidationError({"bbox": "Use south,west,north,east"})
+            if not (-90 <= south <= north <= 90 and -180 <= west <= 180 and -180 <= east <= 180):
+                raise serializers.ValidationError({"bbox": "Coordinates out of range"})
+            attrs["bbox"] = (south, west, north, east)
+        elif attrs.get("lat") is None or attrs.get("lon") is None:
+            raise serializers.ValidationError("Provide lat and lon, or bbox.")
+        return attrs
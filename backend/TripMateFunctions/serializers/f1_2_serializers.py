@@ -45,6 +45,9 @@ class F12RouteOptimizationResponseSerializer(serializers.Serializer):
     total_distance_km = serializers.FloatField()
     total_duration_min = serializers.FloatField()
     updated_items = F12ItemOrderUpdateSerializer(many=True, required=False)
+    # Full-trip optimisation only: travel time of the previous plan and the difference
+    baseline_duration_min = serializers.FloatField(required=False)
+    time_saved_min = serializers.FloatField(required=False)
 
 
 class F12RouteLegsResponseSerializer(serializers.Serializer):
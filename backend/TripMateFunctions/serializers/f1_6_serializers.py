@@ -28,6 +28,8 @@ class DestinationSerializer(serializers.ModelSerializer):
 
 class F16DestinationFAQRequestSerializer(serializers.Serializer):
     destination_id = serializers.IntegerField()
+    # Optional: only FAQs / Q&A matching this text, best match first
+    query = serializers.CharField(required=False, allow_blank=True, max_length=200)
 
 
 class F16FAQEntrySerializer(serializers.ModelSerializer):
@@ -1,8 +1,12 @@
 from rest_framework import serializers
 
+from ..models import Trip
+
 
 class F21SyncRequestSerializer(serializers.Serializer):
     trip_id = serializers.IntegerField()
+    # Journal revision the client already has (preferred over last_synced_at)
+    revision = serializers.IntegerField(required=False, min_value=0)
     last_synced_at = serializers.DateTimeField(required=False)
     # Optional: list of local changes to push
     changes = serializers.JSONField(required=False)
@@ -10,9 +14,34 @@ class F21SyncRequestSerializer(serializers.Serializer):
 
 class F21SyncResponseSerializer(serializers.Serializer):
     """
-    Return any new remote changes since last_synced_at.
-    Frontend will merge these into local state.
+    Return any new remote changes since the client's revision.
+    Frontend will merge these into local state (or replace it when reset).
     """
+    revision = serializers.IntegerField()
     trip = serializers.JSONField(required=False)
+    reset = serializers.BooleanField(required=False)
     changes = serializers.JSONField(required=False)
     server_timestamp = serializers.DateTimeField()
+
+
+class F21TripFieldsSerializer(serializers.ModelSerializer):
+    """Trip row without nested days/items, as sent in "trip" sync changes."""
+
+    owner = serializers.PrimaryKeyRelatedField(read_only=True)
+
+    class Meta:
+        model = Trip
+        fields = [
+            "id",
+            "owner",
+            "title",
+            "main_city",
+            "main_country",
+            "visibility",
+            "start_date",
+            "end_date",
+            "description",
+            "travel_type",
+            "is_demo",
+            "updated_at",
+        ]
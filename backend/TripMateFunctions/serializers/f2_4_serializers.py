@@ -4,16 +4,15 @@ from rest_framework import serializers
 
 from ..models import (
     Trip,
-    TripPhoto,
-    ItineraryItemTag,
     TripDay,
     ItineraryItem,
-    Profile,
     CommunityFAQ,
+    CommunityTripCard,
 )
+from ..services.community_cards import owner_display_name, trip_tags
 
 # -------------------------------------------------------------------
-# Helper functions shared by both preview + detail serializers
+# Helper functions for the detail serializer
 # -------------------------------------------------------------------
 
 
@@ -22,70 +21,34 @@ def _owner_name_from_trip(trip: Trip) -> str:
     Prefer Profile.name (profiles table, Profile.id == AppUser.id).
     Fallback to AppUser.full_name, then email.
     """
-    owner = getattr(trip, "owner", None)
-    if not owner:
-        return ""
+    card = getattr(trip, "community_card", None)
+    if card is not None:
+        return card.owner_name
+    return owner_display_name(getattr(trip, "owner", None))
 
-    # 1) profiles.name
-    profile = Profile.objects.filter(id=owner.id).only("name").first()
-    if profile and profile.name and str(profile.name).strip():
-        return str(profile.name).strip()
-
-    # 2) AppUser.full_name
-    full_name = getattr(owner, "full_name", "") or ""
-    if full_name.strip():
-        return full_name.strip()
-
-    # 3) email fallback
-    return owner.email
 
 def _cover_photo_from_trip(trip: Trip) -> Optional[str]:
     """
     Use the earliest uploaded TripPhoto as the cover photo, if any.
-    If the Trip instance already has prefetch_related("photos") applied,
-    this will re-use that queryset instead of hitting the DB again.
+    Re-uses prefetch_related("photos") instead of querying again.
     """
-    photos = getattr(trip, "photos", None)
-
-    if photos is not None and hasattr(photos, "all"):
-        photo = photos.all().order_by("created_at").first()
-    else:
-        photo = TripPhoto.objects.filter(trip=trip).order_by("created_at").first()
-
-    return photo.file_url if photo else None
+    card = getattr(trip, "community_card", None)
+    if card is not None:
+        return card.cover_photo_url
+    photos = sorted(trip.photos.all(), key=lambda p: (p.created_at, p.id))
+    return photos[0].file_url if photos else None
 
 
 def _tags_from_trip(trip: Trip) -> List[str]:
     """
-    Gather distinct tags from itinerary_item_tag linked to this trip
+    Distinct tags from itinerary_item_tag linked to this trip
     via itinerary_item (item__trip_id).
 
     IMPORTANT:
     - itinerary_item_tag stores one tag per row (not comma-separated).
     - We DO NOT fallback to Trip.travel_type (user explicitly requested this).
     """
-    tag_values = (
-        ItineraryItemTag.objects.filter(item__trip_id=trip.id)
-        .values_list("tag", flat=True)
-        .distinct()
-    )
-
-    tags: List[str] = []
-    seen = set()
-
-    for t in tag_values:
-        if not t:
-            continue
-        tt = str(t).strip()
-        if not tt:
-            continue
-        key = tt.lower()
-        if key in seen:
-            continue
-        seen.add(key)
-        tags.append(tt)
-
-    return tags
+    return trip_tags(trip.id)
 
 
 # -------------------------------------------------------------------
@@ -95,20 +58,22 @@ def _tags_from_trip(trip: Trip) -> List[str]:
 
 class F24CommunityTripPreviewSerializer(serializers.ModelSerializer):
     """
-    Lightweight serializer for the Discovery list views.
+    Lightweight serializer for the Discovery list views, read from the
+    precomputed CommunityTripCard (services/community_cards.py).
     Includes:
       - basic trip info
-      - owner_name (derived from AppUser)
+      - owner_name (Profile.name, AppUser.full_name or email)
       - cover_photo_url (earliest TripPhoto)
       - tags (aggregated itinerary tags ONLY)
+      - day / stop / photo counts
     """
 
-    owner_name = serializers.SerializerMethodField()
-    cover_photo_url = serializers.SerializerMethodField()
+    id = serializers.IntegerField(source="trip_id", read_only=True)
+    visibility = serializers.SerializerMethodField()
     tags = serializers.SerializerMethodField()
 
     class Meta:
-        model = Trip
+        model = CommunityTripCard
         fields = [
             "id",
             "title",
@@ -121,17 +86,18 @@ class F24CommunityTripPreviewSerializer(serializers.ModelSerializer):
             "owner_name",
             "cover_photo_url",
             "tags",
+            "day_count",
+            "stop_count",
+            "photo_count",
         ]
 
-    def get_owner_name(self, obj: Trip) -> str:
-        return _owner_name_from_trip(obj)
-
-    def get_cover_photo_url(self, obj: Trip) -> Optional[str]:
-        return _cover_photo_from_trip(obj)
+    def get_visibility(self, obj: CommunityTripCard) -> str:
+        # Only public trips have a card
+        return Trip.Visibility.PUBLIC
 
-    def get_tags(self, obj: Trip) -> List[str]:
+    def get_tags(self, obj: CommunityTripCard) -> List[str]:
         # Limit to 4 for neat UI; frontend also slices, but this keeps payload small.
-        return _tags_from_trip(obj)[:4]
+        return list(obj.tags or [])[:4]
 
 
 # -------------------------------------------------------------------
@@ -4,6 +4,10 @@ from rest_framework import serializers
 class F26TemplateCopyRequestSerializer(serializers.Serializer):
     public_trip_id = serializers.IntegerField()
     new_owner_id = serializers.IntegerField(required=False)
+    copy_tags = serializers.BooleanField(required=False, default=False)
+    copy_notes = serializers.BooleanField(required=False, default=False)
+    copy_checklists = serializers.BooleanField(required=False, default=False)
+    copy_budget = serializers.BooleanField(required=False, default=False)
 
 
 class F26TemplateCopyResponseSerializer(serializers.Serializer):
@@ -0,0 +1,8 @@
+"""
+Services package.
+
+Shared, view-independent building blocks (concurrency, caching, ...).
+Import the module you need directly, e.g.:
+
+from TripMateFunctions.services.fanout import FanOut
+"""
@@ -0,0 +1,172 @@
+# backend/TripMateFunctions/services/ai_stream.py
+"""
+Server-sent events for the AI endpoints (Planbot chat, solo itinerary).
+
+Sea-Lion (OpenAI-compatible) and Gemini both stream completions as SSE. The
+views proxy those token streams to the browser instead of blocking for the
+whole completion:
+
+    def events():
+        yield sse_event("start", {})
+        for delta in token_stream:
+            yield sse_event("token", {"text": delta})
+    return event_stream_response(events())
+
+ItineraryStreamParser reads the itinerary JSON while it is still being
+generated and hands back each object of the "stops" array as soon as its
+closing brace arrives, so stops can be shown one by one. Stops that were
+complete are kept even if the model stops mid-document (truncated output),
+which used to cost a whole second generation.
+"""
+import json
+
+from django.http import StreamingHttpResponse
+
+
+class AIStreamError(Exception):
+    """A provider failed (before or while streaming)."""
+
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def event_stream_response(events, status: int = 200) -> StreamingHttpResponse:
+    response = StreamingHttpResponse(events, content_type="text/event-stream", status=status)
+    response["Cache-Control"] = "no-cache"
+    # Don't let proxies (nginx / Railway edge) buffer the stream
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+def wants_event_stream(request) -> bool:
+    """?stream=1 or Accept: text/event-stream"""
+    if str(request.query_params.get("stream", "")).lower() in ("1", "true", "yes"):
+        return True
+    return "text/event-stream" in request.headers.get("Accept", "")
+
+
+def iter_sse_data(resp):
+    """Yield the ``data:`` payloads of an upstream SSE response (requests, stream=True)."""
+    data_lines = []
+    for raw in resp.iter_lines(decode_unicode=True):
+        if raw is None:
+            continue
+        line = raw.rstrip("\r")
+        if not line:
+            if data_lines:
+                yield "\n".join(data_lines)
+                data_lines = []
+            continue
+        if line.startswith("data:"):
+            data_lines.append(line[5:].lstrip())
+    if data_lines:
+        yield "\n".join(data_lines)
+
+
+class ItineraryStreamParser:
+    """
+    Incremental scanner for {"title": ..., "stops": [{...}, {...}]}.
+
+    feed(chunk) returns the stops completed by that chunk. Top-level string
+    fields (title, main_city, ...) are collected in ``fields`` as they arrive.
+    The scanner only tracks string/escape state and bracket depth, so markdown
+    fences or prose around the JSON are ignored.
+    """
+
+    def __init__(self, array_key: str = "stops"):
+        self.array_key = array_key
+        self.fields = {}
+        self.stops = []
+        self._buf = ""
+        self._pos = 0
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_string = None
+        self._pending_key = None
+        self._array_depth = None
+        self._item_start = None
+
+    @property
+    def text(self) -> str:
+        return self._buf
+
+    def feed(self, chunk: str) -> list:
+        self._buf += chunk or ""
+        buf = self._buf
+        completed = []
+
+        i = self._pos
+        while i < len(buf):
+            ch = buf[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._close_string(buf[self._string_start : i + 1])
+                i += 1
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch == ":":
+                self._pending_key = self._last_string
+            elif ch == ",":
+                self._pending_key = None
+            elif ch in "{[":
+                self._stack.append(ch)
+                depth = len(self._stack)
+                if (
+                    ch == "["
+                    and depth == 2
+                    and self._stack[0] == "{"
+                    and self._pending_key == self.array_key
+                ):
+                    self._array_depth = depth
+                elif ch == "{" and self._array_depth is not None and depth == self._array_depth + 1:
+                    self._item_start = i
+                self._pending_key = None
+            elif ch in "}]":
+                depth = len(self._stack)
+                if ch == "}" and self._item_start is not None and depth == self._array_depth + 1:
+                    try:
+                        stop = json.loads(buf[self._item_start : i + 1])
+                    except ValueError:
+                        stop = None
+                    if isinstance(stop, dict):
+                        self.stops.append(stop)
+                        completed.append(stop)
+                    self._item_start = None
+                elif ch == "]" and depth == self._array_depth:
+                    self._array_depth = None
+                if self._stack:
+                    self._stack.pop()
+            i += 1
+
+        self._pos = i
+        return completed
+
+    def _close_string(self, literal: str):
+        try:
+            value = json.loads(literal)
+        except ValueError:
+            value = literal[1:-1]
+        if len(self._stack) == 1 and self._pending_key is not None:
+            # Top-level "key": "value"
+            self.fields[self._pending_key] = value
+            self._pending_key = None
+            return
+        self._last_string = value
+
+    def salvage(self) -> dict | None:
+        """Best-effort itinerary from what was parsed (for truncated output)."""
+        if not self.stops:
+            return None
+        return {**self.fields, "stops": list(self.stops)}
@@ -0,0 +1,306 @@
+# backend/TripMateFunctions/services/analytics.py
+"""
+Daily rollups behind the F8 admin dashboard.
+
+The dashboard used to run a dozen COUNT / AVG / TruncDate queries over
+app_user, trip, user_session and profiles for every load. Each calendar day
+now has one AnalyticsDay row (plus AnalyticsDayPlace rows per destination),
+so any from/to range reads O(days) small rows:
+
+    refresh_rollups()                      # dirty / new / stale days only
+    summary = range_summary(date(2026, 1, 1), date(2026, 1, 31))
+    summary["active_users"], summary["active_users_series"], ...
+
+The dashboard only reads rows; recomputing them runs outside the request:
+  - save hooks (signals.py) mark the days a user / trip / session touches as
+    dirty after commit;
+  - a dashboard read that finds dirty days, or today's row missing or older
+    than OPEN_DAY_TTL_SECONDS (sessions and last_active_at are written
+    straight to Supabase by the frontend, which Django never sees), queues one
+    "analytics_rollup" job (schedule_refresh) that runs refresh_rollups();
+  - `python manage.py rollup_analytics` does the same from cron and
+    rebuilds history with --rebuild.
+
+Active users are distinct over a range, so each day keeps one
+AnalyticsActiveUser row per user seen active that day and a range runs one
+COUNT(DISTINCT user_id) over its days. Refreshing a day only adds rows, so a
+user who is active again later still counts for the earlier day.
+"""
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Max, Min, Q, Sum, TextField, Value
+from django.db.models.functions import Coalesce, NullIf, Trim
+from django.utils import timezone
+
+from ..models import (
+    AnalyticsActiveUser,
+    AnalyticsDay,
+    AnalyticsDayPlace,
+    AnalyticsProfileCountry,
+    AppUser,
+    Profile,
+    Trip,
+    UserSession,
+)
+from .commit_batch import collect_on_commit
+
+# Today's and yesterday's rows are recomputed on read at most this often
+OPEN_DAY_TTL_SECONDS = getattr(settings, "ANALYTICS_OPEN_DAY_TTL_SECONDS", 300)
+OPEN_DAYS = 2
+
+
+# ----------------------------
+# Computing a day
+# ----------------------------
+
+def day_bounds(day):
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def _local_date(moment):
+    if moment is None:
+        return None
+    return timezone.localdate(moment) if timezone.is_aware(moment) else moment.date()
+
+
+def _first_non_blank(*fields):
+    blank = Value("", output_field=TextField())
+    return Coalesce(
+        *[NullIf(Trim(f), blank) for f in fields],
+        Value("Others", output_field=TextField()),
+        output_field=TextField(),
+    )
+
+
+def refresh_day(day) -> AnalyticsDay:
+    """Recompute one day's row and place counts from the source tables."""
+    start, end = day_bounds(day)
+    created = Trip.objects.filter(created_at__gte=start, created_at__lt=end)
+    trips = created.aggregate(total=Count("id"), demo=Count("id", filter=Q(is_demo=True)))
+    places = list(
+        created.annotate(place=_first_non_blank("main_country", "main_city"))
+        .values("place")
+        .annotate(trips=Count("id"), demo=Count("id", filter=Q(is_demo=True)))
+    )
+    moderated = Q(moderated_at__gte=start, moderated_at__lt=end)
+    flagged = Q(is_flagged=True, updated_at__gte=start, updated_at__lt=end)
+    moderation = Trip.objects.filter(moderated | flagged).aggregate(
+        approved=Count("id", filter=moderated & Q(moderation_status="APPROVED")),
+        rejected=Count("id", filter=moderated & Q(moderation_status="REJECTED")),
+        flagged=Count("id", filter=flagged),
+        pending=Count("id", filter=flagged & Q(moderation_status__isnull=True)),
+    )
+    sessions = (
+        UserSession.objects.filter(session_start__gte=start, session_start__lt=end, duration_sec__isnull=False)
+        .aggregate(n=Count("id"), seconds=Sum("duration_sec"))
+    )
+    signups = AppUser.objects.filter(created_at__gte=start, created_at__lt=end).count()
+    active_ids = AppUser.objects.filter(last_active_at__gte=start, last_active_at__lt=end).values_list("id", flat=True)
+
+    AnalyticsDay.objects.get_or_create(date=day)
+    with transaction.atomic():
+        # Row lock: a hook marking the day dirty meanwhile waits and wins
+        row = AnalyticsDay.objects.select_for_update().get(date=day)
+        AnalyticsActiveUser.objects.bulk_create(
+            [AnalyticsActiveUser(day=row, user_id=user_id) for user_id in active_ids],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+        row.active_users = AnalyticsActiveUser.objects.filter(day=row).count()
+        row.signups = signups
+        row.itineraries_created = trips["total"]
+        row.demo_itineraries_created = trips["demo"]
+        row.session_count = sessions["n"]
+        row.session_seconds = sessions["seconds"] or 0
+        row.approved = moderation["approved"]
+        row.rejected = moderation["rejected"]
+        row.flagged = moderation["flagged"]
+        row.flagged_pending = moderation["pending"]
+        row.dirty = False
+        row.refreshed_at = timezone.now()
+        row.save()
+        AnalyticsDayPlace.objects.filter(day=row).delete()
+        AnalyticsDayPlace.objects.bulk_create([
+            AnalyticsDayPlace(day=row, place=p["place"][:255], trips=p["trips"], demo_trips=p["demo"])
+            for p in places
+        ])
+    return row
+
+
+def _earliest_day():
+    firsts = [
+        AppUser.objects.aggregate(m=Min("created_at"))["m"],
+        Trip.objects.aggregate(m=Min("created_at"))["m"],
+    ]
+    firsts = [_local_date(f) for f in firsts if f]
+    return min(firsts) if firsts else None
+
+
+def rebuild_rollups(since=None) -> int:
+    """Recompute every day from ``since`` (default: the first user / trip) to today."""
+    today = timezone.localdate()
+    day = since or _earliest_day() or today
+    count = 0
+    while day <= today:
+        refresh_day(day)
+        day += timedelta(days=1)
+        count += 1
+    refresh_profile_countries()
+    return count
+
+
+def refresh_rollups() -> int:
+    """
+    Bring the rollups up to date: dirty days, days after the newest row and
+    today / yesterday when stale. Builds the whole history on first use.
+    Returns the number of days recomputed.
+    """
+    today = timezone.localdate()
+    # Rows created by hooks alone (refreshed_at unset) don't count as history
+    latest = AnalyticsDay.objects.filter(refreshed_at__isnull=False).aggregate(m=Max("date"))["m"]
+    if latest is None:
+        return rebuild_rollups()
+
+    days = set(AnalyticsDay.objects.filter(dirty=True, date__lte=today).values_list("date", flat=True))
+    day = latest + timedelta(days=1)
+    while day <= today:
+        days.add(day)
+        day += timedelta(days=1)
+    stale_before = timezone.now() - timedelta(seconds=OPEN_DAY_TTL_SECONDS)
+    open_days = [today - timedelta(days=i) for i in range(OPEN_DAYS)]
+    fresh = set(
+        AnalyticsDay.objects.filter(date__in=open_days, refreshed_at__gte=stale_before).values_list("date", flat=True)
+    )
+    days.update(d for d in open_days if d not in fresh)
+
+    for day in sorted(days):
+        refresh_day(day)
+    return len(days)
+
+
+def schedule_refresh():
+    """
+    Queue the "analytics_rollup" job when the rollups are behind: dirty days,
+    or no fresh row for today. One job at a time; returns it, or None.
+    """
+    from .jobs import enqueue
+
+    stale_before = timezone.now() - timedelta(seconds=OPEN_DAY_TTL_SECONDS)
+    fresh_today = AnalyticsDay.objects.filter(
+        date=timezone.localdate(), dirty=False, refreshed_at__gte=stale_before
+    ).exists()
+    if fresh_today and not AnalyticsDay.objects.filter(dirty=True).exists():
+        return None
+    job, _ = enqueue("analytics_rollup", dedupe_key="all")
+    return job
+
+
+def run_rollup_job(job):
+    """Job handler (services/jobs.py): the first run builds the whole history."""
+    days = refresh_rollups()
+    refresh_profile_countries()
+    return {"days": days}
+
+
+# ----------------------------
+# Save hooks
+# ----------------------------
+
+def mark_days_dirty(days):
+    days = {d for d in days if d}
+    if not days:
+        return
+    updated = AnalyticsDay.objects.filter(date__in=days).update(dirty=True)
+    if updated < len(days):
+        AnalyticsDay.objects.bulk_create([AnalyticsDay(date=d, dirty=True) for d in days], ignore_conflicts=True)
+
+
+def mark_dirty_on_commit(*moments):
+    """Mark the days of these datetimes dirty once the transaction commits (one UPDATE per transaction)."""
+    collect_on_commit("analytics_days", {_local_date(m) for m in moments}, mark_days_dirty)
+
+
+# ----------------------------
+# Reading
+# ----------------------------
+
+def range_summary(start, end) -> dict:
+    """Metrics for the days start..end (inclusive) from the rollup rows."""
+    rows = AnalyticsDay.objects.filter(date__gte=start, date__lte=end)
+    sums = rows.aggregate(
+        signups=Sum("signups"),
+        itineraries_created=Sum("itineraries_created"),
+        demo_itineraries_created=Sum("demo_itineraries_created"),
+        session_count=Sum("session_count"),
+        session_seconds=Sum("session_seconds"),
+        approved=Sum("approved"),
+        rejected=Sum("rejected"),
+        flagged=Sum("flagged"),
+        flagged_pending=Sum("flagged_pending"),
+    )
+    out = {k: int(v or 0) for k, v in sums.items()}
+
+    out["active_users"] = AnalyticsActiveUser.objects.filter(
+        day__date__gte=start, day__date__lte=end
+    ).aggregate(n=Count("user_id", distinct=True))["n"]
+    per_day = dict(rows.values_list("date", "active_users"))
+    days = (end - start).days + 1
+    out["active_users_series"] = [int(per_day.get(start + timedelta(days=i), 0)) for i in range(days)]
+    out["avg_session_length_min"] = (
+        round(out["session_seconds"] / out["session_count"] / 60.0, 1) if out["session_count"] else 0.0
+    )
+    return out
+
+
+def totals() -> dict:
+    """All-time users / itineraries / demo itineraries (sums of the daily rows)."""
+    sums = AnalyticsDay.objects.aggregate(
+        users=Sum("signups"),
+        itineraries=Sum("itineraries_created"),
+        demo_itineraries=Sum("demo_itineraries_created"),
+    )
+    return {k: int(v or 0) for k, v in sums.items()}
+
+
+def top_places(start, end, limit: int = 5, include_demo: bool = True):
+    """[(place, trips), ...] for trips created start..end, most first."""
+    trips = Sum("trips") if include_demo else Sum("trips") - Sum("demo_trips")
+    rows = (
+        AnalyticsDayPlace.objects.filter(day__date__gte=start, day__date__lte=end)
+        .values("place")
+        .annotate(n=trips)
+        .filter(n__gt=0)
+        .order_by("-n", "place")
+    )
+    return [(r["place"], int(r["n"])) for r in rows[:limit]]
+
+
+def refresh_profile_countries() -> int:
+    """Snapshot profiles per country (profiles are edited in Supabase, so no hooks)."""
+    if "profiles" not in connection.introspection.table_names():
+        return 0
+    counts = list(
+        Profile.objects.annotate(country=_first_non_blank("nationality", "location"))
+        .values("country")
+        .annotate(n=Count("id"))
+    )
+    with transaction.atomic():
+        AnalyticsProfileCountry.objects.all().delete()
+        AnalyticsProfileCountry.objects.bulk_create([
+            AnalyticsProfileCountry(country=c["country"][:255], profiles=c["n"]) for c in counts
+        ])
+    return len(counts)
+
+
+def profile_countries(limit: int = 5):
+    """
+    (total profiles, [(country, profiles), ...] most first) from the snapshot
+    the rollup job / command takes.
+    """
+    snapshot = AnalyticsProfileCountry.objects.all()
+    total = snapshot.aggregate(n=Sum("profiles"))["n"] or 0
+    top = snapshot.order_by("-profiles", "country").values_list("country", "profiles")[:limit]
+    return int(total), [(country, int(n)) for country, n in top]
@@ -0,0 +1,283 @@
+# backend/TripMateFunctions/services/cache.py
+"""
+Shared cache layer.
+
+All view-level caches (adaptive previews, Overpass, OpenTripMap, geocoding,
+SeaLion about/travel, FX rates ...) go through a CacheNamespace instead of a
+module-level dict. Values live in the Django cache backend configured in
+settings.CACHES (file-based by default, Redis when REDIS_URL is set), so every
+gunicorn worker shares them. Size is left to the backend: the file backend
+culls a random share of its files past MAX_ENTRIES, Redis evicts per its
+maxmemory policy.
+
+A small per-process LRU (L1) sits in front of the shared backend to avoid
+re-reading hot keys from disk/network within a few seconds.
+
+    OSM_CACHE = CacheNamespace("osm", default_ttl=60 * 60 * 24)
+    hours = OSM_CACHE.get(key)
+    OSM_CACHE.set(key, hours)
+"""
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+# Short in-process TTL so a clear()/update from another worker is seen quickly.
+L1_MAX_TTL_SECONDS = 30
+VERSION_REFRESH_SECONDS = 10
+
+_NAMESPACES: dict[str, "CacheNamespace"] = {}
+_NAMESPACES_LOCK = threading.Lock()
+
+
+_SAFE_KEY_RE = re.compile(r"^[A-Za-z0-9_.:|=@-]{1,160}$")
+
+
+def safe_key(key) -> str:
+    """Keys with spaces/unicode or very long keys are hashed (memcached/redis-safe)."""
+    key = str(key)
+    if _SAFE_KEY_RE.match(key):
+        return key
+    return "h:" + hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def _new_version(previous: int | None) -> int:
+    """A namespace version above ``previous`` and every version handed out before."""
+    return max(time.time_ns(), (previous or 0) + 1)
+
+
+class LocalLRU:
+    """Bounded in-process LRU with per-entry expiry."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max(int(max_entries), 0)
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        if not self.max_entries:
+            return _MISSING
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return _MISSING
+            expires_at, value = entry
+            if expires_at <= now:
+                self._data.pop(key, None)
+                return _MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value, ttl_seconds: float):
+        if not self.max_entries:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class CacheNamespace:
+    """
+    A named slice of the shared cache with its own default TTL and counters.
+
+    - get()/set() store any picklable value; ``None`` is a valid cached value
+      (use lookup() to tell a cached None from a miss).
+    - clear() moves the namespace to a new version, which invalidates every
+      key in it across all workers without scanning the backend.
+
+    Versions are wall-clock nanoseconds stored without a timeout. If the
+    version key is lost anyway (evicted or culled), the next reader starts a
+    new, higher version, so entries from before a clear() never come back.
+    """
+
+    def __init__(self, namespace: str, default_ttl: int = 3600, l1_size: int = 256, alias: str = "default"):
+        self.namespace = namespace
+        self.default_ttl = max(int(default_ttl), 1)
+        self.alias = alias
+        self._l1 = LocalLRU(l1_size)
+        self._lock = threading.Lock()
+        self._version = None
+        self._version_checked_at = 0.0
+        self.hits = 0
+        self.l1_hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.errors = 0
+
+        with _NAMESPACES_LOCK:
+            _NAMESPACES[namespace] = self
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    def _version_key(self) -> str:
+        return f"tm:{self.namespace}:__version"
+
+    def _current_version(self) -> int:
+        now = time.monotonic()
+        if self._version is not None and now - self._version_checked_at < VERSION_REFRESH_SECONDS:
+            return self._version
+        try:
+            version = self.backend.get(self._version_key())
+            if version is None:
+                # First use, or the key was evicted: a fresh generation
+                version = _new_version(self._version)
+                self.backend.add(self._version_key(), version, None)
+                version = self.backend.get(self._version_key()) or version
+        except Exception as exc:
+            logger.warning("cache[%s] version lookup failed: %s", self.namespace, exc)
+            version = self._version or _new_version(None)
+        if version != self._version:
+            self._l1.clear()
+        self._version = version
+        self._version_checked_at = now
+        return version
+
+    def make_key(self, key: str) -> str:
+        return f"tm:{self.namespace}:v{self._current_version()}:{safe_key(key)}"
+
+    def _count(self, field: str):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def lookup(self, key: str):
+        """Return (hit, value)."""
+        full_key = self.make_key(key)
+
+        value = self._l1.get(full_key)
+        if value is not _MISSING:
+            self._count("l1_hits")
+            self._count("hits")
+            return True, value
+
+        try:
+            entry = self.backend.get(full_key)
+        except Exception as exc:
+            logger.warning("cache[%s] get failed: %s", self.namespace, exc)
+            self._count("errors")
+            entry = None
+
+        if not isinstance(entry, dict) or "v" not in entry:
+            self._count("misses")
+            return False, None
+
+        self._count("hits")
+        remaining = entry.get("exp", 0) - time.time()
+        self._l1.set(full_key, entry["v"], min(L1_MAX_TTL_SECONDS, max(remaining, 0)))
+        return True, entry["v"]
+
+    def get(self, key: str, default=None):
+        hit, value = self.lookup(key)
+        return value if hit else default
+
+    def get_many(self, keys) -> dict:
+        """{key: value} for the keys that are cached (one backend round trip, no L1)."""
+        full_keys = {self.make_key(key): key for key in keys}
+        if not full_keys:
+            return {}
+        try:
+            entries = self.backend.get_many(list(full_keys))
+        except Exception as exc:
+            logger.warning("cache[%s] get_many failed: %s", self.namespace, exc)
+            self._count("errors")
+            return {}
+        found = {
+            full_keys[full_key]: entry["v"]
+            for full_key, entry in entries.items()
+            if isinstance(entry, dict) and "v" in entry
+        }
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(full_keys) - len(found)
+        return found
+
+    def set(self, key: str, value, ttl: int | None = None):
+        ttl = max(int(ttl if ttl is not None else self.default_ttl), 1)
+        full_key = self.make_key(key)
+        try:
+            self.backend.set(full_key, {"v": value, "exp": time.time() + ttl}, ttl)
+        except Exception as exc:
+            logger.warning("cache[%s] set failed: %s", self.namespace, exc)
+            self._count("errors")
+        self._l1.set(full_key, value, min(L1_MAX_TTL_SECONDS, ttl))
+        self._count("sets")
+
+    def set_many(self, values: dict, ttl: int | None = None):
+        """Store {key: value} in one backend round trip."""
+        ttl = max(int(ttl if ttl is not None else self.default_ttl), 1)
+        expires = time.time() + ttl
+        entries = {self.make_key(key): {"v": value, "exp": expires} for key, value in values.items()}
+        if not entries:
+            return
+        try:
+            self.backend.set_many(entries, ttl)
+        except Exception as exc:
+            logger.warning("cache[%s] set_many failed: %s", self.namespace, exc)
+            self._count("errors")
+        for full_key, entry in entries.items():
+            self._l1.set(full_key, entry["v"], min(L1_MAX_TTL_SECONDS, ttl))
+        with self._lock:
+            self.sets += len(entries)
+
+    def delete(self, key: str):
+        full_key = self.make_key(key)
+        self._l1.delete(full_key)
+        try:
+            self.backend.delete(full_key)
+        except Exception as exc:
+            logger.warning("cache[%s] delete failed: %s", self.namespace, exc)
+            self._count("errors")
+
+    def clear(self):
+        self._l1.clear()
+        try:
+            # incr() would rewrite the key with the backend's default timeout
+            version = _new_version(max(self._version or 0, self.backend.get(self._version_key()) or 0))
+            self.backend.set(self._version_key(), version, None)
+        except Exception as exc:
+            logger.warning("cache[%s] clear failed: %s", self.namespace, exc)
+            self._count("errors")
+            return
+        self._version = version
+        self._version_checked_at = time.monotonic()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "namespace": self.namespace,
+            "hits": self.hits,
+            "l1_hits": self.l1_hits,
+            "misses": self.misses,
+            "sets": self.sets,
+            "errors": self.errors,
+            "hit_rate": round(self.hits / total, 3) if total else None,
+        }
+
+
+def get_namespace(namespace: str) -> CacheNamespace | None:
+    return _NAMESPACES.get(namespace)
+
+
+def cache_stats() -> list[dict]:
+    """Hit/miss counters for every namespace in this process."""
+    return [ns.stats() for ns in sorted(_NAMESPACES.values(), key=lambda n: n.namespace)]
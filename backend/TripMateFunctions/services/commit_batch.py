@@ -0,0 +1,45 @@
+# backend/TripMateFunctions/services/commit_batch.py
+"""
+Coalesced after-commit work for hooks that fire per row.
+
+Save hooks run once per saved row, so a bulk edit or a trip clone would
+mark the same analytics day or refresh the same community card hundreds of
+times. Hooks add their keys to a pending set instead; the first callback
+that runs after the commit flushes the whole set in one go:
+
+    collect_on_commit("analytics_days", days, mark_days_dirty)
+
+The later callbacks of that transaction find the set empty and return.
+Outside a transaction on_commit runs at once, so the flush happens
+straight away. Keys added in a transaction that is rolled back are flushed
+with the thread's next commit, so flush functions must be idempotent
+(re-marking a day, refreshing a card).
+"""
+import threading
+
+from django.db import transaction
+
+_pending = threading.local()
+
+
+def _batches() -> dict:
+    if not hasattr(_pending, "batches"):
+        _pending.batches = {}
+    return _pending.batches
+
+
+def collect_on_commit(name: str, keys, flush):
+    """Add ``keys`` to the pending set ``name``; ``flush(keys)`` runs once after commit."""
+    keys = {k for k in keys if k is not None}
+    if not keys:
+        return
+    batches = _batches()
+    batches.setdefault(name, set()).update(keys)
+
+    def run():
+        batch = batches.pop(name, None)
+        if batch:
+            flush(batch)
+
+    # A failed flush is logged, never raised into the write that triggered it
+    transaction.on_commit(run, robust=True)
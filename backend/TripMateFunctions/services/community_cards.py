@@ -0,0 +1,145 @@
+# backend/TripMateFunctions/services/community_cards.py
+"""
+Read model for the F2.4 community feed.
+
+Every public, unflagged trip has a CommunityTripCard row holding what a
+discovery card shows (owner name, cover photo, tags, day/stop/photo counts),
+so a feed page is one indexed query instead of a Profile, photo and tag query
+per trip. The trip's search document (services/search.py) is refreshed with
+its card. Signals call schedule_card_refresh(trip_id) when a trip or its days,
+items, tags or photos change; the card is rebuilt once, after commit:
+
+    schedule_card_refresh(trip.id)      # from signals / bulk writers
+    refresh_community_card(trip.id)     # synchronous, returns the card or None
+
+Profile names are edited straight in Supabase, which Django never sees; they
+reach the cards on the trip's next change or with
+`python manage.py rebuild_community_cards`.
+"""
+import logging
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from ..models import (
+    CommunityTripCard,
+    ItineraryItem,
+    ItineraryItemTag,
+    Profile,
+    SearchDocument,
+    Trip,
+    TripDay,
+    TripPhoto,
+)
+from .commit_batch import collect_on_commit
+from .ledger import owner_is_deleting
+from .search import index_trip, remove_document
+
+logger = logging.getLogger(__name__)
+
+# Tags stored per card; the feed shows the first four
+CARD_TAG_LIMIT = 12
+
+
+def is_listed(trip: Trip) -> bool:
+    return trip.visibility == Trip.Visibility.PUBLIC and not trip.is_flagged
+
+
+def owner_display_name(owner) -> str:
+    """Profile.name, else AppUser.full_name, else the email."""
+    if not owner:
+        return ""
+    profile_name = Profile.objects.filter(id=owner.id).values_list("name", flat=True).first()
+    if profile_name and str(profile_name).strip():
+        return str(profile_name).strip()
+    full_name = (getattr(owner, "full_name", "") or "").strip()
+    return full_name or owner.email
+
+
+def trip_tags(trip_id) -> list:
+    """Distinct itinerary tags of a trip (case-insensitive), in first-seen order."""
+    tags, seen = [], set()
+    for tag in ItineraryItemTag.objects.filter(item__trip_id=trip_id).order_by("id").values_list("tag", flat=True):
+        tag = str(tag or "").strip()
+        if tag and tag.lower() not in seen:
+            seen.add(tag.lower())
+            tags.append(tag)
+    return tags
+
+
+def _card_values(trip: Trip) -> dict:
+    photos = TripPhoto.objects.filter(trip_id=trip.id)
+    return {
+        "title": trip.title,
+        "main_city": trip.main_city,
+        "main_country": trip.main_country,
+        "travel_type": trip.travel_type,
+        "start_date": trip.start_date,
+        "end_date": trip.end_date,
+        "created_at": trip.created_at,
+        "owner_name": owner_display_name(trip.owner)[:255],
+        "cover_photo_url": photos.order_by("created_at", "id").values_list("file_url", flat=True).first(),
+        "tags": trip_tags(trip.id)[:CARD_TAG_LIMIT],
+        "day_count": TripDay.objects.filter(trip_id=trip.id).count(),
+        "stop_count": ItineraryItem.objects.filter(trip_id=trip.id).count(),
+        "photo_count": photos.count(),
+    }
+
+
+def refresh_community_card(trip_id, trip: Trip | None = None):
+    """Rebuild (or drop) the card and search document of one trip now. Returns the card, or None if unlisted."""
+    if trip is None:
+        trip = Trip.objects.select_related("owner").filter(pk=trip_id).first()
+    if trip is None or not is_listed(trip):
+        CommunityTripCard.objects.filter(trip_id=trip_id).delete()
+        remove_document(SearchDocument.Kind.TRIP, trip_id)
+        return None
+
+    index_trip(trip)
+    values = _card_values(trip)
+    if CommunityTripCard.objects.filter(trip_id=trip.id).update(**values, refreshed_at=timezone.now()):
+        return CommunityTripCard(trip_id=trip.id, **values)
+    try:
+        with transaction.atomic():
+            return CommunityTripCard.objects.create(trip=trip, **values)
+    except IntegrityError:
+        # A concurrent refresh inserted it first
+        CommunityTripCard.objects.filter(trip_id=trip.id).update(**values, refreshed_at=timezone.now())
+        return CommunityTripCard(trip_id=trip.id, **values)
+
+
+def _refresh_cards(trip_ids):
+    """Rebuild the cards of the listed trips among ``trip_ids`` (one query to load them)."""
+    # Unlisted trips are skipped: they lost their card when they were saved
+    listed = Trip.objects.select_related("owner").filter(
+        pk__in=trip_ids, visibility=Trip.Visibility.PUBLIC, is_flagged=False
+    )
+    for trip in listed.order_by("pk"):
+        try:
+            refresh_community_card(trip.id, trip=trip)
+        except Exception:
+            logger.exception("community card refresh failed for trip %s", trip.id)
+
+
+def schedule_card_refresh(trip_id):
+    """Refresh the trip's card once the current transaction commits (at most once per transaction)."""
+    if trip_id is None or owner_is_deleting("trips", trip_id):
+        return
+    collect_on_commit("community_cards", {trip_id}, _refresh_cards)
+
+
+def schedule_owner_cards_refresh(user_id):
+    """The owner's name changed: refresh the cards of their listed trips."""
+    for trip_id in CommunityTripCard.objects.filter(trip__owner_id=user_id).values_list("trip_id", flat=True):
+        schedule_card_refresh(trip_id)
+
+
+def rebuild_community_cards() -> int:
+    """Rebuild every card from scratch; returns the number of listed trips."""
+    listed = Trip.objects.filter(visibility=Trip.Visibility.PUBLIC, is_flagged=False)
+    CommunityTripCard.objects.exclude(trip__in=listed).delete()
+    count = 0
+    for trip in listed.select_related("owner").iterator(chunk_size=200):
+        refresh_community_card(trip.id, trip=trip)
+        count += 1
+    return count
@@ -0,0 +1,163 @@
+# backend/TripMateFunctions/services/fanout.py
+"""
+Dependency-aware concurrent fetch stage.
+
+Views such as place-details stitch together many slow external lookups
+(Mapbox, Wikipedia, Overpass, SeaLion ...). Registering them on a FanOut
+runs every independent source in parallel, starts dependent sources as soon
+as their inputs are ready, and bounds the whole stage with one deadline.
+Whatever finished in time is returned together with a per-source status, so
+the caller can still build a (partial) response.
+"""
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+STATUS_OK = "ok"
+STATUS_ERROR = "error"
+STATUS_TIMEOUT = "timeout"
+STATUS_SKIPPED = "skipped"
+
+
+def _in_worker(fn, arg):
+    """Run one task; give back any DB connection the worker thread opened (or its pool slot)."""
+    try:
+        return fn(arg)
+    finally:
+        connections.close_all()
+
+
+class FanOutResult:
+    def __init__(self, values: dict, status: dict, elapsed_ms: int):
+        self.values = values
+        self.status = status
+        self.elapsed_ms = elapsed_ms
+
+    def get(self, name: str, default=None):
+        value = self.values.get(name)
+        return default if value is None else value
+
+    def ok(self, name: str) -> bool:
+        return (self.status.get(name) or {}).get("status") == STATUS_OK
+
+    @property
+    def partial(self) -> bool:
+        return any(s.get("status") != STATUS_OK for s in self.status.values())
+
+
+class FanOut:
+    """
+    Usage:
+        fan = FanOut(deadline_seconds=15)
+        fan.add("geo", lambda deps: wiki_geosearch(lat, lon), default=[])
+        fan.add("wiki", lambda deps: wiki_summary(deps["geo"]), after=["geo"])
+        result = fan.run()
+
+    Each source callable receives a dict with the values of the sources listed
+    in ``after``. A dependency that failed or timed out contributes its
+    ``default`` instead, so downstream sources still run with what we have.
+    Dependencies must be registered before the sources that use them.
+    """
+
+    def __init__(self, deadline_seconds: float = 20.0, max_workers: int = 8, name: str = "fanout"):
+        self.deadline_seconds = max(float(deadline_seconds), 0.1)
+        self.max_workers = max(int(max_workers), 1)
+        self.name = name
+        self._tasks: dict[str, dict] = {}
+
+    def add(self, name: str, fn, *, after=(), default=None):
+        if name in self._tasks:
+            raise ValueError(f"Source '{name}' registered twice")
+        missing = [d for d in after if d not in self._tasks]
+        if missing:
+            raise ValueError(f"Source '{name}' depends on unknown sources: {missing}")
+        self._tasks[name] = {"fn": fn, "after": tuple(after), "default": default}
+        return self
+
+    def run(self) -> FanOutResult:
+        started = time.monotonic()
+        deadline = started + self.deadline_seconds
+
+        values: dict = {}
+        status: dict = {}
+        waiting = dict(self._tasks)
+        running: dict = {}  # future -> (name, started_at)
+
+        def _settle(name: str, state: str, t0: float | None, value=None, error: str | None = None):
+            values[name] = value if state == STATUS_OK else self._tasks[name]["default"]
+            entry = {"status": state}
+            if t0 is not None:
+                entry["ms"] = int((time.monotonic() - t0) * 1000)
+            if error:
+                entry["error"] = error
+            status[name] = entry
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+        try:
+            while waiting or running:
+                for name, spec in list(waiting.items()):
+                    if all(dep in status for dep in spec["after"]):
+                        deps = {dep: values.get(dep) for dep in spec["after"]}
+                        running[executor.submit(_in_worker, spec["fn"], deps)] = (name, time.monotonic())
+                        del waiting[name]
+
+                remaining = deadline - time.monotonic()
+                if not running or remaining <= 0:
+                    break
+
+                done, _ = wait(list(running), timeout=remaining, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    name, t0 = running.pop(fut)
+                    try:
+                        _settle(name, STATUS_OK, t0, value=fut.result())
+                    except Exception as exc:
+                        logger.warning("%s source '%s' failed: %s", self.name, name, exc)
+                        _settle(name, STATUS_ERROR, t0, error=str(exc)[:200])
+
+            for fut, (name, t0) in running.items():
+                fut.cancel()
+                _settle(name, STATUS_TIMEOUT, t0)
+            for name in waiting:
+                _settle(name, STATUS_SKIPPED, None)
+        finally:
+            # Don't block the response on stragglers; they finish on their own HTTP timeouts.
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        elapsed_ms = int((time.monotonic() - started) * 1000)
+        if any(s["status"] != STATUS_OK for s in status.values()):
+            logger.info("%s finished partially in %sms: %s", self.name, elapsed_ms, status)
+        return FanOutResult(values, status, elapsed_ms)
+
+
+def parallel_map(fn, items, *, max_workers: int = 6, timeout: float | None = None, name: str = "pmap"):
+    """
+    Run ``fn`` over ``items`` concurrently and return results in input order.
+    Items that raise or do not finish within ``timeout`` yield None.
+    """
+    items = list(items)
+    if not items:
+        return []
+    if len(items) == 1:
+        try:
+            return [fn(items[0])]
+        except Exception as exc:
+            logger.warning("%s item failed: %s", name, exc)
+            return [None]
+
+    out = [None] * len(items)
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items))), thread_name_prefix=name)
+    try:
+        futures = {executor.submit(_in_worker, fn, it): idx for idx, it in enumerate(items)}
+        done, _ = wait(list(futures), timeout=timeout)
+        for fut in done:
+            try:
+                out[futures[fut]] = fut.result()
+            except Exception as exc:
+                logger.warning("%s item failed: %s", name, exc)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return out
@@ -0,0 +1,90 @@
+# backend/TripMateFunctions/services/geohash.py
+"""
+Geohash encoding and cell covers (no Django imports, so models can use it).
+
+A geohash is a base-32 string naming a lat/lon cell; every extra character
+splits the cell into 32, and points in the same cell share the prefix. A
+radius query becomes a few prefix (LIKE 'abc%') lookups on an indexed column:
+
+    encode(35.0116, 135.7681)          # 'xn0x1mxm6'
+    cover(35.0, 135.7, 35.02, 135.78)  # {'xn0rp', 'xn0x0', 'xn0x1'}
+"""
+import math
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+# ~4.8 m x 4.8 m cells; queries use shorter prefixes
+PRECISION = 9
+# Prefixes per query: enough to cover a box without a huge OR
+MAX_CELLS = 12
+
+
+def encode(lat: float, lon: float, precision: int = PRECISION) -> str:
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    chars, bits, ch, even = [], 0, 0, True
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if lon >= mid:
+                ch = ch * 2 + 1
+                lon_lo = mid
+            else:
+                ch = ch * 2
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                ch = ch * 2 + 1
+                lat_lo = mid
+            else:
+                ch = ch * 2
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[ch])
+            bits, ch = 0, 0
+    return "".join(chars)
+
+
+def encode_or_none(lat, lon, precision: int = PRECISION):
+    """encode() for model fields: None when a coordinate is missing or out of range."""
+    if lat is None or lon is None:
+        return None
+    try:
+        lat, lon = float(lat), float(lon)
+    except (TypeError, ValueError):
+        return None
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0):
+        return None
+    return encode(lat, lon, precision)
+
+
+def cell_size_deg(precision: int):
+    """(lat degrees, lon degrees) of a cell at ``precision``."""
+    lon_bits = math.ceil(5 * precision / 2)
+    lat_bits = 5 * precision - lon_bits
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def _steps(lo: float, hi: float, step: float) -> list:
+    n = int((hi - lo) / step) + 1
+    return [lo + i * step for i in range(n)] + [hi]
+
+
+def cover(south: float, west: float, north: float, east: float, max_cells: int = MAX_CELLS) -> set:
+    """
+    Geohash prefixes whose cells together contain the box (west <= east, no
+    date-line crossing), using the longest prefix that needs <= max_cells.
+    """
+    for precision in range(PRECISION, 0, -1):
+        lat_deg, lon_deg = cell_size_deg(precision)
+        rows = math.floor((north - south) / lat_deg) + 2
+        cols = math.floor((east - west) / lon_deg) + 2
+        if rows * cols <= max_cells:
+            break
+    return {
+        encode(min(lat, 90.0), min(lon, 180.0), precision)
+        for lat in _steps(south, north, lat_deg)
+        for lon in _steps(west, east, lon_deg)
+    }
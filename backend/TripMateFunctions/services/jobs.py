@@ -0,0 +1,333 @@
+# backend/TripMateFunctions/services/jobs.py
+"""
+DB-backed background job queue.
+
+AI itinerary generation and invitation emails used to run in ad-hoc
+threads: a worker restart lost them and a burst of requests spawned
+unbounded threads. They are now BackgroundJob rows:
+
+    job, created = enqueue("group_itinerary", trip=trip, dedupe_key=f"trip:{trip.id}")
+
+- JOB_KINDS maps a kind to its handler (and an optional final-failure hook)
+  by dotted path. A handler receives the job, may call report_progress(),
+  and returns a JSON-serialisable result. Raising JobError(message) stores
+  ``message`` for the client; other exceptions are logged and reported as a
+  generic failure. Either way the job is retried with exponential backoff
+  until max_attempts.
+- Jobs are claimed with a conditional UPDATE and a lease (locked_until), so
+  any number of workers can share the table and jobs of a crashed worker are
+  claimed again once the lease runs out.
+- Workers: `python manage.py run_jobs` (Procfile "worker"), and/or a small
+  in-process pool per web worker when settings.JOBS_RUN_IN_PROCESS is on.
+  gunicorn starts that pool at boot (post_worker_init in gunicorn.conf.py),
+  so jobs left queued, backing off or with an expired lease by a restart run
+  without waiting for the next enqueue.
+- Clients poll GET /api/jobs/<id>/.
+"""
+import logging
+import os
+import random
+import socket
+import threading
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from ..models import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+JOB_KINDS = {
+    "solo_itinerary": {
+        "handler": "TripMateFunctions.views.f1_3_views.run_solo_generation_job",
+        "max_attempts": 2,
+    },
+    "group_itinerary": {
+        "handler": "TripMateFunctions.views.f2_2_views.run_group_generation_job",
+        "on_failure": "TripMateFunctions.views.f2_2_views.group_generation_failed",
+        "max_attempts": 3,
+    },
+    "email": {
+        "handler": "TripMateFunctions.services.mailer.run_email_job",
+        "max_attempts": 5,
+    },
+    "analytics_rollup": {
+        "handler": "TripMateFunctions.services.analytics.run_rollup_job",
+        "max_attempts": 2,
+    },
+}
+
+ACTIVE_STATUSES = (BackgroundJob.Status.QUEUED, BackgroundJob.Status.RUNNING)
+
+LEASE_SECONDS = getattr(settings, "JOBS_LEASE_SECONDS", 600)
+RETRY_BASE_SECONDS = getattr(settings, "JOBS_RETRY_BASE_SECONDS", 10)
+RETRY_MAX_SECONDS = getattr(settings, "JOBS_RETRY_MAX_SECONDS", 600)
+POLL_SECONDS = 2.0
+
+
+class JobError(Exception):
+    """Expected job failure; the message is shown to the client."""
+
+
+def _handler_for(kind: str, name: str = "handler"):
+    spec = JOB_KINDS.get(kind) or {}
+    path = spec.get(name)
+    return import_string(path) if path else None
+
+
+def _worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}"[:128]
+
+
+# ----------------------------
+# Producer side
+# ----------------------------
+
+def enqueue(kind: str, payload: dict | None = None, *, trip=None, user=None, dedupe_key: str | None = None,
+            max_attempts: int | None = None):
+    """
+    Queue a job and return (job, created). With ``dedupe_key``, an existing
+    queued/running job for that key is returned instead of a new one.
+    """
+    if kind not in JOB_KINDS:
+        raise ValueError(f"Unknown job kind {kind!r}")
+
+    active_key = f"{kind}:{dedupe_key}"[:191] if dedupe_key else None
+    if active_key:
+        existing = BackgroundJob.objects.filter(active_key=active_key).first()
+        if existing:
+            return existing, False
+
+    try:
+        with transaction.atomic():
+            job = BackgroundJob.objects.create(
+                kind=kind,
+                payload=payload or {},
+                trip=trip,
+                created_by=user,
+                active_key=active_key,
+                max_attempts=max_attempts or JOB_KINDS[kind].get("max_attempts", 3),
+            )
+    except IntegrityError:
+        # Lost the race against an identical request
+        existing = BackgroundJob.objects.filter(active_key=active_key).first()
+        if existing:
+            return existing, False
+        raise
+
+    transaction.on_commit(_wake_in_process_pool)
+    return job, True
+
+
+def report_progress(job, percent: int, message: str = ""):
+    """Record progress and extend the lease (long AI calls)."""
+    percent = max(0, min(100, int(percent)))
+    job.progress = percent
+    job.progress_message = message[:255]
+    BackgroundJob.objects.filter(pk=job.pk).update(
+        progress=percent,
+        progress_message=job.progress_message,
+        locked_until=timezone.now() + timedelta(seconds=LEASE_SECONDS),
+        updated_at=timezone.now(),
+    )
+
+
+# ----------------------------
+# Worker side
+# ----------------------------
+
+def claim_next(worker_id: str, kinds=None):
+    """Claim the oldest due job (or one whose lease expired). Returns it or None."""
+    now = timezone.now()
+    due = Q(status=BackgroundJob.Status.QUEUED, run_after__lte=now) | Q(
+        status=BackgroundJob.Status.RUNNING, locked_until__lt=now
+    )
+    qs = BackgroundJob.objects.filter(due)
+    if kinds:
+        qs = qs.filter(kind__in=kinds)
+
+    for candidate in qs.order_by("run_after", "id").values("id", "status", "locked_until")[:10]:
+        claimed = BackgroundJob.objects.filter(
+            pk=candidate["id"],
+            status=candidate["status"],
+            locked_until=candidate["locked_until"],
+        ).update(
+            status=BackgroundJob.Status.RUNNING,
+            locked_by=worker_id,
+            locked_until=now + timedelta(seconds=LEASE_SECONDS),
+            started_at=now,
+            updated_at=now,
+        )
+        if claimed:
+            return BackgroundJob.objects.get(pk=candidate["id"])
+    return None
+
+
+def _retry_delay(attempts: int) -> float:
+    delay = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * (2 ** max(attempts - 1, 0)))
+    return delay * (1 + random.random() * 0.25)
+
+
+def run_job(job):
+    """Execute one claimed job and record the outcome."""
+    if job.attempts >= job.max_attempts:
+        # Lease expired on the last attempt: the worker died mid-job
+        _record_failure(job, "The job was interrupted. Please try again.")
+        return job
+
+    job.attempts += 1
+    BackgroundJob.objects.filter(pk=job.pk).update(attempts=job.attempts)
+
+    try:
+        handler = _handler_for(job.kind)
+        if handler is None:
+            raise JobError(f"No handler for job kind {job.kind!r}")
+        result = handler(job)
+    except Exception as exc:
+        if isinstance(exc, JobError):
+            message = str(exc)
+            logger.warning("Job %s (%s) failed: %s", job.id, job.kind, message)
+        else:
+            message = "Job failed unexpectedly."
+            logger.exception("Job %s (%s) crashed", job.id, job.kind)
+        _record_failure(job, message)
+        return job
+
+    now = timezone.now()
+    BackgroundJob.objects.filter(pk=job.pk).update(
+        status=BackgroundJob.Status.SUCCEEDED,
+        result=result,
+        error=None,
+        progress=100,
+        active_key=None,
+        locked_by=None,
+        locked_until=None,
+        finished_at=now,
+        updated_at=now,
+    )
+    job.status, job.result = BackgroundJob.Status.SUCCEEDED, result
+    return job
+
+
+def _record_failure(job, message: str):
+    now = timezone.now()
+    if job.attempts < job.max_attempts:
+        BackgroundJob.objects.filter(pk=job.pk).update(
+            status=BackgroundJob.Status.QUEUED,
+            error=message,
+            run_after=now + timedelta(seconds=_retry_delay(job.attempts)),
+            locked_by=None,
+            locked_until=None,
+            updated_at=now,
+        )
+        job.status = BackgroundJob.Status.QUEUED
+        return
+
+    BackgroundJob.objects.filter(pk=job.pk).update(
+        status=BackgroundJob.Status.FAILED,
+        error=message,
+        active_key=None,
+        locked_by=None,
+        locked_until=None,
+        finished_at=now,
+        updated_at=now,
+    )
+    job.status, job.error = BackgroundJob.Status.FAILED, message
+
+    on_failure = _handler_for(job.kind, "on_failure")
+    if on_failure:
+        try:
+            on_failure(job)
+        except Exception:
+            logger.exception("on_failure hook for job %s (%s) failed", job.id, job.kind)
+
+
+def _release_connections():
+    """A worker never sees request_finished: close (or return to the pool) its connections."""
+    for conn in connections.all(initialized_only=True):
+        if not conn.in_atomic_block:
+            conn.close()
+
+
+def run_pending_jobs(worker_id: str | None = None, kinds=None, limit: int | None = None) -> int:
+    """Run due jobs in this thread until none are left (or ``limit``). Returns the count."""
+    worker_id = worker_id or _worker_id()
+    count = 0
+    while limit is None or count < limit:
+        job = claim_next(worker_id, kinds)
+        if job is None:
+            break
+        try:
+            run_job(job)
+        finally:
+            _release_connections()
+        count += 1
+    return count
+
+
+class JobWorkerPool:
+    """A fixed number of worker threads polling the job table."""
+
+    def __init__(self, workers: int = 2, kinds=None, poll_seconds: float = POLL_SECONDS, name: str = "jobs"):
+        self.workers = max(1, int(workers))
+        self.kinds = kinds
+        self.poll_seconds = poll_seconds
+        self.name = name
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+
+    def start(self):
+        for i in range(self.workers):
+            t = threading.Thread(target=self._loop, name=f"{self.name}-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self, timeout: float | None = None):
+        self._stop.set()
+        self._wake.set()
+        for t in self._threads:
+            t.join(timeout)
+
+    def _loop(self):
+        worker_id = f"{_worker_id()}:{uuid.uuid4().hex[:6]}"
+        while not self._stop.is_set():
+            try:
+                ran = run_pending_jobs(worker_id, self.kinds)
+            except Exception:
+                logger.exception("Job worker %s crashed; continuing", worker_id)
+                _release_connections()
+                ran = 0
+            if not ran:
+                self._wake.wait(self.poll_seconds)
+                self._wake.clear()
+
+
+_pool: JobWorkerPool | None = None
+_pool_lock = threading.Lock()
+
+
+def start_in_process_pool():
+    """This process's worker pool, started if needed; None when JOBS_RUN_IN_PROCESS is off."""
+    global _pool
+    if not getattr(settings, "JOBS_RUN_IN_PROCESS", True):
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = JobWorkerPool(getattr(settings, "JOBS_IN_PROCESS_WORKERS", 2), name="inproc-jobs").start()
+    return _pool
+
+
+def _wake_in_process_pool():
+    pool = start_in_process_pool()
+    if pool is not None:
+        pool.wake()
@@ -0,0 +1,318 @@
+# backend/TripMateFunctions/services/ledger.py
+"""
+Group expense ledger for F3.1.
+
+Running totals
+--------------
+TripLedgerTotal holds, per (trip, member, currency), how much the member paid
+and how much of the split amounts they owe. Every TripExpense / ExpenseSplit
+write changes those totals by a delta (signals.py):
+
+    pre_save / pre_delete    remember_ledger_state(instance)   row as stored
+    post_save / post_delete  apply_ledger_change(instance)     new row - stored row
+
+so the ledger endpoint reads one small table instead of every expense and split.
+
+Balances and settle-up
+----------------------
+Balances follow the budget page: the payer is credited the full amount, each
+split debits its member, and expenses without splits are shared equally by all
+trip members. settle_up() turns the net balances into at most n-1 transfers
+(largest debtor pays largest creditor, O(n log n) with two heaps).
+"""
+import heapq
+import threading
+from collections import defaultdict
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+
+from ..models import AppUser, ExpenseSplit, TripCollaborator, TripExpense, TripLedgerTotal
+
+ZERO = Decimal("0")
+CENT = Decimal("0.01")
+
+_LEDGER_STATE_ATTR = "_ledger_stored_contribution"
+
+# Trips / users being deleted in this thread: their ledger rows go away with
+# them, so the cascaded expense/split deletes must not write new ones.
+_deleting = threading.local()
+
+
+def _deleting_set(kind: str) -> set:
+    if not hasattr(_deleting, kind):
+        setattr(_deleting, kind, set())
+    return getattr(_deleting, kind)
+
+
+def ledger_owner_deleting(kind: str, pk):
+    """kind is "trips" or "users"; call from pre_delete."""
+    _deleting_set(kind).add(pk)
+
+
+def ledger_owner_deleted(kind: str, pk):
+    _deleting_set(kind).discard(pk)
+
+
+def owner_is_deleting(kind: str, pk) -> bool:
+    """True while the trip / user ``pk`` is being deleted in this thread."""
+    return pk in _deleting_set(kind)
+
+
+# ----------------------------
+# Incremental running totals
+# ----------------------------
+
+def _expense_contribution(trip_id, payer_id, currency, amount) -> dict:
+    return {(trip_id, payer_id, currency): (Decimal(amount), ZERO)}
+
+
+def _split_contribution(trip_id, user_id, currency, amount) -> dict:
+    return {(trip_id, user_id, currency): (ZERO, Decimal(amount))}
+
+
+def _stored_contribution(instance) -> dict:
+    """What the row currently in the database adds to the running totals."""
+    if instance.pk is None:
+        return {}
+
+    if isinstance(instance, TripExpense):
+        row = (
+            TripExpense.objects.filter(pk=instance.pk)
+            .values("trip_id", "payer_id", "currency", "amount")
+            .first()
+        )
+        if not row:
+            return {}
+        return _expense_contribution(row["trip_id"], row["payer_id"], row["currency"], row["amount"])
+
+    row = (
+        ExpenseSplit.objects.filter(pk=instance.pk)
+        .values("user_id", "amount", "expense__trip_id", "expense__currency")
+        .first()
+    )
+    if not row:
+        return {}
+    return _split_contribution(row["expense__trip_id"], row["user_id"], row["expense__currency"], row["amount"])
+
+
+def _current_contribution(instance) -> dict:
+    """What the in-memory (just saved) row adds to the running totals."""
+    if isinstance(instance, TripExpense):
+        return _expense_contribution(instance.trip_id, instance.payer_id, instance.currency, instance.amount)
+
+    expense = (
+        TripExpense.objects.filter(pk=instance.expense_id).values("trip_id", "currency").first()
+    )
+    if not expense:
+        return {}
+    return _split_contribution(expense["trip_id"], instance.user_id, expense["currency"], instance.amount)
+
+
+def _add_to_totals(trip_id, user_id, currency, paid: Decimal, owed: Decimal):
+    filters = {"trip_id": trip_id, "user_id": user_id, "currency": currency}
+    updated = TripLedgerTotal.objects.filter(**filters).update(paid=F("paid") + paid, owed=F("owed") + owed)
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            TripLedgerTotal.objects.create(paid=paid, owed=owed, **filters)
+    except IntegrityError:
+        # Another request created the row first
+        TripLedgerTotal.objects.filter(**filters).update(paid=F("paid") + paid, owed=F("owed") + owed)
+
+
+def _apply_delta(before: dict, after: dict):
+    deltas = defaultdict(lambda: [ZERO, ZERO])
+    for key, (paid, owed) in after.items():
+        deltas[key][0] += paid
+        deltas[key][1] += owed
+    for key, (paid, owed) in before.items():
+        deltas[key][0] -= paid
+        deltas[key][1] -= owed
+
+    deleting_trips, deleting_users = _deleting_set("trips"), _deleting_set("users")
+    with transaction.atomic():
+        for (trip_id, user_id, currency), (paid, owed) in deltas.items():
+            if trip_id in deleting_trips or user_id in deleting_users:
+                continue
+            if paid or owed:
+                _add_to_totals(trip_id, user_id, currency, paid, owed)
+
+
+def _move_expense_splits(expense: TripExpense, before: dict):
+    """A changed expense currency/trip re-files the amounts its splits owe."""
+    if not before:
+        return
+    (old_trip_id, _, old_currency), = before.keys()
+    if (old_trip_id, old_currency) == (expense.trip_id, expense.currency):
+        return
+
+    moved_before, moved_after = defaultdict(lambda: (ZERO, ZERO)), defaultdict(lambda: (ZERO, ZERO))
+    for split in ExpenseSplit.objects.filter(expense_id=expense.pk).values("user_id", "amount"):
+        key = (old_trip_id, split["user_id"], old_currency)
+        moved_before[key] = (ZERO, moved_before[key][1] + split["amount"])
+        key = (expense.trip_id, split["user_id"], expense.currency)
+        moved_after[key] = (ZERO, moved_after[key][1] + split["amount"])
+    _apply_delta(moved_before, moved_after)
+
+
+def remember_ledger_state(instance):
+    setattr(instance, _LEDGER_STATE_ATTR, _stored_contribution(instance))
+
+
+def apply_ledger_change(instance, deleted: bool = False):
+    before = getattr(instance, _LEDGER_STATE_ATTR, None) or {}
+    after = {} if deleted else _current_contribution(instance)
+    _apply_delta(before, after)
+    if isinstance(instance, TripExpense) and not deleted:
+        _move_expense_splits(instance, before)
+    setattr(instance, _LEDGER_STATE_ATTR, after)
+
+
+def rebuild_trip_ledger(trip_id):
+    """Recompute a trip's running totals from scratch (repair / backfill)."""
+    totals = defaultdict(lambda: [ZERO, ZERO])
+    paid_rows = (
+        TripExpense.objects.filter(trip_id=trip_id)
+        .values("payer_id", "currency")
+        .annotate(total=Sum("amount"))
+    )
+    for row in paid_rows:
+        totals[(row["payer_id"], row["currency"])][0] += row["total"] or ZERO
+    owed_rows = (
+        ExpenseSplit.objects.filter(expense__trip_id=trip_id)
+        .values("user_id", "expense__currency")
+        .annotate(total=Sum("amount"))
+    )
+    for row in owed_rows:
+        totals[(row["user_id"], row["expense__currency"])][1] += row["total"] or ZERO
+
+    with transaction.atomic():
+        TripLedgerTotal.objects.filter(trip_id=trip_id).delete()
+        TripLedgerTotal.objects.bulk_create([
+            TripLedgerTotal(trip_id=trip_id, user_id=user_id, currency=currency, paid=paid, owed=owed)
+            for (user_id, currency), (paid, owed) in totals.items()
+        ])
+
+
+# ----------------------------
+# Balances / settle-up
+# ----------------------------
+
+def convert_amount(amount: Decimal, from_code: str, to_code: str, sgd_per_unit: dict) -> Decimal:
+    """Same conversion as the budget page: via SGD, unknown currencies count as 1:1."""
+    if from_code == to_code:
+        return Decimal(amount)
+    from_rate = Decimal(str(sgd_per_unit.get(from_code) or 1))
+    to_rate = Decimal(str(sgd_per_unit.get(to_code) or 1))
+    return Decimal(amount) * from_rate / to_rate
+
+
+def settle_up(net_cents: dict) -> list[tuple]:
+    """
+    Greedy debt simplification: repeatedly let the largest debtor pay the
+    largest creditor. Every step settles at least one member, so the result
+    has at most n-1 transfers. Returns [(from_user, to_user, cents), ...].
+    """
+    creditors = [(-cents, str(uid), uid) for uid, cents in net_cents.items() if cents > 0]
+    debtors = [(cents, str(uid), uid) for uid, cents in net_cents.items() if cents < 0]
+    heapq.heapify(creditors)
+    heapq.heapify(debtors)
+
+    transfers = []
+    while creditors and debtors:
+        credit, c_key, creditor = heapq.heappop(creditors)
+        debt, d_key, debtor = heapq.heappop(debtors)
+        amount = min(-credit, -debt)
+        transfers.append((debtor, creditor, amount))
+        if -credit > amount:
+            heapq.heappush(creditors, (credit + amount, c_key, creditor))
+        if -debt > amount:
+            heapq.heappush(debtors, (debt + amount, d_key, debtor))
+    return transfers
+
+
+def _trip_members(trip) -> dict:
+    members = {}
+    if trip.owner_id and trip.owner:
+        members[trip.owner_id] = trip.owner
+    collabs = (
+        TripCollaborator.objects
+        .filter(trip_id=trip.id, user__isnull=False)
+        .select_related("user")
+    )
+    for c in collabs:
+        members[c.user_id] = c.user
+    return members
+
+
+def _money(value: Decimal) -> str:
+    return str(value.quantize(CENT, rounding=ROUND_HALF_UP))
+
+
+def build_trip_ledger(trip, currency: str, sgd_per_unit: dict) -> dict:
+    """Per-member paid/owed/net in ``currency`` plus the settle-up transfers."""
+    members = _trip_members(trip)
+
+    paid = defaultdict(lambda: ZERO)
+    owed = defaultdict(lambda: ZERO)
+    total_spent = ZERO
+    for row in TripLedgerTotal.objects.filter(trip_id=trip.id).values("user_id", "currency", "paid", "owed"):
+        p = convert_amount(row["paid"], row["currency"], currency, sgd_per_unit)
+        o = convert_amount(row["owed"], row["currency"], currency, sgd_per_unit)
+        total_spent += p
+        if row["user_id"] is not None:
+            paid[row["user_id"]] += p
+            owed[row["user_id"]] += o
+
+    # Expenses without splits are shared by everyone on the trip
+    unsplit = (
+        TripExpense.objects.filter(trip_id=trip.id, splits__isnull=True)
+        .values("currency")
+        .annotate(total=Sum("amount"))
+    )
+    shared = sum(
+        (convert_amount(row["total"], row["currency"], currency, sgd_per_unit) for row in unsplit),
+        ZERO,
+    )
+    if shared and members:
+        share = shared / len(members)
+        for user_id in members:
+            owed[user_id] += share
+
+    user_ids = set(members) | set(paid) | set(owed)
+    missing = user_ids - set(members)
+    if missing:
+        # Former collaborators who still have expenses on the trip
+        members.update({u.id: u for u in AppUser.objects.filter(id__in=missing)})
+
+    net_cents = {}
+    rows = []
+    for user_id in user_ids:
+        net = paid[user_id] - owed[user_id]
+        net_cents[user_id] = int((net / CENT).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+        user = members.get(user_id)
+        rows.append({
+            "user": str(user_id),
+            "full_name": getattr(user, "full_name", None),
+            "email": getattr(user, "email", None),
+            "paid": _money(paid[user_id]),
+            "owed": _money(owed[user_id]),
+            "net": _money(net),
+        })
+    rows.sort(key=lambda r: Decimal(r["net"]), reverse=True)
+
+    transfers = [
+        {"from": str(debtor), "to": str(creditor), "amount": _money(Decimal(cents) * CENT)}
+        for debtor, creditor, cents in settle_up(net_cents)
+    ]
+
+    return {
+        "trip": trip.id,
+        "currency": currency,
+        "total_spent": _money(total_spent),
+        "members": rows,
+        "transfers": transfers,
+    }
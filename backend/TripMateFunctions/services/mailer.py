@@ -0,0 +1,65 @@
+# backend/TripMateFunctions/services/mailer.py
+"""
+Transactional email, sent from the background job queue.
+
+    queue_email(to="friend@example.com", subject="...", body="...")
+
+Brevo's HTTP API is used when BREVO_API_KEY is set, Django's mail backend
+otherwise. Delivery errors raise so the job is retried with backoff.
+"""
+import logging
+
+import requests
+from django.conf import settings
+from django.core.mail import send_mail
+
+from .jobs import JobError, enqueue
+
+logger = logging.getLogger(__name__)
+
+
+def send_email_now(to: str, subject: str, body: str):
+    if getattr(settings, "BREVO_API_KEY", ""):
+        resp = requests.post(
+            getattr(settings, "BREVO_API_URL", "https://api.brevo.com/v3/smtp/email"),
+            headers={
+                "api-key": settings.BREVO_API_KEY,
+                "Content-Type": "application/json",
+            },
+            json={
+                "sender": {
+                    "email": settings.BREVO_SENDER_EMAIL,
+                    "name": settings.BREVO_SENDER_NAME,
+                },
+                "to": [{"email": to}],
+                "subject": subject,
+                "textContent": body,
+            },
+            timeout=10,
+        )
+        resp.raise_for_status()
+        logger.info(f"Email sent to {to} via Brevo (messageId={resp.json().get('messageId')})")
+        return
+
+    send_mail(
+        subject=subject,
+        message=body,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        recipient_list=[to],
+        fail_silently=False,
+    )
+    logger.info(f"Email sent to {to} via SMTP backend")
+
+
+def queue_email(to: str, subject: str, body: str, *, trip=None, user=None):
+    job, _ = enqueue("email", {"to": to, "subject": subject, "body": body}, trip=trip, user=user)
+    return job
+
+
+def run_email_job(job):
+    payload = job.payload or {}
+    try:
+        send_email_now(payload["to"], payload["subject"], payload["body"])
+    except Exception as exc:
+        raise JobError(f"Email delivery failed: {exc}") from exc
+    return {"to": payload["to"]}
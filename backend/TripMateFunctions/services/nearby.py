@@ -0,0 +1,234 @@
+# backend/TripMateFunctions/services/nearby.py
+"""
+Radius / bounding-box queries over stored coordinates.
+
+Destination, ItineraryItem and TripPhoto keep an indexed ``geohash`` next to
+lat/lon (set in save(), bulk_create_items and migration 0014). A query turns
+its box into a few geohash prefixes, reads only (pk, lat, lon) for the rows
+in those cells, and ranks them with a vectorised haversine:
+
+    nearest(Destination.objects.all(), 35.01, 135.77, radius_m=2000, limit=10)
+    # [(destination, 412.7), ...]   nearest first, distance in metres
+
+nearby_places() searches the local catalogue (destinations plus stops of
+public trips) so place details, replacement options and recommendations can
+skip Wikipedia / OpenTripMap / Mapbox when we already know the area.
+remember_places() keeps OpenTripMap results in their own table
+(OpenTripMapPlace); only replacement options ask nearby_places() to include
+them, so they never show up as curated destinations.
+"""
+import math
+
+import numpy as np
+from django.db.models import Q
+
+from ..models import Destination, ItineraryItem, OpenTripMapPlace, Trip
+from . import geohash
+
+EARTH_RADIUS_M = 6_371_000.0
+MAX_RADIUS_M = 50_000
+
+
+def haversine_m(lat: float, lon: float, lats, lons) -> np.ndarray:
+    """Great-circle distances (m) from (lat, lon) to each of lats/lons."""
+    lat1, lon1 = math.radians(lat), math.radians(lon)
+    lat2 = np.radians(np.asarray(lats, dtype=float))
+    lon2 = np.radians(np.asarray(lons, dtype=float))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def bounding_box(lat: float, lon: float, radius_m: float):
+    """(south, west, north, east) around a point; west > east when it crosses the date line."""
+    dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+    south, north = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+    cos_lat = math.cos(math.radians(lat))
+    if north >= 90.0 or south <= -90.0 or cos_lat < 1e-6:
+        return south, -180.0, north, 180.0
+    dlon = math.degrees(radius_m / (EARTH_RADIUS_M * cos_lat))
+    if dlon >= 180.0:
+        return south, -180.0, north, 180.0
+    west, east = lon - dlon, lon + dlon
+    if west < -180.0:
+        west += 360.0
+    if east > 180.0:
+        east -= 360.0
+    return south, west, north, east
+
+
+def box_filter(south: float, west: float, north: float, east: float) -> Q:
+    """Rows inside the box: geohash prefixes (indexed) plus the exact lat/lon range."""
+    if west > east:
+        # Crosses the date line: two boxes
+        return box_filter(south, west, north, 180.0) | box_filter(south, -180.0, north, east)
+    cells = Q()
+    for prefix in sorted(geohash.cover(south, west, north, east)):
+        cells |= Q(geohash__startswith=prefix)
+    return cells & Q(lat__gte=south, lat__lte=north, lon__gte=west, lon__lte=east)
+
+
+def within_box(queryset, south: float, west: float, north: float, east: float):
+    return queryset.filter(box_filter(south, west, north, east))
+
+
+def ranked_rows(queryset, lat: float, lon: float, radius_m: float, fields=(), limit: int | None = None):
+    """
+    [(distance_m, row), ...] nearest first for rows within ``radius_m``, where
+    row is the values() dict of ``fields`` (plus pk / lat / lon).
+    """
+    radius_m = min(float(radius_m), MAX_RADIUS_M)
+    rows = list(
+        within_box(queryset, *bounding_box(lat, lon, radius_m)).values("pk", "lat", "lon", *fields)
+    )
+    if not rows:
+        return []
+    dist = haversine_m(lat, lon, [r["lat"] for r in rows], [r["lon"] for r in rows])
+    inside = np.flatnonzero(dist <= radius_m)
+    order = inside[np.argsort(dist[inside], kind="stable")]
+    if limit is not None:
+        order = order[:limit]
+    return [(float(dist[i]), rows[i]) for i in order]
+
+
+def nearest(queryset, lat: float, lon: float, radius_m: float, limit: int | None = None):
+    """[(obj, distance_m), ...] nearest first; loads only the returned objects."""
+    ranked = ranked_rows(queryset, lat, lon, radius_m, limit=limit)
+    objs = queryset.in_bulk([row["pk"] for _, row in ranked])
+    return [(objs[row["pk"]], d) for d, row in ranked if row["pk"] in objs]
+
+
+def _hours_text(value):
+    if isinstance(value, dict):
+        return value.get("opening_hours") or value.get("text") or None
+    if isinstance(value, str) and value.strip():
+        return value.strip()
+    return None
+
+
+def nearby_places(lat: float, lon: float, radius_m: float, limit: int = 12, exclude_names=(), opentripmap=False):
+    """
+    Known places around a point, nearest first, one per name: destinations
+    and the stops of public trips, plus remembered OpenTripMap places when
+    ``opentripmap`` is set. Dicts with name, lat, lon, dist_m, kinds,
+    address, opening_hours, xid and source ("destination" / "itinerary" /
+    "opentripmap").
+    """
+    skip = {str(n).strip().lower() for n in exclude_names if n}
+    destinations = ranked_rows(
+        Destination.objects.all(), lat, lon, radius_m,
+        fields=("name", "category", "address", "opening_hours_json", "external_ref"),
+    )
+    stops = ranked_rows(
+        ItineraryItem.objects.filter(trip__visibility=Trip.Visibility.PUBLIC, trip__is_flagged=False),
+        lat, lon, radius_m,
+        fields=("title", "item_type", "address"),
+    )
+
+    candidates = [
+        (d, {
+            "name": row["name"],
+            "kinds": row["category"],
+            "address": row["address"],
+            "opening_hours": _hours_text(row["opening_hours_json"]),
+            "xid": row["external_ref"] or f"destination:{row['pk']}",
+            "source": "destination",
+        }, row)
+        for d, row in destinations
+    ] + [
+        (d, {
+            "name": row["title"],
+            "kinds": row["item_type"],
+            "address": row["address"],
+            "opening_hours": None,
+            "xid": f"itinerary:{row['pk']}",
+            "source": "itinerary",
+        }, row)
+        for d, row in stops
+    ]
+    if opentripmap:
+        learned = ranked_rows(
+            OpenTripMapPlace.objects.all(), lat, lon, radius_m,
+            fields=("xid", "name", "kinds", "address", "opening_hours"),
+        )
+        candidates += [
+            (d, {
+                "name": row["name"],
+                "kinds": row["kinds"],
+                "address": row["address"],
+                "opening_hours": row["opening_hours"],
+                "xid": row["xid"],
+                "source": "opentripmap",
+            }, row)
+            for d, row in learned
+        ]
+    # Destinations first on ties: they carry hours and categories
+    candidates.sort(key=lambda c: (round(c[0]), c[1]["source"] != "destination"))
+
+    out, seen = [], set(skip)
+    for dist, place, row in candidates:
+        key = (place["name"] or "").strip().lower()
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        out.append({**place, "lat": row["lat"], "lon": row["lon"], "dist_m": round(dist)})
+        if len(out) >= limit:
+            break
+    return out
+
+
+def named_places(names, lat: float, lon: float, radius_m: float) -> dict:
+    """
+    {name: (lat, lon, address)} for the ``names`` that match a known place
+    (case-insensitive) within ``radius_m``; the nearest match wins.
+    """
+    wanted = {str(n).strip().lower(): n for n in names if n and str(n).strip()}
+    if not wanted:
+        return {}
+    by_name = Q()
+    by_title = Q()
+    for key in wanted:
+        by_name |= Q(name__iexact=key)
+        by_title |= Q(title__iexact=key)
+
+    found = {}
+    sources = [
+        (Destination.objects.filter(by_name), "name"),
+        (ItineraryItem.objects.filter(by_title, trip__visibility=Trip.Visibility.PUBLIC, trip__is_flagged=False), "title"),
+    ]
+    for queryset, field in sources:
+        for _, row in ranked_rows(queryset, lat, lon, radius_m, fields=(field, "address")):
+            original = wanted.get((row[field] or "").strip().lower())
+            if original is not None and original not in found:
+                found[original] = (row["lat"], row["lon"], row["address"] or "")
+    return found
+
+
+def remember_places(places) -> int:
+    """
+    Store OpenTripMap places (OpenTripMapPlace, one row per xid), skipping
+    known xids. places: dicts with xid, name, lat, lon and optional kinds,
+    address, opening_hours. Returns the number of new xids (a concurrent
+    request may have stored some of them first).
+    """
+    fresh = {p["xid"]: p for p in places if p.get("xid") and p.get("name") and p.get("lat") is not None}
+    if not fresh:
+        return 0
+    known = set(OpenTripMapPlace.objects.filter(xid__in=list(fresh)).values_list("xid", flat=True))
+    rows = [
+        OpenTripMapPlace(
+            xid=xid[:64],
+            name=p["name"][:255],
+            lat=float(p["lat"]),
+            lon=float(p["lon"]),
+            geohash=geohash.encode_or_none(p["lat"], p["lon"]),
+            kinds=p.get("kinds") or None,
+            address=p.get("address"),
+            opening_hours=p.get("opening_hours"),
+        )
+        for xid, p in fresh.items()
+        if xid not in known
+    ]
+    # bulk_create skips save(), so geohash is set above. xid is unique: one a
+    # concurrent request has just stored is skipped, not duplicated
+    OpenTripMapPlace.objects.bulk_create(rows, ignore_conflicts=True)
+    return len(rows)
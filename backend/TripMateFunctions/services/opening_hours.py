@@ -0,0 +1,506 @@
+# backend/TripMateFunctions/services/opening_hours.py
+"""
+OSM opening_hours strings compiled once into interval tables.
+
+The adaptive planner and replacement filtering ask "is this place open at
+14:30 on that day?" for many places, often with the same strings. A string
+is parsed once (memoised) into rules, and days are answered from a table of
+(open, close) minute intervals:
+
+    hours = compile_hours("Mo-Fr 09:00-12:00,13:00-18:00; Sa 10:00-02:00; PH off")
+    hours.intervals_on(date(2026, 5, 4))          # ((540, 720), (780, 1080))
+    hours.is_open_at(datetime(2026, 5, 4, 12, 30))  # False (lunch break)
+    hours.is_open_at(datetime(2026, 5, 10, 1, 0))   # True (Saturday night)
+
+Supported: 24/7; weekday ranges and lists, nth weekdays (Sa[1], Su[-1]);
+several time spans, overnight spans (22:00-02:00, 18:00-26:00), open ends
+(18:00+); month, date and year ranges (Jan-Mar, Dec 24-26, Apr 15-Oct 15,
+2026), week numbers; PH (with the holidays passed in); off / closed /
+unknown; ";" normal, "," additional and "||" fallback rules. Rules only
+keyed by weekday are flattened into a 7-day table at compile time.
+Sunrise / sunset are approximated (06:00 / 18:00). A string we can't parse
+compiles to None, which callers treat as unknown.
+"""
+import bisect
+import re
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+DAY_MINUTES = 24 * 60
+WEEKDAYS = {"mo": 0, "tu": 1, "we": 2, "th": 3, "fr": 4, "sa": 5, "su": 6}
+# Not OSM syntax, but common in scraped data
+WEEKDAYS.update({"mon": 0, "tue": 1, "wed": 2, "thu": 3, "fri": 4, "sat": 5, "sun": 6})
+MONTHS = {m: i + 1 for i, m in enumerate(
+    ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
+)}
+EVENTS = {"dawn": 5 * 60 + 30, "sunrise": 6 * 60, "sunset": 18 * 60, "dusk": 18 * 60 + 30}
+MODIFIERS = {"open": "open", "off": "closed", "closed": "closed", "unknown": "unknown"}
+
+_TOKEN = re.compile(
+    r'\s*(?:(?P<comment>"[^"]*")|(?P<always>24/7)|(?P<time>\d{1,2}:\d{2})|(?P<year>\d{4})'
+    r"|(?P<num>\d{1,2})|(?P<word>[A-Za-z]+)|(?P<sym>\|\||[-,;:\[\]+()/.]))"
+)
+
+
+class HoursSyntaxError(ValueError):
+    pass
+
+
+def _tokens(text: str) -> list:
+    out, pos = [], 0
+    text = text.strip()
+    while pos < len(text):
+        m = _TOKEN.match(text, pos)
+        if not m or m.end() == pos:
+            if text[pos:].strip():
+                raise HoursSyntaxError(f"Unexpected {text[pos:pos + 10]!r}")
+            break
+        kind = m.lastgroup
+        value = m.group(kind)
+        if kind == "word":
+            value = value.lower()
+        out.append((kind, value))
+        pos = m.end()
+    return out
+
+
+class _Rule:
+    """One rule: optional year / week / month-day / weekday selectors, times and a state."""
+
+    def __init__(self, kind: str):
+        self.kind = kind            # "normal" / "additional" / "fallback"
+        self.years = None           # [(from, to)]
+        self.weeks = None           # [(from, to, step)]
+        self.dates = None           # [((month, day), (month, day))]
+        self.weekdays = None        # {weekday: None | {nth, ...}}
+        self.holidays = False       # PH
+        self.school_holidays = False
+        self.times = None           # [(start, end)] minutes; end may pass 24:00
+        self.state = "open"
+
+    @property
+    def weekly(self) -> bool:
+        return not (self.years or self.weeks or self.dates or self.holidays or self.school_holidays) and not any(
+            self.weekdays.values() if self.weekdays else ()
+        )
+
+    def matches(self, day: date, holidays) -> bool:
+        if self.years and not any(lo <= day.year <= hi for lo, hi in self.years):
+            return False
+        if self.weeks:
+            week = day.isocalendar()[1]
+            if not any(lo <= week <= hi and (week - lo) % step == 0 for lo, hi, step in self.weeks):
+                return False
+        if self.dates and not any(_in_date_range(day, lo, hi) for lo, hi in self.dates):
+            return False
+        if self.weekdays is None and not self.holidays and not self.school_holidays:
+            return True
+        if self.holidays and day in holidays:
+            return True
+        nths = (self.weekdays or {}).get(day.weekday(), False)
+        if nths is False:
+            return False
+        return nths is None or not nths.isdisjoint(_nth_of_month(day))
+
+
+def _in_date_range(day: date, lo, hi) -> bool:
+    md = (day.month, day.day)
+    if lo <= hi:
+        return lo <= md <= hi
+    return md >= lo or md <= hi  # wraps the new year (Nov-Feb)
+
+
+def _nth_of_month(day: date):
+    """(n, -m): the weekday's occurrence counted from the start and from the end of the month."""
+    next_month = (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    days_after = (next_month - day).days - 1
+    return (day.day - 1) // 7 + 1, -(days_after // 7 + 1)
+
+
+class _Parser:
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self, offset: int = 0):
+        i = self.pos + offset
+        return self.tokens[i] if i < len(self.tokens) else (None, None)
+
+    def take(self, kind=None, value=None):
+        tok = self.peek()
+        if tok[0] is None or (kind and tok[0] != kind) or (value is not None and tok[1] != value):
+            raise HoursSyntaxError(f"Expected {value or kind}, got {tok[1]!r}")
+        self.pos += 1
+        return tok[1]
+
+    def at(self, kind, value=None) -> bool:
+        tok = self.peek()
+        return tok[0] == kind and (value is None or tok[1] == value)
+
+    # -- rules ------------------------------------------------------------
+
+    def rules(self) -> list:
+        rules = [self.rule("normal")]
+        while self.peek()[0] is not None:
+            sep = self.take("sym")
+            if sep == ";":
+                if self.peek()[0] is None:
+                    break
+                rules.append(self.rule("normal"))
+            elif sep == "||":
+                rules.append(self.rule("fallback"))
+            elif sep == ",":
+                rules.append(self.rule("additional"))
+            else:
+                raise HoursSyntaxError(f"Unexpected {sep!r}")
+        return rules
+
+    def rule(self, kind: str) -> _Rule:
+        rule = _Rule(kind)
+        if self.at("always"):
+            self.take()
+            rule.times = [(0, DAY_MINUTES)]
+        else:
+            self.wide_range(rule)
+            if self.at("sym", ":"):
+                self.take()
+            self.weekday_selector(rule)
+            self.time_selector(rule)
+        modifier = self.at("word") and self.peek()[1] in MODIFIERS
+        if modifier:
+            rule.state = MODIFIERS[self.take()]
+        comment = self.at("comment")
+        if comment:
+            self.take()
+        empty = rule.times is None and rule.weekdays is None and not (
+            rule.dates or rule.years or rule.weeks or rule.holidays or rule.school_holidays
+        )
+        if empty and not modifier:
+            if not comment:
+                raise HoursSyntaxError("Empty rule")
+            rule.state = "unknown"  # || "by appointment"
+        return rule
+
+    # -- selectors ---------------------------------------------------------
+
+    def wide_range(self, rule: _Rule):
+        while True:
+            if self.at("year"):
+                lo = int(self.take())
+                hi = lo
+                if self.at("sym", "-") and self.peek(1)[0] == "year":
+                    self.take()
+                    hi = int(self.take())
+                rule.years = (rule.years or []) + [(lo, hi)]
+            elif self.at("word", "week"):
+                self.take()
+                weeks = []
+                while True:
+                    lo = int(self.take("num"))
+                    hi, step = lo, 1
+                    if self.at("sym", "-"):
+                        self.take()
+                        hi = int(self.take("num"))
+                        if self.at("sym", "/"):
+                            self.take()
+                            step = int(self.take("num"))
+                    weeks.append((lo, hi, max(step, 1)))
+                    if self.at("sym", ",") and self.peek(1)[0] == "num":
+                        self.take()
+                        continue
+                    break
+                rule.weeks = (rule.weeks or []) + weeks
+            elif self.at("word") and self.peek()[1] in MONTHS:
+                rule.dates = (rule.dates or []) + [self.date_range()]
+                while self.at("sym", ",") and self.peek(1)[0] == "word" and self.peek(1)[1] in MONTHS:
+                    self.take()
+                    rule.dates.append(self.date_range())
+            else:
+                return
+
+    def month_day(self, end: bool):
+        month = MONTHS[self.take("word")]
+        if self.at("num"):
+            return month, int(self.take())
+        return month, 31 if end else 1
+
+    def date_range(self):
+        month = MONTHS[self.take("word")]
+        if self.at("num"):
+            lo = (month, int(self.take()))
+            hi = lo
+            if self.at("sym", "-"):
+                self.take()
+                if self.at("num"):                      # Dec 24-26
+                    hi = (month, int(self.take()))
+                else:                                   # Apr 15-Oct 15
+                    hi = self.month_day(end=True)
+            return lo, hi
+        lo, hi = (month, 1), (month, 31)
+        if self.at("sym", "-") and self.peek(1)[0] == "word" and self.peek(1)[1] in MONTHS:
+            self.take()
+            hi = self.month_day(end=True)
+        return lo, hi
+
+    def weekday_selector(self, rule: _Rule):
+        while True:
+            tok = self.peek()
+            if tok[0] != "word":
+                return
+            if tok[1] == "ph":
+                self.take()
+                rule.holidays = True
+                if self.at("sym", "+") or (self.at("sym", "-") and self.peek(1)[0] == "num"):
+                    raise HoursSyntaxError("PH offsets are not supported")
+            elif tok[1] == "sh":
+                self.take()
+                rule.school_holidays = True
+            elif tok[1] in WEEKDAYS:
+                self.weekday_range(rule)
+            else:
+                return
+            if self.at("sym", ",") and self.peek(1)[0] == "word" and (
+                self.peek(1)[1] in WEEKDAYS or self.peek(1)[1] in ("ph", "sh")
+            ):
+                self.take()
+                continue
+            return
+
+    def weekday_range(self, rule: _Rule):
+        lo = WEEKDAYS[self.take("word")]
+        hi = lo
+        if self.at("sym", "-") and self.peek(1)[0] == "word" and self.peek(1)[1] in WEEKDAYS:
+            self.take()
+            hi = WEEKDAYS[self.take()]
+        nths = None
+        if self.at("sym", "["):
+            self.take()
+            nths = set()
+            while True:
+                sign = -1 if self.at("sym", "-") else 1
+                if sign < 0:
+                    self.take()
+                n = int(self.take("num"))
+                n_hi = n
+                if sign > 0 and self.at("sym", "-") and self.peek(1)[0] == "num":
+                    self.take()
+                    n_hi = int(self.take())
+                nths.update(sign * k for k in range(n, n_hi + 1))
+                if self.at("sym", ","):
+                    self.take()
+                    continue
+                break
+            self.take("sym", "]")
+        days = list(range(lo, hi + 1)) if lo <= hi else list(range(lo, 7)) + list(range(0, hi + 1))
+        rule.weekdays = rule.weekdays or {}
+        for d in days:
+            current = rule.weekdays.get(d, False)
+            if nths is None or current is None:
+                rule.weekdays[d] = None
+            else:
+                rule.weekdays[d] = (current or set()) | nths
+
+    def time_selector(self, rule: _Rule):
+        spans = []
+        while self.at("time") or self.at("word") and self.peek()[1] in EVENTS or self.at("sym", "("):
+            start = self.moment()
+            if self.at("sym", "+"):
+                self.take()
+                end = DAY_MINUTES
+            elif self.at("sym", "-"):
+                self.take()
+                end = self.moment()
+                if self.at("sym", "+"):
+                    self.take()
+                if end <= start:
+                    end += DAY_MINUTES
+            else:
+                raise HoursSyntaxError("Single points in time are not supported")
+            spans.append((start, min(end, 2 * DAY_MINUTES)))
+            if self.at("sym", ",") and (
+                self.peek(1)[0] == "time" or self.peek(1)[1] in EVENTS or self.peek(1)[1] == "("
+            ):
+                self.take()
+                continue
+            break
+        if spans:
+            rule.times = spans
+
+    def moment(self) -> int:
+        if self.at("time"):
+            h, m = map(int, self.take().split(":"))
+            if m >= 60 or h > 48:
+                raise HoursSyntaxError("Bad time")
+            return h * 60 + m
+        if self.at("sym", "("):
+            self.take()
+            base = EVENTS[self.take("word")]
+            sign = 1 if self.take("sym") == "+" else -1
+            h, m = map(int, self.take("time").split(":"))
+            self.take("sym", ")")
+            return max(0, base + sign * (h * 60 + m))
+        return EVENTS[self.take("word")]
+
+
+def _merge(spans) -> tuple:
+    out = []
+    for start, end in sorted(spans):
+        if out and start <= out[-1][1]:
+            if end > out[-1][1]:
+                out[-1] = (out[-1][0], end)
+        else:
+            out.append((start, end))
+    return tuple(out)
+
+
+def _subtract(spans, holes) -> list:
+    out = list(spans)
+    for h_start, h_end in holes:
+        nxt = []
+        for start, end in out:
+            if h_end <= start or h_start >= end:
+                nxt.append((start, end))
+                continue
+            if start < h_start:
+                nxt.append((start, h_start))
+            if h_end < end:
+                nxt.append((h_end, end))
+        out = nxt
+    return out
+
+
+class OpeningHours:
+    """A compiled opening_hours string. Minutes are counted from local midnight."""
+
+    def __init__(self, text: str, rules: list):
+        self.text = text
+        self.rules = rules
+        self._weekly = None
+        if all(r.weekly for r in rules):
+            # Any Monday, Tuesday... behaves the same: precompute the week
+            base = date(2024, 1, 1)  # a Monday
+            self._weekly = tuple(self._evaluate(base + timedelta(days=d), frozenset()) for d in range(7))
+
+    def __repr__(self):
+        return f"OpeningHours({self.text!r})"
+
+    def _rule_spans(self, day: date, holidays):
+        """Spans (may pass midnight) of the rules that apply on ``day``; None when unknown."""
+        spans = []
+        matched = False
+        unknown = False
+        for rule in self.rules:
+            if rule.kind == "fallback" and matched:
+                continue
+            if not rule.matches(day, holidays):
+                continue
+            times = rule.times or [(0, DAY_MINUTES)]
+            if rule.state == "unknown":
+                unknown = True
+            elif rule.state == "closed":
+                spans = _subtract(spans, times) if rule.kind == "additional" and rule.times else []
+                unknown = False
+            elif rule.kind == "additional":
+                spans = spans + list(times)
+            else:
+                spans = list(times)
+                unknown = False
+            matched = True
+        return None if unknown else spans
+
+    def _evaluate(self, day: date, holidays):
+        own = self._rule_spans(day, holidays)
+        if own is None:
+            return None
+        previous = self._rule_spans(day - timedelta(days=1), holidays) or []
+        spans = [(max(s, 0), min(e, DAY_MINUTES)) for s, e in own if s < DAY_MINUTES]
+        spans += [(max(s - DAY_MINUTES, 0), min(e - DAY_MINUTES, DAY_MINUTES)) for s, e in previous if e > DAY_MINUTES]
+        return _merge(s for s in spans if s[1] > s[0])
+
+    def intervals_on(self, day: date, holidays=()):
+        """((open, close), ...) minutes for ``day``, sorted and merged; None when unknown."""
+        if self._weekly is not None:
+            return self._weekly[day.weekday()]
+        return self._evaluate(day, frozenset(holidays))
+
+    def interval_at(self, day: date, minute: int, holidays=()):
+        """The (open, close) interval containing ``minute``, False when closed, None when unknown."""
+        spans = self.intervals_on(day, holidays)
+        if spans is None:
+            return None
+        i = bisect.bisect_right(spans, (minute, DAY_MINUTES + 1)) - 1
+        if i >= 0 and spans[i][0] <= minute < spans[i][1]:
+            return spans[i]
+        return False
+
+    def is_open_at(self, moment: datetime, holidays=()):
+        """True / False, or None when the hours say "unknown"."""
+        found = self.interval_at(moment.date(), moment.hour * 60 + moment.minute, holidays)
+        return None if found is None else bool(found)
+
+    def is_open_between(self, day: date, start: int, end: int, holidays=()):
+        """Whether one interval covers the whole visit start..end (minutes), or None when unknown."""
+        found = self.interval_at(day, start, holidays)
+        if not found:
+            return found
+        return end <= found[1]
+
+    def next_opening(self, day: date, minute: int, holidays=()):
+        """The start of the next interval after ``minute`` on ``day``, or None."""
+        for start, _ in self.intervals_on(day, holidays) or ():
+            if start > minute:
+                return start
+        return None
+
+    def fit_visit(self, day: date, start: int | None, end: int | None, holidays=()):
+        """
+        (start, end) moved inside the day's opening hours: a start outside them
+        moves to the next (else the first) opening, an end past the interval's
+        close is cut to it. None when the day is closed or unknown.
+        """
+        spans = self.intervals_on(day, holidays)
+        if not spans:
+            return None
+        if start is not None:
+            span = self.interval_at(day, start, holidays)
+            if not span:
+                nxt = self.next_opening(day, start, holidays)
+                span = next(s for s in spans if s[0] == nxt) if nxt is not None else spans[0]
+                start = span[0]
+        else:
+            span = self.interval_at(day, max(end - 1, 0), holidays) if end is not None else spans[0]
+            if not span:
+                before = [s for s in spans if s[1] <= end]
+                span = before[-1] if before else spans[0]
+        if end is not None and not span[0] < end <= span[1]:
+            end = span[1]
+        if start is not None and end is not None and end <= start:
+            start, end = span
+        return start, end
+
+
+@lru_cache(maxsize=4096)
+def compile_hours(text: str | None):
+    """The compiled hours for an OSM opening_hours string, or None when empty / unparseable."""
+    if not text or not str(text).strip():
+        return None
+    try:
+        return OpeningHours(text, _Parser(_tokens(str(text))).rules())
+    except (HoursSyntaxError, KeyError, ValueError, IndexError):
+        return None
+
+
+def open_at_many(texts, moment: datetime, holidays=()) -> list:
+    """is_open_at for many strings at once: True / False / None (unknown or unparseable) each."""
+    answers = {}
+    out = []
+    for text in texts:
+        if text not in answers:
+            hours = compile_hours(text)
+            answers[text] = hours.is_open_at(moment, holidays) if hours else None
+        out.append(answers[text])
+    return out
+
+
+def format_minutes(minute: int) -> str:
+    return f"{minute // 60:02d}:{minute % 60:02d}"
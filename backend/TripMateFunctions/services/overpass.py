@@ -0,0 +1,148 @@
+# backend/TripMateFunctions/services/overpass.py
+"""
+Opening hours from OpenStreetMap (Overpass), many places per request.
+
+Overpass is slow and rate-limited, so the stops of a day (or trip) go out as
+one union query - an `around:200` clause per coordinate - and each element
+that comes back is matched to the nearest stop within RADIUS_M:
+
+    hours = opening_hours_batch([(35.0037, 135.7788), (34.9949, 135.7850)])
+    hours[(35.0037, 135.7788)]
+    # {"opening_hours": "Mo-Su 09:00-17:00", "source": "osm", "confidence": 1.0, "tags": {...}}
+
+Results are cached per coordinate (rounded to 4 decimals, ~10 m) for a day,
+so later lookups of any of those stops - alone or in another batch - skip
+Overpass. Failed requests are not cached.
+"""
+import logging
+
+import requests
+
+from .cache import CacheNamespace
+from .nearby import haversine_m
+from .singleflight import single_flight
+
+logger = logging.getLogger(__name__)
+
+OVERPASS_URL = "https://overpass-api.de/api/interpreter"
+RADIUS_M = 200
+# Coordinates per Overpass query; a long day is split into a few
+MAX_POINTS_PER_QUERY = 25
+OSM_TTL_SECONDS = 60 * 60 * 24
+
+OSM_CACHE = CacheNamespace("osm_hours", default_ttl=OSM_TTL_SECONDS)
+
+
+def round_coord(val: float) -> float:
+    return round(float(val), 4)
+
+
+def _cache_key(point) -> str:
+    return f"osm:{point[0]}:{point[1]}"
+
+
+def _unknown():
+    return {"opening_hours": None, "source": "unknown", "confidence": 0.2, "tags": {}}
+
+
+def _query(points) -> str:
+    clauses = "\n".join(
+        f"  {kind}(around:{RADIUS_M},{lat},{lon})[opening_hours];"
+        for lat, lon in points
+        for kind in ("node", "way", "relation")
+    )
+    return f"[out:json][timeout:25];\n(\n{clauses}\n);\nout tags center qt;"
+
+
+def _element_coords(elem):
+    if elem.get("lat") is not None and elem.get("lon") is not None:
+        return float(elem["lat"]), float(elem["lon"])
+    center = elem.get("center") or {}
+    if center.get("lat") is not None and center.get("lon") is not None:
+        return float(center["lat"]), float(center["lon"])
+    return None
+
+
+def _match(points, elements) -> dict:
+    """{point: result} with the nearest element carrying opening_hours for each point."""
+    located = []
+    for elem in elements:
+        coords = _element_coords(elem)
+        if coords and (elem.get("tags") or {}).get("opening_hours"):
+            located.append((coords, elem["tags"]))
+
+    results = {}
+    for point in points:
+        result = _unknown()
+        if located:
+            dist = haversine_m(point[0], point[1], [c[0] for c, _ in located], [c[1] for c, _ in located])
+            best = int(dist.argmin())
+            if dist[best] <= RADIUS_M:
+                tags = located[best][1]
+                result = {"opening_hours": tags["opening_hours"], "source": "osm", "confidence": 1.0, "tags": tags}
+        results[point] = result
+    return results
+
+
+def _fetch(points):
+    """One Overpass request for ``points``; None when it fails."""
+    try:
+        resp = requests.post(OVERPASS_URL, data={"data": _query(points)}, timeout=30)
+        if resp.status_code != 200:
+            logger.warning("Overpass returned %s for %d point(s)", resp.status_code, len(points))
+            return None
+        elements = (resp.json() or {}).get("elements") or []
+    except Exception as exc:
+        logger.warning("Overpass request failed: %s", exc)
+        return None
+    return _match(points, elements)
+
+
+def opening_hours_batch(coords) -> dict:
+    """
+    {(rounded lat, rounded lon): result} for every (lat, lon) in ``coords``
+    (None coordinates are skipped). Cached points are not queried again.
+    """
+    points = {
+        (round_coord(lat), round_coord(lon))
+        for lat, lon in coords
+        if lat is not None and lon is not None
+    }
+    results, missing = {}, []
+    for point in sorted(points):
+        hit, value = OSM_CACHE.lookup(_cache_key(point))
+        if hit:
+            results[point] = value
+        else:
+            missing.append(point)
+
+    for i in range(0, len(missing), MAX_POINTS_PER_QUERY):
+        chunk = missing[i:i + MAX_POINTS_PER_QUERY]
+        fetched = _fetch(chunk)
+        if fetched is None:
+            results.update({point: _unknown() for point in chunk})
+            continue
+        for point, result in fetched.items():
+            OSM_CACHE.set(_cache_key(point), result, OSM_TTL_SECONDS)
+        results.update(fetched)
+    return results
+
+
+def opening_hours_at(lat: float | None, lon: float | None):
+    """Opening hours near a single coordinate (concurrent callers share one request)."""
+    if lat is None or lon is None:
+        return None
+    point = (round_coord(lat), round_coord(lon))
+    return single_flight(
+        OSM_CACHE,
+        _cache_key(point),
+        lambda: (_fetch([point]) or {}).get(point),
+        ttl=OSM_TTL_SECONDS,
+    ) or _unknown()
+
+
+def lookup(results: dict, lat: float | None, lon: float | None):
+    """The batch result for an item's coordinates, or None."""
+    if lat is None or lon is None:
+        return None
+    return results.get((round_coord(lat), round_coord(lon)))
@@ -0,0 +1,300 @@
+# backend/TripMateFunctions/services/presence.py
+"""
+Trip presence and the co-editing long-poll channel (F2.1).
+
+Presence lives in the shared cache, not in the database: every poll is a
+heartbeat that refreshes one key per (trip, user) with a short TTL, and
+"who is online" is one get_many over the trip's members:
+
+    heartbeat(trip_id, user.id)
+    online = online_user_ids(trip_id, trip_member_ids(trip_id))
+
+AppUser.last_active_at (used by the admin dashboard) is written in coalesced
+batches: note_active() only collects user ids, and at most one UPDATE per
+ACTIVE_FLUSH_SECONDS per worker stores them. Ids still pending when the
+requests stop are written by a timer after ACTIVE_FLUSH_SECONDS.
+
+wait_for_change() is the long-poll: it returns as soon as the trip's journal
+revision (services/trip_sync.py) or the set of online members differs from
+what the client already has, or after ``timeout``. It is a coroutine: the
+channel process (gunicorn_channel.conf.py) keeps thousands of waiting polls
+as suspended tasks, not threads. Polls of the same trip share one watcher
+per process, which reads the cache once per POLL_TICK_SECONDS, refreshes
+their heartbeats in one write and wakes them only when something changed.
+Blocking calls go through run_sync(): at most CHANNEL_DB_CONNECTIONS at once
+per process, each closing its database connection afterwards.
+"""
+import asyncio
+import hashlib
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from ..models import AppUser, Trip, TripCollaborator
+from .cache import CacheNamespace
+from .trip_sync import current_revision
+
+PRESENCE_TTL_SECONDS = getattr(settings, "PRESENCE_TTL_SECONDS", 20)
+LONG_POLL_SECONDS = getattr(settings, "PRESENCE_LONG_POLL_SECONDS", 15)
+ACTIVE_FLUSH_SECONDS = getattr(settings, "PRESENCE_ACTIVE_FLUSH_SECONDS", 30)
+# Sent as poll_after by processes that do not hold long-polls (the WSGI web process)
+POLL_AFTER_SECONDS = getattr(settings, "PRESENCE_POLL_AFTER_SECONDS", 5)
+CHANNEL_DB_CONNECTIONS = getattr(settings, "PRESENCE_CHANNEL_DB_CONNECTIONS", 4)
+HEARTBEAT_REFRESH_SECONDS = 5
+POLL_TICK_SECONDS = 1.0
+
+_PRESENCE = CacheNamespace("presence", default_ttl=PRESENCE_TTL_SECONDS, l1_size=0)
+_MEMBERS = CacheNamespace("trip_members", default_ttl=5 * 60, l1_size=0)
+
+# Online set and revision per trip, shared by this process's polls for one tick: with N
+# viewers on a trip, N polls would otherwise each read N presence keys.
+_online_lock = threading.Lock()
+_online_memo: dict = {}
+_revision_memo: dict = {}
+
+# Taken in the calling thread: every WSGI request runs its own event loop
+_sync_slots = threading.BoundedSemaphore(CHANNEL_DB_CONNECTIONS)
+# trip id -> _TripWatch, for the polls waiting in this process
+_watches: dict = {}
+
+_active_lock = threading.Lock()
+_active_pending: set = set()
+_active_flushed_at = time.monotonic()
+_active_timer = None
+
+
+# ----------------------------
+# Members
+# ----------------------------
+
+def trip_member_ids(trip_id):
+    """Owner + collaborator user ids (as strings), cached; None if the trip does not exist."""
+    hit, members = _MEMBERS.lookup(f"{trip_id}")
+    if hit:
+        return members
+
+    owner_id = Trip.objects.filter(pk=trip_id).values_list("owner_id", flat=True).first()
+    if owner_id is None:
+        return None
+    members = {str(owner_id)}
+    members.update(
+        str(uid)
+        for uid in TripCollaborator.objects.filter(trip_id=trip_id, user__isnull=False).values_list(
+            "user_id", flat=True
+        )
+    )
+    members = sorted(members)
+    _MEMBERS.set(f"{trip_id}", members)
+    return members
+
+
+def invalidate_trip_members(trip_id):
+    _MEMBERS.delete(f"{trip_id}")
+
+
+# ----------------------------
+# Presence
+# ----------------------------
+
+def _presence_key(trip_id, user_id) -> str:
+    return f"{trip_id}:{user_id}"
+
+
+def heartbeat(trip_id, user_id):
+    _PRESENCE.set(_presence_key(trip_id, user_id), time.time())
+    user_id = str(user_id)
+    with _online_lock:
+        memo = _online_memo.get(trip_id)
+        if memo and user_id not in memo[1]:
+            _online_memo[trip_id] = (memo[0], tuple(sorted((*memo[1], user_id))))
+
+
+def heartbeat_many(trip_id, user_ids):
+    _PRESENCE.set_many({_presence_key(trip_id, uid): time.time() for uid in user_ids})
+
+
+def online_user_ids(trip_id, member_ids) -> list:
+    now = time.monotonic()
+    with _online_lock:
+        memo = _online_memo.get(trip_id)
+    if memo and memo[0] > now:
+        return list(memo[1])
+
+    keys = {_presence_key(trip_id, uid): uid for uid in member_ids or []}
+    seen = _PRESENCE.get_many(keys)
+    cutoff = time.time() - PRESENCE_TTL_SECONDS
+    online = tuple(sorted(keys[key] for key, ts in seen.items() if ts and ts >= cutoff))
+
+    with _online_lock:
+        if len(_online_memo) > 1024:
+            for stale in [t for t, (expires, _) in _online_memo.items() if expires <= now]:
+                del _online_memo[stale]
+        _online_memo[trip_id] = (now + POLL_TICK_SECONDS, online)
+    return list(online)
+
+
+def presence_tag(online_ids) -> str:
+    return hashlib.sha1(",".join(online_ids).encode()).hexdigest()[:12]
+
+
+def note_active(user_id):
+    """Remember that ``user_id`` was active; flushed to AppUser.last_active_at in batches."""
+    global _active_timer
+    with _active_lock:
+        _active_pending.add(user_id)
+        if time.monotonic() - _active_flushed_at < ACTIVE_FLUSH_SECONDS:
+            if _active_timer is None:
+                # Written even if no later request comes to flush them
+                _active_timer = threading.Timer(ACTIVE_FLUSH_SECONDS, _flush_from_timer)
+                _active_timer.daemon = True
+                _active_timer.start()
+            return
+    flush_active()
+
+
+def _flush_from_timer():
+    global _active_timer
+    with _active_lock:
+        _active_timer = None
+    try:
+        flush_active()
+    finally:
+        connections.close_all()
+
+
+def flush_active() -> int:
+    """Write the collected last_active_at values now (one UPDATE). Returns the user count."""
+    global _active_flushed_at
+    with _active_lock:
+        ids = list(_active_pending)
+        _active_pending.clear()
+        _active_flushed_at = time.monotonic()
+    if ids:
+        AppUser.objects.filter(id__in=ids).update(last_active_at=timezone.now())
+    return len(ids)
+
+
+# ----------------------------
+# Long-poll
+# ----------------------------
+
+def release_connections():
+    """Hundreds of idle long-polls must not pin as many database connections."""
+    for conn in connections.all(initialized_only=True):
+        if not conn.in_atomic_block:
+            conn.close()
+
+
+def _in_slot(fn, *args):
+    with _sync_slots:
+        try:
+            return fn(*args)
+        finally:
+            release_connections()
+
+
+async def run_sync(fn, *args):
+    """Run ``fn(*args)`` off the event loop, at most CHANNEL_DB_CONNECTIONS at a time; its connection is closed after."""
+    return await sync_to_async(_in_slot)(fn, *args)
+
+
+def _revision_for_tick(trip_id):
+    """current_revision(), shared by this process's polls of one trip for one tick."""
+    now = time.monotonic()
+    with _online_lock:
+        memo = _revision_memo.get(trip_id)
+    if memo and memo[0] > now:
+        return memo[1]
+    revision = current_revision(trip_id)
+    with _online_lock:
+        if len(_revision_memo) > 1024:
+            for stale in [t for t, (expires, _) in _revision_memo.items() if expires <= now]:
+                del _revision_memo[stale]
+        _revision_memo[trip_id] = (now + POLL_TICK_SECONDS, revision)
+    return revision
+
+
+def _tick(trip_id, member_ids):
+    online = online_user_ids(trip_id, member_ids)
+    return _revision_for_tick(trip_id), online, presence_tag(online)
+
+
+class _TripWatch:
+    """Ticks for every poll of one trip waiting in this process; ``changed`` is set when the state moves."""
+
+    def __init__(self, trip_id, member_ids):
+        self.trip_id = trip_id
+        self.member_ids = member_ids
+        self.users: dict = {}  # user id -> polls waiting
+        self.state = None  # (revision, online ids, presence tag)
+        self.changed = asyncio.Event()
+        self.task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        beat_at = time.monotonic() + HEARTBEAT_REFRESH_SECONDS
+        while True:
+            await asyncio.sleep(POLL_TICK_SECONDS)
+            if time.monotonic() >= beat_at:
+                await run_sync(heartbeat_many, self.trip_id, list(self.users))
+                beat_at = time.monotonic() + HEARTBEAT_REFRESH_SECONDS
+            state = await run_sync(_tick, self.trip_id, self.member_ids)
+            if state != self.state:
+                self.state = state
+                self.changed.set()
+                self.changed = asyncio.Event()
+
+    def join(self, user_id, member_ids):
+        self.member_ids = member_ids
+        self.users[user_id] = self.users.get(user_id, 0) + 1
+
+    def leave(self, user_id):
+        self.users[user_id] -= 1
+        if not self.users[user_id]:
+            del self.users[user_id]
+        if not self.users:
+            self.task.cancel()
+            if _watches.get(self.trip_id) is self:
+                del _watches[self.trip_id]
+
+
+def _watch(trip_id, user_id, member_ids) -> _TripWatch:
+    watch = _watches.get(trip_id)
+    if watch is None or watch.task.done() or watch.task.get_loop() is not asyncio.get_running_loop():
+        watch = _watches[trip_id] = _TripWatch(trip_id, member_ids)
+    watch.join(user_id, member_ids)
+    return watch
+
+
+async def wait_for_change(trip_id, user_id, member_ids, since_revision=None, known_presence=None, timeout=LONG_POLL_SECONDS):
+    """
+    Wait until the journal revision differs from ``since_revision`` (when
+    given) or the online set's tag differs from ``known_presence``, or
+    ``timeout`` passes. Returns (revision, online_ids); heartbeats meanwhile.
+    """
+    deadline = time.monotonic() + max(0.0, timeout)
+    await run_sync(heartbeat, trip_id, user_id)
+    revision, online, tag = await run_sync(_tick, trip_id, member_ids)
+
+    watch = None
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            changed = tag != known_presence or (since_revision is not None and revision != since_revision)
+            if changed or remaining <= 0:
+                return revision, online
+
+            if watch is None:
+                watch = _watch(trip_id, user_id, member_ids)
+            try:
+                await asyncio.wait_for(watch.changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+            if watch.state is not None:
+                revision, online, tag = watch.state
+    finally:
+        if watch is not None:
+            watch.leave(user_id)
@@ -0,0 +1,48 @@
+# backend/TripMateFunctions/services/ratelimit.py
+"""
+Per-process pacing for third-party APIs with request quotas
+(Mapbox geocoding, Overpass, OpenTripMap ...).
+
+    MAPBOX_GEOCODE_LIMIT = RateLimiter(rate_per_second=10, max_concurrent=4)
+    with MAPBOX_GEOCODE_LIMIT:
+        requests.get(...)
+"""
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    Allow at most ``rate_per_second`` calls to start per second and at most
+    ``max_concurrent`` calls in flight. Callers block until a slot is free.
+    """
+
+    def __init__(self, rate_per_second: float, max_concurrent: int = 4):
+        self.interval = 1.0 / rate_per_second if rate_per_second and rate_per_second > 0 else 0.0
+        self._slots = threading.BoundedSemaphore(max(int(max_concurrent), 1))
+        self._lock = threading.Lock()
+        self._next_start = 0.0
+
+    def _wait_for_turn(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start_at = max(now, self._next_start)
+            self._next_start = start_at + self.interval
+        delay = start_at - now
+        if delay > 0:
+            time.sleep(delay)
+
+    def __enter__(self):
+        self._slots.acquire()
+        try:
+            self._wait_for_turn()
+        except BaseException:
+            self._slots.release()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._slots.release()
+        return False
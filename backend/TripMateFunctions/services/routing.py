@@ -0,0 +1,381 @@
+# backend/TripMateFunctions/services/routing.py
+"""
+Routing engine for F1.2.
+
+- get_travel_matrix(): one OpenRouteService matrix call per set of stops
+  (distance + duration), or a vectorised haversine matrix when ORS is not
+  configured / fails / the set is too large. Matrices are cached by rounded
+  coordinates and profile, independent of stop order, so re-ordering a day
+  does not trigger another ORS call.
+- optimise_order(): greedy nearest-neighbour tour improved with 2-opt and
+  Or-opt moves under a time budget. Works on asymmetric matrices (ORS
+  durations are not symmetric).
+- balanced_clusters(): capacity-constrained k-means used to split a trip's
+  stops into geographically compact days of fixed size.
+"""
+import logging
+import os
+import time
+
+import numpy as np
+import requests
+from django.conf import settings
+
+from .cache import CacheNamespace
+from .singleflight import single_flight
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0
+
+# ORS free tier: 3500 matrix elements per request (~59 x 59)
+ORS_MATRIX_MAX_LOCATIONS = 50
+ORS_PROFILES = {
+    "driving-car",
+    "driving-hgv",
+    "cycling-regular",
+    "cycling-road",
+    "cycling-mountain",
+    "cycling-electric",
+    "foot-walking",
+    "foot-hiking",
+    "wheelchair",
+}
+
+_MATRIX_CACHE = CacheNamespace("route_matrix", default_ttl=60 * 60 * 24 * 7)
+# Haversine estimates are cached briefly so ORS is retried soon after an outage
+FALLBACK_MATRIX_TTL = 60 * 60
+
+
+def get_ors_key() -> str:
+    return (
+        getattr(settings, "OPENROUTESERVICE_API_KEY", None)
+        or os.environ.get("OPENROUTESERVICE_API_KEY")
+        or ""
+    ).strip()
+
+
+def normalize_profile(profile: str) -> str:
+    p = (profile or "").strip()
+    if p in ORS_PROFILES:
+        return p
+    return "driving-car"
+
+
+def fallback_speed_kmh(profile: str) -> float:
+    p = (profile or "").strip()
+    if p == "foot-walking":
+        return 4.5
+    if p == "cycling-regular":
+        return 15.0
+    return 30.0  # driving-car fallback
+
+
+def haversine_matrix(points) -> np.ndarray:
+    """Pairwise great-circle distances (km) for [(lat, lon), ...]."""
+    pts = np.radians(np.asarray(points, dtype=float).reshape(-1, 2))
+    lat = pts[:, 0][:, None]
+    lon = pts[:, 1][:, None]
+    dlat = lat.T - lat
+    dlon = lon.T - lon
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat) * np.cos(lat.T) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class TravelMatrix:
+    """distance_km / duration_min are n x n arrays in the order of the input points."""
+
+    def __init__(self, distance_km: np.ndarray, duration_min: np.ndarray, source: str):
+        self.distance_km = distance_km
+        self.duration_min = duration_min
+        self.source = source
+
+    def leg(self, i: int, j: int):
+        return round(float(self.distance_km[i, j]), 2), round(float(self.duration_min[i, j]), 1)
+
+    def legs(self, order):
+        """[(i, j, distance_km, duration_min), ...] for consecutive stops of ``order``."""
+        return [(i, j, *self.leg(i, j)) for i, j in zip(order[:-1], order[1:])]
+
+    def path_duration(self, order) -> float:
+        order = np.asarray(order, dtype=int)
+        if len(order) < 2:
+            return 0.0
+        return float(self.duration_min[order[:-1], order[1:]].sum())
+
+
+def _fallback_matrix(points, profile: str):
+    dist = haversine_matrix(points)
+    return dist, dist / fallback_speed_kmh(profile) * 60.0
+
+
+def _ors_matrix(points, profile: str):
+    """Returns (distance_km, duration_min) arrays, or None on failure."""
+    api_key = get_ors_key()
+    if not api_key or len(points) > ORS_MATRIX_MAX_LOCATIONS:
+        return None
+
+    url = f"https://api.openrouteservice.org/v2/matrix/{normalize_profile(profile)}"
+    payload = {
+        "locations": [[lon, lat] for lat, lon in points],
+        "metrics": ["distance", "duration"],
+        "units": "km",
+    }
+    try:
+        resp = requests.post(
+            url,
+            json=payload,
+            headers={"Authorization": api_key, "Content-Type": "application/json"},
+            timeout=12,
+        )
+        if resp.status_code != 200:
+            logger.warning("ORS matrix error %s: %s", resp.status_code, resp.text[:200])
+            return None
+        data = resp.json() or {}
+        distances = data.get("distances")
+        durations = data.get("durations")
+        if not distances or not durations:
+            return None
+        # Unroutable pairs come back as null -> NaN, patched with the fallback estimate
+        dist = np.array(distances, dtype=float)
+        dur = np.array(durations, dtype=float) / 60.0
+    except Exception as exc:
+        logger.warning("ORS matrix request failed: %s", exc)
+        return None
+
+    if np.isnan(dist).any() or np.isnan(dur).any():
+        fb_dist, fb_dur = _fallback_matrix(points, profile)
+        dist = np.where(np.isnan(dist), fb_dist, dist)
+        dur = np.where(np.isnan(dur), fb_dur, dur)
+    return dist, dur
+
+
+def get_travel_matrix(points, profile: str = "driving-car") -> TravelMatrix:
+    """
+    Travel matrix for [(lat, lon), ...]. Uses a single ORS matrix request when
+    possible; otherwise haversine distance at the profile's fallback speed.
+    """
+    n = len(points)
+    if n < 2:
+        zeros = np.zeros((n, n))
+        return TravelMatrix(zeros, zeros.copy(), "none")
+
+    profile = normalize_profile(profile)
+    rounded = [(round(float(lat), 4), round(float(lon), 4)) for lat, lon in points]
+
+    # Cache in a canonical (sorted, de-duplicated) order so any permutation of
+    # the same stops hits the same entry.
+    canonical = sorted(set(rounded))
+    cache_key = profile + "|" + ";".join(f"{lat},{lon}" for lat, lon in canonical)
+
+    def compute():
+        ors = _ors_matrix(canonical, profile)
+        if ors is not None:
+            return {"distance_km": ors[0], "duration_min": ors[1], "source": "ors"}
+        fb = _fallback_matrix(canonical, profile)
+        # Not cached by single_flight (see cacheable below): store with a short TTL instead
+        _MATRIX_CACHE.set(
+            cache_key,
+            {"distance_km": fb[0], "duration_min": fb[1], "source": "haversine"},
+            FALLBACK_MATRIX_TTL,
+        )
+        return {"distance_km": fb[0], "duration_min": fb[1], "source": "haversine"}
+
+    entry = single_flight(
+        _MATRIX_CACHE,
+        cache_key,
+        compute,
+        cacheable=lambda v: v.get("source") == "ors",
+    )
+
+    index = {p: i for i, p in enumerate(canonical)}
+    idx = np.array([index[p] for p in rounded], dtype=int)
+    return TravelMatrix(
+        entry["distance_km"][np.ix_(idx, idx)],
+        entry["duration_min"][np.ix_(idx, idx)],
+        entry["source"],
+    )
+
+
+# ----------------------------
+# Tour optimisation (open path, fixed start)
+# ----------------------------
+
+def nearest_neighbour_order(cost: np.ndarray, start: int = 0) -> list[int]:
+    n = cost.shape[0]
+    visited = np.zeros(n, dtype=bool)
+    order = [start]
+    visited[start] = True
+    for _ in range(n - 1):
+        row = np.where(visited, np.inf, cost[order[-1]])
+        nxt = int(np.argmin(row))
+        order.append(nxt)
+        visited[nxt] = True
+    return order
+
+
+def _path_cost(cost: np.ndarray, order: np.ndarray) -> float:
+    return float(cost[order[:-1], order[1:]].sum()) if len(order) > 1 else 0.0
+
+
+def _two_opt_pass(cost: np.ndarray, order: np.ndarray, deadline: float) -> bool:
+    """Best-improvement 2-opt pass with exact deltas for asymmetric costs."""
+    n = len(order)
+    improved = False
+    for i in range(1, n - 1):
+        if time.monotonic() > deadline:
+            break
+        # Prefix sums of forward and backward edge costs along the current path
+        fwd = np.concatenate(([0.0], np.cumsum(cost[order[:-1], order[1:]])))
+        bwd = np.concatenate(([0.0], np.cumsum(cost[order[1:], order[:-1]])))
+
+        j = np.arange(i + 1, n)
+        a = order[i - 1]
+        before = cost[a, order[i]] + (fwd[j] - fwd[i])
+        after = cost[a, order[j]] + (bwd[j] - bwd[i])
+        has_next = j < n - 1
+        nxt = order[np.minimum(j + 1, n - 1)]
+        before = before + np.where(has_next, cost[order[j], nxt], 0.0)
+        after = after + np.where(has_next, cost[order[i], nxt], 0.0)
+
+        delta = after - before
+        k = int(np.argmin(delta))
+        if delta[k] < -1e-9:
+            jj = int(j[k])
+            order[i:jj + 1] = order[i:jj + 1][::-1]
+            improved = True
+    return improved
+
+
+def _or_opt_pass(cost: np.ndarray, order: np.ndarray, deadline: float, max_segment: int = 3):
+    """Move segments of 1..max_segment stops to their best position (no reversal)."""
+    n = len(order)
+    for seg_len in range(1, max_segment + 1):
+        for i in range(1, n - seg_len + 1):
+            if time.monotonic() > deadline:
+                return order, False
+            seg = order[i:i + seg_len]
+            rest = np.concatenate((order[:i], order[i + seg_len:]))
+            current = _path_cost(cost, order)
+
+            # Insert after rest[k] for k = 0 .. len(rest)-1 (start stays fixed)
+            heads = rest
+            tails = np.append(rest[1:], -1)
+            has_tail = tails >= 0
+            tails_safe = np.where(has_tail, tails, 0)
+            base = _path_cost(cost, rest)
+            inner = _path_cost(cost, seg)
+            add = (
+                cost[heads, seg[0]]
+                + inner
+                + np.where(has_tail, cost[seg[-1], tails_safe] - cost[heads, tails_safe], 0.0)
+            )
+            totals = base + add
+            k = int(np.argmin(totals))
+            if totals[k] < current - 1e-9:
+                return np.concatenate((rest[:k + 1], seg, rest[k + 1:])), True
+    return order, False
+
+
+def optimise_order(cost: np.ndarray, start: int = 0, time_budget_ms: float = 50.0) -> list[int]:
+    """
+    Open-path tour over all indices of ``cost`` starting at ``start``:
+    nearest neighbour, then 2-opt + Or-opt until no improvement or the budget runs out.
+    """
+    cost = np.asarray(cost, dtype=float)
+    n = cost.shape[0]
+    if n == 0:
+        return []
+    if n <= 2:
+        return [start] + [i for i in range(n) if i != start]
+
+    deadline = time.monotonic() + time_budget_ms / 1000.0
+    order = np.array(nearest_neighbour_order(cost, start), dtype=int)
+
+    while time.monotonic() < deadline:
+        improved = _two_opt_pass(cost, order, deadline)
+        order, moved = _or_opt_pass(cost, order, deadline)
+        if not (improved or moved):
+            break
+    return [int(i) for i in order]
+
+
+# ----------------------------
+# Day clustering (capacity-constrained k-means)
+# ----------------------------
+
+def _project_km(points) -> np.ndarray:
+    """Equirectangular projection to a local km grid (fine at city/region scale)."""
+    pts = np.asarray(points, dtype=float).reshape(-1, 2)
+    lat0 = np.radians(pts[:, 0].mean()) if len(pts) else 0.0
+    y = np.radians(pts[:, 0]) * EARTH_RADIUS_KM
+    x = np.radians(pts[:, 1]) * EARTH_RADIUS_KM * np.cos(lat0)
+    return np.c_[x, y]
+
+
+def _capacitated_assign(dist: np.ndarray, capacities: np.ndarray) -> np.ndarray:
+    """
+    Assign each point (row) to a cluster (column) without exceeding capacities.
+    Points with the largest regret (gap between best and second-best cluster)
+    choose first, so points that clearly belong somewhere get there.
+    """
+    n, k = dist.shape
+    labels = np.full(n, -1, dtype=int)
+    remaining = capacities.astype(int).copy()
+    open_mask = remaining > 0
+
+    sorted_d = np.sort(np.where(open_mask, dist, np.inf), axis=1)
+    regret = (sorted_d[:, 1] - sorted_d[:, 0]) if k > 1 else np.zeros(n)
+    regret = np.where(np.isfinite(regret), regret, np.finfo(float).max)
+
+    for i in np.argsort(-regret, kind="stable"):
+        row = np.where(remaining > 0, dist[i], np.inf)
+        j = int(np.argmin(row))
+        labels[i] = j
+        remaining[j] -= 1
+    return labels
+
+
+def balanced_clusters(points, capacities, init_labels=None, max_iter: int = 25) -> np.ndarray:
+    """
+    Split ``points`` [(lat, lon), ...] into len(capacities) geographic clusters
+    where cluster j receives exactly capacities[j] points.
+
+    ``init_labels`` (e.g. the current day of every stop) seeds the centroids so
+    clusters stay aligned with the existing days.
+    """
+    capacities = np.asarray(capacities, dtype=int)
+    k = len(capacities)
+    xy = _project_km(points)
+    n = len(xy)
+    if k == 0 or n == 0:
+        return np.zeros(n, dtype=int)
+    if capacities.sum() != n:
+        raise ValueError("capacities must sum to the number of points")
+
+    centroids = np.zeros((k, 2))
+    if init_labels is not None:
+        init_labels = np.asarray(init_labels, dtype=int)
+        for j in range(k):
+            members = xy[init_labels == j]
+            centroids[j] = members.mean(axis=0) if len(members) else xy.mean(axis=0)
+    else:
+        # Deterministic spread-out seeds: farthest-point sampling
+        centroids[0] = xy[0]
+        d = np.linalg.norm(xy - centroids[0], axis=1)
+        for j in range(1, k):
+            centroids[j] = xy[int(np.argmax(d))]
+            d = np.minimum(d, np.linalg.norm(xy - centroids[j], axis=1))
+
+    labels = None
+    for _ in range(max_iter):
+        dist = np.linalg.norm(xy[:, None, :] - centroids[None, :, :], axis=2)
+        new_labels = _capacitated_assign(dist, capacities)
+        if labels is not None and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        for j in range(k):
+            members = xy[labels == j]
+            if len(members):
+                centroids[j] = members.mean(axis=0)
+    return labels
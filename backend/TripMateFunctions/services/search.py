@@ -0,0 +1,344 @@
+# backend/TripMateFunctions/services/search.py
+"""
+Full-text search over public trips, community FAQs and destination FAQ / Q&A.
+
+Every searchable row has a SearchDocument (kind, object_id, title, body).
+Results are ranked, every word is a prefix ("kyo" finds "Kyoto") and a
+misspelt word ("ramne") is corrected when the exact query finds nothing:
+
+    hits = search("ramen kyoto", kinds=["trip"])
+    # [{"kind": "trip", "id": 12, "title": ..., "snippet": ..., "rank": 0.61}, ...]
+    faqs = search_queryset(CommunityFAQ.objects.filter(country="France"), "visa", "community_faq")
+
+search_queryset() searches only among the rows of the queryset (the filter
+runs inside the full-text query) and returns every match, best first, so
+views can filter and paginate as usual.
+
+Backends, picked from the connection:
+  PostgreSQL  search_vector (title weight A, body weight B) with a GIN index;
+              typos fall back to pg_trgm word similarity.
+  SQLite      FTS5 table search_document_fts, kept in sync by triggers and
+              ranked with bm25; typos are corrected against its vocabulary.
+  other       icontains on title and body, unranked.
+
+install_search_backend() creates the backend objects (migration 0013).
+Documents are updated on save: signals call index_object() for FAQs and
+Q&A, and trips are indexed with their community card
+(services/community_cards.py), so only public, unflagged trips are found.
+"""
+import difflib
+import re
+
+from django.conf import settings
+from django.core.exceptions import EmptyResultSet
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db import connection
+from django.db.models import Case, F, IntegerField, Q, When
+from django.db.models.functions import Greatest
+
+from ..models import CommunityFAQ, DestinationFAQ, DestinationQA, ItineraryItem, SearchDocument, Trip
+
+Kind = SearchDocument.Kind
+
+SEARCH_LIMIT = 50
+MAX_TERMS = 8
+TS_CONFIG = getattr(settings, "SEARCH_TS_CONFIG", "english")
+# pg_trgm word similarity a misspelt word needs to match
+TRIGRAM_THRESHOLD = 0.4
+# difflib ratio for SQLite vocabulary corrections
+VOCAB_CUTOFF = 0.75
+
+# Recomputes search_vector for the rows matching the appended WHERE clause
+PG_UPDATE_VECTOR_SQL = (
+    "UPDATE search_document SET search_vector = "
+    "setweight(to_tsvector(%s::regconfig, coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector(%s::regconfig, coalesce(body, '')), 'B')"
+)
+
+_POSTGRES_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS search_document_vector_idx ON search_document USING gin (search_vector)",
+    "CREATE INDEX IF NOT EXISTS search_document_title_trgm_idx ON search_document USING gin (title gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS search_document_body_trgm_idx ON search_document USING gin (body gin_trgm_ops)",
+]
+_POSTGRES_DROP = [
+    "DROP INDEX IF EXISTS search_document_vector_idx",
+    "DROP INDEX IF EXISTS search_document_title_trgm_idx",
+    "DROP INDEX IF EXISTS search_document_body_trgm_idx",
+]
+
+_SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_document_fts USING fts5("
+    "title, body, content='search_document', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_document_vocab USING fts5vocab(search_document_fts, 'row')",
+    "CREATE TRIGGER IF NOT EXISTS search_document_ai AFTER INSERT ON search_document BEGIN "
+    "INSERT INTO search_document_fts(rowid, title, body) VALUES (new.id, new.title, new.body); END",
+    "CREATE TRIGGER IF NOT EXISTS search_document_ad AFTER DELETE ON search_document BEGIN "
+    "INSERT INTO search_document_fts(search_document_fts, rowid, title, body) "
+    "VALUES ('delete', old.id, old.title, old.body); END",
+    "CREATE TRIGGER IF NOT EXISTS search_document_au AFTER UPDATE ON search_document BEGIN "
+    "INSERT INTO search_document_fts(search_document_fts, rowid, title, body) "
+    "VALUES ('delete', old.id, old.title, old.body); "
+    "INSERT INTO search_document_fts(rowid, title, body) VALUES (new.id, new.title, new.body); END",
+    # Rows that existed before the triggers
+    "INSERT INTO search_document_fts(search_document_fts) VALUES ('rebuild')",
+]
+_SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS search_document_ai",
+    "DROP TRIGGER IF EXISTS search_document_ad",
+    "DROP TRIGGER IF EXISTS search_document_au",
+    "DROP TABLE IF EXISTS search_document_vocab",
+    "DROP TABLE IF EXISTS search_document_fts",
+]
+
+
+# ----------------------------
+# Backend setup
+# ----------------------------
+
+def install_search_backend(conn=None):
+    """Create the GIN / FTS5 objects for ``conn``'s backend (idempotent)."""
+    conn = conn or connection
+    statements = {"postgresql": _POSTGRES_DDL, "sqlite": _SQLITE_DDL}.get(conn.vendor, [])
+    with conn.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def uninstall_search_backend(conn=None):
+    conn = conn or connection
+    statements = {"postgresql": _POSTGRES_DROP, "sqlite": _SQLITE_DROP}.get(conn.vendor, [])
+    with conn.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def update_vectors(conn=None, ids=None):
+    """PostgreSQL: recompute search_vector (all rows, or ``ids``)."""
+    conn = conn or connection
+    if conn.vendor != "postgresql":
+        return
+    sql, params = PG_UPDATE_VECTOR_SQL, [TS_CONFIG, TS_CONFIG]
+    if ids is not None:
+        if not ids:
+            return
+        sql += " WHERE id = ANY(%s)"
+        params.append(list(ids))
+    with conn.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+# ----------------------------
+# Documents
+# ----------------------------
+
+def _join(*parts) -> str:
+    return " ".join(str(p).strip() for p in parts if p and str(p).strip())
+
+
+def document_text(kind: str, obj, item_titles=()):
+    """(title, body) to index for ``obj``, or None if it must not be searchable."""
+    if kind == Kind.TRIP:
+        if obj.visibility != Trip.Visibility.PUBLIC or obj.is_flagged:
+            return None
+        return obj.title, _join(obj.main_city, obj.main_country, obj.travel_type, obj.description, *item_titles)
+    if kind == Kind.COMMUNITY_FAQ:
+        if not obj.is_published:
+            return None
+        return obj.question, _join(obj.answer, obj.country, obj.category)
+    if kind == Kind.DESTINATION_FAQ:
+        if not obj.is_published:
+            return None
+        return obj.question, _join(obj.answer)
+    if kind == Kind.DESTINATION_QA:
+        if not obj.is_public:
+            return None
+        return obj.question, _join(obj.answer)
+    raise ValueError(f"Unknown search document kind {kind!r}")
+
+
+_KIND_OF_MODEL = {
+    Trip: Kind.TRIP,
+    CommunityFAQ: Kind.COMMUNITY_FAQ,
+    DestinationFAQ: Kind.DESTINATION_FAQ,
+    DestinationQA: Kind.DESTINATION_QA,
+}
+_MODEL_OF_KIND = {kind: model for model, kind in _KIND_OF_MODEL.items()}
+
+
+def _store(kind: str, object_id, text):
+    if text is None:
+        remove_document(kind, object_id)
+        return
+    title, body = text
+    doc, _ = SearchDocument.objects.update_or_create(
+        kind=kind, object_id=object_id, defaults={"title": title, "body": body}
+    )
+    update_vectors(ids=[doc.pk])
+
+
+def index_trip(trip: Trip):
+    titles = ()
+    if trip.visibility == Trip.Visibility.PUBLIC and not trip.is_flagged:
+        titles = ItineraryItem.objects.filter(trip_id=trip.id).order_by("id").values_list("title", flat=True)
+    _store(Kind.TRIP, trip.id, document_text(Kind.TRIP, trip, titles))
+
+
+def index_object(instance):
+    """Add, update or remove the search document of a FAQ / Q&A / trip row."""
+    if isinstance(instance, Trip):
+        index_trip(instance)
+        return
+    kind = _KIND_OF_MODEL[type(instance)]
+    _store(kind, instance.pk, document_text(kind, instance))
+
+
+def remove_object(instance):
+    remove_document(_KIND_OF_MODEL[type(instance)], instance.pk)
+
+
+def reindex_objects(kind: str, ids):
+    """Re-index rows changed without signals (queryset.update)."""
+    for instance in _MODEL_OF_KIND[kind].objects.filter(pk__in=list(ids)):
+        index_object(instance)
+
+
+def remove_document(kind: str, object_id):
+    SearchDocument.objects.filter(kind=kind, object_id=object_id).delete()
+
+
+def rebuild_search_index() -> int:
+    """Re-index everything; returns the number of documents."""
+    SearchDocument.objects.all().delete()
+    for model in _MODEL_OF_KIND.values():
+        for instance in model.objects.all().iterator(chunk_size=500):
+            index_object(instance)
+    return SearchDocument.objects.count()
+
+
+# ----------------------------
+# Querying
+# ----------------------------
+
+def _terms(query: str) -> list:
+    return re.findall(r"\w+", (query or "").lower())[:MAX_TERMS]
+
+
+def _hit(kind, object_id, title, body, rank) -> dict:
+    return {
+        "kind": kind,
+        "id": object_id,
+        "title": title,
+        "snippet": (body or "")[:160],
+        "rank": round(float(rank or 0), 4),
+    }
+
+
+def _documents(kinds, scope):
+    docs = SearchDocument.objects.filter(kind__in=kinds)
+    if scope is not None:
+        docs = docs.filter(object_id__in=scope)
+    return docs
+
+
+def _search_postgres(terms, kinds, limit, scope=None):
+    docs = _documents(kinds, scope)
+    query = SearchQuery(" & ".join(f"{t}:*" for t in terms), search_type="raw", config=TS_CONFIG)
+    rows = list(
+        docs.filter(search_vector=query)
+        .annotate(rank=SearchRank(F("search_vector"), query))
+        .order_by("-rank", "id")
+        .values_list("kind", "object_id", "title", "body", "rank")[:limit]
+    )
+    if rows:
+        return rows
+
+    # Typo tolerance: trigram similarity of the words against title / body
+    text = " ".join(terms)
+    return list(
+        docs.filter(Q(title__trigram_word_similar=text) | Q(body__trigram_word_similar=text))
+        .annotate(
+            rank=Greatest(
+                TrigramWordSimilarity(text, "title"),
+                TrigramWordSimilarity(text, "body"),
+            )
+        )
+        .filter(rank__gte=TRIGRAM_THRESHOLD)
+        .order_by("-rank", "id")
+        .values_list("kind", "object_id", "title", "body", "rank")[:limit]
+    )
+
+
+def _fts5_match(terms, kinds, limit, scope=None):
+    match = " ".join(f'"{t}"*' for t in terms)
+    placeholders = ", ".join(["%s"] * len(kinds))
+    scope_sql, scope_params = "", []
+    if scope is not None:
+        try:
+            sql, scope_params = scope.query.sql_with_params()
+        except EmptyResultSet:
+            return []
+        scope_sql = f"AND d.object_id IN ({sql}) "
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT d.kind, d.object_id, d.title, d.body, -bm25(search_document_fts, 10.0, 1.0) AS rank "
+            "FROM search_document_fts JOIN search_document d ON d.id = search_document_fts.rowid "
+            f"WHERE search_document_fts MATCH %s AND d.kind IN ({placeholders}) {scope_sql}"
+            "ORDER BY rank DESC, d.id LIMIT %s",
+            [match, *kinds, *scope_params, -1 if limit is None else limit],
+        )
+        return cursor.fetchall()
+
+
+def _search_sqlite(terms, kinds, limit, scope=None):
+    rows = _fts5_match(terms, kinds, limit, scope)
+    if rows:
+        return rows
+
+    # Typo tolerance: swap unknown words for the closest indexed word
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT term FROM search_document_vocab")
+        vocab = [row[0] for row in cursor.fetchall()]
+    corrected = [(difflib.get_close_matches(t, vocab, n=1, cutoff=VOCAB_CUTOFF) or [t])[0] for t in terms]
+    if corrected == terms:
+        return []
+    return _fts5_match(corrected, kinds, limit, scope)
+
+
+def _search_fallback(terms, kinds, limit, scope=None):
+    docs = _documents(kinds, scope)
+    for t in terms:
+        docs = docs.filter(Q(title__icontains=t) | Q(body__icontains=t))
+    return [(*row, 0) for row in docs.order_by("-updated_at").values_list("kind", "object_id", "title", "body")[:limit]]
+
+
+def search(query: str, kinds=None, limit: int | None = SEARCH_LIMIT, scope=None) -> list:
+    """
+    Best matches for ``query`` (best first), as dicts: kind, id, title, snippet,
+    rank. ``scope`` (a values() queryset of object ids) restricts the documents
+    searched; ``limit=None`` returns every match.
+    """
+    terms = _terms(query)
+    if not terms:
+        return []
+    kinds = list(kinds or Kind.values)
+    backend = {"postgresql": _search_postgres, "sqlite": _search_sqlite}.get(connection.vendor, _search_fallback)
+    return [_hit(*row) for row in backend(terms, kinds, limit, scope)]
+
+
+def search_ids(query: str, kind: str, limit: int | None = SEARCH_LIMIT, scope=None) -> list:
+    return [hit["id"] for hit in search(query, [kind], limit, scope)]
+
+
+def order_by_hits(queryset, ids, field: str = "pk"):
+    """``queryset`` restricted to ``ids`` and ordered like them (best match first)."""
+    if not ids:
+        return queryset.none()
+    position = Case(*[When(**{field: pk}, then=i) for i, pk in enumerate(ids)], output_field=IntegerField())
+    return queryset.filter(**{f"{field}__in": ids}).order_by(position)
+
+
+def search_queryset(queryset, query: str, kind: str, field: str = "pk"):
+    """Every row of ``queryset`` matching ``query``, best first; the filter runs inside the search."""
+    scope = queryset.order_by().values(field)
+    return order_by_hits(queryset, search_ids(query, kind, limit=None, scope=scope), field)
@@ -0,0 +1,213 @@
+# backend/TripMateFunctions/services/singleflight.py
+"""
+Request coalescing ("single-flight") for slow cached lookups.
+
+When several collaborators open the same trip at once, every request used to
+miss the cache and call Overpass / OpenTripMap / SeaLion for the same key.
+single_flight() lets exactly one caller compute a value while concurrent
+callers for that key wait for it:
+
+- inside a worker, followers block on the leader's in-process call;
+- across workers, the leader holds a short lock and other workers poll the
+  namespace until the value appears or the lock goes away. With Redis the
+  lock is cache.add (SET NX); FileBasedCache.add is a read-then-write, so on
+  the file cache the lock is a file created with O_CREAT | O_EXCL next to
+  the cache files. A lock left by a crashed leader is broken after
+  ``lock_ttl``; two workers breaking the same stale lock may both compute.
+
+    hours = single_flight(_OSM_CACHE, key, fetch, ttl=60 * 60 * 24)
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+import uuid
+
+from django.core.cache.backends.filebased import FileBasedCache
+
+from .cache import CacheNamespace, safe_key
+
+logger = logging.getLogger(__name__)
+
+LOCK_TTL_SECONDS = 60
+WAIT_TIMEOUT_SECONDS = 30
+POLL_INTERVAL_SECONDS = 0.2
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: BaseException | None = None
+
+
+_inflight: dict[str, _Call] = {}
+_inflight_lock = threading.Lock()
+
+
+def _default_cacheable(value) -> bool:
+    return value is not None
+
+
+# ----------------------------
+# Cross-worker lock
+# ----------------------------
+
+def _lock_path(backend: FileBasedCache, lock_key: str) -> str:
+    return os.path.join(backend._dir, "sf-locks", hashlib.sha1(lock_key.encode()).hexdigest() + ".lock")
+
+
+def _read_lock_file(path: str):
+    """(token, expires_at) of a lock file, or None when there is none."""
+    try:
+        with open(path, encoding="utf-8") as fh:
+            token, _, expires = fh.read().partition(" ")
+        return token, float(expires or 0)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError):
+        return "", 0.0  # half-written or unreadable: treat as stale
+
+
+def _acquire_lock_file(path: str, token: str, lock_ttl: float) -> bool:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    for _ in range(2):
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            held = _read_lock_file(path)
+            if held is not None and held[1] > time.time():
+                return False
+            try:
+                os.unlink(path)  # stale: its leader died without releasing it
+            except FileNotFoundError:
+                pass
+            continue
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            fh.write(f"{token} {time.time() + lock_ttl}")
+        return True
+    return False
+
+
+def _acquire_lock(namespace: CacheNamespace, lock_key: str, token: str, lock_ttl: float) -> bool:
+    backend = namespace.backend
+    if isinstance(backend, FileBasedCache):
+        return _acquire_lock_file(_lock_path(backend, lock_key), token, lock_ttl)
+    return bool(backend.add(lock_key, token, lock_ttl))
+
+
+def _lock_held(namespace: CacheNamespace, lock_key: str) -> bool:
+    try:
+        backend = namespace.backend
+        if isinstance(backend, FileBasedCache):
+            held = _read_lock_file(_lock_path(backend, lock_key))
+            return held is not None and held[1] > time.time()
+        return backend.get(lock_key) is not None
+    except Exception:
+        return False
+
+
+def _release_lock(namespace: CacheNamespace, lock_key: str, token: str):
+    try:
+        backend = namespace.backend
+        if isinstance(backend, FileBasedCache):
+            path = _lock_path(backend, lock_key)
+            held = _read_lock_file(path)
+            if held is not None and held[0] == token:
+                os.unlink(path)
+        elif backend.get(lock_key) == token:
+            backend.delete(lock_key)
+    except Exception:
+        pass
+
+
+# ----------------------------
+# Single-flight
+# ----------------------------
+
+def _wait_for_other_worker(namespace: CacheNamespace, key: str, lock_key: str, wait_timeout: float):
+    """Poll the shared cache while another worker computes the value. Returns (hit, value)."""
+    deadline = time.monotonic() + wait_timeout
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL_SECONDS)
+        hit, value = namespace.lookup(key)
+        if hit:
+            return True, value
+        if not _lock_held(namespace, lock_key):
+            # Lock released without a cached value (the fetch failed); do it ourselves.
+            break
+    return False, None
+
+
+def _lead(namespace: CacheNamespace, key: str, fn, ttl, cacheable, lock_ttl: float, wait_timeout: float):
+    lock_key = f"tm:sf:{namespace.namespace}:{safe_key(key)}"
+    token = uuid.uuid4().hex
+    try:
+        have_lock = _acquire_lock(namespace, lock_key, token, lock_ttl)
+    except Exception as exc:
+        logger.warning("single_flight[%s] lock failed: %s", namespace.namespace, exc)
+        have_lock = True  # cache backend trouble: just compute
+
+    if not have_lock:
+        hit, value = _wait_for_other_worker(namespace, key, lock_key, wait_timeout)
+        if hit:
+            return value
+
+    try:
+        value = fn()
+        if cacheable(value):
+            namespace.set(key, value, ttl)
+        return value
+    finally:
+        if have_lock:
+            _release_lock(namespace, lock_key, token)
+
+
+def single_flight(
+    namespace: CacheNamespace,
+    key: str,
+    fn,
+    *,
+    ttl: int | None = None,
+    cacheable=_default_cacheable,
+    lock_ttl: float = LOCK_TTL_SECONDS,
+    wait_timeout: float = WAIT_TIMEOUT_SECONDS,
+):
+    """
+    Return the cached value for ``key`` or compute it once with ``fn()``.
+
+    ``cacheable(value)`` decides whether a result is stored (default: not None),
+    so transient failures are shared with the callers that waited for them but
+    are not cached for later requests.
+    """
+    hit, value = namespace.lookup(key)
+    if hit:
+        return value
+
+    flight_key = f"{namespace.namespace}:{key}"
+    with _inflight_lock:
+        call = _inflight.get(flight_key)
+        leader = call is None
+        if leader:
+            call = _Call()
+            _inflight[flight_key] = call
+
+    if not leader:
+        if not call.done.wait(wait_timeout):
+            logger.warning("single_flight[%s] timed out waiting for %s", namespace.namespace, key)
+            return fn()
+        if call.error is not None:
+            raise call.error
+        return call.value
+
+    try:
+        call.value = _lead(namespace, key, fn, ttl, cacheable, lock_ttl, wait_timeout)
+        return call.value
+    except BaseException as exc:
+        call.error = exc
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(flight_key, None)
+        call.done.set()
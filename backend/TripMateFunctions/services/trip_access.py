@@ -0,0 +1,108 @@
+# backend/TripMateFunctions/services/trip_access.py
+"""
+Who can see which trips.
+
+A user can access a trip they own or have a TripCollaborator row on (invited
+or active). Views used to check this with `Q(owner=user) |
+Q(collaborators__user=user)` + DISTINCT, or an extra `.exists()` per request.
+Instead, a user's memberships are read once (one UNION query) and cached per
+user; TripCollaborator and Trip save / delete hooks drop the entry, and
+drop it again once their transaction commits (signals.py):
+
+    if not can_access_trip(user, trip_id):
+        raise PermissionDenied(...)
+    TripPhoto.objects.filter(trip_filter(user))           # trip_id IN (...)
+    Trip.objects.filter(trip_filter(user, field="pk"))
+
+active_only=True leaves out pending invites (owner or accepted collaborators).
+"""
+from django.db import transaction
+from django.db.models import CharField, Q, Value
+
+from ..models import Trip, TripCollaborator
+from .cache import CacheNamespace
+
+OWNER = TripCollaborator.Role.OWNER
+
+# No L1: an invalidation from another worker must be seen on the next request.
+# The TTL bounds the one case the hooks miss: the previous owner of a
+# reassigned trip.
+_ACCESS = CacheNamespace("trip_access", default_ttl=5 * 60, l1_size=0)
+
+
+def _user_id(user):
+    """An AppUser (or anonymous user) or a user id."""
+    if user is None or not getattr(user, "is_authenticated", True):
+        return None
+    return getattr(user, "id", user)
+
+
+def trip_roles(user) -> dict:
+    """{trip_id: (role, status)} for every trip the user can access; owner wins."""
+    user_id = _user_id(user)
+    if user_id is None:
+        return {}
+    key = str(user_id)
+    hit, roles = _ACCESS.lookup(key)
+    if hit:
+        return roles
+
+    owned = Trip.objects.filter(owner_id=user_id).values_list(
+        "id",
+        Value(OWNER, output_field=CharField()),
+        Value(TripCollaborator.Status.ACTIVE, output_field=CharField()),
+    )
+    joined = TripCollaborator.objects.filter(user_id=user_id).values_list("trip_id", "role", "status")
+    roles = {}
+    for trip_id, role, status in owned.union(joined, all=True):
+        if roles.get(trip_id, ("",))[0] != OWNER:
+            roles[trip_id] = (str(role), str(status))
+    _ACCESS.set(key, roles)
+    return roles
+
+
+def accessible_trip_ids(user, active_only: bool = False) -> list:
+    return sorted(
+        trip_id
+        for trip_id, (_, status) in trip_roles(user).items()
+        if not active_only or status == TripCollaborator.Status.ACTIVE
+    )
+
+
+def trip_role(user, trip) -> str | None:
+    """The user's role on ``trip`` (a Trip or its id): owner / editor / viewer, or None."""
+    entry = trip_roles(user).get(getattr(trip, "pk", trip))
+    return entry[0] if entry else None
+
+
+def can_access_trip(user, trip, active_only: bool = False) -> bool:
+    """``trip`` is a Trip or a trip id (int or numeric string)."""
+    trip_id = getattr(trip, "pk", trip)
+    try:
+        trip_id = int(trip_id)
+    except (TypeError, ValueError):
+        return False
+    entry = trip_roles(user).get(trip_id)
+    if entry is None:
+        return False
+    return not active_only or entry[1] == TripCollaborator.Status.ACTIVE
+
+
+def trip_filter(user, field: str = "trip_id", active_only: bool = False) -> Q:
+    """Q(<field>__in=<accessible trip ids>) for querysets of trips or trip-owned rows."""
+    return Q(**{f"{field}__in": accessible_trip_ids(user, active_only=active_only)})
+
+
+def _drop(user_ids):
+    for user_id in user_ids:
+        _ACCESS.delete(str(user_id))
+
+
+def invalidate_trip_access(*user_ids):
+    user_ids = {u for u in user_ids if u is not None}
+    if not user_ids:
+        return
+    _drop(user_ids)
+    if transaction.get_connection().in_atomic_block:
+        # Roles read from pre-commit rows in the meantime must not survive the commit
+        transaction.on_commit(lambda: _drop(user_ids))
@@ -0,0 +1,216 @@
+# backend/TripMateFunctions/services/trip_clone.py
+"""
+Bulk itinerary writes and trip cloning.
+
+Copying a public template (F2.6) or saving an AI itinerary (F1.3 / F2.2)
+used to insert every day and item with its own round trip. The helpers here
+insert each table with one bulk_create (batched for very large trips) inside
+one transaction, so a copy costs a handful of statements whatever its size:
+
+    with transaction.atomic():
+        day_map = bulk_create_days(trip, [TripDay(trip=trip, day_index=1, date=d)])
+        bulk_create_items(trip, [ItineraryItem(trip=trip, day=day_map[1], title="Louvre")])
+
+    new_trip = clone_trip(source, owner, copy_tags=True, visibility="private")
+
+bulk_create skips model signals, so both helpers invalidate the trip view
+snapshot, journal a co-editing "reset" (services/trip_sync.py) and schedule a
+community card refresh themselves; bulk_create also skips save(), so items get
+their geohash here.
+"""
+from django.db import transaction
+
+from ..models import (
+    Checklist,
+    ChecklistItem,
+    ItineraryItem,
+    ItineraryItemNote,
+    ItineraryItemTag,
+    Trip,
+    TripBudget,
+    TripDay,
+)
+from .community_cards import schedule_card_refresh
+from .geohash import encode_or_none
+from .trip_snapshot import invalidate_trip_snapshot
+from .trip_sync import record_reset
+
+BULK_BATCH_SIZE = 500
+
+# Trip fields copied from the template unless overridden
+_TRIP_FIELDS = (
+    "title",
+    "main_city",
+    "main_country",
+    "start_date",
+    "end_date",
+    "description",
+    "travel_type",
+)
+
+# Itinerary item fields copied as-is; costs and bookings stay with the source
+_ITEM_FIELDS = (
+    "destination_id",
+    "title",
+    "item_type",
+    "start_time",
+    "end_time",
+    "lat",
+    "lon",
+    "address",
+    "notes_summary",
+    "is_all_day",
+    "sort_order",
+)
+
+
+def bulk_create_days(trip: Trip, days: list) -> dict:
+    """Insert ``days`` in one statement; returns {day_index: TripDay} with primary keys set."""
+    if not days:
+        return {}
+    created = TripDay.objects.bulk_create(days, batch_size=BULK_BATCH_SIZE)
+    invalidate_trip_snapshot(trip.id)
+    record_reset(trip.id)
+    schedule_card_refresh(trip.id)
+    if any(day.pk is None for day in created):
+        # Backend can't return ids from a bulk insert: read them back once
+        return {d.day_index: d for d in TripDay.objects.filter(trip=trip)}
+    return {d.day_index: d for d in created}
+
+
+def bulk_create_items(trip: Trip, items: list) -> list:
+    """Insert ``items`` (all belonging to ``trip``) in as few statements as possible."""
+    if not items:
+        return []
+    for item in items:
+        # bulk_create skips ItineraryItem.save()
+        item.geohash = encode_or_none(item.lat, item.lon)
+    created = ItineraryItem.objects.bulk_create(items, batch_size=BULK_BATCH_SIZE)
+    invalidate_trip_snapshot(trip.id)
+    record_reset(trip.id)
+    schedule_card_refresh(trip.id)
+    return created
+
+
+def _copy_item_children(item_pairs: list, owner, copy_tags: bool, copy_notes: bool):
+    """item_pairs: [(source_item_id, new_item), ...]"""
+    new_by_source = {src_id: item for src_id, item in item_pairs}
+    if not new_by_source:
+        return
+
+    if copy_tags:
+        ItineraryItemTag.objects.bulk_create(
+            [
+                ItineraryItemTag(item=new_by_source[tag.item_id], tag=tag.tag)
+                for tag in ItineraryItemTag.objects.filter(item_id__in=list(new_by_source))
+            ],
+            batch_size=BULK_BATCH_SIZE,
+        )
+
+    if copy_notes:
+        # Notes are re-authored by the new owner; the template author stays private
+        ItineraryItemNote.objects.bulk_create(
+            [
+                ItineraryItemNote(item=new_by_source[note.item_id], user=owner, content=note.content)
+                for note in ItineraryItemNote.objects.filter(item_id__in=list(new_by_source)).order_by("id")
+            ],
+            batch_size=BULK_BATCH_SIZE,
+        )
+
+
+def _copy_checklists(source: Trip, new_trip: Trip, owner):
+    checklists = list(Checklist.objects.filter(trip=source).prefetch_related("items").order_by("id"))
+    if not checklists:
+        return
+    new_checklists = Checklist.objects.bulk_create([
+        Checklist(
+            owner=owner,
+            trip=new_trip,
+            name=c.name,
+            description=c.description,
+            checklist_type=c.checklist_type,
+        )
+        for c in checklists
+    ])
+    ChecklistItem.objects.bulk_create(
+        [
+            ChecklistItem(
+                checklist=new_c,
+                label=ci.label,
+                sort_order=ci.sort_order,
+                due_date=ci.due_date,
+                is_completed=False,
+            )
+            for c, new_c in zip(checklists, new_checklists)
+            for ci in c.items.all()
+        ],
+        batch_size=BULK_BATCH_SIZE,
+    )
+
+
+def clone_trip(
+    source: Trip,
+    owner,
+    *,
+    copy_tags: bool = False,
+    copy_notes: bool = False,
+    copy_checklists: bool = False,
+    copy_budget: bool = False,
+    **trip_fields,
+) -> Trip:
+    """
+    Copy ``source`` (days and items, optionally tags / notes / checklists /
+    planned budget) to a new trip owned by ``owner`` in one transaction.
+    ``trip_fields`` override the copied Trip fields, e.g. visibility="private".
+    Expenses, media and collaborators are never copied.
+    """
+    values = {name: getattr(source, name) for name in _TRIP_FIELDS}
+    values.update(trip_fields)
+
+    with transaction.atomic():
+        new_trip = Trip.objects.create(owner=owner, **values)
+
+        source_days = list(TripDay.objects.filter(trip=source).order_by("day_index"))
+        day_map = bulk_create_days(
+            new_trip,
+            [TripDay(trip=new_trip, date=d.date, day_index=d.day_index, note=d.note) for d in source_days],
+        )
+        new_day_by_source = {d.id: day_map.get(d.day_index) for d in source_days}
+
+        source_items = list(ItineraryItem.objects.filter(trip=source).order_by("day_id", "sort_order", "id"))
+        new_items = [
+            ItineraryItem(
+                trip=new_trip,
+                day=new_day_by_source.get(item.day_id),
+                cost_amount=None,
+                cost_currency=None,
+                booking_reference="",
+                **{name: getattr(item, name) for name in _ITEM_FIELDS},
+            )
+            for item in source_items
+        ]
+        new_items = bulk_create_items(new_trip, new_items)
+
+        if copy_tags or copy_notes:
+            if any(item.pk is None for item in new_items):
+                raise RuntimeError("clone_trip needs a database that returns ids from bulk inserts")
+            _copy_item_children(
+                [(src.id, new) for src, new in zip(source_items, new_items)],
+                owner,
+                copy_tags,
+                copy_notes,
+            )
+
+        if copy_checklists:
+            _copy_checklists(source, new_trip, owner)
+
+        if copy_budget:
+            budget = TripBudget.objects.filter(trip=source).first()
+            if budget:
+                TripBudget.objects.create(
+                    trip=new_trip,
+                    currency=budget.currency,
+                    planned_total=budget.planned_total,
+                )
+
+    return new_trip
@@ -0,0 +1,155 @@
+# backend/TripMateFunctions/services/trip_snapshot.py
+"""
+Read-only trip snapshot for the public view / share-link page.
+
+The whole payload (trip + days + items) is built with two queries and stored
+as ready-to-send JSON in the shared cache, together with an ETag.
+
+Snapshots are versioned: every trip has a revision token and the snapshot key
+includes it. TripMateFunctions.signals bumps the revision whenever a Trip,
+TripDay or ItineraryItem is saved or deleted, so a snapshot that was being
+built while the trip changed is stored under the old revision and never
+served. A revision that is lost from the cache is replaced by a new one, never
+reused. Code paths that bypass model signals (bulk_create / bulk_update /
+queryset.update) call invalidate_trip_snapshot() themselves.
+"""
+import hashlib
+import json
+import time
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from ..models import ItineraryItem, Trip, TripDay
+from .cache import CacheNamespace
+from .singleflight import single_flight
+
+# Bump when the payload shape changes so old snapshots are ignored
+SNAPSHOT_SCHEMA_VERSION = 1
+
+_SNAPSHOT_CACHE = CacheNamespace("trip_view", default_ttl=60 * 60)
+# No per-process L1: an edit must be visible on the next request in every worker
+_REVISIONS = CacheNamespace("trip_view_rev", default_ttl=60 * 60 * 24 * 30, l1_size=0)
+
+
+def _revision(trip_id) -> int:
+    revision = _REVISIONS.get(str(trip_id))
+    if revision:
+        return revision
+    # Never seen, or the key expired / was culled: start a new revision. Falling
+    # back to a fixed value could name a snapshot built before the last edit.
+    return _bump_revision(trip_id)
+
+
+def _snapshot_key(trip_id, revision: int) -> str:
+    return f"{trip_id}:s{SNAPSHOT_SCHEMA_VERSION}:r{revision}"
+
+
+def _owner_name(owner) -> str:
+    if not owner:
+        return "Anonymous"
+    if owner.full_name:
+        return owner.full_name
+    if owner.email:
+        return owner.email.split("@")[0]  # Use part before @
+    return "Anonymous"
+
+
+def _item_data(item: ItineraryItem) -> dict:
+    return {
+        "id": item.id,
+        "title": item.title,
+        "description": None,
+        "location": None,
+        "address": item.address,
+        "start_time": str(item.start_time) if item.start_time else None,
+        "end_time": str(item.end_time) if item.end_time else None,
+        "sort_order": item.sort_order,
+        # Coordinates for map
+        "lat": float(item.lat) if item.lat is not None else None,
+        "lon": float(item.lon) if item.lon is not None else None,
+        # Thumbnail for images
+        "thumbnail_url": item.thumbnail_url,
+    }
+
+
+def build_trip_view_snapshot(trip_id):
+    """Trip payload for view-only access, or None if the trip does not exist."""
+    days = list(
+        TripDay.objects.filter(trip_id=trip_id)
+        .select_related("trip__owner")
+        .order_by("day_index")
+    )
+    if days:
+        trip = days[0].trip
+    else:
+        trip = Trip.objects.select_related("owner").filter(id=trip_id).first()
+        if trip is None:
+            return None
+
+    items_by_day = {day.id: [] for day in days}
+    if days:
+        for item in ItineraryItem.objects.filter(day_id__in=list(items_by_day)).order_by("sort_order", "id"):
+            items_by_day[item.day_id].append(item)
+
+    return {
+        "id": trip.id,
+        "title": trip.title,
+        "destination": None,
+        "start_date": trip.start_date.isoformat() if trip.start_date else None,
+        "end_date": trip.end_date.isoformat() if trip.end_date else None,
+        "created_at": trip.created_at.isoformat() if trip.created_at else None,
+        # Include owner info (non-sensitive)
+        "owner": {
+            "name": _owner_name(trip.owner),
+        },
+        # Include trip days and itinerary items
+        "days": [
+            {
+                "id": day.id,
+                "day_index": day.day_index,
+                "date": day.date.isoformat() if day.date else None,
+                "items": [_item_data(item) for item in items_by_day[day.id]],
+            }
+            for day in days
+        ],
+        # View-only flag
+        "is_view_only": True,
+    }
+
+
+def get_trip_view_snapshot(trip_id):
+    """
+    Returns {"json": str, "etag": str} for the trip, or None if it does not exist.
+    Cached until the trip changes; concurrent misses build it once.
+    """
+    try:
+        trip_id = int(trip_id)
+    except (TypeError, ValueError):
+        return None
+
+    def build():
+        data = build_trip_view_snapshot(trip_id)
+        if data is None:
+            return None
+        body = json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False)
+        etag = hashlib.sha1(body.encode("utf-8")).hexdigest()
+        return {"json": body, "etag": f'"{etag}"'}
+
+    return single_flight(_SNAPSHOT_CACHE, _snapshot_key(trip_id, _revision(trip_id)), build)
+
+
+def _bump_revision(trip_id) -> int:
+    revision = time.time_ns()
+    _REVISIONS.set(str(trip_id), revision)
+    return revision
+
+
+def invalidate_trip_snapshot(trip_id):
+    """Move the trip to a new revision; the old snapshot simply expires."""
+    if trip_id is None:
+        return
+    _bump_revision(trip_id)
+    if transaction.get_connection().in_atomic_block:
+        # A snapshot built from pre-commit rows in the meantime must not survive the commit
+        transaction.on_commit(lambda: _bump_revision(trip_id))
@@ -0,0 +1,199 @@
+# backend/TripMateFunctions/services/trip_sync.py
+"""
+Change journal for F2.1 co-editing sync.
+
+Every trip has a revision counter (Trip.sync_revision) and a journal of
+compact operations (TripChange), written by TripMateFunctions.signals when a
+Trip, TripDay or ItineraryItem is saved or deleted:
+
+    rev 41  upsert item 812  {...item fields...}
+    rev 42  delete day  77
+
+A poll asks for everything after the revision it already has, so its cost
+depends on how much was edited, not on the size of the trip:
+
+    revision, changes = changes_since(trip, 40)   # -> 42, [op 41, op 42]
+    revision, changes = changes_since(trip, 42)   # -> 42, []   (nothing new)
+    revision, changes = changes_since(trip, 3)    # -> 42, None (reload the trip)
+
+``None`` tells the client to reload the whole trip: its revision fell out of
+the retained journal, the gap is too large, or a RESET op was recorded.
+Code that rewrites many rows at once (AI generation, template copy) runs
+inside ``batch_rewrite(trip_id)``, which journals one RESET instead of an op
+per row. bulk_create / bulk_update skip signals, so those call sites record
+their changes themselves.
+
+The revision bump and the journal insert share a transaction and the bump
+row-locks the trip, so revisions become visible in order and without gaps.
+After commit the new revision is also published to the shared cache, which
+the presence/co-editing long-poll channel (services/presence.py) watches.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import F
+
+from ..models import ItineraryItem, Trip, TripChange, TripDay
+from ..serializers.f1_1_serializers import ItineraryItemSerializer, TripDaySerializer
+from ..serializers.f2_1_serializers import F21TripFieldsSerializer
+from .cache import CacheNamespace
+from .ledger import owner_is_deleting
+
+# Journal entries kept per trip; older clients reload the whole trip
+JOURNAL_KEEP = 1000
+PRUNE_EVERY = 100
+# Larger gaps are cheaper to send as a full reload
+MAX_CHANGES_PER_POLL = 500
+
+_batch = threading.local()
+
+# Latest revision per trip, read by the long-poll channel on every tick. Only a
+# wake-up hint: answers are always built from the journal.
+_REVISIONS = CacheNamespace("trip_sync_rev", default_ttl=60 * 60, l1_size=0)
+
+
+def _batched_trips() -> set:
+    if not hasattr(_batch, "trips"):
+        _batch.trips = set()
+    return _batch.trips
+
+
+def _entity_of(instance):
+    """(entity, trip_id, data) for a journaled model instance."""
+    if isinstance(instance, ItineraryItem):
+        return "item", instance.trip_id, ItineraryItemSerializer(instance).data
+    if isinstance(instance, TripDay):
+        return "day", instance.trip_id, TripDaySerializer(instance).data
+    return "trip", instance.pk, F21TripFieldsSerializer(instance).data
+
+
+def record_changes(trip_id, changes: list):
+    """
+    Append ``changes`` ([(entity, entity_id, op, data), ...]) to the trip's
+    journal with consecutive revisions. Returns the new revision, or None if
+    nothing was recorded.
+    """
+    if not changes or trip_id is None:
+        return None
+    if trip_id in _batched_trips() or owner_is_deleting("trips", trip_id):
+        return None
+
+    with transaction.atomic():
+        if not Trip.objects.filter(pk=trip_id).update(sync_revision=F("sync_revision") + len(changes)):
+            return None
+        last = Trip.objects.filter(pk=trip_id).values_list("sync_revision", flat=True).first()
+        first = last - len(changes) + 1
+        TripChange.objects.bulk_create([
+            TripChange(
+                trip_id=trip_id,
+                revision=first + i,
+                entity=entity,
+                entity_id=entity_id,
+                op=op,
+                data=data,
+            )
+            for i, (entity, entity_id, op, data) in enumerate(changes)
+        ])
+
+    transaction.on_commit(lambda: publish_revision(trip_id, last))
+
+    if last // PRUNE_EVERY != (first - 1) // PRUNE_EVERY:
+        TripChange.objects.filter(trip_id=trip_id, revision__lte=last - JOURNAL_KEEP).delete()
+    return last
+
+
+def record_instance_change(instance, deleted: bool = False):
+    entity, trip_id, data = _entity_of(instance)
+    if deleted:
+        return record_changes(trip_id, [(entity, instance.pk, TripChange.Op.DELETE, None)])
+    return record_changes(trip_id, [(entity, instance.pk, TripChange.Op.UPSERT, data)])
+
+
+def record_upserts(trip_id, instances):
+    """Journal rows written without signals (bulk_update / queryset.update)."""
+    changes = []
+    for instance in instances:
+        entity, _, data = _entity_of(instance)
+        changes.append((entity, instance.pk, TripChange.Op.UPSERT, data))
+    return record_changes(trip_id, changes)
+
+
+def record_reset(trip_id):
+    return record_changes(trip_id, [("trip", trip_id, TripChange.Op.RESET, None)])
+
+
+@contextmanager
+def batch_rewrite(trip_id):
+    """Rewrite many rows of a trip; clients get one RESET instead of an op per row."""
+    batched = _batched_trips()
+    if trip_id in batched:
+        yield
+        return
+    batched.add(trip_id)
+    try:
+        yield
+    finally:
+        batched.discard(trip_id)
+    record_reset(trip_id)
+
+
+def changes_since(trip, revision):
+    """
+    (current revision, changes after ``revision``) where changes is a list of
+    {"rev", "entity", "id", "op", "data"} with only the last op per row, or
+    None when the client must reload the whole trip.
+    """
+    current = trip.sync_revision
+    if revision is None or revision > current:
+        return current, None
+    if revision == current:
+        return current, []
+    if current - revision > MAX_CHANGES_PER_POLL:
+        return current, None
+
+    rows = list(
+        TripChange.objects.filter(trip_id=trip.id, revision__gt=revision, revision__lte=current)
+        .order_by("revision")
+        .values("revision", "entity", "entity_id", "op", "data")
+    )
+    if len(rows) != current - revision or any(r["op"] == TripChange.Op.RESET for r in rows):
+        return current, None
+
+    latest = {}
+    for r in rows:
+        key = (r["entity"], r["entity_id"])
+        latest.pop(key, None)  # keep dict order = order of the last op
+        latest[key] = {
+            "rev": r["revision"],
+            "entity": r["entity"],
+            "id": r["entity_id"],
+            "op": r["op"],
+            "data": r["data"],
+        }
+    return current, list(latest.values())
+
+
+def publish_revision(trip_id, revision):
+    _REVISIONS.set(f"{trip_id}", revision)
+
+
+def current_revision(trip_id):
+    """Latest journal revision of a trip, from the shared cache when possible."""
+    hit, revision = _REVISIONS.lookup(f"{trip_id}")
+    if hit:
+        return revision
+    revision = Trip.objects.filter(pk=trip_id).values_list("sync_revision", flat=True).first()
+    if revision is not None:
+        _REVISIONS.set(f"{trip_id}", revision)
+    return revision
+
+
+def revision_at(trip, when):
+    """Latest revision recorded at or before ``when`` (for clients that only send last_synced_at)."""
+    return (
+        TripChange.objects.filter(trip_id=trip.id, created_at__lte=when)
+        .order_by("-revision")
+        .values_list("revision", flat=True)
+        .first()
+    )
@@ -0,0 +1,189 @@
+# backend/TripMateFunctions/services/weather.py
+"""
+Daily weather for a whole trip from Open-Meteo, one request per source.
+
+Open-Meteo returns any start_date..end_date window in one response, so the
+adaptive planner asks for the trip's date range once per rounded location
+instead of once per day (and per anchor):
+
+    timeline = weather_timeline(35.01, 135.77, date(2026, 4, 1), date(2026, 4, 10))
+    weather_for_day(timeline, date(2026, 4, 3))
+    # {"precipitation_sum": 0.4, "weathercode": 3, "temperature_2m_max": 19.2, ...}
+
+Older days come from the archive API, the last ARCHIVE_LAG_DAYS and the next
+FORECAST_DAYS from the forecast API, and days neither covers get
+climate-model temperatures. That is 1-3 calls per trip and cell.
+The result is cached as one list per field, keyed by ~11 km cell, range and
+today's date (the split between sources moves every day).
+"""
+from datetime import date, timedelta
+
+import requests
+
+from .cache import CacheNamespace
+from .singleflight import single_flight
+
+FORECAST_URL = "https://api.open-meteo.com/v1/forecast"
+ARCHIVE_URL = "https://archive-api.open-meteo.com/v1/archive"
+CLIMATE_URL = "https://climate-api.open-meteo.com/v1/climate"
+
+FIELDS = (
+    "precipitation_sum",
+    "precipitation_probability_max",
+    "weathercode",
+    "temperature_2m_max",
+    "temperature_2m_min",
+    "windspeed_10m_max",
+)
+# The forecast API covers today and the next 15 days
+FORECAST_DAYS = 16
+# The archive (ERA5) trails by a few days; the forecast API serves those
+ARCHIVE_LAG_DAYS = 5
+# Longer trips are fetched in windows of this many days
+MAX_RANGE_DAYS = 31
+# Grid cell (degrees); Open-Meteo's own models are 1.5-11 km
+CELL_DEG = 0.1
+# Ranges touching the last week or the forecast change during the day
+RECENT_DAYS = 7
+RECENT_TTL_SECONDS = 60 * 60
+SETTLED_TTL_SECONDS = 60 * 60 * 24
+
+_WEATHER_CACHE = CacheNamespace("weather", default_ttl=RECENT_TTL_SECONDS)
+
+
+def _cell(value: float) -> float:
+    return round(round(float(value) / CELL_DEG) * CELL_DEG, 4)
+
+
+def _daily(url: str, params: dict, timeout: float):
+    """The ``daily`` block of an Open-Meteo response, or None on failure."""
+    try:
+        r = requests.get(url, params=params, timeout=timeout)
+        if r.status_code != 200:
+            return None
+        return r.json().get("daily") or {}
+    except Exception:
+        return None
+
+
+def _forecast(lat: float, lon: float, start: date, end: date):
+    return _daily(FORECAST_URL, {
+        "latitude": lat,
+        "longitude": lon,
+        "daily": "precipitation_sum,precipitation_probability_max,weathercode,temperature_2m_max,temperature_2m_min,windspeed_10m_max",
+        "timezone": "auto",
+        "start_date": start.isoformat(),
+        "end_date": end.isoformat(),
+    }, timeout=10)
+
+
+def _archive(lat: float, lon: float, start: date, end: date):
+    daily = _daily(ARCHIVE_URL, {
+        "latitude": lat,
+        "longitude": lon,
+        "daily": "precipitation_sum,weather_code,temperature_2m_max,temperature_2m_min,windspeed_10m_max",
+        "timezone": "auto",
+        "start_date": start.isoformat(),
+        "end_date": end.isoformat(),
+    }, timeout=12)
+    if daily is not None and "weather_code" in daily:
+        daily["weathercode"] = daily.pop("weather_code")
+    return daily
+
+
+def _climate(lat: float, lon: float, start: date, end: date):
+    return _daily(CLIMATE_URL, {
+        "latitude": lat,
+        "longitude": lon,
+        "daily": "temperature_2m_max,temperature_2m_min",
+        "models": "EC_Earth3P_HR",
+        "start_date": start.isoformat(),
+        "end_date": end.isoformat(),
+    }, timeout=12)
+
+
+def _missing_temps(columns: dict, i: int) -> bool:
+    return columns["temperature_2m_max"][i] is None and columns["temperature_2m_min"][i] is None
+
+
+def _fetch_timeline(lat: float, lon: float, start: date, end: date, today: date) -> dict:
+    days = (end - start).days + 1
+    columns = {f: [None] * days for f in FIELDS}
+    ok = True
+
+    def fill(source, lo: date, hi: date):
+        nonlocal ok
+        if lo > hi:
+            return
+        daily = source(lat, lon, lo, hi)
+        if daily is None:
+            ok = False
+            return
+        for j, day_str in enumerate(daily.get("time") or []):
+            try:
+                i = (date.fromisoformat(day_str) - start).days
+            except (TypeError, ValueError):
+                continue
+            if not 0 <= i < days:
+                continue
+            for field in FIELDS:
+                values = daily.get(field) or []
+                if columns[field][i] is None and j < len(values):
+                    columns[field][i] = values[j]
+
+    recent = today - timedelta(days=ARCHIVE_LAG_DAYS)
+    horizon = today + timedelta(days=FORECAST_DAYS - 1)
+    fill(_archive, start, min(end, recent - timedelta(days=1)))
+    fill(_forecast, max(start, recent), min(end, horizon))
+
+    # Past days without data and days beyond the forecast horizon
+    gaps = [
+        start + timedelta(days=i)
+        for i in range(days)
+        if _missing_temps(columns, i) and not today <= start + timedelta(days=i) <= horizon
+    ]
+    if gaps:
+        fill(_climate, min(gaps), max(gaps))
+
+    return {"start": start.isoformat(), "days": days, "ok": ok, **columns}
+
+
+def weather_timeline(lat: float, lon: float, start: date, end: date) -> dict:
+    """
+    Daily weather for start..end (inclusive) around (lat, lon): {"start",
+    "days", <field>: [value per day]}. Cached; failed fetches are not.
+    """
+    lat, lon = _cell(lat), _cell(lon)
+    today = date.today()
+    key = f"{lat}:{lon}:{start.isoformat()}:{end.isoformat()}:{today.isoformat()}"
+    ttl = SETTLED_TTL_SECONDS if end < today - timedelta(days=RECENT_DAYS) else RECENT_TTL_SECONDS
+    return single_flight(
+        _WEATHER_CACHE,
+        key,
+        lambda: _fetch_timeline(lat, lon, start, end, today),
+        ttl=ttl,
+        cacheable=lambda timeline: bool(timeline and timeline["ok"]),
+    )
+
+
+def timeline_range(day: date, trip_start: date | None, trip_end: date | None):
+    """
+    The range to fetch for ``day``: the trip's dates (in MAX_RANGE_DAYS windows
+    for long trips), or just the day when it falls outside them.
+    """
+    if not (trip_start and trip_end and trip_start <= day <= trip_end):
+        return day, day
+    offset = (day - trip_start).days // MAX_RANGE_DAYS * MAX_RANGE_DAYS
+    start = trip_start + timedelta(days=offset)
+    return start, min(trip_end, start + timedelta(days=MAX_RANGE_DAYS - 1))
+
+
+def weather_for_day(timeline: dict | None, day: date):
+    """One day of a timeline as {field: value}, or None when it has no data."""
+    if not timeline:
+        return None
+    i = (day - date.fromisoformat(timeline["start"])).days
+    if not 0 <= i < timeline["days"]:
+        return None
+    wx = {field: timeline[field][i] for field in FIELDS}
+    return wx if any(v is not None for v in wx.values()) else None
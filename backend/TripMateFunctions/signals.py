@@ -0,0 +1,243 @@
+# backend/TripMateFunctions/signals.py
+"""
+Model signal handlers (connected in TripmatefunctionsConfig.ready).
+
+Keep these cheap: they run inside the request that saved the model.
+"""
+from django.db import models
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .authentication import invalidate_cached_user
+from .models import (
+    AppUser,
+    CommunityFAQ,
+    CommunityTripCard,
+    DestinationFAQ,
+    DestinationQA,
+    ExpenseSplit,
+    ItineraryItem,
+    ItineraryItemTag,
+    SearchDocument,
+    Trip,
+    TripCollaborator,
+    TripDay,
+    TripExpense,
+    TripPhoto,
+    UserSession,
+)
+from .services.analytics import mark_dirty_on_commit
+from .services.community_cards import is_listed, schedule_card_refresh, schedule_owner_cards_refresh
+from .services.ledger import (
+    apply_ledger_change,
+    ledger_owner_deleted,
+    ledger_owner_deleting,
+    remember_ledger_state,
+)
+from .services.presence import invalidate_trip_members
+from .services.search import index_object, remove_document, remove_object
+from .services.trip_access import invalidate_trip_access
+from .services.trip_snapshot import invalidate_trip_snapshot
+from .services.trip_sync import record_instance_change
+
+
+@receiver(post_save, sender=Trip)
+@receiver(post_delete, sender=Trip)
+def _trip_changed(sender, instance, **kwargs):
+    invalidate_trip_snapshot(instance.pk)
+    invalidate_trip_members(instance.pk)
+    invalidate_trip_access(instance.owner_id)
+
+
+@receiver(post_save, sender=TripCollaborator)
+@receiver(post_delete, sender=TripCollaborator)
+def _trip_collaborator_changed(sender, instance, **kwargs):
+    invalidate_trip_members(instance.trip_id)
+    invalidate_trip_access(instance.user_id)
+
+
+@receiver(post_save, sender=TripDay)
+@receiver(post_delete, sender=TripDay)
+@receiver(post_save, sender=ItineraryItem)
+@receiver(post_delete, sender=ItineraryItem)
+def _trip_content_changed(sender, instance, **kwargs):
+    invalidate_trip_snapshot(instance.trip_id)
+
+
+@receiver(post_save, sender=Trip)
+def _community_card_trip_saved(sender, instance, created=False, **kwargs):
+    if is_listed(instance):
+        schedule_card_refresh(instance.pk)
+    elif not created:
+        # Made private or flagged: drop it from the feed and search right away
+        CommunityTripCard.objects.filter(trip_id=instance.pk).delete()
+        remove_document(SearchDocument.Kind.TRIP, instance.pk)
+
+
+@receiver(post_delete, sender=Trip)
+def _search_trip_deleted(sender, instance, **kwargs):
+    remove_document(SearchDocument.Kind.TRIP, instance.pk)
+
+
+@receiver(post_save, sender=CommunityFAQ)
+@receiver(post_save, sender=DestinationFAQ)
+@receiver(post_save, sender=DestinationQA)
+def _search_faq_saved(sender, instance, **kwargs):
+    index_object(instance)
+
+
+@receiver(post_delete, sender=CommunityFAQ)
+@receiver(post_delete, sender=DestinationFAQ)
+@receiver(post_delete, sender=DestinationQA)
+def _search_faq_deleted(sender, instance, **kwargs):
+    remove_object(instance)
+
+
+@receiver(post_save, sender=TripDay)
+@receiver(post_delete, sender=TripDay)
+@receiver(post_save, sender=ItineraryItem)
+@receiver(post_delete, sender=ItineraryItem)
+@receiver(post_save, sender=TripPhoto)
+@receiver(post_delete, sender=TripPhoto)
+def _community_card_content_changed(sender, instance, **kwargs):
+    if sender.trip.is_cached(instance) and not is_listed(instance.trip):
+        # Private or flagged trips have no card; the trip's own save drops one
+        return
+    schedule_card_refresh(instance.trip_id)
+
+
+@receiver(post_save, sender=ItineraryItemTag)
+@receiver(post_delete, sender=ItineraryItemTag)
+def _community_card_tag_changed(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, models.Model) and not isinstance(origin, ItineraryItemTag):
+        # Cascade from an item / trip delete: that row's own signal covers the trip
+        return
+    row = (
+        ItineraryItem.objects.filter(pk=instance.item_id)
+        .values_list("trip_id", "trip__visibility", "trip__is_flagged")
+        .first()
+    )
+    if row and is_listed(Trip(visibility=row[1], is_flagged=row[2])):
+        schedule_card_refresh(row[0])
+
+
+@receiver(post_save, sender=Trip)
+@receiver(post_save, sender=TripDay)
+@receiver(post_save, sender=ItineraryItem)
+def _journal_saved(sender, instance, created=False, **kwargs):
+    if sender is Trip and created:
+        return
+    record_instance_change(instance)
+
+
+@receiver(post_delete, sender=TripDay)
+@receiver(post_delete, sender=ItineraryItem)
+def _journal_deleted(sender, instance, **kwargs):
+    record_instance_change(instance, deleted=True)
+
+
+@receiver(post_save, sender=AppUser)
+@receiver(post_delete, sender=AppUser)
+def _app_user_changed(sender, instance, **kwargs):
+    # Status / role changes must reach SupabaseJWTAuthentication immediately
+    invalidate_cached_user(instance.email)
+
+
+@receiver(post_save, sender=AppUser)
+def _community_card_owner_saved(sender, instance, created=False, update_fields=None, **kwargs):
+    if created or (update_fields is not None and "full_name" not in update_fields):
+        return
+    schedule_owner_cards_refresh(instance.pk)
+
+
+# Admin analytics rollups (services/analytics.py): mark the days a row counts towards
+ANALYTICS_TRIP_FIELDS = {"main_country", "main_city", "is_demo", "is_flagged", "moderation_status", "moderated_at"}
+# Flagged trips are bucketed by updated_at, so moving it moves the flag's day
+_ANALYTICS_TRIP_DAY_FIELDS = ANALYTICS_TRIP_FIELDS | {"updated_at"}
+
+
+def _touches_analytics(update_fields) -> bool:
+    return update_fields is None or bool(_ANALYTICS_TRIP_DAY_FIELDS & set(update_fields))
+
+
+@receiver(post_save, sender=AppUser)
+def _analytics_user_saved(sender, instance, created=False, **kwargs):
+    if created:
+        mark_dirty_on_commit(instance.created_at)
+
+
+@receiver(post_delete, sender=AppUser)
+def _analytics_user_deleted(sender, instance, **kwargs):
+    mark_dirty_on_commit(instance.created_at, instance.last_active_at)
+
+
+@receiver(pre_save, sender=Trip)
+def _analytics_trip_saving(sender, instance, update_fields=None, **kwargs):
+    if instance._state.adding or instance.pk is None or not _touches_analytics(update_fields):
+        return
+    # The days that counted this trip's moderation and flag before the save
+    before = Trip.objects.filter(pk=instance.pk).values_list("moderated_at", "updated_at", "is_flagged").first()
+    instance._analytics_days_before = (before[0], before[1] if before[2] else None) if before else ()
+
+
+@receiver(post_save, sender=Trip)
+def _analytics_trip_saved(sender, instance, created=False, update_fields=None, **kwargs):
+    if not created and not _touches_analytics(update_fields):
+        return
+    mark_dirty_on_commit(
+        instance.created_at,
+        instance.moderated_at,
+        instance.updated_at if instance.is_flagged else None,
+        *getattr(instance, "_analytics_days_before", ()),
+    )
+
+
+@receiver(post_delete, sender=Trip)
+def _analytics_trip_deleted(sender, instance, **kwargs):
+    mark_dirty_on_commit(instance.created_at, instance.moderated_at, instance.updated_at)
+
+
+@receiver(post_save, sender=UserSession)
+@receiver(post_delete, sender=UserSession)
+def _analytics_session_changed(sender, instance, **kwargs):
+    mark_dirty_on_commit(instance.session_start)
+
+
+@receiver(pre_save, sender=TripExpense)
+@receiver(pre_delete, sender=TripExpense)
+@receiver(pre_save, sender=ExpenseSplit)
+@receiver(pre_delete, sender=ExpenseSplit)
+def _ledger_row_changing(sender, instance, **kwargs):
+    remember_ledger_state(instance)
+
+
+@receiver(post_save, sender=TripExpense)
+@receiver(post_save, sender=ExpenseSplit)
+def _ledger_row_saved(sender, instance, **kwargs):
+    apply_ledger_change(instance)
+
+
+@receiver(post_delete, sender=TripExpense)
+@receiver(post_delete, sender=ExpenseSplit)
+def _ledger_row_deleted(sender, instance, **kwargs):
+    apply_ledger_change(instance, deleted=True)
+
+
+@receiver(pre_delete, sender=Trip)
+def _trip_deleting(sender, instance, **kwargs):
+    ledger_owner_deleting("trips", instance.pk)
+
+
+@receiver(post_delete, sender=Trip)
+def _trip_deleted(sender, instance, **kwargs):
+    ledger_owner_deleted("trips", instance.pk)
+
+
+@receiver(pre_delete, sender=AppUser)
+def _app_user_deleting(sender, instance, **kwargs):
+    ledger_owner_deleting("users", instance.pk)
+
+
+@receiver(post_delete, sender=AppUser)
+def _app_user_deleted(sender, instance, **kwargs):
+    ledger_owner_deleted("users", instance.pk)
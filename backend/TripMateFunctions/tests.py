@@ -1,3 +1,1644 @@
-from django.test import TestCase
+import json
+import runpy
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import jwt
+import numpy as np
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import connection
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from datetime import date, timedelta
+
+from . import authentication
+from .authentication import SupabaseJWTAuthentication
+from .models import (
+    AnalyticsActiveUser,
+    AnalyticsDay,
+    AppUser,
+    BackgroundJob,
+    CommunityFAQ,
+    CommunityTripCard,
+    Destination,
+    DestinationQA,
+    ExpenseSplit,
+    ItineraryItem,
+    ItineraryItemTag,
+    OpenTripMapPlace,
+    Profile,
+    SearchDocument,
+    Trip,
+    TripBudget,
+    TripChange,
+    TripCollaborator,
+    TripDay,
+    TripExpense,
+    TripLedgerTotal,
+    TripPhoto,
+)
+from .services import (
+    analytics,
+    geohash,
+    jobs,
+    nearby,
+    overpass,
+    presence,
+    routing,
+    search,
+    singleflight,
+    trip_access,
+    trip_snapshot,
+    weather,
+)
+from .services.opening_hours import compile_hours, open_at_many
+from .services.ai_stream import ItineraryStreamParser
+from .services.cache import CacheNamespace
+from .services.ledger import rebuild_trip_ledger, settle_up
+from .services.trip_clone import bulk_create_items
+from .services.trip_snapshot import get_trip_view_snapshot, invalidate_trip_snapshot
+from .services.trip_sync import batch_rewrite
+from .views.f1_1_views import TripViewSet
+from .views.f1_2_views import F12FullTripRouteOptimizationView
+from .views.f1_3_views import F13SoloAITripGenerateCreateView
+from .views.f1_4_views import (
+    _OTM_CACHE,
+    _OTM_DETAILS,
+    _build_replacement_options,
+    _compute_weather_context,
+    _replacement_options_many,
+)
+from .views.f2_4_views import F24CommunityFAQListView, F24CommunityTripListView
+from .views.f2_1_views import F21RealTimeCoEditingSyncView, F21TripChannelView, F21TripPresencePollView
+from .views.f2_6_views import F26ItineraryTemplateCopyView
+from .views.f3_1_views import FX_CACHE, F31TripExpenseViewSet
+from .views.f5_1_views import F51TripPhotoViewSet
+from .views.f8_views import admin_analytics
+from .views.job_views import JobStatusView
+from .views.search_views import SearchView
+
+
+class CacheNamespaceTests(TestCase):
+    """Namespaced values shared through the Django cache; clear() is a version bump."""
+
+    def setUp(self):
+        cache.clear()
+        # No L1, so every read goes to the shared backend like another worker's would
+        self.ns = CacheNamespace("test_ns", default_ttl=60, l1_size=0)
+
+    def _other_worker(self):
+        other = CacheNamespace("test_ns", default_ttl=60, l1_size=0)
+        other._version_checked_at = float("-inf")
+        return other
+
+    def test_cached_none_is_a_hit(self):
+        self.ns.set("empty", None)
+        self.assertEqual(self.ns.lookup("empty"), (True, None))
+        self.assertEqual(self.ns.lookup("missing"), (False, None))
+        self.ns.set("key with spaces / ünïcode", 1)
+        self.assertEqual(self._other_worker().get("key with spaces / ünïcode"), 1)
+
+    def test_clear_reaches_other_workers(self):
+        self.ns.set("a", 1)
+        other = self._other_worker()
+        self.assertEqual(other.get("a"), 1)
+        self.ns.clear()
+        other._version_checked_at = float("-inf")
+        self.assertIsNone(other.get("a"))
+
+    def test_cleared_entries_stay_gone_when_the_version_key_is_lost(self):
+        self.ns.set("a", 1)
+        with mock.patch.object(cache, "set", wraps=cache.set) as backend_set:
+            self.ns.clear()
+        self.assertIsNone(backend_set.call_args.args[2])  # stored without a timeout
+
+        # The version key expires or is culled: entries from before clear() must not come back
+        cache.delete(self.ns._version_key())
+        self.assertIsNone(self._other_worker().get("a"))
+        self.ns._version_checked_at = float("-inf")
+        self.assertIsNone(self.ns.get("a"))
+
+
+class SingleFlightTests(TestCase):
+    """One caller computes a missing value; the others, in this worker or another, wait for it."""
+
+    def setUp(self):
+        cache.clear()
+        self.ns = CacheNamespace("test_sf", default_ttl=60, l1_size=0)
+
+    def test_concurrent_callers_share_one_call(self):
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return {"value": 42}
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(singleflight.single_flight(self.ns, "k", fetch)))
+            for _ in range(5)
+        ]
+        threads[0].start()
+        started.wait(5)
+        for t in threads[1:]:
+            t.start()
+        time.sleep(0.1)
+        release.set()
+        for t in threads:
+            t.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{"value": 42}] * 5)
+        self.assertEqual(self.ns.get("k"), {"value": 42})
+
+    def test_failures_are_shared_but_not_cached(self):
+        fetch = mock.Mock(return_value=None)
+        self.assertIsNone(singleflight.single_flight(self.ns, "k", fetch))
+        self.assertIsNone(singleflight.single_flight(self.ns, "k", fetch))
+        self.assertEqual(fetch.call_count, 2)
+
+    def test_waits_for_another_workers_lead(self):
+        lock_key = f"tm:sf:{self.ns.namespace}:k"
+        self.assertTrue(singleflight._acquire_lock(self.ns, lock_key, "other-worker", 10))
+
+        def other_worker():
+            time.sleep(0.3)
+            self.ns.set("k", "theirs")
+            singleflight._release_lock(self.ns, lock_key, "other-worker")
+
+        worker = threading.Thread(target=other_worker)
+        worker.start()
+        fetch = mock.Mock(return_value="ours")
+        self.assertEqual(singleflight.single_flight(self.ns, "k", fetch, wait_timeout=5), "theirs")
+        worker.join(5)
+        fetch.assert_not_called()
+
+    def test_file_cache_lock_is_exclusive(self):
+        with tempfile.TemporaryDirectory() as cache_dir, override_settings(
+            CACHES={
+                "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+                "files": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": cache_dir},
+            }
+        ):
+            ns = CacheNamespace("test_sf", l1_size=0, alias="files")
+            with mock.patch.object(caches["files"], "add") as backend_add:
+                self.assertTrue(singleflight._acquire_lock(ns, "lock", "a", 10))
+                self.assertFalse(singleflight._acquire_lock(ns, "lock", "b", 10))
+            backend_add.assert_not_called()  # FileBasedCache.add is not atomic
+            self.assertTrue(singleflight._lock_held(ns, "lock"))
+
+            singleflight._release_lock(ns, "lock", "b")  # not the holder
+            self.assertTrue(singleflight._lock_held(ns, "lock"))
+            singleflight._release_lock(ns, "lock", "a")
+            self.assertFalse(singleflight._lock_held(ns, "lock"))
+
+            # A lock whose leader died is broken once it expires
+            self.assertTrue(singleflight._acquire_lock(ns, "lock", "c", -1))
+            self.assertFalse(singleflight._lock_held(ns, "lock"))
+            self.assertTrue(singleflight._acquire_lock(ns, "lock", "d", 10))
+
+
+class TripListQueryCountTests(TestCase):
+    """The dashboard trip list must not issue queries per trip / collaborator."""
+
+    def setUp(self):
+        self.user = AppUser.objects.create(email="owner@example.com", full_name="Olive Owner")
+        # SupabaseJWTAuthentication sets this on the AppUser it returns
+        self.user.is_authenticated = True
+        self.factory = APIRequestFactory()
+
+    def _make_trip(self, n: int):
+        trip = Trip.objects.create(owner=self.user, title=f"Trip {n}", main_city="Tokyo", travel_type="solo_ai")
+        TripCollaborator.objects.create(
+            trip=trip, user=self.user, role=TripCollaborator.Role.OWNER, status=TripCollaborator.Status.ACTIVE
+        )
+        friend = AppUser.objects.create(email=f"friend{n}@example.com", full_name=f"Friend {n}")
+        TripCollaborator.objects.create(trip=trip, user=friend, status=TripCollaborator.Status.ACTIVE)
+        TripCollaborator.objects.create(trip=trip, invited_email=f"pending{n}@example.com")
+        TripBudget.objects.create(trip=trip, currency="JPY", planned_total=Decimal("1000.00"))
+
+        for city in ("Tokyo", "Kyoto"):
+            day = TripDay.objects.create(trip=trip, day_index=1 if city == "Tokyo" else 2)
+            dest = Destination.objects.create(name=f"{city} spot {n}", city=city)
+            ItineraryItem.objects.create(trip=trip, day=day, destination=dest, title=f"{city} stop")
+        return trip
+
+    def _list(self):
+        request = self.factory.get("/api/f1/trips/")
+        force_authenticate(request, user=self.user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = TripViewSet.as_view({"get": "list"})(request)
+            response.render()
+        return response, len(ctx.captured_queries)
+
+    def test_query_count_does_not_grow_with_trips(self):
+        self._make_trip(1)
+        _, few = self._list()
+
+        for n in range(2, 8):
+            self._make_trip(n)
+        response, many = self._list()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 7)
+        self.assertEqual(few, many)
+        self.assertLessEqual(many, 4)
+
+    def test_overview_fields(self):
+        self._make_trip(1)
+        response, _ = self._list()
+        trip = response.data[0]
+
+        self.assertEqual(trip["location_label"], "Tokyo - Kyoto")
+        self.assertEqual(trip["duration_label"], "2 days · 1 nights")
+        self.assertEqual(trip["currency_code"], "JPY")
+        self.assertEqual(trip["planned_total"], "1000.00")
+        emails = [c["email"] for c in trip["collaborators"]]
+        self.assertEqual(emails[0], "owner@example.com")
+        self.assertIn("friend1@example.com", emails)
+        self.assertIn("pending1@example.com", emails)
+        self.assertTrue(trip["collaborators"][0]["is_current_user"])
+
+
+class RoutingEngineTests(TestCase):
+    """One matrix per set of stops, reused in any order; 2-opt / Or-opt only ever shorten a path."""
+
+    # Stops along one street, listed out of order
+    LINE = [(1.3000, 103.8000), (1.3000, 103.8300), (1.3000, 103.8100), (1.3000, 103.8400), (1.3000, 103.8200)]
+
+    def setUp(self):
+        routing._MATRIX_CACHE.clear()
+
+    def _line_cost(self, order_on_line):
+        positions = np.asarray(order_on_line, dtype=float)
+        return np.abs(positions[None, :] - positions[:, None])
+
+    def _ors_response(self, json_data):
+        return mock.Mock(status_code=200, json=mock.Mock(return_value=json_data))
+
+    def test_haversine_matrix(self):
+        km = routing.haversine_matrix([(1.3521, 103.8198), (3.1390, 101.6869)])  # Singapore, Kuala Lumpur
+        self.assertAlmostEqual(km[0, 1], 309, delta=5)
+        self.assertEqual(km[0, 1], km[1, 0])
+        self.assertEqual(km[0, 0], 0)
+
+    def test_matrix_is_fetched_once_for_any_order_of_the_stops(self):
+        def ors(url, json=None, **kwargs):
+            # ORS answers in the order it was asked; make every pair distinguishable
+            n = len(json["locations"])
+            km = [[10 * i + j for j in range(n)] for i in range(n)]
+            return self._ors_response({"distances": km, "durations": [[60 * d for d in row] for row in km]})
+
+        with override_settings(OPENROUTESERVICE_API_KEY="k"), \
+                mock.patch("TripMateFunctions.services.routing.requests.post", side_effect=ors) as post:
+            first = routing.get_travel_matrix(self.LINE[:3], "foot-walking")
+            again = routing.get_travel_matrix(self.LINE[:3][::-1], "foot-walking")
+
+        post.assert_called_once()
+        self.assertEqual(first.source, "ors")
+        np.testing.assert_array_equal(again.distance_km, first.distance_km[::-1, ::-1])
+        self.assertEqual(first.leg(0, 1), (first.distance_km[0, 1], first.duration_min[0, 1]))
+        self.assertEqual(first.duration_min[0, 1], first.distance_km[0, 1])  # seconds -> minutes
+
+    def test_unroutable_pairs_and_outages_fall_back_to_haversine(self):
+        points = self.LINE[:2]
+        with override_settings(OPENROUTESERVICE_API_KEY="k"), mock.patch(
+            "TripMateFunctions.services.routing.requests.post",
+            return_value=self._ors_response({"distances": [[0, None], [2.5, 0]], "durations": [[0, None], [300, 0]]}),
+        ):
+            patched = routing.get_travel_matrix(points, "driving-car")
+        estimate = routing.haversine_matrix(points)[0, 1]
+        self.assertAlmostEqual(patched.distance_km[0, 1], estimate)
+        self.assertAlmostEqual(patched.duration_min[0, 1], estimate / 30.0 * 60)
+        self.assertEqual(patched.distance_km[1, 0], 2.5)
+
+        routing._MATRIX_CACHE.clear()
+        with override_settings(OPENROUTESERVICE_API_KEY="k"), mock.patch(
+            "TripMateFunctions.services.routing.requests.post", side_effect=ConnectionError("down")
+        ):
+            self.assertEqual(routing.get_travel_matrix(points, "foot-walking").source, "haversine")
+
+    def test_two_opt_uncrosses_a_path(self):
+        cost = self._line_cost([0, 1, 2, 3, 4])
+        order = np.array([0, 3, 2, 1, 4])
+        self.assertTrue(routing._two_opt_pass(cost, order, deadline=float("inf")))
+        self.assertEqual(order.tolist(), [0, 1, 2, 3, 4])
+
+    def test_or_opt_moves_a_stop_to_its_best_slot(self):
+        cost = self._line_cost([0, 1, 2, 3, 4])
+        order, moved = routing._or_opt_pass(cost, np.array([0, 2, 3, 4, 1]), deadline=float("inf"))
+        self.assertTrue(moved)
+        self.assertEqual(order.tolist(), [0, 1, 2, 3, 4])
+        _, moved = routing._or_opt_pass(cost, order, deadline=float("inf"))
+        self.assertFalse(moved)
+
+    def test_optimised_order_on_asymmetric_costs(self):
+        rng = np.random.default_rng(5)
+        for _ in range(20):
+            cost = rng.uniform(1, 100, size=(9, 9))
+            np.fill_diagonal(cost, 0)
+            greedy = np.array(routing.nearest_neighbour_order(cost, start=2))
+            order = routing.optimise_order(cost, start=2, time_budget_ms=1000)
+
+            self.assertEqual(order[0], 2)
+            self.assertEqual(sorted(order), list(range(9)))
+            self.assertLessEqual(routing._path_cost(cost, np.array(order)), routing._path_cost(cost, greedy) + 1e-9)
+
+        # Along a street the best open path is simply the street order
+        xs = [lon for _, lon in self.LINE]
+        order = routing.optimise_order(routing.haversine_matrix(self.LINE), start=0)
+        self.assertEqual([xs[i] for i in order], sorted(xs))
+
+
+class DayClusteringTests(TestCase):
+    """Stops split into compact days of exactly the requested sizes."""
+
+    # Two neighbourhoods about 10 km apart, four stops each
+    WEST = [(1.30, 103.80), (1.301, 103.801), (1.302, 103.800), (1.300, 103.802)]
+    EAST = [(1.30, 103.89), (1.301, 103.891), (1.302, 103.890), (1.300, 103.892)]
+
+    def test_neighbourhoods_become_days(self):
+        labels = routing.balanced_clusters(self.WEST + self.EAST, [4, 4])
+        self.assertEqual(len(set(labels[:4])), 1)
+        self.assertEqual(len(set(labels[4:])), 1)
+        self.assertNotEqual(labels[0], labels[4])
+
+    def test_day_sizes_are_exact(self):
+        labels = routing.balanced_clusters(self.WEST + self.EAST, [5, 3])
+        self.assertEqual(np.bincount(labels, minlength=2).tolist(), [5, 3])
+        # The larger day tops up with one eastern stop; no western stop leaves it
+        self.assertEqual(set(labels[:4].tolist()), {0})
+        self.assertEqual(sorted(labels[4:].tolist()), [0, 1, 1, 1])
+
+        labels = routing.balanced_clusters(self.WEST + self.EAST, [2, 0, 6])
+        self.assertEqual(np.bincount(labels, minlength=3).tolist(), [2, 0, 6])
+
+        with self.assertRaises(ValueError):
+            routing.balanced_clusters(self.WEST, [2, 3])
+        self.assertEqual(routing.balanced_clusters([], []).tolist(), [])
+
+    def test_current_days_keep_their_numbers(self):
+        current = [1, 1, 1, 0, 0, 0, 0, 1]  # mostly west = day 1, east = day 0
+        labels = routing.balanced_clusters(self.WEST + self.EAST, [4, 4], init_labels=current)
+        self.assertEqual(labels.tolist(), [1, 1, 1, 1, 0, 0, 0, 0])
+
+    def test_long_trip_is_routed_with_one_matrix_per_day(self):
+        # 60 stops in three neighbourhoods, every day visiting all three
+        owner = AppUser.objects.create(email="owner@example.com")
+        owner.is_authenticated = True
+        trip = Trip.objects.create(owner=owner, title="Long trip")
+        days = [TripDay.objects.create(trip=trip, day_index=i + 1) for i in range(3)]
+        for i in range(60):
+            area, n = i % 3, i // 3
+            ItineraryItem.objects.create(
+                trip=trip, day=days[(area + n) % 3], title=f"Stop {i}", sort_order=n + 1,
+                lat=1.30 + 0.001 * n, lon=103.80 + 0.09 * area + 0.0005 * (n % 2),
+            )
+
+        def ors(url, json=None, **kwargs):
+            points = [(lat, lon) for lon, lat in json["locations"]]
+            km = routing.haversine_matrix(points)
+            return mock.Mock(status_code=200, json=mock.Mock(return_value={
+                "distances": km.tolist(), "durations": (km * 120).tolist(),
+            }))
+
+        routing._MATRIX_CACHE.clear()
+        request = APIRequestFactory().post("/api/f1/route-optimize-full/", {"trip_id": trip.id}, format="json")
+        force_authenticate(request, user=owner)
+        with override_settings(OPENROUTESERVICE_API_KEY="k"), \
+                mock.patch("TripMateFunctions.services.routing.requests.post", side_effect=ors) as post:
+            response = F12FullTripRouteOptimizationView.as_view()(request)
+
+        self.assertEqual(response.status_code, 200)
+        # Three current days for the baseline and three new ones, each well under the ORS limit
+        self.assertEqual([len(c.kwargs["json"]["locations"]) for c in post.call_args_list], [20] * 6)
+        for day in days:
+            lons = {round(float(lon), 1) for lon in day.items.values_list("lon", flat=True)}
+            self.assertEqual(len(lons), 1)
+        self.assertGreater(response.data["time_saved_min"], 0)
+
+
+class TripSnapshotTests(TestCase):
+    """The view-only snapshot is built once per trip revision; every edit moves the revision."""
+
+    def setUp(self):
+        owner = AppUser.objects.create(email="snap@example.com", full_name="Snap Owner")
+        self.trip = Trip.objects.create(owner=owner, title="Hanoi")
+        day = TripDay.objects.create(trip=self.trip, day_index=1)
+        ItineraryItem.objects.create(trip=self.trip, day=day, title="Old Quarter", sort_order=1)
+
+    def _title(self):
+        return json.loads(get_trip_view_snapshot(self.trip.id)["json"])["title"]
+
+    def test_snapshot_is_cached_until_the_trip_changes(self):
+        first = get_trip_view_snapshot(self.trip.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_trip_view_snapshot(self.trip.id), first)
+
+        ItineraryItem.objects.filter(trip=self.trip).update(title="Hoan Kiem Lake")  # no signals
+        invalidate_trip_snapshot(self.trip.id)
+        changed = get_trip_view_snapshot(self.trip.id)
+        self.assertNotEqual(changed["etag"], first["etag"])
+        self.assertIn("Hoan Kiem Lake", changed["json"])
+        self.assertIsNone(get_trip_view_snapshot(0))
+
+    def test_lost_revision_never_serves_an_old_snapshot(self):
+        # The revision key is culled or expires, before and after an edit
+        trip_snapshot._REVISIONS.delete(str(self.trip.id))
+        self.assertEqual(self._title(), "Hanoi")
+        self.trip.title = "Ha Long"
+        self.trip.save()
+        trip_snapshot._REVISIONS.delete(str(self.trip.id))
+        self.assertEqual(self._title(), "Ha Long")
+
+
+@override_settings(SUPABASE_JWT_SECRET="test-secret-0123456789abcdef0123456789")
+class SupabaseAuthCacheTests(TestCase):
+    """Warm presence polls must authenticate without touching the database."""
+
+    def setUp(self):
+        authentication._USER_CACHE.clear()
+        authentication._CLAIMS_CACHE.clear()
+        self.user = AppUser.objects.create(email="poller@example.com", full_name="Paula Poller")
+        token = jwt.encode(
+            {"sub": "abc", "email": self.user.email, "exp": int(time.time()) + 600},
+            "test-secret-0123456789abcdef0123456789",
+            algorithm="HS256",
+        )
+        self.factory = APIRequestFactory()
+        self.headers = {"HTTP_AUTHORIZATION": f"Bearer {token}"}
+
+    def _authenticate(self):
+        request = self.factory.get("/api/f2/trips/1/presence/", **self.headers)
+        user, _ = SupabaseJWTAuthentication().authenticate(request)
+        return user
+
+    def test_warm_polls_issue_no_queries(self):
+        self._authenticate()
+        with self.assertNumQueries(0):
+            for _ in range(20):
+                user = self._authenticate()
+        self.assertEqual(user.id, self.user.id)
+        self.assertTrue(user.is_authenticated)
+
+    def test_status_and_role_changes_invalidate(self):
+        self.assertEqual(self._authenticate().status, AppUser.Status.PENDING)
+
+        self.user.status = AppUser.Status.SUSPENDED
+        self.user.role = AppUser.Role.ADMIN
+        self.user.save()
+
+        with self.assertNumQueries(1):
+            user = self._authenticate()
+        self.assertEqual(user.status, AppUser.Status.SUSPENDED)
+        self.assertEqual(user.role, AppUser.Role.ADMIN)
+
+
+class ExpenseLedgerTests(TestCase):
+    """Running totals stay equal to a full recompute; balances match the budget page."""
+
+    def setUp(self):
+        self.alice = AppUser.objects.create(email="alice@example.com", full_name="Alice")
+        self.bob = AppUser.objects.create(email="bob@example.com", full_name="Bob")
+        self.cara = AppUser.objects.create(email="cara@example.com", full_name="Cara")
+        self.alice.is_authenticated = True
+        self.trip = Trip.objects.create(owner=self.alice, title="Bali")
+        for user in (self.bob, self.cara):
+            TripCollaborator.objects.create(trip=self.trip, user=user, status=TripCollaborator.Status.ACTIVE)
+        TripBudget.objects.create(trip=self.trip, currency="SGD")
+        FX_CACHE.set("latest", {"sgd_per_unit": {"SGD": 1.0, "USD": 1.35}, "as_of": "2026Sep", "source": "test"})
+
+    def _expense(self, payer, amount, currency="SGD", splits=None):
+        expense = TripExpense.objects.create(
+            trip=self.trip, payer=payer, description="x", amount=Decimal(amount), currency=currency
+        )
+        for user, share in (splits or {}).items():
+            ExpenseSplit.objects.create(expense=expense, user=user, amount=Decimal(share))
+        return expense
+
+    def _totals(self):
+        return sorted(
+            (str(r.user_id), r.currency, r.paid, r.owed)
+            for r in TripLedgerTotal.objects.filter(trip=self.trip)
+            if r.paid or r.owed
+        )
+
+    def _ledger(self, user=None):
+        request = APIRequestFactory().get("/api/f3/expenses/ledger/", {"trip": self.trip.id})
+        if user is not None:
+            force_authenticate(request, user=user)
+        # As the router builds it, with the action's own permission classes
+        return F31TripExpenseViewSet.as_view({"get": "ledger"}, **F31TripExpenseViewSet.ledger.kwargs)(request)
+
+    def test_incremental_totals_match_rebuild(self):
+        dinner = self._expense(self.alice, "90.00", splits={self.alice: "30", self.bob: "30", self.cara: "30"})
+        taxi = self._expense(self.bob, "20.00", splits={self.alice: "10", self.bob: "10"})
+        self._expense(self.cara, "15.00")
+
+        dinner.amount = Decimal("120.00")
+        dinner.currency = "USD"
+        dinner.save()
+        split = ExpenseSplit.objects.get(expense=dinner, user=self.cara)
+        split.amount = Decimal("60")
+        split.save()
+        taxi.delete()
+
+        incremental = self._totals()
+        rebuild_trip_ledger(self.trip.id)
+        self.assertEqual(incremental, self._totals())
+
+    def test_ledger_balances_and_transfers(self):
+        self._expense(self.alice, "90.00", splits={self.alice: "30", self.bob: "30", self.cara: "30"})
+        self._expense(self.cara, "30.00")  # no splits: shared by all three
+
+        trip_access.trip_roles(self.alice)  # memberships are cached per user
+        with self.assertNumQueries(4):
+            response = self._ledger(self.alice)
+        self.assertEqual(response.status_code, 200)
+
+        net = {m["email"]: m["net"] for m in response.data["members"]}
+        self.assertEqual(net, {"alice@example.com": "50.00", "bob@example.com": "-40.00", "cara@example.com": "-10.00"})
+        self.assertEqual(response.data["total_spent"], "120.00")
+        transfers = {(t["from"], t["to"], t["amount"]) for t in response.data["transfers"]}
+        self.assertEqual(transfers, {
+            (str(self.bob.id), str(self.alice.id), "40.00"),
+            (str(self.cara.id), str(self.alice.id), "10.00"),
+        })
+
+    def test_ledger_is_members_only(self):
+        self._expense(self.alice, "90.00", splits={self.bob: "90"})
+        stranger = AppUser.objects.create(email="eve@example.com", full_name="Eve")
+        stranger.is_authenticated = True
+
+        self.assertEqual(self._ledger(stranger).status_code, 404)
+        self.assertIn(self._ledger().status_code, (401, 403))
+        self.bob.is_authenticated = True
+        self.assertEqual(self._ledger(self.bob).status_code, 200)
+
+    def test_settle_up_uses_at_most_n_minus_one_transfers(self):
+        net = {"a": 700, "b": -300, "c": -200, "d": 100, "e": -300}
+        transfers = settle_up(net)
+        self.assertLessEqual(len(transfers), len(net) - 1)
+        for debtor, creditor, cents in transfers:
+            net[debtor] += cents
+            net[creditor] -= cents
+        self.assertTrue(all(v == 0 for v in net.values()))
+
+    def test_deleting_trip_drops_ledger(self):
+        self._expense(self.alice, "10.00", splits={self.bob: "10"})
+        self.trip.delete()
+        self.assertFalse(TripLedgerTotal.objects.exists())
+
+
+class TemplateCopyTests(TestCase):
+    """Copying a public trip costs the same number of statements for any size."""
+
+    def setUp(self):
+        self.author = AppUser.objects.create(email="author@example.com")
+        self.user = AppUser.objects.create(email="copier@example.com")
+        self.user.is_authenticated = True
+
+    def _public_trip(self, n_days: int):
+        trip = Trip.objects.create(owner=self.author, title="Kyoto", visibility="public")
+        TripBudget.objects.create(trip=trip, currency="JPY", planned_total=Decimal("50000.00"))
+        for d in range(1, n_days + 1):
+            day = TripDay.objects.create(trip=trip, day_index=d, note=f"day {d}")
+            for k in range(3):
+                item = ItineraryItem.objects.create(
+                    trip=trip, day=day, title=f"{d}-{k}", sort_order=k, cost_amount=Decimal("10.00")
+                )
+                ItineraryItemTag.objects.create(item=item, tag="temple")
+        return trip
+
+    def _copy(self, trip):
+        request = APIRequestFactory().post(
+            "/api/f2/templates/copy/",
+            {"public_trip_id": trip.id, "copy_tags": True, "copy_budget": True},
+            format="json",
+        )
+        force_authenticate(request, user=self.user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = F26ItineraryTemplateCopyView.as_view()(request)
+        return response, len(ctx.captured_queries)
+
+    def test_copy_is_bulk_and_complete(self):
+        _, small = self._copy(self._public_trip(1))
+        response, large = self._copy(self._public_trip(6))
+        self.assertEqual(small, large)
+
+        new_trip = Trip.objects.get(id=response.data["new_trip_id"])
+        self.assertEqual(new_trip.owner, self.user)
+        self.assertEqual(new_trip.visibility, "private")
+        self.assertEqual(new_trip.days.count(), 6)
+        items = list(new_trip.items.select_related("day"))
+        self.assertEqual(len(items), 18)
+        self.assertTrue(all(item.day.trip_id == new_trip.id and item.cost_amount is None for item in items))
+        self.assertEqual(ItineraryItemTag.objects.filter(item__trip=new_trip).count(), 18)
+        self.assertEqual(new_trip.budget.planned_total, Decimal("50000.00"))
+
+
+@override_settings(JOBS_RUN_IN_PROCESS=False)
+class BackgroundJobTests(TestCase):
+    """Queued jobs dedupe, retry with backoff, run their failure hook and can be polled."""
+
+    def setUp(self):
+        self.user = AppUser.objects.create(email="owner@example.com")
+        self.user.is_authenticated = True
+        self.trip = Trip.objects.create(owner=self.user, title="Seoul", travel_type="group_generating")
+
+    def _make_due(self, job):
+        BackgroundJob.objects.filter(pk=job.pk).update(run_after=timezone.now())
+
+    def test_enqueue_dedupes_active_jobs(self):
+        email = {"to": "a@example.com", "subject": "Join my trip", "body": "..."}
+        first, created = jobs.enqueue("email", email, dedupe_key="invite:1")
+        again, created_again = jobs.enqueue("email", email, dedupe_key="invite:1")
+        self.assertTrue(created)
+        self.assertFalse(created_again)
+        self.assertEqual(first.id, again.id)
+
+        with mock.patch("TripMateFunctions.services.mailer.send_email_now") as send:
+            self.assertEqual(jobs.run_pending_jobs(), 1)
+        send.assert_called_once()
+
+        first.refresh_from_db()
+        self.assertEqual(first.status, BackgroundJob.Status.SUCCEEDED)
+        self.assertEqual(first.result, {"to": "a@example.com"})
+        self.assertIsNone(first.active_key)
+
+        # Finished jobs no longer block a new one for the same key
+        _, created = jobs.enqueue("email", email, dedupe_key="invite:1")
+        self.assertTrue(created)
+
+    def test_retries_then_runs_failure_hook(self):
+        job, _ = jobs.enqueue("group_itinerary", {"trip_id": self.trip.id}, trip=self.trip)
+        failing = mock.Mock(side_effect=jobs.JobError("AI service unavailable"))
+
+        with mock.patch("TripMateFunctions.views.f2_2_views._generate_group_itinerary", failing):
+            self.assertEqual(jobs.run_pending_jobs(), 1)
+            job.refresh_from_db()
+            self.assertEqual(job.status, BackgroundJob.Status.QUEUED)
+            self.assertGreater(job.run_after, timezone.now())
+            # Backing off: nothing is due yet
+            self.assertEqual(jobs.run_pending_jobs(), 0)
+
+            for _ in range(job.max_attempts - 1):
+                self._make_due(job)
+                jobs.run_pending_jobs()
+
+        job.refresh_from_db()
+        self.assertEqual(failing.call_count, 3)
+        self.assertEqual(job.status, BackgroundJob.Status.FAILED)
+        self.assertEqual(job.error, "AI service unavailable")
+        self.trip.refresh_from_db()
+        self.assertEqual(self.trip.travel_type, "draft")
+
+    def test_web_workers_start_their_pool_at_boot(self):
+        conf = runpy.run_path(str(settings.BASE_DIR / "gunicorn.conf.py"))
+        with mock.patch.object(jobs, "_pool", None), \
+                mock.patch.object(jobs.JobWorkerPool, "start", autospec=True, side_effect=lambda pool: pool) as start:
+            conf["post_worker_init"](mock.Mock())
+            start.assert_not_called()  # JOBS_RUN_IN_PROCESS is off here
+
+            with override_settings(JOBS_RUN_IN_PROCESS=True):
+                conf["post_worker_init"](mock.Mock())
+                jobs._wake_in_process_pool()
+        start.assert_called_once()
+
+    def test_status_endpoint_is_limited_to_trip_members(self):
+        job, _ = jobs.enqueue("group_itinerary", {"trip_id": self.trip.id}, trip=self.trip, user=self.user)
+        jobs.report_progress(job, 30, "Generating itinerary")
+        stranger = AppUser.objects.create(email="stranger@example.com")
+        stranger.is_authenticated = True
+
+        def get(user):
+            request = APIRequestFactory().get(f"/api/jobs/{job.id}/")
+            force_authenticate(request, user=user)
+            return JobStatusView.as_view()(request, job_id=job.id)
+
+        self.assertEqual(get(stranger).status_code, 404)
+        response = get(self.user)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["status"], "queued")
+        self.assertEqual(response.data["progress"], 30)
+        self.assertEqual(response.data["trip"], self.trip.id)
+
+
+class AIStreamTests(TestCase):
+    """Itinerary stops are emitted as soon as they are complete, whatever the chunking."""
+
+    ITINERARY = (
+        '```json\n{"title": "Bali {Escape}", "main_city": "Ubud", "days": 2, "stops": ['
+        '{"day_index": 1, "title": "Ubud Palace", "description": "Say \\"hi\\" [ok]", "lat": -8.5, "lon": 115.26},'
+        '{"day_index": 2, "title": "Tanah Lot Temple", "lat": -8.62, "lon": 115.09}'
+        "]}\n```"
+    )
+
+    def test_parser_emits_each_stop_once_for_any_chunking(self):
+        for size in (1, 7, len(self.ITINERARY)):
+            parser = ItineraryStreamParser()
+            emitted = []
+            for i in range(0, len(self.ITINERARY), size):
+                emitted.extend(parser.feed(self.ITINERARY[i : i + size]))
+            self.assertEqual([s["title"] for s in emitted], ["Ubud Palace", "Tanah Lot Temple"])
+            self.assertEqual(emitted[0]["description"], 'Say "hi" [ok]')
+            self.assertEqual(parser.fields, {"title": "Bali {Escape}", "main_city": "Ubud"})
+
+    def test_truncated_output_keeps_complete_stops(self):
+        parser = ItineraryStreamParser()
+        parser.feed(self.ITINERARY[: self.ITINERARY.index('"Tanah Lot') + 5])
+        self.assertEqual(parser.salvage()["stops"][0]["title"], "Ubud Palace")
+        self.assertEqual(len(parser.salvage()["stops"]), 1)
+
+    def test_solo_trip_answers_with_the_job_at_once(self):
+        user = AppUser.objects.create(email="solo-job@example.com")
+        user.is_authenticated = True
+        request = APIRequestFactory().post(
+            "/api/f1/ai-solo-trip/",
+            {"duration_days": 2, "activities": ["temples", "food"], "destination_types": ["culture", "nature"]},
+            format="json",
+        )
+        force_authenticate(request, user=user)
+
+        with mock.patch("TripMateFunctions.views.f1_3_views._stream_with_fallback") as generate:
+            response = F13SoloAITripGenerateCreateView.as_view()(request)
+
+        self.assertEqual(response.status_code, 202)
+        job = BackgroundJob.objects.get(pk=response.data["job_id"])
+        self.assertEqual((job.kind, job.status), ("solo_itinerary", BackgroundJob.Status.QUEUED))
+        generate.assert_not_called()
+
+    def test_solo_trip_streams_stops_then_saves(self):
+        user = AppUser.objects.create(email="solo@example.com")
+        user.is_authenticated = True
+        chunks = [self.ITINERARY[i : i + 16] for i in range(0, len(self.ITINERARY), 16)]
+        request = APIRequestFactory().post(
+            "/api/f1/ai-solo-trip/?stream=1",
+            {
+                "duration_days": 2,
+                "activities": ["temples", "food"],
+                "destination_types": ["culture", "nature"],
+            },
+            format="json",
+        )
+        force_authenticate(request, user=user)
+
+        with mock.patch("TripMateFunctions.views.f1_3_views._stream_with_fallback", return_value=iter(chunks)):
+            response = F13SoloAITripGenerateCreateView.as_view()(request)
+            self.assertEqual(response["Content-Type"], "text/event-stream")
+            body = b"".join(response.streaming_content).decode()
+
+        events = [block.split("\n")[0][len("event: "):] for block in body.strip().split("\n\n")]
+        self.assertEqual(events, ["start", "meta", "meta", "stop", "stop", "done"])
+        trip = Trip.objects.get(owner=user)
+        self.assertIn(f'"trip_id": {trip.id}', body)
+        self.assertEqual(trip.title, "Bali {Escape}")
+        self.assertEqual(list(trip.items.order_by("sort_order").values_list("title", flat=True)),
+                         ["Ubud Palace", "Tanah Lot Temple"])
+
+
+class CoEditingSyncTests(TestCase):
+    """Polls return only the journal entries after the client's revision."""
+
+    def setUp(self):
+        self.owner = AppUser.objects.create(email="sync-owner@example.com")
+        self.owner.is_authenticated = True
+        self.trip = Trip.objects.create(owner=self.owner, title="Lisbon")
+        self.day = TripDay.objects.create(trip=self.trip, day_index=1)
+
+    def _poll(self, revision=None, trip=None):
+        body = {"trip_id": (trip or self.trip).id}
+        if revision is not None:
+            body["revision"] = revision
+        request = APIRequestFactory().post("/api/f2/sync/", body, format="json")
+        force_authenticate(request, user=self.owner)
+        with CaptureQueriesContext(connection) as ctx:
+            response = F21RealTimeCoEditingSyncView.as_view()(request)
+        return response, len(ctx.captured_queries)
+
+    def test_first_poll_resets_then_deltas_then_nothing(self):
+        response, _ = self._poll()
+        self.assertTrue(response.data["reset"])
+        self.assertEqual(len(response.data["trip"]["days"]), 1)
+        revision = response.data["revision"]
+
+        item = ItineraryItem.objects.create(trip=self.trip, day=self.day, title="Belem Tower")
+        item.title = "Belém Tower"
+        item.save()
+        self.day.delete()
+
+        response, _ = self._poll(revision)
+        self.assertEqual(response.status_code, 200)
+        changes = response.data["changes"]
+        # Two writes to the item collapse into its latest state
+        self.assertEqual([(c["entity"], c["op"]) for c in changes], [("item", "upsert"), ("day", "delete")])
+        self.assertEqual(changes[0]["data"]["title"], "Belém Tower")
+
+        response, _ = self._poll(response.data["revision"])
+        self.assertEqual(response.status_code, 204)
+
+    def test_poll_cost_does_not_grow_with_trip_size(self):
+        big = Trip.objects.create(owner=self.owner, title="Big")
+        day = TripDay.objects.create(trip=big, day_index=1)
+        for i in range(40):
+            ItineraryItem.objects.create(trip=big, day=day, title=f"Stop {i}")
+        small_rev = self._poll()[0].data["revision"]
+        big_rev = self._poll(trip=big)[0].data["revision"]
+
+        ItineraryItem.objects.create(trip=self.trip, day=self.day, title="New")
+        ItineraryItem.objects.create(trip=big, day=day, title="New")
+        _, small_queries = self._poll(small_rev)
+        _, big_queries = self._poll(big_rev, trip=big)
+        self.assertEqual(small_queries, big_queries)
+
+    def test_batch_rewrite_records_one_reset(self):
+        revision = self._poll()[0].data["revision"]
+        with batch_rewrite(self.trip.id):
+            ItineraryItem.objects.create(trip=self.trip, day=self.day, title="A")
+            ItineraryItem.objects.create(trip=self.trip, day=self.day, title="B")
+        self.trip.refresh_from_db()
+        self.assertEqual(self.trip.sync_revision, revision + 1)
+        response, _ = self._poll(revision)
+        self.assertTrue(response.data["reset"])
+        self.assertEqual(len(response.data["trip"]["items"]), 2)
+
+    def test_saving_a_stale_trip_keeps_the_revision(self):
+        ItineraryItem.objects.create(trip=self.trip, day=self.day, title="A")
+        self.trip.title = "Lisboa"  # instance still holds sync_revision from setUp
+        self.trip.save()
+        self.trip.save()
+        changes = TripChange.objects.filter(trip=self.trip).order_by("revision")
+        self.assertEqual(list(changes.values_list("revision", flat=True)), [1, 2, 3, 4])
+        self.assertEqual(changes.last().data["title"], "Lisboa")
+
+    def test_deleting_a_trip_does_not_journal_its_rows(self):
+        ItineraryItem.objects.create(trip=self.trip, day=self.day, title="A")
+        self.trip.delete()
+        self.assertFalse(Trip.objects.filter(title="Lisbon").exists())
+
+
+class PresenceChannelTests(TestCase):
+    """Presence lives in the cache; the channel wakes up on new revisions."""
+
+    def setUp(self):
+        cache.clear()
+        presence._online_memo.clear()
+        presence._revision_memo.clear()
+        presence.flush_active()
+        self.owner = AppUser.objects.create(email="presence-owner@example.com")
+        self.owner.is_authenticated = True
+        self.friend = AppUser.objects.create(email="presence-friend@example.com")
+        self.friend.is_authenticated = True
+        self.trip = Trip.objects.create(owner=self.owner, title="Kyoto")
+        TripCollaborator.objects.create(trip=self.trip, user=self.friend, status=TripCollaborator.Status.ACTIVE)
+
+    def _heartbeat(self, user):
+        request = APIRequestFactory().post(f"/api/f2/trips/{self.trip.id}/presence/", {}, format="json")
+        force_authenticate(request, user=user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = F21TripPresencePollView.as_view()(request, trip_id=self.trip.id)
+        return response, ctx.captured_queries
+
+    def _channel(self, user=None, trip_id=None, factory=AsyncRequestFactory, **params):
+        """The channel as the ASGI channel process serves it (factory=RequestFactory: the WSGI web process)."""
+        trip_id = trip_id or self.trip.id
+        request = factory().get(f"/api/f2/trips/{trip_id}/channel/", params)
+        with mock.patch.object(SupabaseJWTAuthentication, "authenticate", return_value=(user or self.owner, None)):
+            response = async_to_sync(F21TripChannelView.as_view())(request, trip_id=trip_id)
+        response.data = json.loads(response.content)
+        return response
+
+    def test_heartbeats_do_not_write_to_the_database(self):
+        self._heartbeat(self.owner)
+        response, queries = self._heartbeat(self.friend)
+        self.assertEqual(sorted(response.data["online_user_ids"]), sorted([str(self.owner.id), str(self.friend.id)]))
+        self.assertFalse([q for q in queries if q["sql"].lstrip().upper().startswith("UPDATE")])
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(presence.flush_active(), 2)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.friend.refresh_from_db()
+        self.assertIsNotNone(self.friend.last_active_at)
+
+    def test_last_active_is_written_without_a_later_request(self):
+        presence._active_timer = None
+        with mock.patch("TripMateFunctions.services.presence.threading.Timer") as timer:
+            presence.note_active(self.friend.id)
+            presence.note_active(self.owner.id)
+        timer.assert_called_once()
+
+        timer.call_args.args[1]()  # fires after ACTIVE_FLUSH_SECONDS
+        self.friend.refresh_from_db()
+        self.assertIsNotNone(self.friend.last_active_at)
+        self.assertIsNone(presence._active_timer)
+
+    def test_channel_wakes_on_new_revision(self):
+        first = self._channel(wait=0)
+        revision, tag = first.data["revision"], first.data["presence"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ItineraryItem.objects.create(trip=self.trip, title="Fushimi Inari")
+
+        started = time.monotonic()
+        response = self._channel(revision=revision, presence=tag, wait=5)
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertEqual(response.data["revision"], revision + 1)
+        self.assertEqual([(c["entity"], c["op"]) for c in response.data["changes"]], [("item", "upsert")])
+
+    def test_channel_times_out_without_changes(self):
+        first = self._channel(wait=0)
+        response = self._channel(revision=first.data["revision"], presence=first.data["presence"], wait=0.2)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["revision"], first.data["revision"])
+        self.assertNotIn("changes", response.data)
+
+    def test_web_process_answers_at_once_with_poll_after(self):
+        first = self._channel(wait=0)
+        started = time.monotonic()
+        response = self._channel(
+            factory=RequestFactory, revision=first.data["revision"], presence=first.data["presence"], wait=5
+        )
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(response.data["poll_after"], presence.POLL_AFTER_SECONDS)
+        self.assertEqual(first.data["poll_after"], 0)
+
+    def test_channel_requires_membership(self):
+        stranger = AppUser.objects.create(email="presence-stranger@example.com")
+        stranger.is_authenticated = True
+        self.assertEqual(self._channel(user=stranger, wait=0).status_code, 403)
+        self.assertEqual(self._channel(trip_id=self.trip.id + 999, wait=0).status_code, 404)
+
+        # Joining the trip invalidates the cached member list
+        TripCollaborator.objects.create(trip=self.trip, user=stranger, status=TripCollaborator.Status.ACTIVE)
+        self.assertEqual(self._channel(user=stranger, wait=0).status_code, 200)
+
+
+class CommunityFeedTests(TestCase):
+    """The discovery feed reads precomputed cards, one page per indexed query."""
+
+    @classmethod
+    def setUpClass(cls):
+        # profiles is managed by Supabase (managed=False); the test DB lacks it
+        cls._created_profiles = "profiles" not in connection.introspection.table_names()
+        if cls._created_profiles:
+            with connection.schema_editor() as editor:
+                editor.create_model(Profile)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        if cls._created_profiles:
+            with connection.schema_editor() as editor:
+                editor.delete_model(Profile)
+
+    def setUp(self):
+        self.owner = AppUser.objects.create(email="feed-owner@example.com", full_name="Feed Owner")
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO profiles (id, name, onboarding_completed) VALUES (%s, %s, %s)",
+                [Profile._meta.pk.get_db_prep_value(self.owner.id, connection), "Mei", False],
+            )
+
+    def _public_trip(self, title, tags=("food",)):
+        with self.captureOnCommitCallbacks(execute=True):
+            trip = Trip.objects.create(owner=self.owner, title=title, main_country="Japan", visibility="public")
+            item = ItineraryItem.objects.create(trip=trip, title=f"{title} stop")
+            for tag in tags:
+                ItineraryItemTag.objects.create(item=item, tag=tag)
+            TripPhoto.objects.create(trip=trip, file_url=f"https://img.example.com/{trip.id}.jpg")
+        return trip
+
+    def _list(self, query=""):
+        request = APIRequestFactory().get(f"/api/f2/community/{query}")
+        with CaptureQueriesContext(connection) as ctx:
+            response = F24CommunityTripListView.as_view()(request)
+        return response, len(ctx.captured_queries)
+
+    def test_page_cost_does_not_depend_on_trip_count(self):
+        self._public_trip("Osaka", tags=("food", "Food", "temples"))
+        _, small = self._list()
+        for i in range(5):
+            self._public_trip(f"Trip {i}")
+        response, large = self._list("?page_size=6")
+
+        self.assertEqual(small, large)
+        self.assertEqual(large, 1)
+        osaka = next(card for card in response.data["results"] if card["title"] == "Osaka")
+        self.assertEqual(osaka["owner_name"], "Mei")
+        self.assertEqual(osaka["tags"], ["food", "temples"])
+        self.assertTrue(osaka["cover_photo_url"].endswith(".jpg"))
+        self.assertEqual((osaka["stop_count"], osaka["photo_count"]), (1, 1))
+
+    def test_cursor_walks_every_trip_once(self):
+        trips = [self._public_trip(f"Trip {i}") for i in range(5)]
+        seen, query = [], "?page_size=2"
+        while query is not None:
+            response, _ = self._list(query)
+            seen += [card["id"] for card in response.data["results"]]
+            nxt = response.data["next"]
+            query = "?" + nxt.split("?", 1)[1] if nxt else None
+        self.assertEqual(seen, [t.id for t in reversed(trips)])
+
+    def test_cards_follow_visibility_flags_and_tags(self):
+        trip = self._public_trip("Nara")
+        with self.captureOnCommitCallbacks(execute=True):
+            ItineraryItemTag.objects.create(item=trip.items.get(), tag="deer")
+        self.assertEqual(CommunityTripCard.objects.get(trip=trip).tags, ["food", "deer"])
+
+        trip.visibility = "private"
+        trip.save()
+        self.assertFalse(CommunityTripCard.objects.filter(trip=trip).exists())
+
+        # Private trips never get a card, whatever changes inside them
+        with self.captureOnCommitCallbacks(execute=True):
+            ItineraryItem.objects.create(trip=trip, title="Todaiji")
+        self.assertFalse(CommunityTripCard.objects.filter(trip=trip).exists())
+
+    def test_unlisted_trips_cost_no_refresh(self):
+        listed = self._public_trip("Kyoto")
+        private = Trip.objects.create(owner=self.owner, title="Secret", visibility="private")
+
+        with mock.patch("TripMateFunctions.signals.schedule_card_refresh") as schedule:
+            ItineraryItem.objects.create(trip=private, title="Hidden stop")
+            TripPhoto.objects.create(trip=private, file_url="https://img.example.com/secret.jpg")
+        schedule.assert_not_called()
+
+        with mock.patch(
+            "TripMateFunctions.services.community_cards.refresh_community_card"
+        ) as refresh, self.captureOnCommitCallbacks(execute=True):
+            for i in range(3):
+                ItineraryItem.objects.create(trip_id=listed.id, title=f"Stop {i}")
+            ItineraryItem.objects.create(trip_id=private.id, title="Another hidden stop")
+        self.assertEqual([c.args[0] for c in refresh.call_args_list], [listed.id])
+
+
+class FullTextSearchTests(TestCase):
+    """Ranked, prefix and typo-tolerant search, kept current by signals."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls._created_profiles = "profiles" not in connection.introspection.table_names()
+        if cls._created_profiles:
+            with connection.schema_editor() as editor:
+                editor.create_model(Profile)
+        search.install_search_backend()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        search.uninstall_search_backend()
+        if cls._created_profiles:
+            with connection.schema_editor() as editor:
+                editor.delete_model(Profile)
+
+    def setUp(self):
+        self.owner = AppUser.objects.create(email="search-owner@example.com", full_name="Search Owner")
+
+    def _trip(self, title, city="Kyoto", visibility="public", stops=()):
+        with self.captureOnCommitCallbacks(execute=True):
+            trip = Trip.objects.create(owner=self.owner, title=title, main_city=city, visibility=visibility)
+            for stop in stops:
+                ItineraryItem.objects.create(trip=trip, title=stop)
+        return trip
+
+    def _search(self, query):
+        request = APIRequestFactory().get("/api/search/", {"q": query})
+        return SearchView.as_view()(request).data["results"]
+
+    def test_title_matches_rank_above_body_matches(self):
+        body_hit = self._trip("Temple walk", stops=["Ramen lunch"])
+        title_hit = self._trip("Ramen crawl")
+        self._trip("Ramen at home", visibility="private")
+
+        results = self._search("ramen")
+        self.assertEqual([(r["kind"], r["id"]) for r in results], [("trip", title_hit.id), ("trip", body_hit.id)])
+
+    def test_prefix_and_typo(self):
+        trip = self._trip("Ramen crawl", city="Fukuoka")
+        self.assertEqual([r["id"] for r in self._search("fukuo")], [trip.id])
+        self.assertEqual([r["id"] for r in self._search("ramne")], [trip.id])
+        self.assertEqual(self._search("zzzz"), [])
+
+    def test_index_follows_writes(self):
+        faq = CommunityFAQ.objects.create(country="Japan", question="Do I need a visa?", answer="Usually not.")
+        destination = Destination.objects.create(name="Osaka Castle", lat=34.68, lon=135.52)
+        qa = DestinationQA.objects.create(destination=destination, question="Is the visa line long?")
+        self.assertEqual({(r["kind"], r["id"]) for r in self._search("visa")},
+                         {("community_faq", faq.id), ("destination_qa", qa.id)})
+
+        faq.is_published = False
+        faq.save()
+        qa.delete()
+        self.assertEqual(self._search("visa"), [])
+
+        trip = self._trip("Visa run")
+        Trip.objects.filter(pk=trip.pk).delete()
+        self.assertFalse(SearchDocument.objects.exists())
+
+    def test_community_list_search_is_ranked(self):
+        first = self._trip("Osaka food", stops=["Kuromon market"])
+        second = self._trip("Osaka food market tour")
+        request = APIRequestFactory().get("/api/f2/community/", {"search": "osaka market"})
+        data = F24CommunityTripListView.as_view()(request).data
+        self.assertEqual({card["id"] for card in data["results"]}, {first.id, second.id})
+        self.assertEqual(data["results"][0]["id"], second.id)
+
+
+    def test_filters_apply_before_the_search_limit(self):
+        CommunityFAQ.objects.bulk_create(
+            CommunityFAQ(country="Japan", question=f"Visa question {i}?", answer="Visa answer.")
+            for i in range(search.SEARCH_LIMIT + 10)
+        )
+        search.rebuild_search_index()
+        france = CommunityFAQ.objects.create(country="France", question="Do I need a visa?", answer="No.")
+
+        request = APIRequestFactory().get("/api/f2/community-faqs/", {"search": "visa", "country": "France"})
+        data = F24CommunityFAQListView.as_view()(request).data
+        rows = data["results"] if isinstance(data, dict) else data
+        self.assertEqual([row["id"] for row in rows], [france.id])
+
+    def test_community_list_search_pages_through_every_match(self):
+        trips = [self._trip(f"Osaka day {i}") for i in range(5)]
+        self._trip("Nara day")
+
+        seen, params = [], {"search": "osaka", "page_size": 2}
+        while params is not None:
+            data = F24CommunityTripListView.as_view()(APIRequestFactory().get("/api/f2/community/", params)).data
+            seen += [card["id"] for card in data["results"]]
+            params = dict(params, page=params.get("page", 1) + 1) if data["next"] else None
+        self.assertEqual(sorted(seen), sorted(t.id for t in trips))
+
+
+class NearbyIndexTests(TestCase):
+    """Radius queries read the geohash cells around a point and rank by distance."""
+
+    def setUp(self):
+        self.owner = AppUser.objects.create(email="geo-owner@example.com", full_name="Geo Owner")
+
+    def test_geohash_follows_coordinates(self):
+        self.assertEqual(geohash.encode(57.64911, 10.40744, 11), "u4pruydqqvj")
+        place = Destination.objects.create(name="Kinkaku-ji", lat=35.0394, lon=135.7292)
+        self.assertTrue(place.geohash.startswith("xn0"))
+
+        place.lat, place.lon = 1.2834, 103.8607
+        place.save(update_fields=["lat", "lon"])
+        place.refresh_from_db()
+        self.assertEqual(place.geohash, geohash.encode(1.2834, 103.8607))
+
+        trip = Trip.objects.create(owner=self.owner, title="Bulk")
+        item, = bulk_create_items(trip, [ItineraryItem(trip=trip, title="Marina Bay", lat=1.2834, lon=103.8607)])
+        self.assertEqual(ItineraryItem.objects.get(title="Marina Bay").geohash, place.geohash)
+
+    def test_nearest_is_ranked_and_bounded(self):
+        near = Destination.objects.create(name="Gion", lat=35.0037, lon=135.7788)
+        far = Destination.objects.create(name="Arashiyama", lat=35.0094, lon=135.6668)
+        Destination.objects.create(name="Osaka Castle", lat=34.6873, lon=135.5262)
+        Destination.objects.create(name="No coordinates")
+
+        ranked = nearby.nearest(Destination.objects.all(), 35.0116, 135.7681, radius_m=12_000)
+        self.assertEqual([obj for obj, _ in ranked], [near, far])
+        self.assertAlmostEqual(ranked[0][1], 1330, delta=30)
+
+        # Boxes crossing the date line are split in two
+        fiji = Destination.objects.create(name="Taveuni", lat=-16.85, lon=179.99)
+        other_side = Destination.objects.create(name="Vanua Balavu", lat=-16.85, lon=-179.99)
+        ranked = nearby.nearest(Destination.objects.all(), -16.85, 179.999, radius_m=5000)
+        self.assertEqual({obj for obj, _ in ranked}, {fiji, other_side})
+
+    def test_replacements_come_from_stored_places_first(self):
+        trip = Trip.objects.create(owner=self.owner, title="Kyoto", visibility="public")
+        stop = ItineraryItem.objects.create(trip=trip, title="Kyoto National Museum", lat=34.9900, lon=135.7732)
+        for i, name in enumerate(["Museum A", "Museum B", "Museum C", "Museum D", "Museum E"]):
+            Destination.objects.create(name=name, lat=34.99 + i * 0.001, lon=135.774, category="museums,cultural")
+        Destination.objects.create(name="Ramen shop", lat=34.9901, lon=135.7733, category="foods")
+
+        with mock.patch.dict("os.environ", {"OPENTRIPMAP_API_KEY": "k"}), \
+                mock.patch("TripMateFunctions.views.f1_4_views.requests.get") as get:
+            options = _build_replacement_options(stop, None, None, None)
+        get.assert_not_called()
+        self.assertEqual([o["title"] for o in options], ["Museum A", "Museum B", "Museum C", "Museum D"])
+        self.assertEqual(options[0]["source"], "destination")
+
+
+class AnalyticsRollupTests(TestCase):
+    """The admin dashboard reads daily rollup rows kept current by save hooks."""
+
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.first = self.today - timedelta(days=3)
+
+    def _at(self, day, hour=12):
+        return timezone.make_aware(timezone.datetime.combine(day, timezone.datetime.min.time())) + timedelta(hours=hour)
+
+    def _user(self, email, day, active=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            user = AppUser.objects.create(email=email)
+        AppUser.objects.filter(pk=user.pk).update(created_at=self._at(day), last_active_at=active and self._at(active))
+        return user
+
+    def _trip(self, owner, day, **fields):
+        trip = Trip.objects.create(owner=owner, title="Trip", **fields)
+        Trip.objects.filter(pk=trip.pk).update(created_at=self._at(day))
+        return trip
+
+    def _dashboard(self, start, end, user=None):
+        request = APIRequestFactory().get("/api/f8/analytics/", {"from": str(start), "to": str(end)})
+        # Not saved, so the admin is not counted in the metrics
+        admin = AppUser(email="admin@example.com", role=AppUser.Role.ADMIN, status=AppUser.Status.VERIFIED)
+        force_authenticate(request, user=user or admin)
+        return admin_analytics(request)
+
+    def test_range_counts_distinct_active_users(self):
+        a = self._user("a@example.com", self.first, active=self.first)
+        self._user("b@example.com", self.first, active=self.first)
+        self._trip(a, self.first, main_country="Japan")
+        self._trip(a, self.first, main_country=" ", main_city="Seoul", is_demo=True)
+        analytics.rebuild_rollups(since=self.first)
+
+        # a is active again the next day; the first day still counts them
+        second = self.first + timedelta(days=1)
+        AppUser.objects.filter(pk=a.pk).update(last_active_at=self._at(second))
+        self._user("c@example.com", second, active=second)
+        analytics.refresh_day(second)
+
+        summary = analytics.range_summary(self.first, second)
+        self.assertEqual(summary["active_users"], 3)
+        self.assertEqual(summary["active_users_series"], [2, 2])
+        self.assertEqual(summary["signups"], 3)
+        self.assertEqual(summary["itineraries_created"], 2)
+        self.assertEqual(summary["demo_itineraries_created"], 1)
+        self.assertEqual(analytics.top_places(self.first, second), [("Japan", 1), ("Seoul", 1)])
+        self.assertEqual(analytics.top_places(self.first, second, include_demo=False), [("Japan", 1)])
+
+    def test_active_users_are_exact_and_outlive_the_user(self):
+        users = [self._user(f"u{i}@example.com", self.first, active=self.first) for i in range(40)]
+        analytics.rebuild_rollups(since=self.first)
+        AppUser.objects.filter(pk=users[0].pk).delete()
+        analytics.refresh_day(self.first)
+
+        self.assertEqual(AnalyticsActiveUser.objects.filter(day_id=self.first).count(), 40)
+        self.assertEqual(analytics.range_summary(self.first, self.today)["active_users"], 40)
+
+    def test_hooks_mark_days_dirty(self):
+        owner = self._user("owner@example.com", self.first)
+        analytics.refresh_rollups()
+        self.assertEqual(analytics.totals()["itineraries"], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Trip.objects.create(owner=owner, title="New", main_country="France")
+            Trip.objects.create(owner=owner, title="Demo", main_country="France", is_demo=True)
+        self.assertTrue(AnalyticsDay.objects.get(date=self.today).dirty)
+
+        analytics.refresh_rollups()
+        self.assertFalse(AnalyticsDay.objects.filter(dirty=True).exists())
+        self.assertEqual(analytics.totals(), {"users": 1, "itineraries": 2, "demo_itineraries": 1})
+
+    def test_moved_flag_leaves_its_old_day(self):
+        owner = self._user("owner@example.com", self.first)
+        trip = self._trip(owner, self.first, is_flagged=True)
+        flag_day = self.first + timedelta(days=1)
+        Trip.objects.filter(pk=trip.pk).update(updated_at=self._at(flag_day))
+        analytics.rebuild_rollups(since=self.first)
+        self.assertEqual(analytics.range_summary(self.first, self.today)["flagged"], 1)
+
+        # Edited today: the flag now counts for today only
+        trip.refresh_from_db()
+        with self.captureOnCommitCallbacks(execute=True):
+            trip.title = "Edited"
+            trip.save()
+            trip.save(update_fields=["title"])
+        analytics.refresh_rollups()
+        self.assertEqual(analytics.range_summary(self.first, self.today)["flagged"], 1)
+        self.assertEqual(analytics.range_summary(flag_day, flag_day)["flagged"], 0)
+
+    def test_one_dirty_update_per_transaction(self):
+        owner = self._user("owner@example.com", self.first)
+        with mock.patch("TripMateFunctions.services.analytics.mark_days_dirty") as mark:
+            with self.captureOnCommitCallbacks(execute=True):
+                for i in range(5):
+                    Trip.objects.create(owner=owner, title=f"Trip {i}")
+        mark.assert_called_once_with({self.today})
+
+    def test_dashboard_queries_do_not_grow_with_data(self):
+        owner = self._user("owner@example.com", self.first, active=self.today)
+        self._trip(owner, self.first, main_country="Japan")
+        analytics.rebuild_rollups(since=self.first)
+        with CaptureQueriesContext(connection) as few:
+            self._dashboard(self.first, self.today)
+
+        for i in range(20):
+            user = self._user(f"user{i}@example.com", self.first + timedelta(days=i % 4), active=self.today)
+            self._trip(user, self.first + timedelta(days=i % 3), main_country=f"Country {i % 7}")
+        analytics.rebuild_rollups(since=self.first)
+        with CaptureQueriesContext(connection) as many:
+            data = self._dashboard(self.first, self.today).data
+
+        self.assertEqual(len(many), len(few))
+        self.assertEqual(data["new_signups"], 21)
+        self.assertEqual(data["active_users"], 21)
+        self.assertEqual(data["itineraries_created"], 21)
+        self.assertEqual(len(data["active_users_series"]), 4)
+        self.assertEqual(len(data["popular_itineraries"]), 5)
+
+    def test_dashboard_is_admin_only_and_never_rebuilds_inline(self):
+        owner = self._user("owner@example.com", self.first, active=self.today)
+        owner.is_authenticated = True
+        self.assertEqual(self._dashboard(self.first, self.today, user=owner).status_code, 403)
+        anonymous = APIRequestFactory().get("/api/f8/analytics/", {"from": str(self.first), "to": str(self.today)})
+        self.assertIn(admin_analytics(anonymous).status_code, (401, 403))
+
+        # No history yet: the read queues one rollup job instead of building it
+        AnalyticsDay.objects.all().delete()
+        self.assertEqual(self._dashboard(self.first, self.today).status_code, 200)
+        self._dashboard(self.first, self.today)
+        self.assertFalse(AnalyticsDay.objects.filter(refreshed_at__isnull=False).exists())
+        self.assertEqual(BackgroundJob.objects.filter(kind="analytics_rollup").count(), 1)
+
+        jobs.run_pending_jobs(worker_id="test", kinds=["analytics_rollup"])
+        self.assertEqual(self._dashboard(self.first, self.today).data["new_signups"], 1)
+        self.assertIsNone(analytics.schedule_refresh())
+
+
+class TripAccessTests(TestCase):
+    """Trip membership is read once per user, cached, and dropped when collaborators change."""
+
+    def setUp(self):
+        self.owner = AppUser.objects.create(email="access-owner@example.com")
+        self.friend = AppUser.objects.create(email="access-friend@example.com")
+        self.friend.is_authenticated = True
+        self.trip = Trip.objects.create(owner=self.owner, title="Shared")
+        self.other = Trip.objects.create(owner=self.owner, title="Private")
+
+    def test_membership_is_cached_and_invalidated(self):
+        self.assertFalse(trip_access.can_access_trip(self.friend, self.trip))
+
+        invite = TripCollaborator.objects.create(trip=self.trip, user=self.friend)
+        self.assertTrue(trip_access.can_access_trip(self.friend, self.trip.id))
+        self.assertFalse(trip_access.can_access_trip(self.friend, self.trip, active_only=True))
+        self.assertEqual(trip_access.trip_role(self.owner, self.other), "owner")
+        with self.assertNumQueries(0):
+            self.assertEqual(trip_access.accessible_trip_ids(self.friend), [self.trip.id])
+            self.assertEqual(trip_access.trip_role(self.friend, self.trip), "editor")
+            self.assertIsNone(trip_access.trip_role(self.owner, 0))
+
+        invite.status = TripCollaborator.Status.ACTIVE
+        invite.save()
+        self.assertTrue(trip_access.can_access_trip(self.friend, str(self.trip.id), active_only=True))
+
+        invite.delete()
+        self.assertEqual(trip_access.accessible_trip_ids(self.friend), [])
+        self.assertFalse(trip_access.can_access_trip(None, self.trip))
+
+    def test_roles_read_before_commit_are_dropped_on_commit(self):
+        self.assertFalse(trip_access.can_access_trip(self.friend, self.trip))
+        with self.captureOnCommitCallbacks(execute=True):
+            TripCollaborator.objects.create(trip=self.trip, user=self.friend, status=TripCollaborator.Status.ACTIVE)
+            # Another request caches the membership it read before this transaction commits
+            trip_access._ACCESS.set(str(self.friend.id), {})
+        self.assertTrue(trip_access.can_access_trip(self.friend, self.trip, active_only=True))
+
+    def test_photo_list_filters_by_trip_ids(self):
+        TripCollaborator.objects.create(trip=self.trip, user=self.friend, status=TripCollaborator.Status.ACTIVE)
+        TripCollaborator.objects.create(trip=self.trip, invited_email="later@example.com")
+        TripPhoto.objects.create(trip=self.trip, user=self.owner, file_url="https://example.com/a.jpg")
+        TripPhoto.objects.create(trip=self.other, user=self.owner, file_url="https://example.com/b.jpg")
+
+        request = APIRequestFactory().get("/api/f5/photos/")
+        force_authenticate(request, user=self.friend)
+        response = F51TripPhotoViewSet.as_view({"get": "list"})(request)
+
+        self.assertEqual(response.status_code, 200)
+        rows = response.data["results"] if isinstance(response.data, dict) else response.data
+        self.assertEqual([r["file_url"] for r in rows], ["https://example.com/a.jpg"])
+
+
+class WeatherTimelineTests(TestCase):
+    """A trip's weather is one Open-Meteo call per source, shared by all its days."""
+
+    def setUp(self):
+        weather._WEATHER_CACHE.clear()
+        owner = AppUser.objects.create(email="weather@example.com")
+        self.today = date.today()
+        self.trip = Trip.objects.create(
+            owner=owner,
+            title="Kyoto",
+            start_date=self.today - timedelta(days=7),
+            end_date=self.today + timedelta(days=2),
+        )
+        self.anchor = ItineraryItem(trip=self.trip, title="Gion", lat=35.0037, lon=135.7788)
+
+    def _respond(self, url, params=None, timeout=None):
+        start = date.fromisoformat(params["start_date"])
+        end = date.fromisoformat(params["end_date"])
+        times = [(start + timedelta(days=i)).isoformat() for i in range((end - start).days + 1)]
+        rain = 12.0 if "archive" in url else 0.0
+        daily = {"time": times, "temperature_2m_max": [20.0] * len(times), "precipitation_sum": [rain] * len(times)}
+        return mock.Mock(status_code=200, json=mock.Mock(return_value={"daily": daily}))
+
+    def test_trip_days_share_one_call_per_source(self):
+        with mock.patch("TripMateFunctions.services.weather.requests.get", side_effect=self._respond) as get:
+            results = [
+                _compute_weather_context(str(self.trip.start_date + timedelta(days=i)), self.anchor, None, self.trip)
+                for i in range(10)
+            ]
+
+        # Archive for the older days, forecast for the recent and coming ones
+        self.assertEqual(get.call_count, 2)
+        self.assertTrue(all(wx["temperature_2m_max"] == 20.0 for wx, *_ in results))
+        wx, is_rainy, is_bad, reasons = results[0]
+        self.assertTrue(is_rainy)
+        self.assertIn("Heavy precipitation", reasons)
+        self.assertFalse(results[-1][1])
+
+    def test_days_beyond_the_forecast_use_climate(self):
+        day = self.today + timedelta(days=40)
+        with mock.patch("TripMateFunctions.services.weather.requests.get", side_effect=self._respond) as get:
+            timeline = weather.weather_timeline(35.0037, 135.7788, day, day + timedelta(days=4))
+        self.assertEqual(get.call_count, 1)
+        self.assertIn("climate", get.call_args[0][0])
+        self.assertEqual(weather.weather_for_day(timeline, day)["temperature_2m_max"], 20.0)
+        self.assertIsNone(weather.weather_for_day(timeline, day - timedelta(days=1)))
+
+
+class OverpassBatchTests(TestCase):
+    """A day's stops share one Overpass query; each gets the nearest element's hours."""
+
+    def setUp(self):
+        overpass.OSM_CACHE.clear()
+        self.stops = [(35.0 + i * 0.01, 135.7) for i in range(10)]
+
+    def _elements(self):
+        # Hours next to the first two stops only; the museum is ~90 m from stop 0
+        return [
+            {"type": "node", "lat": 35.0008, "lon": 135.7, "tags": {"opening_hours": "Tu-Su 09:00-17:00", "name": "Museum"}},
+            {"type": "way", "center": {"lat": 35.01, "lon": 135.7001}, "tags": {"opening_hours": "24/7"}},
+            {"type": "node", "lat": 35.0, "lon": 135.7, "tags": {"name": "No hours"}},
+        ]
+
+    def test_one_query_for_a_day(self):
+        response = mock.Mock(status_code=200, json=mock.Mock(return_value={"elements": self._elements()}))
+        with mock.patch("TripMateFunctions.services.overpass.requests.post", return_value=response) as post:
+            hours = overpass.opening_hours_batch(self.stops + [(None, None)])
+            again = overpass.opening_hours_batch(self.stops[:3])
+
+        self.assertEqual(post.call_count, 1)
+        self.assertEqual(post.call_args.kwargs["data"]["data"].count("around:200"), 30)
+        self.assertEqual(len(hours), 10)
+        self.assertEqual(overpass.lookup(hours, 35.0, 135.7)["opening_hours"], "Tu-Su 09:00-17:00")
+        self.assertEqual(overpass.lookup(hours, 35.01, 135.7)["opening_hours"], "24/7")
+        self.assertEqual(overpass.lookup(hours, 35.05, 135.7)["source"], "unknown")
+        self.assertEqual(again[(35.0, 135.7)]["source"], "osm")
+
+    def test_failures_are_not_cached(self):
+        with mock.patch("TripMateFunctions.services.overpass.requests.post", return_value=mock.Mock(status_code=429)):
+            hours = overpass.opening_hours_batch(self.stops[:2])
+        self.assertEqual(hours[(35.0, 135.7)]["source"], "unknown")
+        self.assertFalse(overpass.OSM_CACHE.lookup("osm:35.0:135.7")[0])
+
+
+class OpeningHoursTests(TestCase):
+    """OSM opening_hours strings compile once into per-day interval tables."""
+
+    monday = date(2026, 6, 1)
+
+    def _day(self, text, day, holidays=()):
+        return compile_hours(text).intervals_on(day, holidays)
+
+    def test_split_shifts_overnight_and_holidays(self):
+        text = "Mo-Fr 09:00-12:00,13:00-18:00; Sa 10:00-02:00; PH off"
+        self.assertEqual(self._day(text, self.monday), ((540, 720), (780, 1080)))
+        self.assertEqual(self._day(text, self.monday, holidays={self.monday}), ())
+        self.assertEqual(self._day(text, self.monday + timedelta(days=6)), ((0, 120),))
+
+        hours = compile_hours(text)
+        self.assertIs(hours.interval_at(self.monday, 750), False)
+        self.assertEqual(hours.next_opening(self.monday, 750), 780)
+        self.assertTrue(hours.is_open_at(timezone.datetime(2026, 6, 7, 1, 30)))
+
+    def test_months_nth_weekdays_and_later_rules(self):
+        seasonal = "Apr-Oct Mo-Su 09:00-19:00; Nov-Mar Mo-Su 10:00-16:00"
+        self.assertEqual(self._day(seasonal, self.monday), ((540, 1140),))
+        self.assertEqual(self._day(seasonal, date(2026, 12, 1)), ((600, 960),))
+        # First Saturday of the month only
+        self.assertEqual(self._day("Sa[1] 08:00-12:00", date(2026, 6, 6)), ((480, 720),))
+        self.assertEqual(self._day("Sa[1] 08:00-12:00", date(2026, 6, 13)), ())
+        self.assertEqual(self._day("Mo-Su 10:00-18:00; Dec 24-26 off", date(2026, 12, 25)), ())
+
+    def test_unknown_and_unparseable(self):
+        self.assertIsNone(compile_hours(""))
+        self.assertIsNone(compile_hours("ask the front desk"))
+        self.assertIsNone(self._day('"by appointment"', self.monday))
+        self.assertEqual(
+            open_at_many(["24/7", "Mo-Fr 09:00-17:00", "Sa-Su 09:00-17:00", None], timezone.datetime(2026, 6, 1, 8)),
+            [True, False, False, None],
+        )
+
+    def test_compiled_once(self):
+        self.assertIs(compile_hours("Tu-Su 09:00-17:00"), compile_hours("Tu-Su 09:00-17:00"))
+
+    def test_fit_visit(self):
+        hours = compile_hours("Mo-Fr 09:00-12:00,13:00-18:00")
+        # Starts at the next opening, ends at that interval's close
+        self.assertEqual(hours.fit_visit(self.monday, 12 * 60 + 15, 13 * 60 + 30), (780, 810))
+        self.assertEqual(hours.fit_visit(self.monday, 10 * 60, 13 * 60), (600, 720))
+        self.assertIsNone(hours.fit_visit(self.monday + timedelta(days=5), 600, 660))
+
+    def test_replacement_options_skip_closed_places(self):
+        stop = ItineraryItem(title="Stop", lat=34.99, lon=135.774)
+        Destination.objects.create(name="Open museum", lat=34.991, lon=135.774, category="museums", opening_hours_json={"opening_hours": "Mo-Su 09:00-17:00"})
+        Destination.objects.create(name="Shut museum", lat=34.992, lon=135.774, category="museums", opening_hours_json={"opening_hours": "Mo-Su 18:00-22:00"})
+        Destination.objects.create(name="Museum, hours unknown", lat=34.993, lon=135.774, category="museums")
+        at = timezone.datetime(2026, 6, 1, 10)
+
+        with mock.patch.dict("os.environ", {"OPENTRIPMAP_API_KEY": ""}):
+            options = _build_replacement_options(stop, self.monday, at, at + timedelta(hours=1))
+        self.assertEqual([o["title"] for o in options], ["Open museum", "Museum, hours unknown"])
+
+
+class ReplacementEnrichmentTests(TestCase):
+    """A day's conflicts share one OpenTripMap stage; details are stored per xid."""
+
+    def setUp(self):
+        _OTM_CACHE.clear()
+        _OTM_DETAILS.clear()
+        trip = Trip.objects.create(owner=AppUser.objects.create(email="p@example.com"), title="Kyoto")
+        self.stops = [
+            ItineraryItem.objects.create(trip=trip, title=f"Museum stop {i}", lat=34.99 + i * 0.01, lon=135.77)
+            for i in range(3)
+        ]
+
+    def _get(self, url, params=None, timeout=None):
+        if url.endswith("/radius"):
+            # Every stop sees the shared museum plus one of its own
+            own = f"N{int(round((params['lat'] - 34.99) * 100))}"
+            places = [("Shared museum", "N100"), (f"Museum {own}", own)]
+            data = [{"xid": xid, "name": name, "point": {"lat": params["lat"], "lon": 135.771}, "kinds": "museums"}
+                    for name, xid in places]
+        else:
+            data = {"kinds": "museums", "opening_hours": "Mo-Su 09:00-17:00", "address": {"city": "Kyoto"}}
+        return mock.Mock(status_code=200, json=mock.Mock(return_value=data))
+
+    def _details_calls(self, get):
+        return sorted(c.args[0].rsplit("/", 1)[1] for c in get.call_args_list if "/xid/" in c.args[0])
+
+    def test_candidates_shared_and_details_stored(self):
+        conflicts = [(stop, None, None) for stop in self.stops]
+        with mock.patch.dict("os.environ", {"OPENTRIPMAP_API_KEY": "k"}), \
+                mock.patch("TripMateFunctions.views.f1_4_views.requests.get", side_effect=self._get) as get:
+            results = _replacement_options_many(conflicts, None)
+        self.assertEqual(self._details_calls(get), ["N0", "N1", "N100", "N2"])
+        self.assertEqual([len(options) for options in results], [2, 2, 2])
+        self.assertEqual(results[1][0]["address"], "Kyoto")
+        self.assertTrue(OpenTripMapPlace.objects.filter(xid="N100").exists())
+
+        # A later plan nearby needs no detail calls, even once the remembered places are gone
+        OpenTripMapPlace.objects.all().delete()
+        with mock.patch.dict("os.environ", {"OPENTRIPMAP_API_KEY": "k"}), \
+                mock.patch("TripMateFunctions.views.f1_4_views.requests.get", side_effect=self._get) as get:
+            options = _build_replacement_options(self.stops[0], None, None, None)
+        self.assertEqual(self._details_calls(get), [])
+        self.assertEqual(len(options), 2)
+
+    def test_learned_places_stay_out_of_the_catalogue(self):
+        stop = self.stops[0]
+        with mock.patch.dict("os.environ", {"OPENTRIPMAP_API_KEY": "k"}), \
+                mock.patch("TripMateFunctions.views.f1_4_views.requests.get", side_effect=self._get):
+            _build_replacement_options(stop, None, None, None)
+        self.assertFalse(Destination.objects.exists())
+        self.assertEqual(nearby.nearby_places(34.99, 135.771, 2000), [])
+        self.assertEqual(nearby.named_places(["Shared museum"], 34.99, 135.771, 2000), {})
+
+        # Replacement options read them back without calling OpenTripMap
+        with mock.patch.dict("os.environ", {"OPENTRIPMAP_API_KEY": "k"}), \
+                mock.patch("TripMateFunctions.views.f1_4_views.requests.get") as get:
+            options = _build_replacement_options(stop, None, None, None)
+        get.assert_not_called()
+        self.assertEqual({(o["title"], o["source"]) for o in options},
+                         {("Shared museum", "opentripmap"), ("Museum N0", "opentripmap")})
+
+    def test_known_places_are_topped_up_not_replaced(self):
+        stop = self.stops[0]
+        for name, xid in (("Local museum", "D1"), ("Shared museum", "N100")):
+            Destination.objects.create(name=name, lat=34.991, lon=135.771, category="museums", external_ref=xid)
+
+        with mock.patch.dict("os.environ", {"OPENTRIPMAP_API_KEY": "k"}), \
+                mock.patch("TripMateFunctions.views.f1_4_views.requests.get", side_effect=self._get) as get:
+            options = _build_replacement_options(stop, None, None, None)
+
+        # Known places first; OpenTripMap adds only what they did not already offer
+        self.assertEqual([o["title"] for o in options], ["Local museum", "Shared museum", "Museum N0"])
+        self.assertEqual(self._details_calls(get), ["N0"])
+        self.assertEqual(list(OpenTripMapPlace.objects.values_list("xid", flat=True)), ["N0"])
@@ -25,6 +25,7 @@ from ..views.f1_5_views import (
 )
 
 from ..views.f1_6_views import F16DestinationFAQView
+from ..views.nearby_views import NearbyPlacesView
 from ..views.email_invitation_views import SendTripInvitationView 
 from ..views.accept_invitation_views import AcceptTripInvitationView
 
@@ -122,6 +123,13 @@ urlpatterns = [
         name="f15-quick-add",
     ),
 
+    # Stored places around a point / in a map viewport (geohash index)
+    path(
+        "places/nearby/",
+        NearbyPlacesView.as_view(),
+        name="f1-places-nearby",
+    ),
+
     # F1.6 - Destination FAQ
     path(
         "destination-faq/",
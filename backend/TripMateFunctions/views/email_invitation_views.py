@@ -4,13 +4,7 @@ Sends invitation emails with unique tokens to invited users.
 """
 
 import secrets
-import ssl
-import smtplib
-import threading
 import logging
-import requests
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 from django.conf import settings
 from django.utils import timezone
 from rest_framework import status
@@ -19,6 +13,7 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from ..models import Trip, TripCollaborator
+from ..services.mailer import queue_email
 
 logger = logging.getLogger(__name__)
 
@@ -112,11 +107,9 @@ class SendTripInvitationView(APIView):
         else:
             invitation_link = f"{frontend_url}/trip-invitation/{invite_token}"
 
-        # Send email asynchronously (non-blocking)
-        def send_invitation_email_async():
-            try:
-                subject = f"{request.user.email} invited you to join a trip on TripMate"
-                body = f"""
+        # Send email from the job queue (non-blocking, retried on failure)
+        subject = f"{request.user.email} invited you to join a trip on TripMate"
+        body = f"""
 Hello!
 
 {request.user.email} has invited you to collaborate on a trip: "{trip.title}"
@@ -128,51 +121,8 @@ This invitation will expire in 7 days.
 
 Best regards,
 TripMate Team
-                """.strip()
-
-                # Prefer Brevo HTTP API, fall back to SMTP
-                if getattr(settings, "BREVO_API_KEY", ""):
-                    headers = {
-                        "api-key": settings.BREVO_API_KEY,
-                        "Content-Type": "application/json",
-                    }
-                    payload = {
-                        "sender": {
-                            "email": settings.BREVO_SENDER_EMAIL,
-                            "name": settings.BREVO_SENDER_NAME,
-                        },
-                        "to": [{"email": invited_email}],
-                        "subject": subject,
-                        "textContent": body,
-                    }
-                    resp = requests.post(
-                        settings.BREVO_API_URL,
-                        headers=headers,
-                        json=payload,
-                        timeout=10,
-                    )
-                    resp.raise_for_status()
-                    logger.info(f"Invitation email sent to {invited_email} via Brevo (messageId={resp.json().get('messageId')})")
-                    return
-
-                # Fallback to SMTP if HTTP providers are not configured
-                context = ssl.create_default_context()
-                context.check_hostname = False
-                context.verify_mode = ssl.CERT_NONE
-
-                server = smtplib.SMTP(settings.INVITATION_EMAIL_HOST, settings.INVITATION_EMAIL_PORT, timeout=10)
-                server.starttls(context=context)
-                server.login(settings.INVITATION_EMAIL_USER, settings.INVITATION_EMAIL_PASSWORD)
-                server.send_message(msg)
-                server.quit()
-                logger.info(f"Invitation email sent to {invited_email} via SMTP")
-
-            except Exception as e:
-                logger.error(f"Failed to send invitation email to {invited_email}: {str(e)}")
-
-        # Start email sending in background thread
-        email_thread = threading.Thread(target=send_invitation_email_async)
-        email_thread.start()
+        """.strip()
+        queue_email(invited_email, subject, body, trip=trip, user=request.user)
 
         # Return immediately without waiting for email
         return Response(
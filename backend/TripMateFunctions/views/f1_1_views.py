@@ -5,14 +5,10 @@ import requests
 import logging
 import re
 import json
-import time
 import hashlib
-import threading
 from urllib.parse import quote
 from django.db.models import F
 from django.db import models
-from django.db.models import Q
-from django.core.cache import cache
 from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -23,8 +19,8 @@ from datetime import timedelta
 from django.utils import timezone
 from django.db import transaction
 from django.shortcuts import get_object_or_404
-from django.core.mail import send_mail
 from django.conf import settings
+from django.http import HttpResponse
 import logging
 
 from ..models import AppUser, Trip, TripDay, ItineraryItem, TripCollaborator
@@ -35,8 +31,18 @@ from ..serializers.f1_1_serializers import (
     TripOverviewSerializer,
     TripCollaboratorInviteSerializer,
 )
-from .f1_4_views import _fetch_osm_opening_hours  # reuse cached Overpass helper
+from .f1_4_views import _items_opening_hours  # reuse batched Overpass helper
 from .base_views import BaseViewSet
+from ..services.cache import CacheNamespace
+from ..services.community_cards import schedule_card_refresh
+from ..services.fanout import FanOut, parallel_map
+from ..services.mailer import queue_email
+from ..services.nearby import nearby_places
+from ..services.overpass import lookup as lookup_opening_hours
+from ..services.singleflight import single_flight
+from ..services.trip_access import can_access_trip, trip_filter
+from ..services.trip_snapshot import get_trip_view_snapshot, invalidate_trip_snapshot
+from ..services.trip_sync import record_upserts
 
 logger = logging.getLogger(__name__)
 
@@ -55,11 +61,10 @@ class TripViewSet(BaseViewSet):
         if not isinstance(user, AppUser):
             return Trip.objects.none()
 
-        return (
-            qs.filter(Q(owner=user) | Q(collaborators__user=user))
-            .distinct()
-            .select_related("owner")
-        )
+        qs = qs.filter(trip_filter(user, field="pk")).select_related("owner")
+        if self.action == "list":
+            qs = TripOverviewSerializer.setup_eager_loading(qs)
+        return qs
     
     def get_serializer_class(self):
         if self.action == "list":
@@ -95,6 +100,8 @@ class TripViewSet(BaseViewSet):
                 )
                 for i in range(num_days)
             ])
+            invalidate_trip_snapshot(trip.id)
+            schedule_card_refresh(trip.id)
 
     @action(detail=True, methods=["post"], url_path="collaborators", permission_classes=[IsAuthenticated])
     def add_collaborator(self, request, pk=None):
@@ -160,60 +167,18 @@ class TripViewSet(BaseViewSet):
         else:
             invite_url = f"{frontend_url}/trip-invitation/{collab.invite_token}"
         
-        # Send email in a non-blocking way (fire and forget)
-        email_sent = False
+        # Send email from the job queue (non-blocking, retried on failure)
+        subject = "You're invited to a Trip on TripMate ✈️"
+        body = (
+            "You've been invited to join a trip.\n\n"
+            f"Click the link below to accept the invite:\n{invite_url}\n\n"
+            "Please note: this invitation will expire 24 hours after it is issued.\n"
+            "If you didn't expect this, you can ignore this email."
+        )
         try:
-            # Use a thread to send email without blocking the response
-            import threading
-            def send_invitation_email():
-                try:
-                    subject = "You're invited to a Trip on TripMate ✈️"
-                    body = (
-                        "You've been invited to join a trip.\n\n"
-                        f"Click the link below to accept the invite:\n{invite_url}\n\n"
-                        "Please note: this invitation will expire 24 hours after it is issued.\n"
-                        "If you didn't expect this, you can ignore this email."
-                    )
-
-                    if getattr(settings, "BREVO_API_KEY", ""):
-                        headers = {
-                            "api-key": settings.BREVO_API_KEY,
-                            "Content-Type": "application/json",
-                        }
-                        payload = {
-                            "sender": {
-                                "email": settings.BREVO_SENDER_EMAIL,
-                                "name": settings.BREVO_SENDER_NAME,
-                            },
-                            "to": [{"email": email}],
-                            "subject": subject,
-                            "textContent": body,
-                        }
-                        resp = requests.post(
-                            getattr(settings, "BREVO_API_URL", "https://api.brevo.com/v3/smtp/email"),
-                            headers=headers,
-                            json=payload,
-                            timeout=10,
-                        )
-                        resp.raise_for_status()
-                        logger.info(f"Invitation email sent to {email} via Brevo (messageId={resp.json().get('messageId')})")
-                    else:
-                        send_mail(
-                            subject=subject,
-                            message=body,
-                            from_email=settings.DEFAULT_FROM_EMAIL,
-                            recipient_list=[email],
-                            fail_silently=True,
-                        )
-                        logger.info(f"Invitation email sent to {email} via SMTP backend")
-                except Exception as e:
-                    logger.error(f"Failed to send invitation email to {email}: {str(e)}")
-            
-            email_thread = threading.Thread(target=send_invitation_email)
-            email_thread.start()
-            email_sent = True  # Email is being sent (async)
+            queue_email(email, subject, body, trip=trip, user=request.user)
         except Exception as e:
-            logger.error(f"Failed to start email thread for {email}: {str(e)}")
+            logger.error(f"Failed to queue invitation email for {email}: {str(e)}")
 
         return Response(
             {
@@ -352,39 +317,28 @@ class TripDayViewSet(BaseViewSet):
             trip=trip,
             day_index__gt=removed_index,
         ).update(day_index=F("day_index") - 1)
+        invalidate_trip_snapshot(trip.id)
+        record_upserts(trip.id, TripDay.objects.filter(trip=trip, day_index__gte=removed_index))
 
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 logger = logging.getLogger(__name__)
 
 # ----------------------------
-# SeaLion caches (in-memory)
+# SeaLion caches (shared, see services/cache.py)
 # ----------------------------
-_SEALION_ABOUT_CACHE: dict[str, dict] = {}
-_SEALION_ABOUT_CACHE_LOCK = threading.Lock()
-
-_SEALION_TRAVEL_CACHE: dict[str, dict] = {}
-_SEALION_TRAVEL_CACHE_LOCK = threading.Lock()
+_SEALION_ABOUT_CACHE = CacheNamespace("sealion_about", default_ttl=60 * 60 * 24)
+_SEALION_TRAVEL_CACHE = CacheNamespace("sealion_travel", default_ttl=60 * 60 * 24)
+_PLACE_DETAILS_CACHE = CacheNamespace("place_details", default_ttl=60 * 20)
+# Known places within 5 km needed to skip the Wikipedia "nearby" geosearch
+LOCAL_NEARBY_MIN = 6
 
 def _cache_key(payload: dict) -> str:
     raw = json.dumps(payload, sort_keys=True, ensure_ascii=False)
     return hashlib.sha256(raw.encode("utf-8")).hexdigest()
 
-def _cache_get(cache: dict, lock: threading.Lock, key: str):
-    now = time.time()
-    with lock:
-        entry = cache.get(key)
-        if not entry:
-            return None
-        if entry.get("expires_at", 0) <= now:
-            cache.pop(key, None)
-            return None
-        return entry.get("value")
-
-def _cache_set(cache: dict, lock: threading.Lock, key: str, value: dict, ttl_seconds: int):
-    expires_at = time.time() + max(int(ttl_seconds), 1)
-    with lock:
-        cache[key] = {"expires_at": expires_at, "value": value}
+def _is_llm_payload(value) -> bool:
+    return isinstance(value, dict) and bool(value)
 
 def _maybe_reset_caches(request):
     """
@@ -398,19 +352,18 @@ def _maybe_reset_caches(request):
         return
 
     if request.query_params.get("reset_all_cache") == "1":
-        with _SEALION_ABOUT_CACHE_LOCK:
-            _SEALION_ABOUT_CACHE.clear()
-        with _SEALION_TRAVEL_CACHE_LOCK:
-            _SEALION_TRAVEL_CACHE.clear()
+        _SEALION_ABOUT_CACHE.clear()
+        _SEALION_TRAVEL_CACHE.clear()
+        _PLACE_DETAILS_CACHE.clear()
         return
 
     if request.query_params.get("reset_about_cache") == "1":
-        with _SEALION_ABOUT_CACHE_LOCK:
-            _SEALION_ABOUT_CACHE.clear()
+        _SEALION_ABOUT_CACHE.clear()
+        _PLACE_DETAILS_CACHE.clear()
 
     if request.query_params.get("reset_travel_cache") == "1":
-        with _SEALION_TRAVEL_CACHE_LOCK:
-            _SEALION_TRAVEL_CACHE.clear()
+        _SEALION_TRAVEL_CACHE.clear()
+        _PLACE_DETAILS_CACHE.clear()
 
 def extract_city_hint(addr: str | None) -> str | None:
     """
@@ -447,6 +400,17 @@ def extract_country_hint(addr: str | None) -> str | None:
     return parts[-1]
 
 
+def _day_stops(item: ItineraryItem) -> list:
+    """``item`` plus the other stops of its day that have coordinates."""
+    if item.day_id is None:
+        return [item]
+    return [item] + list(
+        ItineraryItem.objects.filter(day_id=item.day_id, lat__isnull=False, lon__isnull=False)
+        .exclude(pk=item.pk)
+        .only("id", "lat", "lon")
+    )
+
+
 class ItineraryItemViewSet(BaseViewSet):
     queryset = ItineraryItem.objects.all()
     serializer_class = ItineraryItemSerializer
@@ -457,11 +421,7 @@ class ItineraryItemViewSet(BaseViewSet):
         if not isinstance(user, AppUser):
             return Response({"detail": "Authentication required."}, status=status.HTTP_401_UNAUTHORIZED)
 
-        allowed_trip_ids = Trip.objects.filter(
-            Q(owner=user) | Q(collaborators__user=user)
-        ).values_list("id", flat=True)
-
-        item = get_object_or_404(ItineraryItem, pk=pk, trip_id__in=allowed_trip_ids)
+        item = get_object_or_404(ItineraryItem.objects.filter(trip_filter(user)), pk=pk)
         trip = item.trip
 
         if item.lat is None or item.lon is None:
@@ -1030,65 +990,6 @@ class ItineraryItemViewSet(BaseViewSet):
             "nearby": [],
         }
 
-        # 1a) Opening hours (OSM Overpass; cached in helper)
-        try:
-            if item.lat is not None and item.lon is not None:
-                oh_info = _fetch_osm_opening_hours(float(item.lat), float(item.lon))
-                if oh_info:
-                    out["opening_hours"] = oh_info.get("opening_hours")
-                    out["opening_hours_source"] = oh_info.get("source")
-                    out["opening_hours_confidence"] = oh_info.get("confidence")
-        except Exception:
-            # Overpass may be down; keep the endpoint resilient
-            pass
-
-        # Fallback: reuse any stored hours on the item so we don't blank the UI if Overpass is empty
-        if not out["opening_hours"]:
-            try:
-                existing = getattr(item, "opening_hours_json", None) or getattr(item, "opening_hours", None)
-                if isinstance(existing, dict):
-                    out["opening_hours"] = existing.get("opening_hours") or existing.get("text") or None
-                    out["opening_hours_source"] = existing.get("source") or out["opening_hours_source"]
-                    out["opening_hours_confidence"] = existing.get("confidence") or out["opening_hours_confidence"]
-                elif isinstance(existing, str) and existing.strip():
-                    out["opening_hours"] = existing.strip()
-            except Exception:
-                pass
-
-        # 1b) POI-first (to get category/kinds)
-        mb_poi = mapbox_reverse(item.lat, item.lon, types="poi", limit=1)
-        if mb_poi:
-            props = mb_poi.get("properties") or {}
-            if props.get("category"):
-                out["kinds"] = props.get("category")  # good when it's a POI
-
-        # 1b) Address/label (for nice address even if not POI)
-        mb_addr = mapbox_reverse(item.lat, item.lon, types="address,place,locality", limit=1)
-        if mb_addr:
-            out["address"] = mb_addr.get("place_name")
-            if title.lower() in ["", "place", "selected place"]:
-                out["name"] = mb_addr.get("text") or out["name"]
-
-
-        # 2) Nearby list (Mapbox poi)
-        geo = wiki_geosearch(item.lat, item.lon, radius_m=5000, limit=12)
-
-        out["nearby"] = [
-            {
-                "xid": str(g.get("pageid")),
-                "name": g.get("title"),
-                "kinds": "wikipedia",
-                "dist_m": g.get("dist"),
-                "lat": g.get("lat"),
-                "lon": g.get("lon"),
-                "image_url": None,
-                "wikipedia": f"https://en.wikipedia.org/?curid={g.get('pageid')}",
-            }
-            for g in geo
-        ]
-
-
-        # 3) Wikipedia → Commons → Openverse (images)
         # Allow caller to control gallery size:
         # /place-details/?include_images=0   => only hero (if any)
         # /place-details/?include_images=3   => small gallery
@@ -1099,125 +1000,185 @@ class ItineraryItemViewSet(BaseViewSet):
             include_images_n = 3
         include_images_n = max(0, min(include_images_n, 20))
 
-        cache_key = f"place_details:{item.id}:img={include_images_n}:v1"
-        cached = cache.get(cache_key)
+        _maybe_reset_caches(request)
+
+        # Whole-panel cache: checked before any external call
+        cache_key = f"{item.id}:img={include_images_n}:v1"
+        cached = _PLACE_DETAILS_CACHE.get(cache_key)
         if cached:
             return Response(cached, status=status.HTTP_200_OK)
 
-        geo = wiki_geosearch(item.lat, item.lon, radius_m=12000, limit=12)
-        candidates = ranked_wiki_titles(title, geo, max_n=6)
-
-        # ALSO include the closest geosearch titles (not just similarity-ranked),
-        # because the correct page can have a very different name:
-        # e.g. "Asakusa Kannon Temple" => "Sensō-ji"
-        nearest_titles = []
-        for g in sorted(geo, key=lambda x: float(x.get("dist") or 1e18))[:6]:
-            t = (g.get("title") or "").strip()
-            if t:
-                nearest_titles.append(t)
-
-        merged = []
-        seen = set()
-        for t in (candidates + nearest_titles):
-            if not t or t in seen:
-                continue
-            seen.add(t)
-            merged.append(t)
-
-        candidates = merged[:12]
-
-
-
-        # If geosearch returns nothing, fall back to itinerary title as a last attempt.
-        if not candidates and title:
-            candidates = [title]
-
-        chosen_title = None
-        wiki = None
-
-        # Try multiple nearby wiki titles until one returns a usable summary
-        for t in candidates:
-            w = wiki_summary(t)
-            if not w:
-                continue
-
-            extract = (w.get("extract") or "").strip()
-            thumb = ((w.get("thumbnail") or {}).get("source") or "").strip()
-
-            # treat it as usable if we got at least some text or a thumbnail
-            if extract or thumb:
-                chosen_title = t
-                wiki = w
-                break
-
-        if wiki:
-            out["description"] = (wiki.get("extract") or out["description"])
-            thumb = (wiki.get("thumbnail") or {}).get("source")
-            if thumb:
-                out["image_url"] = thumb
-            out["wikipedia"] = (
-                (((wiki.get("content_urls") or {}).get("desktop") or {}).get("page"))
-                or out["wikipedia"]
-            )
-            wiki_desc = (wiki.get("description") or "").strip()
-            out["kinds"] = out["kinds"] or (wiki_desc if wiki_desc else None)
-            out["source"] = "wikipedia"
+        item_lat = float(item.lat)
+        item_lon = float(item.lon)
 
-        # 4) Gallery build (only if include_images_n > 0)
-        gallery: list[str] = []
+        # Stored hours on the item (used when Overpass is empty so we don't blank the UI)
+        stored_hours = None
+        try:
+            stored_hours = getattr(item, "opening_hours_json", None) or getattr(item, "opening_hours", None)
+        except Exception:
+            stored_hours = None
 
-        if include_images_n > 0:
-            # Prefer Wikipedia media list if we have a chosen title
-            if chosen_title:
-                gallery = wiki_media_images(chosen_title, limit=include_images_n)
-
-            # If wiki media list is empty, try Commons category heuristics
-            if not gallery:
-                gallery = commons_scenic_images(chosen_title or title, limit=include_images_n)
-
-            # If still empty, use Openverse fallback
-            if not gallery:
-                nearby_titles_for_ov = [n.get("name") for n in (out.get("nearby") or []) if n.get("name")]
-                for q in make_openverse_queries(title, out.get("address"), nearby_titles_for_ov):
-                    gallery = openverse_search(q, limit=include_images_n)
-                    if gallery:
-                        break
-
-
-        # Ensure hero image exists: if still none, try Openverse for at least one
-        if (not out["image_url"] or str(out["image_url"]).strip() == ""):
-            # if gallery exists, pick first as hero
-            if gallery:
-                out["image_url"] = gallery[0]
-            else:
-                nearby_titles_for_ov = [n.get("name") for n in (out.get("nearby") or []) if n.get("name")]
-                for q in make_openverse_queries(title, out.get("address"), nearby_titles_for_ov):
-                    ov = openverse_search(q, limit=1)
-                    if ov:
-                        out["image_url"] = ov[0]
-                        break
-                    
+        def apply_sources(target: dict, vals: dict):
+            """
+            Merge finished upstream sources into a response dict.
+            Used for the final response and for the partial view that the
+            SeaLion / gallery sources build their prompts and cache keys from.
+            """
+            # 1a) Opening hours (OSM Overpass; cached in helper)
+            oh_info = vals.get("osm")
+            if oh_info:
+                target["opening_hours"] = oh_info.get("opening_hours")
+                target["opening_hours_source"] = oh_info.get("source")
+                target["opening_hours_confidence"] = oh_info.get("confidence")
+
+            if not target["opening_hours"]:
+                if isinstance(stored_hours, dict):
+                    target["opening_hours"] = stored_hours.get("opening_hours") or stored_hours.get("text") or None
+                    target["opening_hours_source"] = stored_hours.get("source") or target["opening_hours_source"]
+                    target["opening_hours_confidence"] = stored_hours.get("confidence") or target["opening_hours_confidence"]
+                elif isinstance(stored_hours, str) and stored_hours.strip():
+                    target["opening_hours"] = stored_hours.strip()
+
+            # 1b) POI-first (to get category/kinds)
+            mb_poi = vals.get("mapbox_poi")
+            if mb_poi:
+                props = mb_poi.get("properties") or {}
+                if props.get("category"):
+                    target["kinds"] = props.get("category")  # good when it's a POI
+
+            # 1c) Address/label (for nice address even if not POI)
+            mb_addr = vals.get("mapbox_addr")
+            if mb_addr:
+                target["address"] = mb_addr.get("place_name")
+                if title.lower() in ["", "place", "selected place"]:
+                    target["name"] = mb_addr.get("text") or target["name"]
+
+            # 2) Nearby list (known places, else Wikipedia geosearch)
+            geo_nearby = vals.get("wiki_geo_nearby")
+            if geo_nearby and "source" in geo_nearby[0]:
+                target["nearby"] = [
+                    {
+                        "xid": p["xid"],
+                        "name": p["name"],
+                        "kinds": p["kinds"],
+                        "dist_m": p["dist_m"],
+                        "lat": p["lat"],
+                        "lon": p["lon"],
+                        "image_url": None,
+                        "wikipedia": None,
+                    }
+                    for p in geo_nearby
+                ]
+            elif geo_nearby:
+                target["nearby"] = [
+                    {
+                        "xid": str(g.get("pageid")),
+                        "name": g.get("title"),
+                        "kinds": "wikipedia",
+                        "dist_m": g.get("dist"),
+                        "lat": g.get("lat"),
+                        "lon": g.get("lon"),
+                        "image_url": None,
+                        "wikipedia": f"https://en.wikipedia.org/?curid={g.get('pageid')}",
+                    }
+                    for g in geo_nearby
+                ]
 
-        # Ensure hero is included first in images (if gallery is enabled)
-        if include_images_n > 0:
-            if out["image_url"] and out["image_url"] not in gallery:
-                gallery = [out["image_url"]] + gallery
+            # 3) Wikipedia summary
+            wiki = (vals.get("wiki") or {}).get("summary")
+            if wiki:
+                target["description"] = (wiki.get("extract") or target["description"])
+                thumb = (wiki.get("thumbnail") or {}).get("source")
+                if thumb:
+                    target["image_url"] = thumb
+                target["wikipedia"] = (
+                    (((wiki.get("content_urls") or {}).get("desktop") or {}).get("page"))
+                    or target["wikipedia"]
+                )
+                wiki_desc = (wiki.get("description") or "").strip()
+                target["kinds"] = target["kinds"] or (wiki_desc if wiki_desc else None)
+                target["source"] = "wikipedia"
+            return target
+
+        def fetch_wiki(deps: dict):
+            geo = deps.get("wiki_geo_wide") or []
+            candidates = ranked_wiki_titles(title, geo, max_n=6)
+
+            # ALSO include the closest geosearch titles (not just similarity-ranked),
+            # because the correct page can have a very different name:
+            # e.g. "Asakusa Kannon Temple" => "Sensō-ji"
+            nearest_titles = []
+            for g in sorted(geo, key=lambda x: float(x.get("dist") or 1e18))[:6]:
+                t = (g.get("title") or "").strip()
+                if t:
+                    nearest_titles.append(t)
 
-            # dedupe preserve order
+            merged = []
             seen = set()
-            deduped = []
-            for u in gallery:
-                if not u or u in seen:
+            for t in (candidates + nearest_titles):
+                if not t or t in seen:
                     continue
-                seen.add(u)
-                deduped.append(u)
-                if len(deduped) >= include_images_n + (1 if out["image_url"] else 0):
-                    break
-
-            out["images"] = deduped
-        else:
-            out["images"] = []
-
+                seen.add(t)
+                merged.append(t)
+
+            candidates = merged[:12]
+
+            # If geosearch returns nothing, fall back to itinerary title as a last attempt.
+            if not candidates and title:
+                candidates = [title]
+
+            # Try nearby wiki titles until one returns a usable summary.
+            # Candidates are fetched a few at a time and the best-ranked usable one wins.
+            batch_size = 4
+            for start in range(0, len(candidates), batch_size):
+                batch = candidates[start:start + batch_size]
+                summaries = parallel_map(wiki_summary, batch, max_workers=batch_size, name="wiki-summary")
+                for t, w in zip(batch, summaries):
+                    if not w:
+                        continue
+                    extract = (w.get("extract") or "").strip()
+                    thumb = ((w.get("thumbnail") or {}).get("source") or "").strip()
+                    # treat it as usable if we got at least some text or a thumbnail
+                    if extract or thumb:
+                        return {"title": t, "summary": w}
+            return {"title": None, "summary": None}
+
+        def fetch_gallery(deps: dict):
+            """Wikipedia → Commons → Openverse (images), plus a hero fallback."""
+            base = apply_sources(dict(out), deps)
+            chosen_title = (deps.get("wiki") or {}).get("title")
+            nearby_titles_for_ov = [n.get("name") for n in (base.get("nearby") or []) if n.get("name")]
+            gallery: list[str] = []
+
+            if include_images_n > 0:
+                # Prefer Wikipedia media list if we have a chosen title
+                if chosen_title:
+                    gallery = wiki_media_images(chosen_title, limit=include_images_n)
+
+                # If wiki media list is empty, try Commons category heuristics
+                if not gallery:
+                    gallery = commons_scenic_images(chosen_title or title, limit=include_images_n)
+
+                # If still empty, use Openverse fallback
+                if not gallery:
+                    for q in make_openverse_queries(title, base.get("address"), nearby_titles_for_ov):
+                        gallery = openverse_search(q, limit=include_images_n)
+                        if gallery:
+                            break
+
+            # Ensure hero image exists: if still none, try Openverse for at least one
+            hero = None
+            if not base["image_url"] or str(base["image_url"]).strip() == "":
+                if gallery:
+                    hero = gallery[0]
+                else:
+                    for q in make_openverse_queries(title, base.get("address"), nearby_titles_for_ov):
+                        ov = openverse_search(q, limit=1)
+                        if ov:
+                            hero = ov[0]
+                            break
+
+            return {"images": gallery, "hero": hero}
 
         # ----------------------------
         # About payload 
@@ -1488,103 +1449,92 @@ class ItineraryItemViewSet(BaseViewSet):
 
         # -------- About payload (LLM first, fallback deterministic) --------
         ttl = int(os.getenv("SEALION_ABOUT_CACHE_TTL_SECONDS", "86400"))  # default 24h
-        _maybe_reset_caches(request)
 
-        # Build the exact payload we would send to SeaLion (used for cache key)
-        nearby_titles = [n.get("name") for n in (out.get("nearby") or []) if n.get("name")]
-        city_hint = extract_city_hint(out.get("address"))
-
-        sealion_context = {
-            "title": (title or out.get("name") or "").strip(),
-            "address": out.get("address"),
-            "city": city_hint,
-            "country_or_region": trip.main_country or extract_country_hint(out.get("address")),
-            "mapbox_category": out.get("kinds"),
-            "wikipedia_extract": out.get("description"),
-            "nearby_wikipedia_titles": nearby_titles[:8],
-            "lat": float(item.lat),
-            "lon": float(item.lon),
-        }
+        def fetch_about(deps: dict):
+            base = apply_sources(dict(out), deps)
+
+            # Build the exact payload we would send to SeaLion (used for cache key)
+            nearby_titles = [n.get("name") for n in (base.get("nearby") or []) if n.get("name")]
+            city_hint = extract_city_hint(base.get("address"))
+
+            sealion_context = {
+                "title": (title or base.get("name") or "").strip(),
+                "address": base.get("address"),
+                "city": city_hint,
+                "country_or_region": trip.main_country or extract_country_hint(base.get("address")),
+                "mapbox_category": base.get("kinds"),
+                "wikipedia_extract": base.get("description"),
+                "nearby_wikipedia_titles": nearby_titles[:8],
+                "lat": item_lat,
+                "lon": item_lon,
+            }
 
-        # Payload used to compute cache key (only include fields that matter)
-        cache_payload = {
-            "name": (out.get("name") or title or "Place").strip(),
-            "kinds": out.get("kinds"),
-            "description": out.get("description"),
-            "address": out.get("address"),
-            "opening_hours": out.get("opening_hours"),
-            "website": out.get("website"),
-            "context": {
-                "title": sealion_context.get("title"),
-                "city": sealion_context.get("city"),
-                "country_or_region": sealion_context.get("country_or_region"),
-                "mapbox_category": sealion_context.get("mapbox_category"),
-                "nearby_wikipedia_titles": sealion_context.get("nearby_wikipedia_titles"),
+            # Payload used to compute cache key (only include fields that matter)
+            cache_payload = {
+                "name": (base.get("name") or title or "Place").strip(),
+                "kinds": base.get("kinds"),
+                "description": base.get("description"),
+                "address": base.get("address"),
+                "opening_hours": base.get("opening_hours"),
+                "website": base.get("website"),
+                "context": {
+                    "title": sealion_context.get("title"),
+                    "city": sealion_context.get("city"),
+                    "country_or_region": sealion_context.get("country_or_region"),
+                    "mapbox_category": sealion_context.get("mapbox_category"),
+                    "nearby_wikipedia_titles": sealion_context.get("nearby_wikipedia_titles"),
+                }
             }
-        }
-        cache_key = _cache_key(cache_payload)
-        cache_key_global = f"sealion_about:{item.id}:{cache_key}"
-
-        # 1) Request-level cache (prevents double-call inside a single request)
-        req_cache = getattr(request, "_sealion_about_req_cache", None)
-        if req_cache is None:
-            req_cache = {}
-            setattr(request, "_sealion_about_req_cache", req_cache)
-
-        about_llm = req_cache.get(cache_key)
-
-        # 2) Cross-request shared cache (Django cache backend) so we persist across workers/restarts
-        if about_llm is None:
-            about_llm = cache.get(cache_key_global)
-
-        # 3) Cross-request in-memory cache (prevents regen across requests)
-        if about_llm is None:
-            about_llm = _cache_get(_SEALION_ABOUT_CACHE, _SEALION_ABOUT_CACHE_LOCK, cache_key)
-
-        # 4) If still not cached, call SeaLion once
-        if about_llm is None:
-            about_llm = self.sealion_generate_about(
-                name=cache_payload["name"],
-                kinds=cache_payload["kinds"],
-                description=cache_payload["description"],
-                address=cache_payload["address"],
-                opening_hours=cache_payload["opening_hours"],
-                website=cache_payload["website"],
-                context=sealion_context,
-            )
+            about_key = _cache_key(cache_payload)
+            about_key_global = f"{item.id}:{about_key}"
+
+            # 1) Request-level cache (prevents double-call inside a single request)
+            req_cache = getattr(request, "_sealion_about_req_cache", None)
+            if req_cache is None:
+                req_cache = {}
+                setattr(request, "_sealion_about_req_cache", req_cache)
+
+            about_llm = req_cache.get(about_key)
+
+            # 2) Shared cache, else call SeaLion once; concurrent viewers
+            #    (any worker) wait for that single call instead of repeating it.
+            #    Only successful LLM results are cached so a SeaLion outage falls back properly.
+            if about_llm is None:
+                about_llm = single_flight(
+                    _SEALION_ABOUT_CACHE,
+                    about_key_global,
+                    lambda: self.sealion_generate_about(
+                        name=cache_payload["name"],
+                        kinds=cache_payload["kinds"],
+                        description=cache_payload["description"],
+                        address=cache_payload["address"],
+                        opening_hours=cache_payload["opening_hours"],
+                        website=cache_payload["website"],
+                        context=sealion_context,
+                    ),
+                    ttl=ttl,
+                    cacheable=_is_llm_payload,
+                )
+                if _is_llm_payload(about_llm):
+                    req_cache[about_key] = about_llm
 
-            # Only cache successful LLM results (so if SeaLion is down, we fall back properly)
-            if isinstance(about_llm, dict) and about_llm:
-                req_cache[cache_key] = about_llm
-                _cache_set(_SEALION_ABOUT_CACHE, _SEALION_ABOUT_CACHE_LOCK, cache_key, about_llm, ttl)
-                cache.set(cache_key_global, about_llm, ttl)
-
-        # 5) Final: use LLM if available; otherwise deterministic fallback
-        if about_llm:
-            out["about"] = about_llm
-        else:
-            out["about"] = build_about_payload(
-                out.get("name") or title or "Place",
-                out.get("kinds"),
-                out.get("address"),
-                out.get("description"),
-                out.get("opening_hours"),
-                out.get("website"),
-                nearby_titles,
-            )
+            return about_llm
 
         # ----------------------------
         # Travel payload (SeaLion + caching)
         # ----------------------------
-        trip_city = (getattr(trip, "main_city", None) or "").strip() or extract_city_hint(out.get("address"))
-        trip_country = (getattr(trip, "main_country", None) or "").strip() or extract_country_hint(out.get("address"))
+        travel_ttl = int(os.getenv("SEALION_TRAVEL_CACHE_TTL_SECONDS", "86400"))
 
         trip_start = str(trip.start_date) if getattr(trip, "start_date", None) else None
         trip_end = str(trip.end_date) if getattr(trip, "end_date", None) else None
 
-        travel_ttl = int(os.getenv("SEALION_TRAVEL_CACHE_TTL_SECONDS", "86400"))
+        def trip_location(address: str | None):
+            trip_city = (getattr(trip, "main_city", None) or "").strip() or extract_city_hint(address)
+            trip_country = (getattr(trip, "main_country", None) or "").strip() or extract_country_hint(address)
+            return trip_city, trip_country
 
         def build_travel_fallback(name: str | None, address: str | None):
+            trip_city, trip_country = trip_location(address)
             place_name = (name or "this place").strip() or "this place"
             loc = ", ".join([p for p in [trip_city, trip_country] if p]) or "the area"
             addr_hint = f"Navigate to: {address}" if address else None
@@ -1609,66 +1559,143 @@ class ItineraryItemViewSet(BaseViewSet):
                 ],
             }
 
-        travel_cache_payload = {
-            "place_name": (out.get("name") or title or "Place").strip(),
-            "address": out.get("address"),
-            "city": trip_city,
-            "country": trip_country,
-            "trip_start": trip_start,
-            "trip_end": trip_end,
-            "opening_hours": out.get("opening_hours"),
-            "website": out.get("website"),
-            # include a tiny bit of signal so travel can be more relevant
-            "kinds": out.get("kinds"),
-            "nearby": [n.get("name") for n in (out.get("nearby") or []) if n.get("name")][:6],
-        }
-        travel_cache_key = _cache_key(travel_cache_payload)
-        travel_cache_key_global = f"sealion_travel:{item.id}:{travel_cache_key}"
-
-        # Request-level cache (prevents double-generation within same request)
-        req_cache = getattr(request, "_sealion_travel_req_cache", None)
-        if req_cache is None:
-            req_cache = {}
-            setattr(request, "_sealion_travel_req_cache", req_cache)
-
-        travel_llm = req_cache.get(travel_cache_key)
-
-        # Shared cache (Django cache backend)
-        if travel_llm is None:
-            travel_llm = cache.get(travel_cache_key_global)
-
-        # Cross-request in-memory cache
-        if travel_llm is None:
-            travel_llm = _cache_get(_SEALION_TRAVEL_CACHE, _SEALION_TRAVEL_CACHE_LOCK, travel_cache_key)
-
-        # Generate once via SeaLion
-        if travel_llm is None:
-            travel_llm = self.sealion_generate_travel(
-                place_name=travel_cache_payload["place_name"],
-                address=travel_cache_payload["address"],
-                city=travel_cache_payload["city"],
-                country=travel_cache_payload["country"],
-                trip_start=travel_cache_payload["trip_start"],
-                trip_end=travel_cache_payload["trip_end"],
-                opening_hours=travel_cache_payload["opening_hours"],
-                website=travel_cache_payload["website"],
+        def fetch_travel(deps: dict):
+            # Travel does not wait for Wikipedia: none of its prompt fields come from there.
+            base = apply_sources(dict(out), deps)
+            trip_city, trip_country = trip_location(base.get("address"))
+
+            travel_cache_payload = {
+                "place_name": (base.get("name") or title or "Place").strip(),
+                "address": base.get("address"),
+                "city": trip_city,
+                "country": trip_country,
+                "trip_start": trip_start,
+                "trip_end": trip_end,
+                "opening_hours": base.get("opening_hours"),
+                "website": base.get("website"),
+                # include a tiny bit of signal so travel can be more relevant
+                "kinds": base.get("kinds"),
+                "nearby": [n.get("name") for n in (base.get("nearby") or []) if n.get("name")][:6],
+            }
+            travel_cache_key = _cache_key(travel_cache_payload)
+            travel_cache_key_global = f"{item.id}:{travel_cache_key}"
+
+            # Request-level cache (prevents double-generation within same request)
+            req_cache = getattr(request, "_sealion_travel_req_cache", None)
+            if req_cache is None:
+                req_cache = {}
+                setattr(request, "_sealion_travel_req_cache", req_cache)
+
+            travel_llm = req_cache.get(travel_cache_key)
+
+            # Shared cache, else generate once via SeaLion (coalesced across viewers)
+            if travel_llm is None:
+                travel_llm = single_flight(
+                    _SEALION_TRAVEL_CACHE,
+                    travel_cache_key_global,
+                    lambda: self.sealion_generate_travel(
+                        place_name=travel_cache_payload["place_name"],
+                        address=travel_cache_payload["address"],
+                        city=travel_cache_payload["city"],
+                        country=travel_cache_payload["country"],
+                        trip_start=travel_cache_payload["trip_start"],
+                        trip_end=travel_cache_payload["trip_end"],
+                        opening_hours=travel_cache_payload["opening_hours"],
+                        website=travel_cache_payload["website"],
+                    ),
+                    ttl=travel_ttl,
+                    cacheable=_is_llm_payload,
+                )
+                if _is_llm_payload(travel_llm):
+                    req_cache[travel_cache_key] = travel_llm
+
+            return travel_llm
+
+        # ----------------------------
+        # Concurrent fetch stage
+        # ----------------------------
+        # Independent lookups run in parallel; Wikipedia summary waits for geosearch,
+        # gallery/About wait for the summary. Bounded by one overall deadline.
+        deadline = float(os.getenv("PLACE_DETAILS_DEADLINE_SECONDS", "20"))
+        fan = FanOut(deadline_seconds=deadline, max_workers=8, name="place-details")
+        # The whole day's stops go in one Overpass query, so opening the next
+        # stop's details is a cache hit
+        day_stops = _day_stops(item)
+        fan.add("osm", lambda deps: lookup_opening_hours(_items_opening_hours(day_stops), item_lat, item_lon))
+        fan.add("mapbox_poi", lambda deps: mapbox_reverse(item_lat, item_lon, types="poi", limit=1))
+        fan.add("mapbox_addr", lambda deps: mapbox_reverse(item_lat, item_lon, types="address,place,locality", limit=1))
+        # Places we already store (destinations, public itineraries) stand in for
+        # the Wikipedia nearby list when the area is well covered
+        local_nearby = nearby_places(item_lat, item_lon, radius_m=5000, limit=12, exclude_names=[title])
+        if len(local_nearby) >= LOCAL_NEARBY_MIN:
+            fan.add("wiki_geo_nearby", lambda deps: local_nearby, default=[])
+        else:
+            fan.add("wiki_geo_nearby", lambda deps: wiki_geosearch(item_lat, item_lon, radius_m=5000, limit=12), default=[])
+        fan.add("wiki_geo_wide", lambda deps: wiki_geosearch(item_lat, item_lon, radius_m=12000, limit=12), default=[])
+        fan.add("wiki", fetch_wiki, after=["wiki_geo_wide"], default={})
+        fan.add("gallery", fetch_gallery, after=["wiki", "mapbox_addr", "wiki_geo_nearby"], default={})
+        fan.add("about", fetch_about, after=["osm", "mapbox_poi", "mapbox_addr", "wiki_geo_nearby", "wiki"])
+        fan.add("travel", fetch_travel, after=["osm", "mapbox_poi", "mapbox_addr", "wiki_geo_nearby"])
+        result = fan.run()
+
+        apply_sources(out, result.values)
+
+        gallery_info = result.get("gallery", {})
+        gallery: list[str] = list(gallery_info.get("images") or [])
+        if not out["image_url"] and gallery_info.get("hero"):
+            out["image_url"] = gallery_info["hero"]
+
+        # Ensure hero is included first in images (if gallery is enabled)
+        if include_images_n > 0:
+            if out["image_url"] and out["image_url"] not in gallery:
+                gallery = [out["image_url"]] + gallery
+
+            # dedupe preserve order
+            seen = set()
+            deduped = []
+            for u in gallery:
+                if not u or u in seen:
+                    continue
+                seen.add(u)
+                deduped.append(u)
+                if len(deduped) >= include_images_n + (1 if out["image_url"] else 0):
+                    break
+
+            out["images"] = deduped
+        else:
+            out["images"] = []
+
+        # Final: use LLM if available; otherwise deterministic fallback
+        about_llm = result.get("about")
+        if about_llm:
+            out["about"] = about_llm
+        else:
+            nearby_titles = [n.get("name") for n in (out.get("nearby") or []) if n.get("name")]
+            out["about"] = build_about_payload(
+                out.get("name") or title or "Place",
+                out.get("kinds"),
+                out.get("address"),
+                out.get("description"),
+                out.get("opening_hours"),
+                out.get("website"),
+                nearby_titles,
             )
-            if isinstance(travel_llm, dict) and travel_llm:
-                req_cache[travel_cache_key] = travel_llm
-                _cache_set(_SEALION_TRAVEL_CACHE, _SEALION_TRAVEL_CACHE_LOCK, travel_cache_key, travel_llm, travel_ttl)
-                cache.set(travel_cache_key_global, travel_llm, travel_ttl)
 
         # Attach to response (ensure consistent shape)
+        travel_llm = result.get("travel")
         if isinstance(travel_llm, dict) and travel_llm:
             out["travel"] = travel_llm
         else:
             out["travel"] = build_travel_fallback(out.get("name") or title, out.get("address"))
 
+        out["sources"] = result.status
+        out["partial"] = result.partial
 
-        # Cache aggressively for images, but avoid caching missing hours for long
-        if out.get("opening_hours") or include_images_n > 0:
+        # Cache aggressively for images, but avoid caching missing hours for long.
+        # Partial responses (a source timed out) are not cached so the next open retries.
+        if not result.partial and (out.get("opening_hours") or include_images_n > 0):
             ttl = 3600 if include_images_n == 0 else 1200
-            cache.set(cache_key, out, ttl)
+            _PLACE_DETAILS_CACHE.set(cache_key, out, ttl)
 
         return Response(out, status=status.HTTP_200_OK)
     
@@ -1958,89 +1985,23 @@ class ViewTripView(APIView):
         """
         Returns trip information for public viewing.
         Does not include sensitive information like collaborator emails.
+        Served from a cached snapshot (see services/trip_snapshot.py) with an ETag.
         """
-        try:
-            trip = Trip.objects.select_related('owner').get(id=trip_id)
-        except Trip.DoesNotExist:
+        snapshot = get_trip_view_snapshot(trip_id)
+        if snapshot is None:
             return Response(
                 {"error": "Trip not found"},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        # Get owner name - handle different AppUser model structures
-        owner_name = "Anonymous"
-        if trip.owner:
-            # Try different common field combinations
-            if hasattr(trip.owner, 'full_name') and trip.owner.full_name:
-                owner_name = trip.owner.full_name
-            elif hasattr(trip.owner, 'first_name') and hasattr(trip.owner, 'last_name'):
-                owner_name = f"{trip.owner.first_name} {trip.owner.last_name}".strip()
-            elif hasattr(trip.owner, 'username') and trip.owner.username:
-                owner_name = trip.owner.username
-            elif hasattr(trip.owner, 'email') and trip.owner.email:
-                owner_name = trip.owner.email.split('@')[0]  # Use part before @
-
-        # Build response with trip details
-        trip_data = {
-            "id": trip.id,
-            "title": trip.title,
-            "destination": trip.destination if hasattr(trip, 'destination') else None,
-            "start_date": trip.start_date.isoformat() if trip.start_date else None,
-            "end_date": trip.end_date.isoformat() if trip.end_date else None,
-            "created_at": trip.created_at.isoformat() if hasattr(trip, 'created_at') else None,
-            
-            # Include owner info (non-sensitive)
-            "owner": {
-                "name": owner_name,
-            },
-            
-            # Include trip days and itinerary items
-            "days": self._get_trip_days(trip),
-            
-            # View-only flag
-            "is_view_only": True,
-        }
-
-        return Response(trip_data, status=status.HTTP_200_OK)
-
-    def _get_trip_days(self, trip):
-        """
-        Helper method to get trip days with itinerary items.
-        Includes lat, lon, address, thumbnail_url for map display.
-        """
-        days = TripDay.objects.filter(trip=trip).order_by('day_index')
-        
-        days_data = []
-        for day in days:
-            # Changed: trip_day → day (based on your model structure)
-            items = ItineraryItem.objects.filter(day=day).order_by('sort_order')
-            
-            items_data = []
-            for item in items:
-                items_data.append({
-                    "id": item.id,
-                    "title": item.title,
-                    "description": getattr(item, 'description', None),
-                    "location": getattr(item, 'location', None),
-                    "address": getattr(item, 'address', None),
-                    "start_time": str(getattr(item, 'start_time', None)) if getattr(item, 'start_time', None) else None,
-                    "end_time": str(getattr(item, 'end_time', None)) if getattr(item, 'end_time', None) else None,
-                    "sort_order": getattr(item, 'sort_order', None),
-                    # Add coordinates for map
-                    "lat": float(item.lat) if hasattr(item, 'lat') and item.lat is not None else None,
-                    "lon": float(item.lon) if hasattr(item, 'lon') and item.lon is not None else None,
-                    # Add thumbnail for images
-                    "thumbnail_url": getattr(item, 'thumbnail_url', None),
-                })
-            
-            days_data.append({
-                "id": day.id,
-                "day_index": day.day_index,
-                "date": day.date.isoformat() if day.date else None,
-                "items": items_data,
-            })
-        
-        return days_data
+        etag = snapshot["etag"]
+        if request.META.get("HTTP_IF_NONE_MATCH") == etag:
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = HttpResponse(snapshot["json"], content_type="application/json")
+        response["ETag"] = etag
+        response["Cache-Control"] = "no-cache"
+        return response
 
 class GenerateShareLinkView(APIView):
     """
@@ -2066,14 +2027,7 @@ class GenerateShareLinkView(APIView):
             )
 
         # Check if user has permission to share this trip
-        is_owner = trip.owner == current_user
-        is_collaborator = TripCollaborator.objects.filter(
-            trip=trip,
-            user=current_user,
-            status=TripCollaborator.Status.ACTIVE
-        ).exists()
-
-        if not (is_owner or is_collaborator):
+        if not can_access_trip(current_user, trip, active_only=True):
             return Response(
                 {"error": "You don't have permission to share this trip"},
                 status=status.HTTP_403_FORBIDDEN
@@ -1,10 +1,10 @@
 # backend/TripMateFunctions/views/f1_2_views.py
-import math
-import os
 import logging
+from collections import defaultdict
 
-import requests
-from django.conf import settings
+import numpy as np
+
+from django.db import transaction
 
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -16,131 +16,59 @@ from ..serializers.f1_2_serializers import (
     F12RouteOptimizationResponseSerializer,
     F12RouteLegsResponseSerializer,
 )
+from ..services.routing import balanced_clusters, get_travel_matrix, haversine_matrix, optimise_order
+from ..services.trip_snapshot import invalidate_trip_snapshot
+from ..services.trip_sync import record_upserts
 
 logger = logging.getLogger(__name__)
 
 
-def _haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """
-    Simple great-circle distance in kilometres between two lat/lon points.
-    Good enough for an internal heuristic; you can swap to ORS distances later.
-    """
-    R = 6371.0
-    phi1 = math.radians(lat1)
-    phi2 = math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlambda = math.radians(lon2 - lon1)
-
-    a = (
-        math.sin(dphi / 2) ** 2
-        + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+def _geocoded_items_by_day(trip):
+    """All geocoded items of the trip in one query, grouped by day id."""
+    by_day = defaultdict(list)
+    items = (
+        ItineraryItem.objects.filter(trip=trip, lat__isnull=False, lon__isnull=False)
+        .order_by("sort_order", "start_time", "id")
     )
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    return R * c
-
-def _get_ors_key() -> str:
-    return (
-        getattr(settings, "OPENROUTESERVICE_API_KEY", None)
-        or os.environ.get("OPENROUTESERVICE_API_KEY")
-        or ""
-    ).strip()
-
-def _normalize_profile(profile: str) -> str:
-    p = (profile or "").strip()
-    allowed = {
-        "driving-car",
-        "driving-hgv",
-        "cycling-regular",
-        "cycling-road",
-        "cycling-mountain",
-        "cycling-electric",
-        "foot-walking",
-        "foot-hiking",
-        "wheelchair",
-    }
-    if p in allowed:
-        return p
-    return "driving-car"
-
-def _fallback_speed_kmh(profile: str) -> float:
-    p = (profile or "").strip()
-    if p == "foot-walking":
-        return 4.5
-    if p == "cycling-regular":
-        return 15.0
-    return 30.0  # driving-car fallback
-
-def _ors_leg(a, b, profile: str):
-    """
-    Returns (distance_km, duration_min) using OpenRouteService, or None on failure.
-    """
-    api_key = _get_ors_key()
-    if not api_key:
-        return None
-
-    ors_profile = _normalize_profile(profile)
-    url = f"https://api.openrouteservice.org/v2/directions/{ors_profile}"
-    headers = {
-        "Authorization": api_key,
-        "Content-Type": "application/json",
-    }
-    payload = {
-        "coordinates": [[a.lon, a.lat], [b.lon, b.lat]],
-        "instructions": False,
-    }
-
-    try:
-        resp = requests.post(url, json=payload, headers=headers, timeout=8)
-        if resp.status_code != 200:
-            logger.warning("ORS error %s: %s", resp.status_code, resp.text[:200])
-            return None
-        data = resp.json()
-        routes = data.get("routes") or []
-        if not routes:
-            return None
-        summary = routes[0].get("summary") or {}
-        meters = summary.get("distance")
-        seconds = summary.get("duration")
-        if meters is None or seconds is None:
-            return None
-        return round(meters / 1000, 2), round(seconds / 60, 1)
-    except Exception as exc:
-        logger.warning("ORS request failed: %s", exc)
-        return None
-
-def _compute_leg(a, b, profile: str):
+    for item in items:
+        by_day[item.day_id].append(item)
+    return by_day
+
+
+def _points(items):
+    return [(float(i.lat), float(i.lon)) for i in items]
+
+
+def _legs_for_route(route, matrix, order):
     """
-    Compute per-leg distance/time using ORS when available, with fallback.
+    Leg dicts for consecutive stops. ``route`` are the items in visiting order,
+    ``order`` their indices into ``matrix``.
     """
-    ors = _ors_leg(a, b, profile)
-    if ors:
-        return ors
+    legs = []
+    for (a, b), (_, _, dist_km, minutes) in zip(zip(route[:-1], route[1:]), matrix.legs(order)):
+        legs.append(
+            {
+                "from_id": a.id,
+                "to_id": b.id,
+                "distance_km": dist_km,
+                "duration_min": minutes,
+            }
+        )
+    return legs
 
-    dist = _haversine_km(a.lat, a.lon, b.lat, b.lon)
-    speed_kmh = _fallback_speed_kmh(profile)
-    minutes = dist / speed_kmh * 60.0
-    return round(dist, 2), round(minutes, 1)
 
-def _nearest_neighbor_route(items):
-    """items must all have lat/lon. Starts from first in current order."""
+def _optimise_items(items, profile: str):
+    """
+    Optimise the visiting order of ``items`` (first item stays first).
+    Returns (route, legs) using one travel matrix for the whole set.
+    """
     if len(items) < 2:
-        return items
-
-    remaining = items.copy()
-    route = [remaining.pop(0)]
+        return list(items), []
+    matrix = get_travel_matrix(_points(items), profile)
+    order = optimise_order(matrix.duration_min, start=0)
+    route = [items[i] for i in order]
+    return route, _legs_for_route(route, matrix, order)
 
-    while remaining:
-        last = route[-1]
-        best_idx = 0
-        best_dist = float("inf")
-        for idx, cand in enumerate(remaining):
-            d = _haversine_km(last.lat, last.lon, cand.lat, cand.lon)
-            if d < best_dist:
-                best_dist = d
-                best_idx = idx
-        route.append(remaining.pop(best_idx))
-
-    return route
 
 class F12RouteOptimizationView(APIView):
     """
@@ -156,7 +84,8 @@ class F12RouteOptimizationView(APIView):
 
     Behaviour:
       - Loads all ItineraryItems for the trip that have lat/lon
-      - Runs a nearest-neighbour heuristic to produce an efficient route
+      - Builds one travel matrix per day (ORS matrix, haversine fallback) and
+        optimises the order (nearest neighbour + 2-opt/Or-opt)
       - Updates each item's sort_order in DB
       - Returns optimised order + per-leg distance/time summary
 
@@ -177,45 +106,41 @@ class F12RouteOptimizationView(APIView):
             return Response({"detail": "Trip not found"}, status=status.HTTP_404_NOT_FOUND)
 
         days = list(TripDay.objects.filter(trip=trip).order_by("day_index", "id"))
+        items_by_day = _geocoded_items_by_day(trip)
+        profile = req_ser.validated_data.get("profile")
 
         all_legs = []
         total_dist = 0.0
         total_min = 0.0
         updated_items = []
         flattened_order = []
+        changed = []
 
         # optimise each day separately
         for day in days:
-            day_items = list(
-                ItineraryItem.objects.filter(trip=trip, day=day, lat__isnull=False, lon__isnull=False)
-                .order_by("sort_order", "start_time", "id")
-            )
-
-            route = _nearest_neighbor_route(day_items)
+            route, legs = _optimise_items(items_by_day.get(day.id, []), profile)
 
             # legs within the day route
-            for a, b in zip(route[:-1], route[1:]):
-                dist_km, minutes = _compute_leg(a, b, req_ser.validated_data.get("profile"))
-                total_dist += dist_km
-                total_min += minutes
-                all_legs.append(
-                    {
-                        "from_id": a.id,
-                        "to_id": b.id,
-                        "distance_km": dist_km,
-                        "duration_min": minutes,
-                    }
-                )
+            for leg in legs:
+                total_dist += leg["distance_km"]
+                total_min += leg["duration_min"]
+            all_legs.extend(legs)
 
             # persist per-day sort_order 1..N
             for order, item in enumerate(route, start=1):
                 if item.sort_order != order:
                     item.sort_order = order
-                    item.save(update_fields=["sort_order"])
+                    changed.append(item)
 
                 updated_items.append({"id": item.id, "day": day.id, "sort_order": order})
                 flattened_order.append(item.id)
 
+        if changed:
+            with transaction.atomic():
+                ItineraryItem.objects.bulk_update(changed, ["sort_order"])
+                invalidate_trip_snapshot(trip.id)
+                record_upserts(trip.id, changed)
+
         response_data = {
             "optimized_order": flattened_order,
             "legs": all_legs,
@@ -229,8 +154,16 @@ class F12RouteOptimizationView(APIView):
     
 class F12FullTripRouteOptimizationView(APIView):
     """
-    Full trip optimisation: optimises across ALL stops, then redistributes them across days
-    while keeping the same number of geocoded stops per day.
+    Full trip optimisation: regroups ALL stops into geographically compact days,
+    keeping the same number of geocoded stops per day, then optimises the
+    order within each day.
+
+    - capacity-constrained k-means (k = number of days, seeded with the
+      current day of each stop so days keep their rough identity)
+    - one travel matrix per day (ORS, haversine fallback), so a long trip
+      stays under the ORS matrix limit as long as each day does
+    - per-day tour: starts at the stop closest to where the previous day ended
+    - reports travel time saved against the current order
     """
 
     def post(self, request, *args, **kwargs):
@@ -244,82 +177,99 @@ class F12FullTripRouteOptimizationView(APIView):
             return Response({"detail": "Trip not found"}, status=status.HTTP_404_NOT_FOUND)
 
         days = list(TripDay.objects.filter(trip=trip).order_by("day_index", "id"))
+        items_by_day = _geocoded_items_by_day(trip)
 
-        # all geocoded items, regardless of day
-        items = list(
-            ItineraryItem.objects.filter(trip=trip, lat__isnull=False, lon__isnull=False)
-            .order_by("sort_order", "start_time", "id")
-        )
-
-        if len(items) < 2:
+        # keep same number of geocoded stops per day as before
+        day_counts = [len(items_by_day.get(day.id, [])) for day in days]
+        if sum(day_counts):
+            # stops already scheduled on a day, in their current day/order
+            items = [item for day in days for item in items_by_day.get(day.id, [])]
+            current_labels = [j for j, count in enumerate(day_counts) for _ in range(count)]
+        else:
+            # if days exist but all counts are 0 (rare), put every geocoded stop on the first day
+            items = [item for group in items_by_day.values() for item in group]
+            day_counts = [len(items)] + [0] * max(0, len(days) - 1)
+            current_labels = None
+
+        if len(items) < 2 or not days:
             response_data = {
                 "optimized_order": [i.id for i in items],
                 "legs": [],
                 "total_distance_km": 0.0,
                 "total_duration_min": 0.0,
+                "baseline_duration_min": 0.0,
+                "time_saved_min": 0.0,
                 "updated_items": [{"id": i.id, "day": i.day_id, "sort_order": i.sort_order or 1} for i in items],
             }
             res_ser = F12RouteOptimizationResponseSerializer(response_data)
             return Response(res_ser.data, status=status.HTTP_200_OK)
 
-        route = _nearest_neighbor_route(items)
+        points = _points(items)
+        profile = req_ser.validated_data.get("profile")
 
-        # keep same number of geocoded stops per day as before
-        day_counts = []
-        for day in days:
-            c = (
-                ItineraryItem.objects.filter(trip=trip, day=day, lat__isnull=False, lon__isnull=False)
-                .count()
-            )
-            day_counts.append(c)
+        # travel time of the current plan (within-day legs only)
+        baseline_min = 0.0
+        if current_labels is not None:
+            offset = 0
+            for count in day_counts:
+                if count > 1:
+                    day_matrix = get_travel_matrix(points[offset:offset + count], profile)
+                    baseline_min += day_matrix.path_duration(list(range(count)))
+                offset += count
 
-        # if days exist but all counts are 0 (rare), just keep original day assignment
-        if sum(day_counts) == 0:
-            day_counts = [len(route)] + [0] * max(0, len(days) - 1)
+        labels = balanced_clusters(points, day_counts, init_labels=current_labels)
 
+        route_idx = []
         legs = []
-        total_dist = 0.0
-        total_min = 0.0
-
-        for a, b in zip(route[:-1], route[1:]):
-            dist_km, minutes = _compute_leg(a, b, req_ser.validated_data.get("profile"))
-            total_dist += dist_km
-            total_min += minutes
-            legs.append(
-                {
-                    "from_id": a.id,
-                    "to_id": b.id,
-                    "distance_km": dist_km,
-                    "duration_min": minutes,
-                }
-            )
-
-        # redistribute route into days using the existing per-day stop counts
         updated_items = []
-        idx = 0
-        for day, count in zip(days, day_counts):
-            chunk = route[idx : idx + count]
-            idx += count
-
-            for order, item in enumerate(chunk, start=1):
+        changed_items = []
+        prev_end = 0  # day 1 starts near the trip's current first stop
+        for j, day in enumerate(days):
+            members = np.flatnonzero(labels == j)
+            if not len(members):
+                continue
+
+            day_points = [points[i] for i in members]
+            # no matrix spans two days: the nearest stop as the crow flies
+            start = int(np.argmin(haversine_matrix([points[prev_end]] + day_points)[0, 1:]))
+            day_matrix = get_travel_matrix(day_points, profile)
+            local = optimise_order(day_matrix.duration_min, start=start)
+            order = members[local]
+            prev_end = int(order[-1])
+
+            chunk = [items[i] for i in order]
+            route_idx.extend(int(i) for i in order)
+            legs.extend(_legs_for_route(chunk, day_matrix, local))
+
+            for sort_order, item in enumerate(chunk, start=1):
                 changed = False
                 if item.day_id != day.id:
                     item.day = day
                     changed = True
-                if item.sort_order != order:
-                    item.sort_order = order
+                if item.sort_order != sort_order:
+                    item.sort_order = sort_order
                     changed = True
 
                 if changed:
-                    item.save(update_fields=["day", "sort_order"])
+                    changed_items.append(item)
 
-                updated_items.append({"id": item.id, "day": day.id, "sort_order": order})
+                updated_items.append({"id": item.id, "day": day.id, "sort_order": sort_order})
+
+        if changed_items:
+            with transaction.atomic():
+                ItineraryItem.objects.bulk_update(changed_items, ["day", "sort_order"])
+                invalidate_trip_snapshot(trip.id)
+                record_upserts(trip.id, changed_items)
 
+        total_dist = sum(leg["distance_km"] for leg in legs)
+        total_min = sum(leg["duration_min"] for leg in legs)
         response_data = {
-            "optimized_order": [i.id for i in route],
+            "optimized_order": [items[i].id for i in route_idx],
             "legs": legs,
             "total_distance_km": round(total_dist, 2),
             "total_duration_min": round(total_min, 1),
+            "baseline_duration_min": round(baseline_min, 1),
+            "time_saved_min": round(max(baseline_min - total_min, 0.0), 1),
             "updated_items": updated_items,
         }
 
@@ -351,28 +301,22 @@ class F12RouteLegsView(APIView):
             return Response({"detail": "Trip not found"}, status=status.HTTP_404_NOT_FOUND)
 
         days = list(TripDay.objects.filter(trip=trip).order_by("day_index", "id"))
+        items_by_day = _geocoded_items_by_day(trip)
         all_legs = []
         total_dist = 0.0
         total_min = 0.0
 
         for day in days:
-            day_items = list(
-                ItineraryItem.objects.filter(
-                    trip=trip, day=day, lat__isnull=False, lon__isnull=False
-                ).order_by("sort_order", "start_time", "id")
-            )
-            for a, b in zip(day_items[:-1], day_items[1:]):
-                dist_km, minutes = _compute_leg(a, b, profile)
-                total_dist += dist_km
-                total_min += minutes
-                all_legs.append(
-                    {
-                        "from_id": a.id,
-                        "to_id": b.id,
-                        "distance_km": dist_km,
-                        "duration_min": minutes,
-                    }
-                )
+            day_items = items_by_day.get(day.id, [])
+            if len(day_items) < 2:
+                continue
+            # one matrix per day instead of one ORS call per leg
+            matrix = get_travel_matrix(_points(day_items), profile)
+            legs = _legs_for_route(day_items, matrix, list(range(len(day_items))))
+            for leg in legs:
+                total_dist += leg["distance_km"]
+                total_min += leg["duration_min"]
+            all_legs.extend(legs)
 
         response_data = {
             "legs": all_legs,
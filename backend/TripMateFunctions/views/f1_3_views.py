@@ -1,4 +1,5 @@
 # backend/TripMateFunctions/views/f1_3_views.py
+import hashlib
 import json
 import logging
 import os
@@ -22,6 +23,7 @@ from ..models import (
     TripBudget,
     GroupPreference,
     AppUser,
+    BackgroundJob,
 )
 from ..serializers.f1_3_serializers import (
     F13AITripPromptSerializer,
@@ -30,6 +32,16 @@ from ..serializers.f1_3_serializers import (
     F13SoloTripGenerateRequestSerializer,
     F13SoloTripGenerateResponseSerializer,
 )
+from ..services.ai_stream import (
+    AIStreamError,
+    ItineraryStreamParser,
+    event_stream_response,
+    iter_sse_data,
+    sse_event,
+    wants_event_stream,
+)
+from ..services.jobs import JobError, enqueue, report_progress
+from ..services.trip_clone import bulk_create_days, bulk_create_items
 
 # from ..views.f2_2_views import F22GroupTripGeneratorView
 
@@ -75,15 +87,17 @@ def _slice_first_json_block(text: str) -> str | None:
     return text[start : end + 1]
 
 
-def _call_sea_lion(messages, temperature=0.4, max_tokens=None, timeout=40):
+SEA_LION_CHAT_URL = "https://api.sea-lion.ai/v1/chat/completions"
+GEMINI_API_BASE = "https://generativelanguage.googleapis.com/v1/models"
+
+
+def _sea_lion_request(messages, temperature=0.4, max_tokens=None):
+    """(api_key, payload) for the OpenAI-compatible Sea-Lion chat endpoint."""
     api_key = getattr(settings, "SEA_LION_API_KEY", None) or os.environ.get(
         "SEA_LION_API_KEY"
     )
     model = getattr(settings, "SEA_LION_MODEL", None) or "aisingapore/Llama-SEA-LION-v3-70B-IT"
 
-    if not api_key:
-        return None, "missing_api_key"
-
     payload = {
         "model": model,
         "messages": messages,
@@ -91,10 +105,18 @@ def _call_sea_lion(messages, temperature=0.4, max_tokens=None, timeout=40):
     }
     if max_tokens is not None:
         payload["max_completion_tokens"] = max_tokens
+    return api_key, payload
+
+
+def _call_sea_lion(messages, temperature=0.4, max_tokens=None, timeout=40):
+    api_key, payload = _sea_lion_request(messages, temperature, max_tokens)
+
+    if not api_key:
+        return None, "missing_api_key"
 
     try:
         resp = requests.post(
-            "https://api.sea-lion.ai/v1/chat/completions",
+            SEA_LION_CHAT_URL,
             headers={
                 "accept": "application/json",
                 "Authorization": f"Bearer {api_key}",
@@ -129,22 +151,15 @@ def _call_sea_lion(messages, temperature=0.4, max_tokens=None, timeout=40):
     return answer, None
 
 
-def _call_gemini(messages, temperature=0.4, max_tokens=None, timeout=40):
-    """
-    Removed systemInstruction parameter that caused 400 error
-    Now injects system prompt as first user message instead
-    """
+def _gemini_request(messages, temperature=0.4, max_tokens=None):
+    """(api_key, model, payload) for Gemini generateContent / streamGenerateContent."""
     api_key = getattr(settings, "GEMINI_API_KEY", None) or os.environ.get(
         "GEMINI_API_KEY"
     )
     model = getattr(settings, "GEMINI_MODEL", None) or "gemini-1.5-flash-latest"
 
-    if not api_key:
-        return None, "missing_api_key"
-
     # Build contents array with system prompt injected as first message
     contents = []
-    system_prompt_found = False
     
     for msg in messages:
         role = msg.get("role")
@@ -162,7 +177,6 @@ def _call_gemini(messages, temperature=0.4, max_tokens=None, timeout=40):
                 "role": "model",
                 "parts": [{"text": "I understand. I will follow these instructions carefully."}]
             })
-            system_prompt_found = True
             continue
 
         # Convert role to Gemini format
@@ -180,10 +194,22 @@ def _call_gemini(messages, temperature=0.4, max_tokens=None, timeout=40):
     
     if max_tokens is not None:
         payload["generationConfig"]["maxOutputTokens"] = max_tokens
+    return api_key, model, payload
+
+
+def _call_gemini(messages, temperature=0.4, max_tokens=None, timeout=40):
+    """
+    Removed systemInstruction parameter that caused 400 error
+    Now injects system prompt as first user message instead
+    """
+    api_key, model, payload = _gemini_request(messages, temperature, max_tokens)
+
+    if not api_key:
+        return None, "missing_api_key"
 
    
     endpoint = (
-        f"https://generativelanguage.googleapis.com/v1/models/{model}:generateContent"
+        f"{GEMINI_API_BASE}/{model}:generateContent"
         f"?key={api_key}"
     )
 
@@ -240,6 +266,106 @@ def _generate_with_fallback(messages, temperature=0.4, max_tokens=None, timeout=
     return None, None, primary_error, fallback_error
 
 
+# ----------------------------
+# Streaming (SSE) variants
+# ----------------------------
+# `timeout` is the longest silence between two chunks, not the whole completion.
+
+def _stream_sea_lion(messages, temperature=0.4, max_tokens=None, timeout=20):
+    """Yield text deltas from Sea-Lion's OpenAI-compatible stream."""
+    api_key, payload = _sea_lion_request(messages, temperature, max_tokens)
+    if not api_key:
+        raise AIStreamError("missing_api_key")
+    payload["stream"] = True
+
+    try:
+        with requests.post(
+            SEA_LION_CHAT_URL,
+            headers={
+                "accept": "text/event-stream",
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json",
+            },
+            json=payload,
+            timeout=(5, timeout),
+            stream=True,
+        ) as resp:
+            if not resp.ok:
+                logger.warning("Sea-Lion stream returned %s: %s", resp.status_code, resp.text[:200])
+                raise AIStreamError(f"bad_status_{resp.status_code}")
+            for data in iter_sse_data(resp):
+                if data == "[DONE]":
+                    return
+                try:
+                    choice = (json.loads(data).get("choices") or [{}])[0]
+                except (ValueError, AttributeError):
+                    continue
+                delta = (choice.get("delta") or {}).get("content")
+                if delta:
+                    yield delta
+    except requests.RequestException as exc:
+        logger.warning("Sea-Lion stream failed: %s", exc)
+        raise AIStreamError("network_error") from exc
+
+
+def _stream_gemini(messages, temperature=0.4, max_tokens=None, timeout=20):
+    """Yield text deltas from Gemini's streamGenerateContent (alt=sse)."""
+    api_key, model, payload = _gemini_request(messages, temperature, max_tokens)
+    if not api_key:
+        raise AIStreamError("missing_api_key")
+
+    endpoint = f"{GEMINI_API_BASE}/{model}:streamGenerateContent?alt=sse&key={api_key}"
+    try:
+        with requests.post(endpoint, json=payload, timeout=(5, timeout), stream=True) as resp:
+            if not resp.ok:
+                logger.warning("Gemini stream returned %s: %s", resp.status_code, resp.text[:200])
+                raise AIStreamError(f"bad_status_{resp.status_code}")
+            for data in iter_sse_data(resp):
+                try:
+                    candidates = json.loads(data).get("candidates") or []
+                except (ValueError, AttributeError):
+                    continue
+                if not candidates:
+                    continue
+                for part in candidates[0].get("content", {}).get("parts", []):
+                    text = part.get("text") if isinstance(part, dict) else None
+                    if text:
+                        yield text
+    except requests.RequestException as exc:
+        logger.warning("Gemini stream failed: %s", exc)
+        raise AIStreamError("network_error") from exc
+
+
+def _stream_with_fallback(messages, temperature=0.4, max_tokens=None, timeout=20):
+    """
+    Streaming counterpart of _generate_with_fallback: yields text deltas.
+    Gemini is only tried when Sea-Lion fails before sending anything; a
+    failure mid-stream raises AIStreamError.
+    """
+    errors = {}
+    for provider, stream in (("sea-lion", _stream_sea_lion), ("gemini", _stream_gemini)):
+        started = False
+        try:
+            for delta in stream(messages, temperature=temperature, max_tokens=max_tokens, timeout=timeout):
+                started = True
+                yield delta
+        except AIStreamError as exc:
+            if started:
+                raise
+            errors[provider] = str(exc)
+            continue
+        if started:
+            return
+        errors[provider] = "empty_response"
+
+    logger.warning(
+        "Both AI providers failed to stream (sea-lion=%s, gemini=%s)",
+        errors.get("sea-lion"),
+        errors.get("gemini"),
+    )
+    raise AIStreamError("AI service unavailable")
+
+
 class F13AITripGeneratorView(APIView):
     """
     F1.3 - AI Trip Generator
@@ -264,76 +390,58 @@ class F13AITripGeneratorView(APIView):
         return Response(res_serializer.data, status=status.HTTP_200_OK)
 
 
-@method_decorator(csrf_exempt, name="dispatch")
-class F13AIChatbotView(APIView):
-    """
-    F1.3 - AI Context Chatbot
-
-    POST /api/f1/ai-chatbot/
-      body: F13AIChatMessageSerializer
-      behaviour:
-        - Include trip context (stops, dates) when calling SEA-LION
-        - Return answer text
-    """
+def _planbot_messages(data):
+    """Chat messages for Planbot: system prompt with the trip context, recent history, question."""
+    user_message = data["message"]
+    trip_context_payload = data.get("trip_context") or {}
 
-    permission_classes = [AllowAny]
-    authentication_classes = []
+    # ---- Build trip context text (frontend supplies Supabase data) ---------------
+    trip_context_text = "No active trip context was provided."
 
-    def post(self, request, *args, **kwargs):
-        serializer = F13AIChatMessageSerializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        data = serializer.validated_data
+    title = trip_context_payload.get("title") or ""
+    main_city = trip_context_payload.get("main_city") or ""
+    main_country = trip_context_payload.get("main_country") or ""
+    start_date = trip_context_payload.get("start_date")
+    end_date = trip_context_payload.get("end_date")
+    days_payload = trip_context_payload.get("days") or []
 
-        user_message = data["message"]
-        trip_context_payload = data.get("trip_context") or {}
+    if any([title, main_city, main_country, days_payload]):
+        if start_date and end_date:
+            date_range = f"{start_date} to {end_date}"
+        elif start_date:
+            date_range = f"starting {start_date}"
+        else:
+            date_range = "dates not specified"
+
+        lines = [
+            f"Trip title: {title or '(untitled)'}",
+            f"Destination: {main_city}, {main_country}".strip(", "),
+            f"Date range: {date_range}",
+            "",
+            "Planned stops by day:",
+        ]
 
-        # ---- Build trip context text (frontend supplies Supabase data) ---------------
-        trip_context_text = "No active trip context was provided."
+        for day in days_payload:
+            day_index = day.get("day_index") or day.get("day") or "?"
+            day_label = f"Day {day_index}"
+            day_date = day.get("date")
+            if day_date:
+                day_label += f" ({day_date})"
+            lines.append(f"- {day_label}:")
+
+            items = day.get("items") or []
+            if not items:
+                lines.append("    (no stops yet)")
+            else:
+                for item in items:
+                    stop_title = item.get("title") or "Untitled stop"
+                    address = item.get("address") or item.get("location") or ""
+                    lines.append(f"    • {stop_title}" + (f" — {address}" if address else ""))
 
-        title = trip_context_payload.get("title") or ""
-        main_city = trip_context_payload.get("main_city") or ""
-        main_country = trip_context_payload.get("main_country") or ""
-        start_date = trip_context_payload.get("start_date")
-        end_date = trip_context_payload.get("end_date")
-        days_payload = trip_context_payload.get("days") or []
+        trip_context_text = "\n".join(lines)
 
-        if any([title, main_city, main_country, days_payload]):
-            if start_date and end_date:
-                date_range = f"{start_date} to {end_date}"
-            elif start_date:
-                date_range = f"starting {start_date}"
-            else:
-                date_range = "dates not specified"
-
-            lines = [
-                f"Trip title: {title or '(untitled)'}",
-                f"Destination: {main_city}, {main_country}".strip(", "),
-                f"Date range: {date_range}",
-                "",
-                "Planned stops by day:",
-            ]
-
-            for day in days_payload:
-                day_index = day.get("day_index") or day.get("day") or "?"
-                day_label = f"Day {day_index}"
-                day_date = day.get("date")
-                if day_date:
-                    day_label += f" ({day_date})"
-                lines.append(f"- {day_label}:")
-
-                items = day.get("items") or []
-                if not items:
-                    lines.append("    (no stops yet)")
-                else:
-                    for item in items:
-                        stop_title = item.get("title") or "Untitled stop"
-                        address = item.get("address") or item.get("location") or ""
-                        lines.append(f"    • {stop_title}" + (f" — {address}" if address else ""))
-
-            trip_context_text = "\n".join(lines)
-
-        # ---- Prepare AI request ----------------------------------------------------
-        system_prompt = f"""
+    # ---- Prepare AI request ----------------------------------------------------
+    system_prompt = f"""
 You are "Planbot", a friendly, safety-aware travel assistant embedded inside a trip-planning app.
 
 Your job:
@@ -350,20 +458,50 @@ TRIP CONTEXT (do not show this block verbatim to the user):
 {trip_context_text}
 """.strip()
 
-        history = data.get("history") or []
+    history = data.get("history") or []
 
-        history_msgs = []
-        for m in history[-10:]:
-            role = m.get("role")
-            content = (m.get("content") or "").strip()
-            if role in ("user", "assistant") and content:
-                history_msgs.append({"role": role, "content": content})
+    history_msgs = []
+    for m in history[-10:]:
+        role = m.get("role")
+        content = (m.get("content") or "").strip()
+        if role in ("user", "assistant") and content:
+            history_msgs.append({"role": role, "content": content})
+
+    messages = [
+        {"role": "system", "content": system_prompt},
+        *history_msgs,
+        {"role": "user", "content": user_message},
+    ]
+    return messages
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class F13AIChatbotView(APIView):
+    """
+    F1.3 - AI Context Chatbot
+
+    POST /api/f1/ai-chatbot/
+      body: F13AIChatMessageSerializer
+      behaviour:
+        - Include trip context (stops, dates) when calling SEA-LION
+        - Return answer text
+        - ?stream=1 (or Accept: text/event-stream): stream the answer as
+          server-sent events (start, token..., done | error)
+    """
+
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    def post(self, request, *args, **kwargs):
+        serializer = F13AIChatMessageSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        messages = _planbot_messages(data)
+
+        if wants_event_stream(request):
+            return event_stream_response(self._stream_reply(messages))
 
-        messages = [
-            {"role": "system", "content": system_prompt},
-            *history_msgs,
-            {"role": "user", "content": user_message},
-        ]
         answer, _, _, _ = _generate_with_fallback(
             messages, temperature=0.4, max_tokens=300, timeout=40
         )
@@ -380,6 +518,27 @@ TRIP CONTEXT (do not show this block verbatim to the user):
             )
 
         return Response({"reply": answer}, status=status.HTTP_200_OK)
+
+    def _stream_reply(self, messages):
+        """SSE: start, token* ({"text"}), then done ({"reply"}) or error ({"reply"})."""
+        yield sse_event("start", {})
+        parts = []
+        try:
+            for delta in _stream_with_fallback(messages, temperature=0.4, max_tokens=300):
+                parts.append(delta)
+                yield sse_event("token", {"text": delta})
+        except AIStreamError:
+            yield sse_event(
+                "error",
+                {
+                    "reply": (
+                        "Planbot couldn't reach the AI service right now. "
+                        "Please refine your question or try again later."
+                    )
+                },
+            )
+            return
+        yield sse_event("done", {"reply": "".join(parts).strip()})
     
     
 class F13SaveTripPreferenceView(APIView):
@@ -453,49 +612,62 @@ class F13SaveTripPreferenceView(APIView):
         )
     
 
-class F13SoloAITripGenerateCreateView(APIView):
-    """
-    POST /api/f1/ai-solo-trip/
-    Generates itinerary via SEA-LION and creates Trip + Days + Items
+def _progress(job, percent, message):
+    if job is not None:
+        report_progress(job, percent, message)
 
-    IMPORTANT:
-    - duration comes ONLY from duration_days (slider)
-    - start_date/end_date are ONLY availability window
-    """
-    permission_classes = [IsAuthenticated]
 
-    def post(self, request):
-        serializer = F13SoloTripGenerateRequestSerializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        data = serializer.validated_data
+def _parse_itinerary_json(ai_text, parse_errors: list):
+    """json.loads the cleaned text, then the first {...} block; None if neither parses."""
+    cleaned = _clean_ai_json_text(ai_text)
+    candidates = [cleaned]
+    sliced = _slice_first_json_block(cleaned)
+    if sliced and sliced != cleaned:
+        candidates.append(sliced)
 
-        user = request.user
+    for candidate in candidates:
+        if not candidate:
+            continue
+        try:
+            return json.loads(candidate)
+        except Exception as exc:
+            parse_errors.append(str(exc))
+    return None
 
-        # ---------- duration must come from slider ----------
-        duration = data["duration_days"]
 
-        # availability window (NOT used to compute duration)
-        start_date = data.get("start_date")
-        end_date = data.get("end_date")
+def _salvage_itinerary(ai_text):
+    parser = ItineraryStreamParser()
+    parser.feed(ai_text or "")
+    return parser.salvage()
 
-        # ---------- build AI prompt ----------
 
-        system_prompt = (
-            "You are a travel planning AI. "
-            "Return ONLY a single valid JSON object. No markdown. No commentary. "
-            "Do not wrap in code fences. Do not add prose before or after the JSON. "
-            "Ensure the JSON is syntactically valid (no trailing commas, proper quotes)."
-        )
+def _solo_trip_prompts(data):
+    """(system_prompt, user_prompt) for a solo itinerary request."""
+    # ---------- duration must come from slider ----------
+    duration = data["duration_days"]
 
-        availability_line = ""
-        if start_date and end_date:
-            availability_line = f"User availability window (NOT trip duration): {start_date} to {end_date}"
-        elif start_date:
-            availability_line = f"User availability window (NOT trip duration): starting {start_date}"
-        elif end_date:
-            availability_line = f"User availability window (NOT trip duration): until {end_date}"
+    # availability window (NOT used to compute duration)
+    start_date = data.get("start_date")
+    end_date = data.get("end_date")
+
+    # ---------- build AI prompt ----------
+
+    system_prompt = (
+        "You are a travel planning AI. "
+        "Return ONLY a single valid JSON object. No markdown. No commentary. "
+        "Do not wrap in code fences. Do not add prose before or after the JSON. "
+        "Ensure the JSON is syntactically valid (no trailing commas, proper quotes)."
+    )
 
-        user_prompt = f"""
+    availability_line = ""
+    if start_date and end_date:
+        availability_line = f"User availability window (NOT trip duration): {start_date} to {end_date}"
+    elif start_date:
+        availability_line = f"User availability window (NOT trip duration): starting {start_date}"
+    elif end_date:
+        availability_line = f"User availability window (NOT trip duration): until {end_date}"
+
+    user_prompt = f"""
 Create a SOLO travel itinerary.
 
 {availability_line}
@@ -539,164 +711,252 @@ Return JSON in this format:
 }}
 """.strip()
 
-        ai_content, _, _, _ = _generate_with_fallback(
-            [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-            temperature=0.4,
-            # Allow more room so responses don't truncate mid-JSON
-            max_tokens=min(1600, 400 + duration * 150),
-            timeout=60,
+    return system_prompt, user_prompt
+
+
+def _save_solo_trip(user, data, itinerary):
+    """Create Trip + owner collaborator + Days + Items (+ budget) from a parsed itinerary."""
+    duration = data["duration_days"]
+    start_date = data.get("start_date")
+
+    # ---------- create DB objects ----------
+    with transaction.atomic():
+        # Calculate actual trip dates based on duration_days (slider value).
+        # Use the availability window start as trip start, then add duration.
+        # e.g. availability Feb 13 - Mar 24, duration 5 days → trip is Feb 13 - Feb 17
+        actual_start = start_date  # from availability window
+        actual_end = None
+        if actual_start:
+            actual_end = actual_start + timedelta(days=duration - 1)
+        
+        trip = Trip.objects.create(
+            owner=user,
+            title=itinerary.get("title", "AI Trip"),
+            main_city=itinerary.get("main_city"),
+            main_country=itinerary.get("main_country"),
+            start_date=actual_start,
+            end_date=actual_end,
+            visibility=Trip.Visibility.PRIVATE,
+            travel_type="solo_ai",
         )
 
-        if not ai_content:
-            return Response(
-                {"detail": "AI service unavailable"},
-                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        TripCollaborator.objects.create(
+            trip=trip,
+            user=user,
+            role=TripCollaborator.Role.OWNER,
+            status=TripCollaborator.Status.ACTIVE,
+            accepted_at=timezone.now(),
+        )
+
+        # Create TripDay objects with actual dates based on trip start_date
+        trip_days = []
+        for i in range(duration):
+            day_date = actual_start + timedelta(days=i) if actual_start else None
+            trip_days.append(TripDay(trip=trip, day_index=i + 1, date=day_date))
+        day_map = bulk_create_days(trip, trip_days)
+
+        items = []
+        sort_order = 1
+        for stop in itinerary.get("stops", []):
+            day_index = int(stop.get("day_index", 1) or 1)
+            if day_index < 1:
+                day_index = 1
+            if day_index > duration:
+                day_index = duration
+
+            day = day_map.get(day_index)
+            items.append(
+                ItineraryItem(
+                    trip=trip,
+                    day=day,
+                    title=stop.get("title") or "Untitled",
+                    item_type=stop.get("item_type"),
+                    notes_summary=stop.get("description"),
+                    address=stop.get("address"),
+                    lat=stop.get("lat"),
+                    lon=stop.get("lon"),
+                    sort_order=sort_order,  # keeps stable ordering
+                )
             )
+            sort_order += 1
 
-        cleaned_ai_content = _clean_ai_json_text(ai_content)
+        bulk_create_items(trip, items)
 
-        itinerary = None
-        parse_errors = []
+        if data.get("budget_max") is not None:
+            TripBudget.objects.create(
+                trip=trip,
+                currency="USD",
+                planned_total=data["budget_max"],
+            )
+    return trip
 
-        candidates = [cleaned_ai_content]
-        sliced = _slice_first_json_block(cleaned_ai_content)
-        if sliced and sliced != cleaned_ai_content:
-            candidates.append(sliced)
 
-        for candidate in candidates:
-            if not candidate:
-                continue
-            try:
-                itinerary = json.loads(candidate)
-                break
-            except Exception as exc:
-                parse_errors.append(str(exc))
+def _generate_solo_trip(user, data, job=None):
+    """
+    Generate a solo itinerary via SEA-LION (Gemini fallback) and create
+    Trip + Days + Items. ``data`` is validated F13SoloTripGenerateRequestSerializer
+    data. Raises JobError when the AI is unavailable or its JSON is unusable.
+    """
+    duration = data["duration_days"]
 
-        # Retry once with a stricter, shorter format if parsing failed
-        if not itinerary:
-            retry_prompt = f"""
+    _progress(job, 10, "Generating itinerary")
+    system_prompt, user_prompt = _solo_trip_prompts(data)
+
+    ai_content, _, _, _ = _generate_with_fallback(
+        [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ],
+        temperature=0.4,
+        # Allow more room so responses don't truncate mid-JSON
+        max_tokens=min(1600, 400 + duration * 150),
+        timeout=60,
+    )
+
+    if not ai_content:
+        raise JobError("AI service unavailable")
+
+    _progress(job, 60, "Reading itinerary")
+
+    parse_errors = []
+    itinerary = _parse_itinerary_json(ai_content, parse_errors)
+    if not itinerary:
+        # Truncated / slightly broken JSON: keep the stops that were complete
+        itinerary = _salvage_itinerary(ai_content)
+
+    # Retry once with a stricter, shorter format if parsing failed
+    if not itinerary:
+        retry_prompt = f"""
 Return ONLY valid JSON. One object. No prose, no code fences.
 Keep descriptions <= 90 chars. 2-3 stops per day and EVERY day index 1..{duration} must appear (max {duration * 3} stops).
 Fields: title (string), main_city (string), main_country (string), days (int), stops (array of objects with day_index:int, title:string, description:string, item_type:string, start_time:"HH:MM", end_time:"HH:MM", address:string|null, lat:float, lon:float). Every stop MUST have lat and lon; omit stops without coordinates.
 JSON only, nothing else.
 """.strip()
 
-            retry_content, _, _, _ = _generate_with_fallback(
-                [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": retry_prompt},
-                ],
-                temperature=0.25,
-                max_tokens=min(1200, 300 + duration * 120),
-                timeout=45,
-            )
+        retry_content, _, _, _ = _generate_with_fallback(
+            [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": retry_prompt},
+            ],
+            temperature=0.25,
+            max_tokens=min(1200, 300 + duration * 120),
+            timeout=45,
+        )
 
-            if retry_content:
-                retry_clean = _clean_ai_json_text(retry_content)
-                retry_candidates = [retry_clean]
-                retry_slice = _slice_first_json_block(retry_clean)
-                if retry_slice and retry_slice != retry_clean:
-                    retry_candidates.append(retry_slice)
-                for candidate in retry_candidates:
-                    if not candidate:
-                        continue
-                    try:
-                        itinerary = json.loads(candidate)
-                        break
-                    except Exception as exc:
-                        parse_errors.append(str(exc))
+        if retry_content:
+            itinerary = _parse_itinerary_json(retry_content, parse_errors) or _salvage_itinerary(retry_content)
 
-        if not itinerary:
-            logger.warning(
-                "AI JSON parse failed for ai-solo-trip after retry. errors=%s raw_preview=%s",
-                parse_errors or ["unknown_error"],
-                (ai_content or "")[:400],
-            )
-            return Response(
-                {"detail": "AI service returned an invalid itinerary. Please try again."},
-                status=status.HTTP_503_SERVICE_UNAVAILABLE,
-            )
+    if not itinerary:
+        logger.warning(
+            "AI JSON parse failed for ai-solo-trip after retry. errors=%s raw_preview=%s",
+            parse_errors or ["unknown_error"],
+            (ai_content or "")[:400],
+        )
+        raise JobError("AI service returned an invalid itinerary. Please try again.")
 
-        # ---------- create DB objects ----------
-        with transaction.atomic():
-            # Calculate actual trip dates based on duration_days (slider value).
-            # Use the availability window start as trip start, then add duration.
-            # e.g. availability Feb 13 - Mar 24, duration 5 days → trip is Feb 13 - Feb 17
-            actual_start = start_date  # from availability window
-            actual_end = None
-            if actual_start:
-                actual_end = actual_start + timedelta(days=duration - 1)
-            
-            trip = Trip.objects.create(
-                owner=user,
-                title=itinerary.get("title", "AI Trip"),
-                main_city=itinerary.get("main_city"),
-                main_country=itinerary.get("main_country"),
-                start_date=actual_start,
-                end_date=actual_end,
-                visibility=Trip.Visibility.PRIVATE,
-                travel_type="solo_ai",
-            )
+    _progress(job, 90, "Saving trip")
 
-            TripCollaborator.objects.create(
-                trip=trip,
-                user=user,
-                role=TripCollaborator.Role.OWNER,
-                status=TripCollaborator.Status.ACTIVE,
-                accepted_at=timezone.now(),
-            )
+    return _save_solo_trip(user, data, itinerary)
 
-            # Create TripDay objects with actual dates based on trip start_date
-            trip_days = []
-            for i in range(duration):
-                day_date = actual_start + timedelta(days=i) if actual_start else None
-                trip_days.append(TripDay(trip=trip, day_index=i + 1, date=day_date))
-            TripDay.objects.bulk_create(trip_days)
-
-            day_map = {d.day_index: d for d in TripDay.objects.filter(trip=trip)}
-
-            items = []
-            sort_order = 1
-            for stop in itinerary.get("stops", []):
-                day_index = int(stop.get("day_index", 1) or 1)
-                if day_index < 1:
-                    day_index = 1
-                if day_index > duration:
-                    day_index = duration
-
-                day = day_map.get(day_index)
-                items.append(
-                    ItineraryItem(
-                        trip=trip,
-                        day=day,
-                        title=stop.get("title") or "Untitled",
-                        item_type=stop.get("item_type"),
-                        notes_summary=stop.get("description"),
-                        address=stop.get("address"),
-                        lat=stop.get("lat"),
-                        lon=stop.get("lon"),
-                        sort_order=sort_order,  # keeps stable ordering
-                    )
-                )
-                sort_order += 1
 
-            if items:
-                ItineraryItem.objects.bulk_create(items)
+def run_solo_generation_job(job):
+    """Handler for "solo_itinerary" jobs (services/jobs.py)."""
+    serializer = F13SoloTripGenerateRequestSerializer(data=job.payload)
+    if not serializer.is_valid():
+        raise JobError("Invalid trip request")
+    if job.created_by_id is None:
+        raise JobError("User not found")
+    trip = _generate_solo_trip(job.created_by, serializer.validated_data, job=job)
+    return {"trip_id": trip.id}
 
-            if data.get("budget_max") is not None:
-                TripBudget.objects.create(
-                    trip=trip,
-                    currency="USD",
-                    planned_total=data["budget_max"],
-                )
 
+class F13SoloAITripGenerateCreateView(APIView):
+    """
+    POST /api/f1/ai-solo-trip/
+    Generates itinerary via SEA-LION and creates Trip + Days + Items
+
+    Runs as a "solo_itinerary" job: answers 202 {"job_id"} at once and the
+    client polls GET /api/jobs/{job_id}/ for the trip_id.
+
+    ?stream=1 (or Accept: text/event-stream) generates in the request instead
+    and streams server-sent events: start, meta (title / city as soon as they
+    are known), one stop event per itinerary stop, then done {"trip_id"} or
+    error {"detail"}.
+
+    IMPORTANT:
+    - duration comes ONLY from duration_days (slider)
+    - start_date/end_date are ONLY availability window
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = F13SoloTripGenerateRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        if wants_event_stream(request):
+            return event_stream_response(self._stream_trip(request.user, serializer.validated_data))
+
+        payload = serializer.data
+
+        # Same user + same request while the first is still running → same job
+        digest = hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+        job, _ = enqueue(
+            "solo_itinerary",
+            payload,
+            user=request.user,
+            dedupe_key=f"user:{request.user.id}:{digest}",
+        )
+
+        if job.status == BackgroundJob.Status.SUCCEEDED:
+            # Deduped onto a job that has already finished
+            return Response(
+                F13SoloTripGenerateResponseSerializer({"trip_id": job.result["trip_id"]}).data,
+                status=status.HTTP_201_CREATED,
+            )
+
+        # The client polls GET /api/jobs/{job_id}/
         return Response(
-            F13SoloTripGenerateResponseSerializer({"trip_id": trip.id}).data,
-            status=status.HTTP_201_CREATED,
+            {"job_id": job.id, "status": job.status},
+            status=status.HTTP_202_ACCEPTED,
         )
+
+    def _stream_trip(self, user, data):
+        yield sse_event("start", {})
+
+        duration = data["duration_days"]
+        system_prompt, user_prompt = _solo_trip_prompts(data)
+        parser = ItineraryStreamParser()
+        sent_fields = set()
+
+        try:
+            for delta in _stream_with_fallback(
+                [
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt},
+                ],
+                temperature=0.4,
+                max_tokens=min(1600, 400 + duration * 150),
+            ):
+                for stop in parser.feed(delta):
+                    yield sse_event("stop", stop)
+                new_fields = {k: v for k, v in parser.fields.items() if k not in sent_fields}
+                if new_fields:
+                    sent_fields.update(new_fields)
+                    yield sse_event("meta", new_fields)
+        except AIStreamError as exc:
+            if not parser.stops:
+                yield sse_event("error", {"detail": "AI service unavailable"})
+                return
+            logger.warning("ai-solo-trip stream broke off after %s stops: %s", len(parser.stops), exc)
+
+        itinerary = _parse_itinerary_json(parser.text, []) or parser.salvage()
+        if not itinerary:
+            logger.warning("AI JSON parse failed for streamed ai-solo-trip. raw_preview=%s", parser.text[:400])
+            yield sse_event("error", {"detail": "AI service returned an invalid itinerary. Please try again."})
+            return
+
+        trip = _save_solo_trip(user, data, itinerary)
+        yield sse_event("done", F13SoloTripGenerateResponseSerializer({"trip_id": trip.id}).data)
     
 class F13GroupPreferencesListView(APIView):
     """
@@ -1,111 +1,65 @@
 # backend/TripMateFunctions/views/f1_4_views.py
 import os
 import json
-import time
 import hashlib
-import threading
 import requests
-from datetime import datetime, date, time as dt_time, timedelta
+from datetime import datetime, date, time as dt_time
 
 from django.shortcuts import get_object_or_404
-from django.db.models import Q
 
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 
-from ..models import AppUser, Trip, TripDay, ItineraryItem
+from ..models import AppUser, OpenTripMapPlace, Trip, TripDay, ItineraryItem
+from ..services.cache import CacheNamespace
+from ..services.fanout import parallel_map
+from ..services.nearby import nearby_places, remember_places
+from ..services.opening_hours import compile_hours, format_minutes, open_at_many
+from ..services.overpass import lookup as lookup_opening_hours, opening_hours_batch
+from ..services.singleflight import single_flight
+from ..services.trip_access import can_access_trip
+from ..services.weather import timeline_range, weather_for_day, weather_timeline
 from ..serializers.f1_4_serializers import (
     AdaptivePlanRequestSerializer,
     F14AdaptivePlanResponseSerializer,
 )
 
 # ----------------------------
-# in-memory cache for preview
+# shared caches (see services/cache.py)
 # ----------------------------
-_ADAPTIVE_CACHE: dict[str, dict] = {}
-_ADAPTIVE_CACHE_LOCK = threading.Lock()
-_OSM_CACHE: dict[str, dict] = {}
-_OSM_CACHE_LOCK = threading.Lock()
-_OTM_CACHE: dict[str, dict] = {}
-_OTM_CACHE_LOCK = threading.Lock()
-_GEO_CACHE: dict[str, dict] = {}
-_GEO_CACHE_LOCK = threading.Lock()
+_ADAPTIVE_CACHE = CacheNamespace("adaptive", default_ttl=60 * 10)
+_OTM_CACHE = CacheNamespace("otm", default_ttl=60 * 60 * 6)
+# Place details barely change; one entry per xid, shared by every plan nearby
+OTM_DETAILS_TTL = 60 * 60 * 24 * 30
+_OTM_DETAILS = CacheNamespace("otm_details", default_ttl=OTM_DETAILS_TTL)
+_GEO_CACHE = CacheNamespace("geocode", default_ttl=60 * 60 * 24 * 7)
+
+REPLACEMENT_OPTION_LIMIT = 4
+REPLACEMENT_RADIUS_M = 2500
+# Concurrent OpenTripMap requests while building replacement options
+OTM_WORKERS = 6
+OTM_STAGE_TIMEOUT_SECONDS = 12
 
 def _cache_key(payload: dict) -> str:
     raw = json.dumps(payload, sort_keys=True, ensure_ascii=False)
     return hashlib.sha256(raw.encode("utf-8")).hexdigest()
 
 def _cache_get(key: str):
-    now = time.time()
-    with _ADAPTIVE_CACHE_LOCK:
-        entry = _ADAPTIVE_CACHE.get(key)
-        if not entry:
-            return None
-        if entry.get("expires_at", 0) <= now:
-            _ADAPTIVE_CACHE.pop(key, None)
-            return None
-        return entry.get("value")
+    return _ADAPTIVE_CACHE.get(key)
 
 def _cache_set(key: str, value: dict, ttl_seconds: int):
-    expires_at = time.time() + max(int(ttl_seconds), 1)
-    with _ADAPTIVE_CACHE_LOCK:
-        _ADAPTIVE_CACHE[key] = {"expires_at": expires_at, "value": value}
-
-
-def _cache_osm_get(key: str):
-    now = time.time()
-    with _OSM_CACHE_LOCK:
-        entry = _OSM_CACHE.get(key)
-        if not entry:
-            return None
-        if entry.get("expires_at", 0) <= now:
-            _OSM_CACHE.pop(key, None)
-            return None
-        return entry.get("value")
-
-
-def _cache_osm_set(key: str, value: dict, ttl_seconds: int):
-    expires_at = time.time() + max(int(ttl_seconds), 1)
-    with _OSM_CACHE_LOCK:
-        _OSM_CACHE[key] = {"expires_at": expires_at, "value": value}
-
-
-def _cache_otm_get(key: str):
-    now = time.time()
-    with _OTM_CACHE_LOCK:
-        entry = _OTM_CACHE.get(key)
-        if not entry:
-            return None
-        if entry.get("expires_at", 0) <= now:
-            _OTM_CACHE.pop(key, None)
-            return None
-        return entry.get("value")
-
-
-def _cache_otm_set(key: str, value: dict, ttl_seconds: int):
-    expires_at = time.time() + max(int(ttl_seconds), 1)
-    with _OTM_CACHE_LOCK:
-        _OTM_CACHE[key] = {"expires_at": expires_at, "value": value}
+    _ADAPTIVE_CACHE.set(key, value, ttl_seconds)
 
 
 def _cache_geo_get(key: str):
-    now = time.time()
-    with _GEO_CACHE_LOCK:
-        entry = _GEO_CACHE.get(key)
-        if not entry:
-            return False, None
-        if entry.get("expires_at", 0) <= now:
-            _GEO_CACHE.pop(key, None)
-            return False, None
-        return True, entry.get("value")
+    # (hit, value): a cached None means "geocoder found nothing", not a miss
+    return _GEO_CACHE.lookup(key)
 
 
 def _cache_geo_set(key: str, value, ttl_seconds: int):
-    expires_at = time.time() + max(int(ttl_seconds), 1)
-    with _GEO_CACHE_LOCK:
-        _GEO_CACHE[key] = {"expires_at": expires_at, "value": value}
+    _GEO_CACHE.set(key, value, ttl_seconds)
 
 
 def _is_outdoor(title: str, item_type: str | None):
@@ -127,102 +81,6 @@ def _is_outdoor(title: str, item_type: str | None):
     return False
 
 
-def _open_meteo_day(lat: float, lon: float, date_str: str):
-    url = "https://api.open-meteo.com/v1/forecast"
-    params = {
-        "latitude": lat,
-        "longitude": lon,
-        "daily": "precipitation_sum,precipitation_probability_max,weathercode,temperature_2m_max,temperature_2m_min,windspeed_10m_max",
-        "timezone": "auto",
-        "start_date": date_str,
-        "end_date": date_str,
-    }
-    try:
-        r = requests.get(url, params=params, timeout=10)
-        if r.status_code != 200:
-            return None
-        data = r.json()
-    except Exception:
-        return None
-
-    daily = data.get("daily") or {}
-    ps = (daily.get("precipitation_sum") or [None])[0]
-    pp = (daily.get("precipitation_probability_max") or [None])[0]
-    wc = (daily.get("weathercode") or [None])[0]
-    tmax = (daily.get("temperature_2m_max") or [None])[0]
-    tmin = (daily.get("temperature_2m_min") or [None])[0]
-    wind = (daily.get("windspeed_10m_max") or [None])[0]
-    return {
-        "precipitation_sum": ps,
-        "precipitation_probability_max": pp,
-        "weathercode": wc,
-        "temperature_2m_max": tmax,
-        "temperature_2m_min": tmin,
-        "windspeed_10m_max": wind,
-    }
-
-
-def _open_meteo_archive_day(lat: float, lon: float, date_str: str):
-    url = "https://archive-api.open-meteo.com/v1/archive"
-    params = {
-        "latitude": lat,
-        "longitude": lon,
-        "daily": "precipitation_sum,weather_code,temperature_2m_max,temperature_2m_min,windspeed_10m_max",
-        "timezone": "auto",
-        "start_date": date_str,
-        "end_date": date_str,
-    }
-    try:
-        r = requests.get(url, params=params, timeout=12)
-        if r.status_code != 200:
-            return None
-        data = r.json()
-    except Exception:
-        return None
-
-    daily = data.get("daily") or {}
-    ps = (daily.get("precipitation_sum") or [None])[0]
-    wc = (daily.get("weather_code") or [None])[0]
-    tmax = (daily.get("temperature_2m_max") or [None])[0]
-    tmin = (daily.get("temperature_2m_min") or [None])[0]
-    wind = (daily.get("windspeed_10m_max") or [None])[0]
-    return {
-        "precipitation_sum": ps,
-        "precipitation_probability_max": None,
-        "weathercode": wc,
-        "temperature_2m_max": tmax,
-        "temperature_2m_min": tmin,
-        "windspeed_10m_max": wind,
-    }
-
-
-def _open_meteo_climate_day(lat: float, lon: float, date_str: str):
-    url = "https://climate-api.open-meteo.com/v1/climate"
-    params = {
-        "latitude": lat,
-        "longitude": lon,
-        "daily": "temperature_2m_max,temperature_2m_min",
-        "models": "EC_Earth3P_HR",
-        "start_date": date_str,
-        "end_date": date_str,
-    }
-    try:
-        r = requests.get(url, params=params, timeout=12)
-        if r.status_code != 200:
-            return None
-        data = r.json()
-    except Exception:
-        return None
-
-    daily = data.get("daily") or {}
-    tmax = (daily.get("temperature_2m_max") or [None])[0]
-    tmin = (daily.get("temperature_2m_min") or [None])[0]
-    return {
-        "temperature_2m_max": tmax,
-        "temperature_2m_min": tmin,
-    }
-
-
 def _geocode_trip_location(trip: Trip):
     parts = []
     if trip.main_city:
@@ -301,7 +159,13 @@ def _compute_weather_context(
     date_str: str,
     anchor: ItineraryItem | None,
     fallback_coords: tuple[float, float] | None = None,
+    trip: Trip | None = None,
 ):
+    """
+    Weather for one day at the anchor (else the trip's geocoded location).
+    With ``trip``, the whole trip's dates are fetched at once
+    (services/weather.py) so the other days are served from the cache.
+    """
     def _parse_date(d: str):
         try:
             return datetime.strptime(d, "%Y-%m-%d").date()
@@ -325,24 +189,16 @@ def _compute_weather_context(
         return merged
 
     target_date = _parse_date(date_str)
-    today = date.today()
-    horizon = today + timedelta(days=16)
+    if target_date is None:
+        return None, False, False, []
+    start, end = timeline_range(
+        target_date,
+        trip.start_date if trip else None,
+        trip.end_date if trip else None,
+    )
 
     def _fetch_for_coords(lat: float, lon: float):
-        if target_date and target_date < today:
-            wx_local = _open_meteo_archive_day(lat, lon, date_str)
-        else:
-            wx_local = _open_meteo_day(lat, lon, date_str)
-
-        if target_date and target_date > horizon and _missing_temps(wx_local):
-            climate = _open_meteo_climate_day(lat, lon, date_str)
-            wx_local = _merge(wx_local, climate)
-
-        if target_date and target_date < today and _missing_temps(wx_local):
-            climate = _open_meteo_climate_day(lat, lon, date_str)
-            wx_local = _merge(wx_local, climate)
-
-        return wx_local
+        return weather_for_day(weather_timeline(lat, lon, start, end), target_date)
 
     wx = None
     if anchor and anchor.lat is not None and anchor.lon is not None:
@@ -381,58 +237,26 @@ def _compute_weather_context(
     return wx, is_rainy, len(bad_weather_reasons) > 0, bad_weather_reasons
 
 
-def _round_coord(val: float) -> float:
-    return round(val, 4)
-
-
-def _fetch_osm_opening_hours(lat: float | None, lon: float | None):
-    """Query Overpass for nearby POIs with opening_hours. Cache for 24h."""
-    if lat is None or lon is None:
-        return None
-
-    rlat = _round_coord(lat)
-    rlon = _round_coord(lon)
-    cache_key = f"osm:{rlat}:{rlon}"
-    cached = _cache_osm_get(cache_key)
-    if cached is not None:
-        return cached
-
-    query = f"""
-    [out:json][timeout:10];
-    (
-      node(around:200,{rlat},{rlon})[opening_hours];
-      way(around:200,{rlat},{rlon})[opening_hours];
-      relation(around:200,{rlat},{rlon})[opening_hours];
-    );
-    out tags center 1;
-    """
-    result = {"opening_hours": None, "source": "unknown", "confidence": 0.2, "tags": {}}
-    try:
-        resp = requests.post(
-            "https://overpass-api.de/api/interpreter",
-            data={"data": query},
-            timeout=12,
-        )
-        if resp.status_code == 200:
-            data = resp.json() or {}
-            elements = data.get("elements") or []
-            if elements:
-                elem = elements[0]
-                tags = elem.get("tags") or {}
-                oh = tags.get("opening_hours")
-                if oh:
-                    result = {
-                        "opening_hours": oh,
-                        "source": "osm",
-                        "confidence": 1.0,
-                        "tags": tags,
-                    }
-    except Exception:
-        # keep default result
-        pass
-
-    _cache_osm_set(cache_key, result, 60 * 60 * 24)
-    return result
+def _stored_opening_hours(it: ItineraryItem):
+    """(text, source, confidence) of hours stored on the item, text None when there are none."""
+    opening_hours_text = None
+    hours_source = "unknown"
+    hours_confidence = 0.2
+    existing = getattr(it, "opening_hours_json", None) or getattr(it, "opening_hours", None)
+    if isinstance(existing, dict):
+        opening_hours_text = existing.get("opening_hours") or existing.get("text") or None
+        hours_source = existing.get("source") or hours_source
+        hours_confidence = existing.get("confidence") or hours_confidence
+    elif isinstance(existing, str):
+        opening_hours_text = existing or None
+    return opening_hours_text, hours_source, hours_confidence
+
+
+def _items_opening_hours(items):
+    """Overpass opening hours for every item with coordinates, in one batched query."""
+    return opening_hours_batch(
+        (float(it.lat), float(it.lon)) for it in items if it.lat is not None and it.lon is not None
+    )
 
 
 def _get_otm_key() -> str:
@@ -440,7 +264,11 @@ def _get_otm_key() -> str:
 
 
 def _otm_kinds_for_item(item: ItineraryItem):
-    text = f"{item.item_type or ''} {item.title or ''}".lower()
+    return _otm_kinds_for_text(f"{item.item_type or ''} {item.title or ''}")
+
+
+def _otm_kinds_for_text(text: str):
+    text = (text or "").lower()
     if "museum" in text:
         return "museums"
     if any(w in text for w in ["park", "garden", "nature", "beach", "trail", "hike", "outdoor"]):
@@ -474,45 +302,77 @@ def _fetch_otm_candidates(lat: float, lon: float, kinds: str | None, limit: int
         params["kinds"] = kinds
 
     cache_key = f"otm:radius:{round(lat,4)}:{round(lon,4)}:{kinds}:{limit}:{radius}"
-    cached = _cache_otm_get(cache_key)
-    if cached is not None:
-        return cached
 
-    try:
-        r = requests.get("https://api.opentripmap.com/0.1/en/places/radius", params=params, timeout=10)
-        if r.status_code != 200:
-            return []
-        data = r.json()
-        if not isinstance(data, list):
-            return []
-        _cache_otm_set(cache_key, data, 60 * 60 * 6)
-        return data
-    except Exception:
-        return []
+    def fetch():
+        try:
+            r = requests.get("https://api.opentripmap.com/0.1/en/places/radius", params=params, timeout=10)
+            if r.status_code != 200:
+                return None
+            data = r.json()
+            if not isinstance(data, list):
+                return None
+            return data
+        except Exception:
+            return None
+
+    # Failed lookups (None) are shared with waiting callers but not cached
+    return single_flight(_OTM_CACHE, cache_key, fetch, ttl=60 * 60 * 6) or []
 
 
 def _fetch_otm_details(xid: str):
+    """{"kinds", "address", "opening_hours"} of an OpenTripMap place, or None."""
     api_key = _get_otm_key()
     if not api_key or not xid:
         return None
 
-    cache_key = f"otm:detail:{xid}"
-    cached = _cache_otm_get(cache_key)
-    if cached is not None:
-        return cached
-
-    try:
-        url = f"https://api.opentripmap.com/0.1/en/places/xid/{xid}"
-        r = requests.get(url, params={"apikey": api_key}, timeout=10)
-        if r.status_code != 200:
-            return None
-        data = r.json()
-        if not isinstance(data, dict):
+    def fetch():
+        try:
+            url = f"https://api.opentripmap.com/0.1/en/places/xid/{xid}"
+            r = requests.get(url, params={"apikey": api_key}, timeout=10)
+            if r.status_code != 200:
+                return None
+            data = r.json()
+            if not isinstance(data, dict):
+                return None
+            return {
+                "kinds": data.get("kinds"),
+                "address": _format_otm_address(data.get("address")),
+                "opening_hours": data.get("opening_hours"),
+            }
+        except Exception:
             return None
-        _cache_otm_set(cache_key, data, 60 * 60 * 12)
-        return data
-    except Exception:
-        return None
+
+    return single_flight(_OTM_DETAILS, f"otm:detail:{xid}", fetch, ttl=OTM_DETAILS_TTL)
+
+
+def _otm_details_many(xids) -> dict:
+    """
+    {xid: details} for many OpenTripMap places. Cached details and places
+    remembered in OpenTripMapPlace need no call; the rest are fetched
+    OTM_WORKERS at a time.
+    """
+    details, missing = {}, []
+    for xid in dict.fromkeys(x for x in xids if x):
+        hit, value = _OTM_DETAILS.lookup(f"otm:detail:{xid}")
+        if hit:
+            details[xid] = value
+        else:
+            missing.append(xid)
+
+    if missing:
+        rows = OpenTripMapPlace.objects.filter(xid__in=missing).values("xid", "kinds", "address", "opening_hours")
+        for row in rows:
+            details[row.pop("xid")] = row
+        missing = [xid for xid in missing if xid not in details]
+
+    fetched = parallel_map(
+        _fetch_otm_details, missing,
+        max_workers=OTM_WORKERS, timeout=OTM_STAGE_TIMEOUT_SECONDS, name="otm-details",
+    )
+    for xid, value in zip(missing, fetched):
+        if value is not None:
+            details[xid] = value
+    return details
 
 
 def _format_otm_address(addr: dict | None):
@@ -529,130 +389,175 @@ def _format_otm_address(addr: dict | None):
     return ", ".join(cleaned) if cleaned else None
 
 
-def _build_replacement_options(it: ItineraryItem, trip_date: date | None, start_dt: datetime | None, end_dt: datetime | None):
-    if it.lat is None or it.lon is None:
-        return []
+def _visit_moment(trip_date: date | None, when_dt: datetime | None):
+    """The planned visit: the trip day at the item's wall-clock time."""
+    if not when_dt or not trip_date:
+        return None
+    return datetime.combine(trip_date, when_dt.time().replace(second=0, microsecond=0))
 
-    kinds = _otm_kinds_for_item(it)
-    candidates = _fetch_otm_candidates(float(it.lat), float(it.lon), kinds=kinds, limit=6, radius=2500)
-    if not candidates:
-        return []
 
-    when_dt = start_dt or end_dt
-    options = []
-    seen = set()
+def _is_open_at(opening_hours: str | None, trip_date: date | None, when_dt: datetime | None):
+    """True / False from the compiled hours (services/opening_hours.py), else None (unknown)."""
+    moment = _visit_moment(trip_date, when_dt)
+    hours = compile_hours(opening_hours)
+    if moment is None or hours is None:
+        return None
+    return hours.is_open_at(moment)
 
-    for cand in candidates:
-        name = (cand.get("name") or "").strip()
-        xid = cand.get("xid")
-        if not name or name.lower() == (it.title or "").lower():
-            continue
-        if xid in seen:
-            continue
-        seen.add(xid)
 
-        point = cand.get("point") or {}
-        lat = point.get("lat")
-        lon = point.get("lon")
-        if lat is None or lon is None:
+def _local_replacement_options(it: ItineraryItem, kinds: str, trip_date: date | None, when_dt: datetime | None):
+    """Replacement options from places we already store (services/nearby.py)."""
+    options = []
+    places = nearby_places(
+        float(it.lat), float(it.lon), REPLACEMENT_RADIUS_M, limit=20, exclude_names=[it.title], opentripmap=True
+    )
+    moment = _visit_moment(trip_date, when_dt)
+    if moment is not None:
+        open_now = open_at_many([place["opening_hours"] for place in places], moment)
+    else:
+        open_now = [None] * len(places)
+    for place, is_open in zip(places, open_now):
+        place_kinds = place["kinds"] or ""
+        if kinds != "interesting_places" and kinds not in place_kinds.split(","):
+            if _otm_kinds_for_text(f"{place_kinds} {place['name']}") != kinds:
+                continue
+        if is_open is False:
             continue
-
-        details = _fetch_otm_details(xid) if xid else None
-        opening_hours = (details or {}).get("opening_hours")
-        address = _format_otm_address((details or {}).get("address"))
-        kinds_raw = (details or {}).get("kinds") or cand.get("kinds")
-
-        is_open = None
-        if opening_hours and when_dt and trip_date:
-            open_t, close_t = _parse_hours_for_date(opening_hours, trip_date)
-            if open_t and close_t:
-                t = when_dt.time().replace(second=0, microsecond=0)
-                is_open = open_t <= t <= close_t
-                if is_open is False:
-                    # skip if we know it's closed at that time
-                    continue
-
         options.append(
             {
-                "title": name,
-                "lat": float(lat),
-                "lon": float(lon),
-                "distance_m": cand.get("dist"),
-                "kinds": kinds_raw,
-                "address": address,
-                "opening_hours": opening_hours,
+                "title": place["name"],
+                "lat": float(place["lat"]),
+                "lon": float(place["lon"]),
+                "distance_m": place["dist_m"],
+                "kinds": place["kinds"],
+                "address": place["address"],
+                "opening_hours": place["opening_hours"],
                 "is_open": is_open,
-                "xid": xid,
-                "source": "opentripmap",
+                "xid": place["xid"],
+                "source": place["source"],
             }
         )
-
-        if len(options) >= 4:
+        if len(options) >= REPLACEMENT_OPTION_LIMIT:
             break
-
     return options
 
 
-def _parse_hours_for_date(opening_hours: str | None, trip_date: date | None):
+def _replacement_options_many(conflicts, trip_date: date | None) -> list:
     """
-    Lightweight parser for common OSM opening_hours patterns.
-    Returns (open_time, close_time) as datetime.time or (None, None) if unknown.
-    Handles multiple ranges and skips 'off/closed' rules.
+    Replacement options for each (item, start_dt, end_dt) in ``conflicts``,
+    in order. Known places come first; the items still short of options share
+    one OpenTripMap stage that tops them up to REPLACEMENT_OPTION_LIMIT (places
+    already offered are skipped by xid and name): their candidate searches run
+    in parallel and every distinct candidate's details are looked up once
+    (see _otm_details_many).
     """
-    if not opening_hours or not trip_date:
-        return None, None
-
-    weekday = trip_date.weekday()  # Monday=0
-    day_map = {"mo": 0, "tu": 1, "we": 2, "th": 3, "fr": 4, "sa": 5, "su": 6}
+    results, pending = [], []
+    for idx, (it, start_dt, end_dt) in enumerate(conflicts):
+        if it.lat is None or it.lon is None:
+            results.append([])
+            continue
+        kinds = _otm_kinds_for_item(it)
+        when_dt = start_dt or end_dt
+        # Known places first: an area we have seen before needs no OpenTripMap calls
+        results.append(_local_replacement_options(it, kinds, trip_date, when_dt))
+        if len(results[idx]) < REPLACEMENT_OPTION_LIMIT:
+            pending.append((idx, it, kinds, when_dt))
+    if not pending or not _get_otm_key():
+        return results
+
+    searches = list(dict.fromkeys(
+        (round(float(it.lat), 4), round(float(it.lon), 4), kinds) for _, it, kinds, _ in pending
+    ))
+    found = parallel_map(
+        lambda search: _fetch_otm_candidates(
+            search[0], search[1], kinds=search[2], limit=6, radius=REPLACEMENT_RADIUS_M
+        ),
+        searches,
+        max_workers=OTM_WORKERS, timeout=OTM_STAGE_TIMEOUT_SECONDS, name="otm-radius",
+    )
+    candidates_at = dict(zip(searches, found))
+
+    # Usable candidates per item, then one details lookup for all of them
+    picks = []
+    for idx, it, kinds, when_dt in pending:
+        chosen = []
+        seen = {o["xid"] for o in results[idx] if o.get("xid")}
+        seen_names = {o["title"].lower() for o in results[idx]} | {(it.title or "").lower()}
+        for cand in candidates_at.get((round(float(it.lat), 4), round(float(it.lon), 4), kinds)) or []:
+            name = (cand.get("name") or "").strip()
+            xid = cand.get("xid")
+            if not name or name.lower() in seen_names:
+                continue
+            if xid in seen:
+                continue
+            seen.add(xid)
+            seen_names.add(name.lower())
+            point = cand.get("point") or {}
+            if point.get("lat") is None or point.get("lon") is None:
+                continue
+            chosen.append((cand, name, xid, point["lat"], point["lon"]))
+        picks.append((idx, when_dt, chosen))
+    details_by_xid = _otm_details_many(xid for _, _, chosen in picks for _, _, xid, _, _ in chosen)
 
-    rules = [r.strip() for r in opening_hours.split(";") if r.strip()]
-    for rule in rules:
-        parts = rule.lower().split()
-        if not parts:
+    learned = {}
+    for idx, when_dt, chosen in picks:
+        if not chosen:
             continue
+        options = results[idx]  # the known places stay first
+        for cand, name, xid, lat, lon in chosen:
+            details = details_by_xid.get(xid) or {}
+            opening_hours = details.get("opening_hours")
+            address = details.get("address")
+            kinds_raw = details.get("kinds") or cand.get("kinds")
+            if xid:
+                learned[xid] = {"xid": xid, "name": name, "lat": lat, "lon": lon, "kinds": kinds_raw,
+                                "address": address, "opening_hours": opening_hours}
+
+            is_open = _is_open_at(opening_hours, trip_date, when_dt)
+            if is_open is False:
+                # skip if we know it's closed at that time
+                continue
 
-        days_part = parts[0]
-        times_part = " ".join(parts[1:]) if len(parts) > 1 else ""
-
-        day_matches = set()
-        for chunk in days_part.split(","):
-            chunk = chunk.strip()
-            if "-" in chunk:
-                start, end = chunk.split("-", 1)
-                if start in day_map and end in day_map:
-                    s, e = day_map[start], day_map[end]
-                    if s <= e:
-                        day_matches.update(range(s, e + 1))
-                    else:
-                        day_matches.update(range(s, 7))
-                        day_matches.update(range(0, e + 1))
-            elif chunk in day_map:
-                day_matches.add(day_map[chunk])
+            options.append(
+                {
+                    "title": name,
+                    "lat": float(lat),
+                    "lon": float(lon),
+                    "distance_m": cand.get("dist"),
+                    "kinds": kinds_raw,
+                    "address": address,
+                    "opening_hours": opening_hours,
+                    "is_open": is_open,
+                    "xid": xid,
+                    "source": "opentripmap",
+                }
+            )
+            if len(options) >= REPLACEMENT_OPTION_LIMIT:
+                break
 
-        if day_matches and weekday not in day_matches:
-            continue
+    # Next time this area is served from OpenTripMapPlace
+    remember_places(learned.values())
+    return results
 
-        if "off" in times_part or "closed" in times_part:
-            continue
 
-        ranges = [r.strip() for r in times_part.split(",") if r.strip()]
-        opens, closes = [], []
-        for rng in ranges:
-            if "-" not in rng:
-                continue
-            start_str, end_str = rng.split("-", 1)
-            try:
-                sh, sm = map(int, start_str.split(":"))
-                eh, em = map(int, end_str.split(":"))
-                opens.append(dt_time(sh, sm))
-                closes.append(dt_time(eh, em))
-            except Exception:
-                continue
+def _build_replacement_options(it: ItineraryItem, trip_date: date | None, start_dt: datetime | None, end_dt: datetime | None):
+    return _replacement_options_many([(it, start_dt, end_dt)], trip_date)[0]
+
+
+def _as_datetime(value):
+    """Item start/end times: datetimes from the ORM, ISO strings from older payloads."""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except Exception:
+        return None
 
-        if opens and closes:
-            return min(opens), max(closes)
 
-    return None, None
+def _minute_of(dt: datetime) -> int:
+    return dt.hour * 60 + dt.minute
 
 
 class F14AdaptivePlanningView(APIView):
@@ -675,11 +580,7 @@ class F14AdaptivePlanningView(APIView):
         weather_only = data.get("weather_only", False)
         proposed_item_ids = data.get("proposed_item_ids") or []
 
-        allowed_trip_ids = Trip.objects.filter(
-            Q(owner=user) | Q(collaborators__user=user)
-        ).values_list("id", flat=True)
-
-        if trip_id not in set(allowed_trip_ids):
+        if not can_access_trip(user, trip_id):
             return Response({"detail": "Forbidden."}, status=status.HTTP_403_FORBIDDEN)
 
         trip = get_object_or_404(Trip, pk=trip_id)
@@ -711,6 +612,7 @@ class F14AdaptivePlanningView(APIView):
                 date_str,
                 anchor,
                 fallback_coords,
+                trip,
             )
             payload = {
                 "applied": False,
@@ -757,29 +659,15 @@ class F14AdaptivePlanningView(APIView):
 
             # Optionally adjust times to opening hours if requested
             if data.get("apply_opening_hours"):
-                def _parse_iso(ts: str | None):
-                    if not ts:
-                        return None
-                    try:
-                        return datetime.fromisoformat(ts.replace("Z", "+00:00"))
-                    except Exception:
-                        return None
-
+                osm_hours = _items_opening_hours(items)
                 for it in items:
-                    oh_info = _fetch_osm_opening_hours(
-                        float(it.lat) if it.lat is not None else None,
-                        float(it.lon) if it.lon is not None else None,
-                    )
-                    opening_hours_text = (oh_info or {}).get("opening_hours")
-                    if not opening_hours_text:
-                        continue
-
-                    open_t, close_t = _parse_hours_for_date(opening_hours_text, trip_date)
-                    if not open_t or not close_t:
+                    oh_info = lookup_opening_hours(osm_hours, it.lat, it.lon)
+                    hours = compile_hours((oh_info or {}).get("opening_hours"))
+                    if hours is None:
                         continue
 
-                    start_dt = _parse_iso(getattr(it, "start_time", None))
-                    end_dt = _parse_iso(getattr(it, "end_time", None))
+                    start_dt = _as_datetime(getattr(it, "start_time", None))
+                    end_dt = _as_datetime(getattr(it, "end_time", None))
 
                     # Determine base date for combining times
                     base_date = None
@@ -796,23 +684,25 @@ class F14AdaptivePlanningView(APIView):
                     if not base_date:
                         continue
 
-                    def combine(t: dt_time):
-                        return datetime.combine(base_date, t, tzinfo=tzinfo)
+                    # Hours are checked on the trip day (the item's own date when unset)
+                    fitted = hours.fit_visit(
+                        trip_date or base_date,
+                        _minute_of(start_dt) if start_dt else None,
+                        _minute_of(end_dt) if end_dt else None,
+                    )
+                    if fitted is None:
+                        continue
+
+                    def combine(minute: int):
+                        minute = min(minute, 24 * 60 - 1)
+                        return datetime.combine(base_date, dt_time(minute // 60, minute % 60), tzinfo=tzinfo)
 
                     new_start = start_dt
                     new_end = end_dt
-
-                    if start_dt:
-                        if start_dt.time() < open_t or start_dt.time() > close_t:
-                            new_start = combine(open_t)
-                    if end_dt:
-                        if end_dt.time() > close_t or end_dt.time() < open_t:
-                            new_end = combine(close_t)
-
-                    # Ensure order
-                    if new_start and new_end and new_end <= new_start:
-                        new_start = combine(open_t)
-                        new_end = combine(close_t)
+                    if start_dt and fitted[0] != _minute_of(start_dt):
+                        new_start = combine(fitted[0])
+                    if end_dt and fitted[1] != _minute_of(end_dt):
+                        new_end = combine(fitted[1])
 
                     updates = []
                     if new_start and new_start != start_dt:
@@ -856,6 +746,7 @@ class F14AdaptivePlanningView(APIView):
                 date_str,
                 anchor,
                 fallback_coords,
+                trip,
             )
             payload = {
                 "applied": False,
@@ -894,6 +785,7 @@ class F14AdaptivePlanningView(APIView):
             date_str,
             anchor,
             fallback_coords,
+            trip,
         )
 
         old_order = [it.id for it in items]
@@ -941,41 +833,24 @@ class F14AdaptivePlanningView(APIView):
         # -----------------------------
         trip_date = data.get("date")
 
-        def _parse_iso(ts: str | None):
-            if not ts:
-                return None
-            try:
-                return datetime.fromisoformat(ts.replace("Z", "+00:00"))
-            except Exception:
-                return None
+        # Prefer stored hours on the item; the rest share one Overpass query
+        stored_hours = {it.id: _stored_opening_hours(it) for it in items}
+        osm_hours = _items_opening_hours([it for it in items if not stored_hours[it.id][0]])
 
+        conflicts = []
         for it in items:
-            opening_hours_text = None
-            hours_source = "unknown"
-            hours_confidence = 0.2
-
-            # Prefer stored hours on the item (if any)
-            existing = getattr(it, "opening_hours_json", None) or getattr(it, "opening_hours", None)
-            if isinstance(existing, dict):
-                opening_hours_text = existing.get("opening_hours") or existing.get("text") or None
-                hours_source = existing.get("source") or hours_source
-                hours_confidence = existing.get("confidence") or hours_confidence
-            elif isinstance(existing, str):
-                opening_hours_text = existing or None
+            opening_hours_text, hours_source, hours_confidence = stored_hours[it.id]
 
             # Otherwise fetch from OSM
             if not opening_hours_text:
-                oh_info = _fetch_osm_opening_hours(
-                    float(it.lat) if it.lat is not None else None,
-                    float(it.lon) if it.lon is not None else None,
-                )
+                oh_info = lookup_opening_hours(osm_hours, it.lat, it.lon)
                 opening_hours_text = (oh_info or {}).get("opening_hours")
                 hours_source = (oh_info or {}).get("source") or hours_source
                 hours_confidence = (oh_info or {}).get("confidence") or hours_confidence
 
-            open_t, close_t = _parse_hours_for_date(opening_hours_text, trip_date)
-            start_dt = _parse_iso(getattr(it, "start_time", None))
-            end_dt = _parse_iso(getattr(it, "end_time", None))
+            hours = compile_hours(opening_hours_text)
+            start_dt = _as_datetime(getattr(it, "start_time", None))
+            end_dt = _as_datetime(getattr(it, "end_time", None))
 
             def add_change(action: str, note: str):
                 changes.append({
@@ -988,28 +863,44 @@ class F14AdaptivePlanningView(APIView):
                 })
 
             has_conflict = False
-            if opening_hours_text and open_t and close_t and (start_dt or end_dt):
-                if start_dt:
-                    st = start_dt.time().replace(second=0, microsecond=0)
-                    if st < open_t:
-                        add_change(
-                            "opening_hours_conflict",
-                            f"Start time {st.strftime('%H:%M')} is before opening ({open_t.strftime('%H:%M')}).",
-                        )
-                        has_conflict = True
-                if end_dt:
-                    et = end_dt.time().replace(second=0, microsecond=0)
-                    if et > close_t:
+            spans = hours.intervals_on(trip_date) if hours and trip_date else None
+            if spans is not None and (start_dt or end_dt):
+                st = _minute_of(start_dt) if start_dt else None
+                et = _minute_of(end_dt) if end_dt else None
+                span = hours.interval_at(trip_date, st) if st is not None else None
+                if not spans:
+                    add_change("opening_hours_conflict", f"Closed on {trip_date.strftime('%A')}.")
+                    has_conflict = True
+                elif st is not None and not span:
+                    nxt = hours.next_opening(trip_date, st)
+                    if nxt is not None:
+                        note = f"Start time {format_minutes(st)} is before opening ({format_minutes(nxt)})."
+                    else:
+                        note = f"Start time {format_minutes(st)} is after closing ({format_minutes(spans[-1][1])})."
+                    add_change("opening_hours_conflict", note)
+                    has_conflict = True
+                if spans and et is not None and (span or st is None):
+                    # The visit has to end before the interval it is in closes
+                    if not span:
+                        span = hours.interval_at(trip_date, max(et - 1, 0))
+                    if span:
+                        close = span[1]
+                    else:
+                        close = max((e for _, e in spans if e < et), default=None)
+                    if close is not None and et > close:
                         add_change(
                             "opening_hours_warning",
-                            f"End time {et.strftime('%H:%M')} is after closing ({close_t.strftime('%H:%M')}).",
+                            f"End time {format_minutes(et)} is after closing ({format_minutes(close)}).",
                         )
                         has_conflict = True
 
             if has_conflict:
-                options = _build_replacement_options(it, trip_date, start_dt, end_dt)
-                if options:
-                    replacement_suggestions.append({"item_id": it.id, "options": options})
+                conflicts.append((it, start_dt, end_dt))
+
+        # One OpenTripMap stage for all of the day's conflicts
+        for (it, _, _), options in zip(conflicts, _replacement_options_many(conflicts, trip_date)):
+            if options:
+                replacement_suggestions.append({"item_id": it.id, "options": options})
 
         # validate shape (optional but helps catch mistakes)
         F14AdaptivePlanResponseSerializer(data=payload).is_valid(raise_exception=True)
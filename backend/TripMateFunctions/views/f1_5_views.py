@@ -23,12 +23,31 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from django.conf import settings
-from django.db.models import Q, Max
+from django.db.models import Max
 
 from ..models import Trip, TripDay, ItineraryItem, AppUser, Profile
+from ..services.cache import CacheNamespace
+from ..services.fanout import FanOut, parallel_map
+from ..services.nearby import named_places
+from ..services.ratelimit import RateLimiter
+from ..services.singleflight import single_flight
+from ..services.trip_access import can_access_trip
 
 logger = logging.getLogger(__name__)
 
+# Geocoded recommendation names (shared across workers)
+_GEOCODE_CACHE = CacheNamespace("rec_geocode", default_ttl=60 * 60 * 24 * 7)
+# Whole recommendation payloads keyed on (destination, itinerary hash, preferences)
+_RECOMMENDATIONS_CACHE = CacheNamespace("ai_recommendations", default_ttl=60 * 60 * 6)
+# Known places this close to the day's stops are used instead of geocoding
+LOCAL_GEOCODE_RADIUS_M = 30_000
+
+# Mapbox geocoding quota is 600 req/min; stay well under it per worker
+_MAPBOX_GEOCODE_LIMIT = RateLimiter(
+    rate_per_second=float(os.environ.get("MAPBOX_GEOCODE_RATE_PER_SECOND", "8")),
+    max_concurrent=int(os.environ.get("MAPBOX_GEOCODE_MAX_CONCURRENT", "4")),
+)
+
 
 # ============================================================================
 # Helper: SeaLion AI Client
@@ -89,13 +108,33 @@ def geocode_place(place_name: str, city: str) -> Optional[Tuple[float, float, st
     Geocode a place name to get coordinates.
     Returns (lat, lon, formatted_address) or None if failed.
     
-    Uses Mapbox Geocoding API.
+    Uses Mapbox Geocoding API (cached, rate-limited).
     """
     mapbox_token = os.environ.get("MAPBOX_ACCESS_TOKEN")
     if not mapbox_token:
         logger.warning("⚠️ MAPBOX_ACCESS_TOKEN not set, geocoding disabled")
         return None
-    
+
+    cache_key = f"{(place_name or '').strip().lower()}|{(city or '').strip().lower()}"
+    coords = single_flight(
+        _GEOCODE_CACHE,
+        cache_key,
+        lambda: _mapbox_geocode(place_name, city, mapbox_token),
+    )
+    return tuple(coords) if coords else None
+
+
+def geocode_places(place_names: List[str], city: str) -> Dict[str, Optional[Tuple[float, float, str]]]:
+    """
+    Batch version of geocode_place: unique names are geocoded in parallel
+    (bounded by the Mapbox rate limiter). Returns {place_name: coords or None}.
+    """
+    unique = list(dict.fromkeys(n for n in place_names if n))
+    results = parallel_map(lambda name: geocode_place(name, city), unique, max_workers=4, name="geocode")
+    return dict(zip(unique, results))
+
+
+def _mapbox_geocode(place_name: str, city: str, mapbox_token: str) -> Optional[Tuple[float, float, str]]:
     try:
         # Combine place name with city for better accuracy
         query = f"{place_name}, {city}"
@@ -110,7 +149,8 @@ def geocode_place(place_name: str, city: str) -> Optional[Tuple[float, float, st
             "types": "poi,address,place",
         }
         
-        response = requests.get(url, params=params, timeout=10)
+        with _MAPBOX_GEOCODE_LIMIT:
+            response = requests.get(url, params=params, timeout=10)
         
         if response.status_code != 200:
             logger.warning(f"Geocoding failed for '{query}': status {response.status_code}")
@@ -301,9 +341,7 @@ class AIRecommendationsView(APIView):
         
         # Verify trip access
         try:
-            trip = Trip.objects.filter(
-                Q(id=trip_id) & (Q(owner=app_user) | Q(collaborators__user=app_user))
-            ).distinct().first()
+            trip = Trip.objects.filter(id=trip_id).first() if can_access_trip(app_user, trip_id) else None
             
             if not trip:
                 return Response(
@@ -350,6 +388,15 @@ class AIRecommendationsView(APIView):
             
             itinerary_hash = self._compute_itinerary_hash(day_items)
             
+            # ✅ Unchanged day + same preferences => reuse the previous result
+            memo_key = self._recommendations_memo_key(
+                destination, trip_country, target_day_index, itinerary_hash, user_preferences
+            )
+            cached = _RECOMMENDATIONS_CACHE.get(memo_key)
+            if cached is not None:
+                logger.info(f"⚡ Recommendations cache hit for {destination} ({itinerary_hash})")
+                return Response(cached)
+            
             # Generate recommendations
             categories = self._generate_categorized_recommendations(
                 destination=destination,
@@ -360,13 +407,25 @@ class AIRecommendationsView(APIView):
                 trip_country=trip_country,
             )
             
-            # ✅ CRITICAL: Geocode all recommendations
+            # ✅ CRITICAL: Geocode all recommendations (one batched, parallel stage)
             logger.info("\n=== 🗺️ Starting Geocoding ===")
+            to_geocode = [
+                rec['name']
+                for recommendations in categories.values()
+                for rec in recommendations
+                if rec.get('lat') is None or rec.get('lon') is None
+            ]
+            # Places we already store near the day's stops need no Mapbox call
+            center = self._items_center(day_items)
+            known = named_places(to_geocode, *center, LOCAL_GEOCODE_RADIUS_M) if center else {}
+            geocoded = geocode_places([name for name in to_geocode if name not in known], destination)
+            geocoded.update(known)
+            if known:
+                logger.info(f"  📍 {len(known)} recommendation(s) located from stored places")
             for category_name, recommendations in categories.items():
-                logger.info(f"\n📍 Geocoding {category_name} recommendations:")
                 for rec in recommendations:
                     if rec.get('lat') is None or rec.get('lon') is None:
-                        coords = geocode_place(rec['name'], destination)
+                        coords = geocoded.get(rec['name'])
                         if coords:
                             rec['lat'], rec['lon'], rec['address'] = coords
                             logger.info(f"  ✅ {rec['name']} → ({rec['lat']:.4f}, {rec['lon']:.4f})")
@@ -385,14 +444,18 @@ class AIRecommendationsView(APIView):
             )
             logger.info(f"\n📊 Geocoding Summary: {with_coords}/{total_recs} recommendations have coordinates")
             
-            return Response({
+            payload = {
                 "success": True,
                 "destination": destination,
                 "day_index": target_day_index,
                 "itinerary_hash": itinerary_hash,
                 "categories": categories,
                 "personalized": True,
-            })
+            }
+            # Don't memoize placeholder results from a failed SeaLion call
+            if not self._has_fallback_category(categories, destination):
+                _RECOMMENDATIONS_CACHE.set(memo_key, payload)
+            return Response(payload)
             
         except Exception as e:
             logger.error(f"AI recommendations failed: {e}", exc_info=True)
@@ -664,12 +727,47 @@ class AIRecommendationsView(APIView):
         logger.info(f"✅ FINAL LOCATION: {most_common_city} (appears {count} times)")
         return most_common_city
     
+    def _items_center(self, items: List[ItineraryItem]) -> Optional[Tuple[float, float]]:
+        """Mean (lat, lon) of the items that have coordinates, or None."""
+        points = [(item.lat, item.lon) for item in items if item.lat is not None and item.lon is not None]
+        if not points:
+            return None
+        return (
+            sum(lat for lat, _ in points) / len(points),
+            sum(lon for _, lon in points) / len(points),
+        )
+    
     def _compute_itinerary_hash(self, items) -> str:
         """Generate itinerary hash."""
         import hashlib
         items_str = ",".join([f"{item.id}:{item.sort_order}" for item in items])
         return hashlib.md5(items_str.encode()).hexdigest()[:8]
     
+    def _recommendations_memo_key(
+        self,
+        destination: str,
+        trip_country: str,
+        day_index: Optional[int],
+        itinerary_hash: str,
+        user_preferences: Dict[str, Any],
+    ) -> str:
+        """Memo key: (destination, itinerary hash, preference fingerprint)."""
+        import hashlib
+        fingerprint = json.dumps(user_preferences or {}, sort_keys=True, default=str)
+        raw = json.dumps(
+            [destination, trip_country, day_index, itinerary_hash, fingerprint],
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+    
+    def _has_fallback_category(self, categories: Dict[str, List[Dict[str, Any]]], destination: str) -> bool:
+        fallbacks = {
+            "nearby": self._fallback_nearby(destination),
+            "food": self._fallback_food(destination),
+            "culture": self._fallback_culture(destination),
+        }
+        return any(categories.get(name) == recs for name, recs in fallbacks.items())
+    
     def _generate_categorized_recommendations(
         self, 
         destination: str, 
@@ -700,24 +798,40 @@ class AIRecommendationsView(APIView):
                 'name': 'Traveler',
             }
         
-        categories = {}
+        # The three SeaLion prompts are independent: run them concurrently.
+        # Each generator already falls back on its own errors; the deadline
+        # covers a hung call (call_sealion_ai times out at 40s).
+        fan = FanOut(deadline_seconds=45, max_workers=3, name="recommendations")
         
         # 1. NEARBY
-        categories["nearby"] = self._generate_nearby_recommendations(
-            destination, existing_places_str, trip_context, user_preferences, trip_country
+        fan.add(
+            "nearby",
+            lambda deps: self._generate_nearby_recommendations(
+                destination, existing_places_str, trip_context, user_preferences, trip_country
+            ),
+            default=self._fallback_nearby(destination),
         )
         
         # 2. FOOD
-        categories["food"] = self._generate_food_recommendations(
-            destination, trip_context, user_preferences, trip_country
+        fan.add(
+            "food",
+            lambda deps: self._generate_food_recommendations(
+                destination, trip_context, user_preferences, trip_country
+            ),
+            default=self._fallback_food(destination),
         )
         
         # 3. CULTURE
-        categories["culture"] = self._generate_culture_recommendations(
-            destination, trip_context, user_preferences, trip_country
+        fan.add(
+            "culture",
+            lambda deps: self._generate_culture_recommendations(
+                destination, trip_context, user_preferences, trip_country
+            ),
+            default=self._fallback_culture(destination),
         )
         
-        return categories
+        result = fan.run()
+        return {name: result.values[name] for name in ("nearby", "food", "culture")}
     
     def _build_preference_context(self, user_preferences: Dict[str, Any]) -> str:
         """Build preference context string."""
@@ -1218,9 +1332,7 @@ class QuickAddRecommendationView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        trip = Trip.objects.filter(
-            Q(id=trip_id) & (Q(owner=app_user) | Q(collaborators__user=app_user))
-        ).distinct().first()
+        trip = Trip.objects.filter(id=trip_id).first() if can_access_trip(app_user, trip_id) else None
         
         if not trip:
             return Response(
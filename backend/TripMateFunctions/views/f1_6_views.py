@@ -2,7 +2,8 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 
-from ..models import Destination, DestinationFAQ, DestinationQA, CountryInfo
+from ..models import Destination, DestinationFAQ, DestinationQA, CountryInfo, SearchDocument
+from ..services.search import search_queryset
 from ..serializers.f1_6_serializers import (
     F16DestinationFAQRequestSerializer,
     F16DestinationFAQPanelSerializer,
@@ -14,7 +15,7 @@ class F16DestinationFAQView(APIView):
     F1.6 - Destination FAQ Panel
 
     POST:
-      - body: {"destination_id": ...}
+      - body: {"destination_id": ..., "query": "<optional search text>"}
       - loads Destination, FAQ, Q&A, CountryInfo
       - returns combined panel payload
     """
@@ -35,6 +36,11 @@ class F16DestinationFAQView(APIView):
         faqs = DestinationFAQ.objects.filter(destination=destination, is_published=True)
         qas = DestinationQA.objects.filter(destination=destination, is_public=True)
 
+        query = (req.validated_data.get("query") or "").strip()
+        if query:
+            faqs = search_queryset(faqs, query, SearchDocument.Kind.DESTINATION_FAQ)
+            qas = search_queryset(qas, query, SearchDocument.Kind.DESTINATION_QA)
+
         country_info = None
         if destination.country_code:
             country_info = (
@@ -1,29 +1,84 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse
 from django.utils import timezone
-from django.shortcuts import get_object_or_404
-from datetime import timedelta
+from django.views import View
 
-from ..models import Trip, TripCollaborator, AppUser
+from ..models import Trip, AppUser
 from ..serializers.f1_1_serializers import TripSerializer
 from ..serializers.f2_1_serializers import (
     F21SyncRequestSerializer,
     F21SyncResponseSerializer,
 )
-
-PRESENCE_TTL_SECONDS = 20
+from ..services.presence import (
+    LONG_POLL_SECONDS,
+    POLL_AFTER_SECONDS,
+    heartbeat,
+    note_active,
+    online_user_ids,
+    presence_tag,
+    run_sync,
+    trip_member_ids,
+    wait_for_change,
+)
+from ..services.trip_access import can_access_trip
+from ..services.trip_sync import changes_since, revision_at
+
+
+def _sync_payload(trip, since):
+    """(changes, response data) for a client at revision ``since``; see F21RealTimeCoEditingSyncView."""
+    revision, changes = changes_since(trip, since)
+    res_data = {
+        "revision": revision,
+        "changes": changes or [],
+        "server_timestamp": timezone.now(),
+    }
+    if changes is None:
+        full = Trip.objects.prefetch_related("days", "items", "collaborators__user").get(id=trip.id)
+        res_data["trip"] = TripSerializer(full).data
+        res_data["reset"] = True
+    return changes, res_data
+
+
+def _member_ids_or_error(trip_id, user):
+    """(member ids, None) or (None, error Response)."""
+    member_ids = trip_member_ids(trip_id)
+    if member_ids is None:
+        return None, Response({"detail": "Trip not found"}, status=status.HTTP_404_NOT_FOUND)
+    if str(user.id) not in member_ids:
+        return None, Response(
+            {"detail": "Not a collaborator on this trip."},
+            status=status.HTTP_403_FORBIDDEN,
+        )
+    return member_ids, None
 
 
 class F21RealTimeCoEditingSyncView(APIView):
     """
     F2.1 - Real-Time Co-Editing sync endpoint.
 
-    You can call this via short polling (1-2s):
-      - send last_synced_at and local changes
-      - receive latest server state / deltas
+    Short polling (1-2s):
+      POST /api/f2/sync/  {"trip_id": 5, "revision": 40}
+
+      - 204 No Content: nothing changed since revision 40
+      - 200 {"revision": 42, "changes": [...]}: the operations after 40
+        ({"rev", "entity": trip|day|item, "id", "op": upsert|delete, "data"}),
+        only the latest one per row. Deleting a day moves its items to day=null.
+      - 200 {"revision": 42, "changes": [], "trip": {...}, "reset": true}:
+        first poll, or too far behind: replace local state with "trip".
+
+    Clients that only know last_synced_at are answered from the revision that
+    was current at that time. Cost scales with the number of edits, not with
+    the size of the trip (services/trip_sync.py).
     """
+    permission_classes = [IsAuthenticated]
 
     def post(self, request, *args, **kwargs):
         req = F21SyncRequestSerializer(data=request.data)
@@ -32,26 +87,44 @@ class F21RealTimeCoEditingSyncView(APIView):
 
         trip_id = data["trip_id"]
         # TODO: apply `data["changes"]` into DB with conflict resolution.
+        # Edits still go through the regular item/day endpoints.
 
-        try:
-            trip = Trip.objects.get(id=trip_id)
-        except Trip.DoesNotExist:
+        trip = Trip.objects.filter(id=trip_id).first()
+        if trip is None:
             return Response(
                 {"detail": "Trip not found"}, status=status.HTTP_404_NOT_FOUND
             )
 
-        trip_payload = TripSerializer(trip).data
+        if not can_access_trip(request.user, trip):
+            return Response(
+                {"detail": "Not a collaborator on this trip."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        since = data.get("revision")
+        if since is None and data.get("last_synced_at"):
+            since = revision_at(trip, data["last_synced_at"])
+
+        changes, res_data = _sync_payload(trip, since)
+
+        if changes == []:
+            res = Response(status=status.HTTP_204_NO_CONTENT)
+            res["ETag"] = f'"{res_data["revision"]}"'
+            return res
 
-        res_data = {
-            "trip": trip_payload,
-            "changes": {},  # TODO: send minimal deltas if you want
-            "server_timestamp": timezone.now(),
-        }
         res = F21SyncResponseSerializer(res_data)
         return Response(res.data, status=status.HTTP_200_OK)
 
 
 class F21TripPresencePollView(APIView):
+    """
+    Presence heartbeat: POST /api/f2/trips/<trip_id>/presence/
+
+    Marks the caller online for PRESENCE_TTL_SECONDS and returns who else is.
+    Presence is kept in the shared cache (services/presence.py); the poll no
+    longer writes AppUser.last_active_at itself. Open trip pages use the
+    long-poll channel below instead.
+    """
     permission_classes = [IsAuthenticated]
 
     def post(self, request, trip_id: int, *args, **kwargs):
@@ -62,37 +135,114 @@ class F21TripPresencePollView(APIView):
                 status=status.HTTP_401_UNAUTHORIZED,
             )
 
-        trip = get_object_or_404(Trip, id=trip_id)
-        is_member = trip.owner_id == user.id or TripCollaborator.objects.filter(
-            trip=trip,
-            user=user,
-        ).exists()
-        if not is_member:
-            return Response(
-                {"detail": "Not a collaborator on this trip."},
-                status=status.HTTP_403_FORBIDDEN,
-            )
+        member_ids, error = _member_ids_or_error(trip_id, user)
+        if error:
+            return error
 
-        now = timezone.now()
-        AppUser.objects.filter(id=user.id).update(last_active_at=now)
-        cutoff = now - timedelta(seconds=PRESENCE_TTL_SECONDS)
-
-        online_ids = set(
-            AppUser.objects.filter(
-                id=trip.owner_id,
-                last_active_at__gte=cutoff,
-            ).values_list("id", flat=True)
+        heartbeat(trip_id, user.id)
+        note_active(user.id)
+        return Response(
+            {"online_user_ids": online_user_ids(trip_id, member_ids), "server_time": timezone.now()},
+            status=status.HTTP_200_OK,
         )
 
-        online_ids.update(
-            TripCollaborator.objects.filter(
-                trip=trip,
-                user__isnull=False,
-                user__last_active_at__gte=cutoff,
-            ).values_list("user_id", flat=True)
+
+def _json(data, status_code=status.HTTP_200_OK):
+    return HttpResponse(JSONRenderer().render(data), status=status_code, content_type="application/json")
+
+
+class F21TripChannelView(View):
+    """
+    F2.1 co-editing channel (long-poll):
+      GET /api/f2/trips/<trip_id>/channel/?revision=40&presence=<tag>&wait=15
+
+    Held open until the trip's journal revision moves past ``revision`` or
+    the set of online members no longer matches ``presence`` (the tag from
+    the previous answer), at most ``wait`` seconds. Also counts as the
+    caller's presence heartbeat. Always answers 200:
+
+      {"revision": 42, "online_user_ids": [...], "presence": "<tag>",
+       "server_time": ..., "poll_after": 0, "changes": [...]}
+
+    ``changes`` (and ``trip`` + ``reset``) follow the sync endpoint and are
+    only included when ``revision`` was sent and is behind. Without
+    ``revision`` the channel only reports presence and the current revision.
+
+    Only the ASGI channel process (gunicorn_channel.conf.py) holds polls
+    open; waiting there costs no thread. The WSGI web process answers at
+    once with ``poll_after`` set, the seconds to wait before polling again,
+    so a page full of viewers cannot take its threads away from the API.
+    """
+
+    async def get(self, request, trip_id: int, *args, **kwargs):
+        opened = await run_sync(self._open, request, trip_id)
+        if isinstance(opened, HttpResponse):
+            return opened
+        user, member_ids, since, wait = opened
+
+        poll_after = 0
+        if not isinstance(request, ASGIRequest):
+            wait, poll_after = 0.0, POLL_AFTER_SECONDS
+        try:
+            revision, online = await wait_for_change(
+                trip_id,
+                user.id,
+                member_ids,
+                since_revision=since,
+                known_presence=request.GET.get("presence") or None,
+                timeout=wait,
+            )
+        finally:
+            # Active until the poll ended; written now if a batch is due
+            await run_sync(note_active, user.id)
+
+        return await run_sync(self._answer, trip_id, since, revision, online, poll_after)
+
+    def _open(self, request, trip_id):
+        """(user, member ids, since, wait) or an error response."""
+        drf_request = Request(
+            request,
+            authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES],
         )
+        try:
+            user = drf_request.user
+        except AuthenticationFailed as exc:
+            return _json({"detail": exc.detail}, status.HTTP_401_UNAUTHORIZED)
+        if not isinstance(user, AppUser):
+            return _json({"detail": "Authentication required."}, status.HTTP_401_UNAUTHORIZED)
 
-        return Response(
-            {"online_user_ids": [str(uid) for uid in online_ids], "server_time": now},
-            status=status.HTTP_200_OK,
+        try:
+            since = request.GET.get("revision")
+            since = int(since) if since not in (None, "") else None
+            wait = float(request.GET.get("wait", LONG_POLL_SECONDS))
+        except (TypeError, ValueError):
+            return _json(
+                {"detail": "revision must be an integer and wait a number."},
+                status.HTTP_400_BAD_REQUEST,
+            )
+        wait = max(0.0, min(wait, LONG_POLL_SECONDS))
+
+        member_ids, error = _member_ids_or_error(trip_id, user)
+        if error:
+            return _json(error.data, error.status_code)
+        return user, member_ids, since, wait
+
+    def _answer(self, trip_id, since, revision, online, poll_after):
+        res_data = {}
+        if since is not None and revision != since:
+            trip = Trip.objects.filter(id=trip_id).first()
+            if trip is None:
+                return _json({"detail": "Trip not found"}, status.HTTP_404_NOT_FOUND)
+            _, res_data = _sync_payload(trip, since)
+            revision = res_data["revision"]
+
+        res_data.update(
+            {
+                "revision": revision,
+                "online_user_ids": online,
+                "presence": presence_tag(online),
+                "server_time": timezone.now(),
+                "poll_after": poll_after,
+            }
         )
+        return _json(res_data)
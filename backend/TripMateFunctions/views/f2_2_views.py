@@ -1,7 +1,6 @@
 # backend/TripMateFunctions/views/f2_2_views.py
 import json
 import logging
-import threading
 from collections import Counter
 from datetime import timedelta, datetime
 
@@ -9,7 +8,7 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
-from django.db import transaction, close_old_connections
+from django.db import transaction
 
 from TripMateFunctions.models import (
     Trip, 
@@ -17,24 +16,30 @@ from TripMateFunctions.models import (
     TripDay, 
     ItineraryItem,
     TripBudget,
-    TripCollaborator,
 )
 
 from .f1_3_views import _generate_with_fallback
+from ..services.jobs import JobError, enqueue, report_progress
+from ..services.trip_access import can_access_trip
+from ..services.trip_clone import bulk_create_days, bulk_create_items
+from ..services.trip_sync import batch_rewrite
 
 logger = logging.getLogger(__name__)
 
 
-def _generate_group_itinerary_background(trip_id):
+def _progress(job, percent, message):
+    if job is not None:
+        report_progress(job, percent, message)
+
+
+def _generate_group_itinerary(trip_id, job=None):
     """
-    Background thread function to generate group itinerary.
-    This runs asynchronously to avoid Railway's 30-second HTTP timeout.
+    Generate the group itinerary for a trip. Runs as a "group_itinerary" job
+    (services/jobs.py) to avoid Railway's 30-second HTTP timeout.
+    AI/parse failures raise JobError so the job is retried with backoff.
     """
     try:
-        # Close old database connections for thread safety
-        close_old_connections()
-        
-        logger.info(f"🚀 Background thread started for trip {trip_id}")
+        logger.info(f"🚀 Group generation started for trip {trip_id}")
         
         trip = Trip.objects.get(id=trip_id)
         preferences = GroupPreference.objects.filter(trip=trip).select_related('user')
@@ -43,7 +48,9 @@ def _generate_group_itinerary_background(trip_id):
             logger.error(f"No preferences found for trip {trip_id}")
             trip.travel_type = "draft"
             trip.save()
-            return
+            return {"trip_id": trip_id, "stops": 0}
+
+        _progress(job, 10, "Merging group preferences")
 
         # ========== MERGE GROUP PREFERENCES ==========
         
@@ -380,6 +387,7 @@ LATEST VALID TIME: 23:00 (11 PM)
 
         # ========== CALL AI ==========
         
+        _progress(job, 30, "Generating itinerary")
         logger.info(f"🤖 Calling AI to generate {duration}-day itinerary (Generation #{generation_seed})...")
         logger.info(f"🌍 Type: {'Multi-city' if is_multi_city else 'Single-city'}")
         
@@ -395,9 +403,9 @@ LATEST VALID TIME: 23:00 (11 PM)
 
         if not ai_content:
             logger.error(f"Both AI providers failed: sealion={primary_error}, gemini={fallback_error}")
-            trip.travel_type = "draft"
-            trip.save()
-            return
+            raise JobError("AI service unavailable")
+
+        _progress(job, 70, "Reading itinerary")
 
         logger.info(f"AI response received from {provider}, length: {len(ai_content)}")
 
@@ -425,9 +433,7 @@ LATEST VALID TIME: 23:00 (11 PM)
                 logger.info("Repaired by removing incomplete items")
             else:
                 logger.error("Cannot repair truncated response")
-                trip.travel_type = "draft"
-                trip.save()
-                return
+                raise JobError("AI service returned an invalid itinerary")
         
         if not cleaned_ai_content.startswith('{'):
             start_idx = cleaned_ai_content.find('{')
@@ -440,24 +446,22 @@ LATEST VALID TIME: 23:00 (11 PM)
             logger.info("JSON parsed successfully")
         except Exception as e:
             logger.error(f"JSON parse failed: {str(e)}")
-            trip.travel_type = "draft"
-            trip.save()
-            return
+            raise JobError("AI service returned an invalid itinerary")
 
         stops = itinerary.get("stops", [])
         if not stops:
             logger.error("AI returned no activities")
-            trip.travel_type = "draft"
-            trip.save()
-            return
+            raise JobError("AI service returned an empty itinerary")
 
         logger.info(f"Successfully parsed {len(stops)} stops")
 
         # ========== UPDATE DATABASE ==========
         
+        _progress(job, 90, "Saving itinerary")
         logger.info(f"Creating itinerary in database...")
         
-        with transaction.atomic():
+        # One "reset" for co-editing clients instead of an op per deleted/created row
+        with transaction.atomic(), batch_rewrite(trip.id):
             trip.title = itinerary.get("title", f"Group Trip to {destination_str}")
             trip.main_city = itinerary.get("main_city", main_city_for_db)
             trip.main_country = itinerary.get("main_country", "United Kingdom")
@@ -482,11 +486,9 @@ LATEST VALID TIME: 23:00 (11 PM)
                     TripDay(trip=trip, day_index=i + 1, date=day_date)
                 )
             
-            TripDay.objects.bulk_create(trip_days)
+            day_map = bulk_create_days(trip, trip_days)
             logger.info(f"Created {len(trip_days)} days")
             
-            day_map = {d.day_index: d for d in TripDay.objects.filter(trip=trip)}
-            
             items = []
             sort_order = 1
 
@@ -541,7 +543,7 @@ LATEST VALID TIME: 23:00 (11 PM)
                 sort_order += 1
 
             if items:
-                ItineraryItem.objects.bulk_create(items)
+                bulk_create_items(trip, items)
                 logger.info(f"✅ Created {len(items)} items")
 
             if avg_budget_max:
@@ -554,19 +556,20 @@ LATEST VALID TIME: 23:00 (11 PM)
                 )
 
         logger.info(f"🎉 Successfully generated {duration}-day {'multi-city' if is_multi_city else 'single-city'} itinerary for trip {trip_id} using {provider}")
+        return {"trip_id": trip_id, "stops": len(stops)}
 
     except Exception as e:
-        logger.error(f"❌ Background generation failed for trip {trip_id}: {str(e)}")
-        import traceback
-        logger.error(traceback.format_exc())
-        try:
-            trip = Trip.objects.get(id=trip_id)
-            trip.travel_type = "draft"
-            trip.save()
-        except Exception:
-            pass
-    finally:
-        close_old_connections()
+        logger.error(f"❌ Group generation failed for trip {trip_id}: {str(e)}")
+        raise
+
+
+def run_group_generation_job(job):
+    return _generate_group_itinerary(job.trip_id, job=job)
+
+
+def group_generation_failed(job):
+    """Final failure: let the group edit / regenerate the draft again."""
+    Trip.objects.filter(id=job.trip_id, travel_type="group_generating").update(travel_type="draft")
 
 
 class TripGroupPreferencesAPIView(APIView):
@@ -603,8 +606,9 @@ class F22GroupTripGeneratorView(APIView):
     POST /api/f2/trips/{trip_id}/generate-group-itinerary/
     NOW SUPPORTS MULTI-CITY ITINERARIES (e.g., London + Edinburgh)
     
-    Uses background thread to avoid Railway's 30-second HTTP timeout.
-    Returns 202 Accepted immediately, frontend polls for completion.
+    Queues a "group_itinerary" job to avoid Railway's 30-second HTTP timeout.
+    Returns 202 Accepted immediately with the job id; the frontend polls
+    GET /api/jobs/{job_id}/ (or the trip's travel_type) for completion.
     """
     permission_classes = [IsAuthenticated]
 
@@ -619,13 +623,7 @@ class F22GroupTripGeneratorView(APIView):
         
         current_user = request.user
         
-        is_collaborator = TripCollaborator.objects.filter(
-            trip=trip,
-            user=current_user,
-            status=TripCollaborator.Status.ACTIVE
-        ).exists()
-
-        if not is_collaborator:
+        if not can_access_trip(current_user, trip, active_only=True):
             return Response(
                 {"error": "Only trip collaborators can regenerate itinerary"},
                 status=status.HTTP_403_FORBIDDEN
@@ -639,37 +637,31 @@ class F22GroupTripGeneratorView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Check if already generating
-        if trip.travel_type == "group_generating":
-            logger.info(f"Trip {trip_id} is already generating, returning 202")
-            return Response(
-                {
-                    "message": "Generation already in progress",
-                    "trip_id": trip_id,
-                    "status": "generating",
-                },
-                status=status.HTTP_202_ACCEPTED
+        # One active generation per trip: a repeated click joins the running job
+        with transaction.atomic():
+            job, created = enqueue(
+                "group_itinerary",
+                {"trip_id": trip.id},
+                trip=trip,
+                user=current_user,
+                dedupe_key=f"trip:{trip.id}",
             )
+            if created:
+                # Set intermediate status for regeneration
+                trip.travel_type = "group_generating"
+                trip.save()
 
-        # Set intermediate status for regeneration
-        trip.travel_type = "group_generating"
-        trip.save()
-        logger.info(f"✅ Trip {trip_id} status: group_generating")
-
-        # Start background thread for AI generation
-        generation_thread = threading.Thread(
-            target=_generate_group_itinerary_background,
-            args=(trip_id,),
-            daemon=True
-        )
-        generation_thread.start()
-        logger.info(f"🚀 Started background generation thread for trip {trip_id}")
+        if not created:
+            logger.info(f"Trip {trip_id} is already generating (job {job.id}), returning 202")
+        else:
+            logger.info(f"🚀 Queued group generation job {job.id} for trip {trip_id}")
 
         # Return immediately with 202 Accepted
         return Response(
             {
-                "message": "Generation started",
+                "message": "Generation started" if created else "Generation already in progress",
                 "trip_id": trip_id,
+                "job_id": job.id,
                 "status": "generating",
             },
             status=status.HTTP_202_ACCEPTED
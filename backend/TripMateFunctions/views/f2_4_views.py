@@ -1,4 +1,4 @@
-from rest_framework import generics, filters, pagination, permissions, status
+from rest_framework import generics, pagination, permissions, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.generics import ListAPIView
@@ -6,7 +6,10 @@ from django.db import connection
 
 from ..models import (Trip, 
                       CommunityFAQ,
+                      CommunityTripCard,
+                      SearchDocument,
                       )
+from ..services.search import remove_document, search_queryset
 from ..serializers.f2_4_serializers import (
     F24CommunityTripPreviewSerializer,
     F24CommunityTripDetailSerializer,
@@ -14,49 +17,68 @@ from ..serializers.f2_4_serializers import (
 )
 
 
-class F24CommunityTripPagination(pagination.PageNumberPagination):
+class F24CommunityTripPagination(pagination.CursorPagination):
     """
-    Pagination for community itineraries.
+    Keyset pagination for community itineraries: ?cursor= comes from the
+    previous page's "next" link, so deep pages cost the same as the first.
     3 items per page to match the Discovery UI.
     """
     page_size = 3
     page_size_query_param = "page_size"
     max_page_size = 50
+    ordering = ("-created_at", "-trip_id")
+
+
+class F24CommunitySearchPagination(pagination.PageNumberPagination):
+    """?search= results are ranked, so they are paged by number rather than by cursor."""
+    page_size = F24CommunityTripPagination.page_size
+    page_size_query_param = "page_size"
+    max_page_size = F24CommunityTripPagination.max_page_size
 
 
 class F24CommunityTripListView(generics.ListAPIView):
     """
     F2.4 - List public itineraries for discovery.
 
+    Served from CommunityTripCard (one precomputed row per public trip, see
+    services/community_cards.py), newest first.
+
     Supports:
-      - ?search=<text> across title, main_city, main_country
+      - ?search=<text> full-text over title, city, country, description and
+        stop names (services/search.py); every match, best first, paged with
+        ?page= (F24CommunitySearchPagination)
       - ?main_country=<country name> (eg. 'Singapore')
 
     Example:
-      /api/f2/community/?main_country=Singapore&page=1
+      /api/f2/community/?main_country=Singapore
+      -> {"next": ".../?cursor=cD0y...&main_country=Singapore", "previous": null, "results": [...]}
     """
 
     serializer_class = F24CommunityTripPreviewSerializer
     permission_classes = [permissions.AllowAny]
-    filter_backends = [filters.SearchFilter]
-    search_fields = ["title", "main_city", "main_country"]
     pagination_class = F24CommunityTripPagination
 
+    def _search_query(self) -> str:
+        return (self.request.query_params.get("search") or "").strip()
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator"):
+            self._paginator = F24CommunitySearchPagination() if self._search_query() else self.pagination_class()
+        return self._paginator
+
     def get_queryset(self):
-        qs = (
-            Trip.objects.filter(
-                visibility="public",
-                is_flagged=False,
-            )
-            .select_related("owner")
-            .prefetch_related("photos")
-        )
+        qs = CommunityTripCard.objects.all()
 
         main_country = self.request.query_params.get("main_country")
         if main_country:
             qs = qs.filter(main_country__iexact=main_country.strip())
 
-        return qs.order_by("-created_at")
+        query = self._search_query()
+        if query:
+            qs = search_queryset(qs, query, SearchDocument.Kind.TRIP, field="trip_id")
+
+        return qs
 
 
 class F24CommunityTripDetailView(generics.RetrieveAPIView):
@@ -78,7 +100,7 @@ class F24CommunityTripDetailView(generics.RetrieveAPIView):
                 visibility="public",
                 is_flagged=False,
             )
-            .select_related("owner")
+            .select_related("owner", "community_card")
             .prefetch_related(
                 "photos",
                 "days__items",
@@ -156,6 +178,10 @@ class F24FlagTripView(APIView):
                 status=status.HTTP_404_NOT_FOUND,
             )
 
+        # Raw UPDATE skips signals: take it off the community feed and search here
+        CommunityTripCard.objects.filter(trip_id=row[0]).delete()
+        remove_document(SearchDocument.Kind.TRIP, row[0])
+
         return Response(
             {
                 "ok": True,
@@ -168,6 +194,10 @@ class F24FlagTripView(APIView):
         )
 
 class F24CommunityFAQListView(ListAPIView):
+    """
+    Published community FAQs. ?country= and ?category= filter;
+    ?search=<text> returns full-text matches, best first.
+    """
     serializer_class = F24CommunityFAQSerializer
     permission_classes = [permissions.AllowAny]  # ✅ add this
 
@@ -182,4 +212,8 @@ class F24CommunityFAQListView(ListAPIView):
         if category:
             qs = qs.filter(category__iexact=category)
 
+        query = (self.request.query_params.get("search") or "").strip()
+        if query:
+            qs = search_queryset(qs, query, SearchDocument.Kind.COMMUNITY_FAQ)
+
         return qs
\ No newline at end of file
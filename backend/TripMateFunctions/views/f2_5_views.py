@@ -2,7 +2,8 @@ from rest_framework import generics, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 
-from ..models import DestinationQA
+from ..models import DestinationQA, SearchDocument
+from ..services.search import search_queryset
 from ..serializers.f2_5_serializers import (
     F25CommunityQASerializer,
     F25QAUpvoteSerializer,
@@ -12,10 +13,23 @@ from ..serializers.f2_5_serializers import (
 class F25CommunityQAListCreateView(generics.ListCreateAPIView):
     """
     F2.5 - List & create Q&A entries.
+
+    GET filters: ?destination_id=<id>; ?search=<text> returns full-text
+    matches (question and answer), best first.
     """
     queryset = DestinationQA.objects.filter(is_public=True)
     serializer_class = F25CommunityQASerializer
 
+    def get_queryset(self):
+        qs = super().get_queryset()
+        destination_id = self.request.query_params.get("destination_id")
+        if destination_id:
+            qs = qs.filter(destination_id=destination_id)
+        query = (self.request.query_params.get("search") or "").strip()
+        if query:
+            qs = search_queryset(qs, query, SearchDocument.Kind.DESTINATION_QA)
+        return qs
+
     def perform_create(self, serializer):
         user = self.request.user if self.request.user.is_authenticated else None
         serializer.save(author=user)
@@ -2,16 +2,18 @@
 import json
 import os
 import re
-import time
 from urllib.parse import urlencode, urlparse, parse_qs, urlunparse
 from urllib.request import Request, urlopen
 
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAuthenticated
 
 from .base_views import BaseViewSet
+from ..services.cache import CacheNamespace
+from ..services.ledger import build_trip_ledger
+from ..services.trip_access import can_access_trip
 from ..models import (
     TripBudget,
     TripExpense,
@@ -85,10 +87,10 @@ MONTHS = {
     "Sep": 9, "Oct": 10, "Nov": 11, "Dec": 12,
 }
 
-FX_CACHE = {
-    "updated_at": 0,
-    "payload": {"base": "SGD", "sgd_per_unit": {"SGD": 1.0}, "as_of": None},
-}
+# Shared across workers; "last_good" outlives the fresh TTL so a provider
+# outage can still be answered with stale rates.
+FX_CACHE = CacheNamespace("fx", default_ttl=43200)
+FX_STALE_TTL_SECONDS = 60 * 60 * 24 * 30
 
 
 def _build_data_gov_url():
@@ -128,16 +130,13 @@ def _latest_rate_column(record):
 
 
 def _get_cached_fx_payload():
-    ttl_seconds = int(os.environ.get("MAS_FX_CACHE_SECONDS") or "43200")
-    now = int(time.time())
-    if now - FX_CACHE["updated_at"] < ttl_seconds:
-        return FX_CACHE["payload"]
-    return None
+    return FX_CACHE.get("latest")
 
 
 def _set_cached_fx_payload(payload):
-    FX_CACHE["payload"] = payload
-    FX_CACHE["updated_at"] = int(time.time())
+    ttl_seconds = int(os.environ.get("MAS_FX_CACHE_SECONDS") or "43200")
+    FX_CACHE.set("latest", payload, ttl_seconds)
+    FX_CACHE.set("last_good", payload, FX_STALE_TTL_SECONDS)
 
 def _env_truthy(value):
     if value is None:
@@ -175,6 +174,79 @@ def _get_query_bool(request, name):
     return _env_truthy(val)
 
 
+def _fetch_fx_payload():
+    """
+    Fetch latest monthly FX rates from data.gov.sg and convert to SGD per unit.
+    Raises on provider/parse errors; caches the payload on success.
+    """
+    data = _fetch_data_gov_json()
+    records = data.get("result", {}).get("records", [])
+    if not records:
+        raise ValueError("No records")
+
+    latest_col = _latest_rate_column(records[0])
+    if not latest_col:
+        raise ValueError("No date columns")
+
+    raw_rates = {}
+    for rec in records:
+        name = rec.get("DataSeries") or rec.get("data_series")
+        if not name:
+            continue
+        code = NAME_TO_CODE.get(str(name).strip())
+        if not code:
+            continue
+        raw_val = rec.get(latest_col)
+        if raw_val in (None, ""):
+            continue
+        try:
+            val = float(str(raw_val).replace(",", ""))
+        except ValueError:
+            continue
+        # Normalize "per 100 units" quotes to "per 1 unit" for consistent inversion
+        scale = SCALE_BY_CODE.get(code, 1)
+        raw_rates[code] = val / scale
+
+    sgd_per_unit = {"SGD": 1.0}
+    env_invert = _env_truthy(os.environ.get("MAS_FX_INVERT"))
+    invert = env_invert if env_invert is not None else _should_invert_rates(raw_rates)
+
+    for code, val in raw_rates.items():
+        if invert:
+            if val == 0:
+                continue
+            sgd_per_unit[code] = 1.0 / val
+        else:
+            sgd_per_unit[code] = val
+
+    payload = {
+        "base": "SGD",
+        "sgd_per_unit": sgd_per_unit,
+        "as_of": latest_col,
+        "inverted": invert,
+        "source": "data.gov.sg",
+        "fallback": False,
+    }
+    _set_cached_fx_payload(payload)
+    return payload
+
+
+def _current_sgd_per_unit():
+    """
+    SGD-per-unit rates for server-side conversions (ledger): fresh cache,
+    else a live fetch, else the last good payload. Returns (rates, payload).
+    """
+    payload = _get_cached_fx_payload()
+    if not payload:
+        try:
+            payload = _fetch_fx_payload()
+        except Exception:
+            payload = FX_CACHE.get("last_good")
+    if not payload:
+        return {"SGD": 1.0}, {"as_of": None, "source": "fallback", "fallback": True}
+    return payload.get("sgd_per_unit") or {"SGD": 1.0}, payload
+
+
 @api_view(["GET"])
 @permission_classes([AllowAny])
 def fx_currencies(request):
@@ -210,59 +282,11 @@ def fx_latest(request):
         return Response(cached_with_source, status=status.HTTP_200_OK)
 
     try:
-        data = _fetch_data_gov_json()
-        records = data.get("result", {}).get("records", [])
-        if not records:
-            raise ValueError("No records")
-
-        latest_col = _latest_rate_column(records[0])
-        if not latest_col:
-            raise ValueError("No date columns")
-
-        raw_rates = {}
-        for rec in records:
-            name = rec.get("DataSeries") or rec.get("data_series")
-            if not name:
-                continue
-            code = NAME_TO_CODE.get(str(name).strip())
-            if not code:
-                continue
-            raw_val = rec.get(latest_col)
-            if raw_val in (None, ""):
-                continue
-            try:
-                val = float(str(raw_val).replace(",", ""))
-            except ValueError:
-                continue
-            # Normalize "per 100 units" quotes to "per 1 unit" for consistent inversion
-            scale = SCALE_BY_CODE.get(code, 1)
-            raw_rates[code] = val / scale
-
-        sgd_per_unit = {"SGD": 1.0}
-        env_invert = _env_truthy(os.environ.get("MAS_FX_INVERT"))
-        invert = env_invert if env_invert is not None else _should_invert_rates(raw_rates)
-
-        for code, val in raw_rates.items():
-            if invert:
-                if val == 0:
-                    continue
-                sgd_per_unit[code] = 1.0 / val
-            else:
-                sgd_per_unit[code] = val
-
-        payload = {
-            "base": "SGD",
-            "sgd_per_unit": sgd_per_unit,
-            "as_of": latest_col,
-            "inverted": invert,
-            "source": "data.gov.sg",
-            "fallback": False,
-        }
-        _set_cached_fx_payload(payload)
+        payload = _fetch_fx_payload()
         return Response(payload, status=status.HTTP_200_OK)
     except Exception:
         # If fetch fails, prefer returning any previously cached rates (even if stale)
-        cached_payload = FX_CACHE.get("payload") or {}
+        cached_payload = FX_CACHE.get("last_good") or {}
         if cached_payload.get("as_of"):
             cached_with_source = dict(cached_payload)
             cached_with_source.setdefault("source", "cache_stale")
@@ -360,12 +384,47 @@ class F31TripExpenseViewSet(BaseViewSet):
     serializer_class = F31TripExpenseSerializer
 
     def get_queryset(self):
-        qs = super().get_queryset()
+        qs = super().get_queryset().prefetch_related("splits")
         trip_id = self.request.query_params.get("trip")
         if trip_id:
             qs = qs.filter(trip_id=trip_id)
         return qs
 
+    @action(detail=False, methods=["get"], url_path="ledger", permission_classes=[IsAuthenticated])
+    def ledger(self, request):
+        """
+        GET /api/f3/expenses/ledger/?trip=<tripId>[&currency=SGD]
+        Per-member paid/owed/net balances and the settle-up transfers, converted
+        to the trip budget currency (or ?currency=) with the cached MAS rates.
+        """
+        trip_id = request.query_params.get("trip")
+        if not trip_id:
+            return Response({"detail": "trip is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Members' emails and balances: 404 for anyone outside the trip
+        if not can_access_trip(request.user, trip_id):
+            return Response({"detail": "Trip not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        trip = Trip.objects.filter(id=trip_id).select_related("owner", "budget").first()
+        if not trip:
+            return Response({"detail": "Trip not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        budget = getattr(trip, "budget", None)
+        currency = (
+            request.query_params.get("currency")
+            or (budget.currency if budget else None)
+            or "SGD"
+        ).upper()
+
+        sgd_per_unit, fx_payload = _current_sgd_per_unit()
+        data = build_trip_ledger(trip, currency, sgd_per_unit)
+        data["fx"] = {
+            "as_of": fx_payload.get("as_of"),
+            "source": fx_payload.get("source"),
+            "fallback": bool(fx_payload.get("fallback")),
+        }
+        return Response(data, status=status.HTTP_200_OK)
+
 
 class F31ExpenseSplitViewSet(BaseViewSet):
     queryset = ExpenseSplit.objects.all()
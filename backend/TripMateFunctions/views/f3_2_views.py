@@ -1,8 +1,9 @@
 from django.db.models import Q
 from rest_framework import viewsets, exceptions
 from rest_framework.exceptions import PermissionDenied, ValidationError
-from ..models import Checklist, ChecklistItem, Trip, TripCollaborator, AppUser
+from ..models import Checklist, ChecklistItem, Trip, AppUser
 from ..serializers.f3_2_serializers import F32ChecklistSerializer, F32ChecklistItemSerializer
+from ..services.trip_access import can_access_trip, trip_filter
 
 
 def get_app_user(request) -> AppUser:
@@ -26,18 +27,6 @@ def get_app_user(request) -> AppUser:
     raise exceptions.NotAuthenticated("Cannot resolve AppUser from request.user.")
 
 
-def _user_can_access_trip(user, trip: Trip) -> bool:
-    if not user:
-        return False
-    if trip.owner_id == user.id:
-        return True
-    return TripCollaborator.objects.filter(
-        trip=trip,
-        user=user,
-        status__in=[TripCollaborator.Status.ACTIVE, TripCollaborator.Status.INVITED],
-    ).exists()
-
-
 class F32ChecklistViewSet(viewsets.ModelViewSet):
     serializer_class = F32ChecklistSerializer
     queryset = Checklist.objects.all()
@@ -55,23 +44,13 @@ class F32ChecklistViewSet(viewsets.ModelViewSet):
             except Trip.DoesNotExist:
                 raise ValidationError({"trip": "Trip not found"})
 
-            if not _user_can_access_trip(user, trip):
+            if not can_access_trip(user, trip):
                 raise PermissionDenied("You do not have access to this trip.")
 
             qs = qs.filter(trip_id=trip_id)
 
         # Only show user’s own checklists OR checklists for trips user can access
-        qs = qs.filter(
-            Q(owner_id=user.id)
-            | Q(trip__owner_id=user.id)
-            | Q(
-                trip__collaborators__user_id=user.id,
-                trip__collaborators__status__in=[
-                    TripCollaborator.Status.ACTIVE,
-                    TripCollaborator.Status.INVITED,
-                ],
-            )
-        ).distinct()
+        qs = qs.filter(Q(owner_id=user.id) | trip_filter(user))
 
         return qs.order_by("-updated_at")
 
@@ -87,7 +66,7 @@ class F32ChecklistViewSet(viewsets.ModelViewSet):
         except Trip.DoesNotExist:
             raise ValidationError({"trip": "Trip not found"})
 
-        if not _user_can_access_trip(user, trip):
+        if not can_access_trip(user, trip):
             raise PermissionDenied("You do not have access to this trip.")
 
         serializer.save(owner=user)
@@ -107,17 +86,7 @@ class F32ChecklistItemViewSet(viewsets.ModelViewSet):
             qs = qs.filter(checklist_id=checklist_id)
 
         # only items of checklists the user can access
-        qs = qs.filter(
-            Q(checklist__owner_id=user.id)
-            | Q(checklist__trip__owner_id=user.id)
-            | Q(
-                checklist__trip__collaborators__user_id=user.id,
-                checklist__trip__collaborators__status__in=[
-                    TripCollaborator.Status.ACTIVE,
-                    TripCollaborator.Status.INVITED,
-                ],
-            )
-        ).distinct()
+        qs = qs.filter(Q(checklist__owner_id=user.id) | trip_filter(user, field="checklist__trip_id"))
 
         return qs.order_by("sort_order", "id")
 
@@ -129,7 +98,7 @@ class F32ChecklistItemViewSet(viewsets.ModelViewSet):
             raise ValidationError({"checklist": "Checklist is required."})
 
         trip = checklist.trip
-        if trip and not _user_can_access_trip(user, trip) and checklist.owner_id != user.id:
+        if trip and not can_access_trip(user, trip) and checklist.owner_id != user.id:
             raise PermissionDenied("You do not have access to this checklist/trip.")
 
         serializer.save()
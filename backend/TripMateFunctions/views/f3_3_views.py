@@ -1,4 +1,3 @@
-from django.db.models import Q
 from rest_framework import exceptions
 from .base_views import BaseViewSet
 from ..models import (
@@ -7,7 +6,6 @@ from ..models import (
     TravelDocument,
     AppUser,
     Trip,
-    TripCollaborator,
     ItineraryItem,
 )
 from ..serializers.f3_3_serializers import (
@@ -15,6 +13,7 @@ from ..serializers.f3_3_serializers import (
     F33ItineraryItemTagSerializer,
     F33TravelDocumentSerializer,
 )
+from ..services.trip_access import can_access_trip, trip_filter
 
 
 def get_app_user(request) -> AppUser:
@@ -38,18 +37,6 @@ def get_app_user(request) -> AppUser:
     raise exceptions.NotAuthenticated("Cannot resolve AppUser from request.user.")
 
 
-def _user_can_access_trip(user: AppUser, trip: Trip) -> bool:
-    if not user:
-        return False
-    if trip.owner_id == user.id:
-        return True
-    return TripCollaborator.objects.filter(
-        trip=trip,
-        user=user,
-        status__in=[TripCollaborator.Status.ACTIVE, TripCollaborator.Status.INVITED],
-    ).exists()
-
-
 class F33ItineraryItemNoteViewSet(BaseViewSet):
     """
     Endpoints:
@@ -77,7 +64,7 @@ class F33ItineraryItemNoteViewSet(BaseViewSet):
             except ItineraryItem.DoesNotExist:
                 raise exceptions.ValidationError({"item": "Itinerary item not found"})
 
-            if not _user_can_access_trip(user, item.trip):
+            if not can_access_trip(user, item.trip):
                 raise exceptions.PermissionDenied("No access to this trip.")
 
             qs = qs.filter(item_id=item_id)
@@ -89,23 +76,14 @@ class F33ItineraryItemNoteViewSet(BaseViewSet):
             except Trip.DoesNotExist:
                 raise exceptions.ValidationError({"trip": "Trip not found"})
 
-            if not _user_can_access_trip(user, trip):
+            if not can_access_trip(user, trip):
                 raise exceptions.PermissionDenied("No access to this trip.")
 
             qs = qs.filter(item__trip_id=trip_id)
 
         # If neither trip nor item is provided, only return notes for trips the user can access
         else:
-            qs = qs.filter(
-                Q(item__trip__owner_id=user.id)
-                | Q(
-                    item__trip__collaborators__user_id=user.id,
-                    item__trip__collaborators__status__in=[
-                        TripCollaborator.Status.ACTIVE,
-                        TripCollaborator.Status.INVITED,
-                    ],
-                )
-            ).distinct()
+            qs = qs.filter(trip_filter(user, field="item__trip_id"))
 
         return qs.order_by("-updated_at", "-created_at")
 
@@ -119,7 +97,7 @@ class F33ItineraryItemNoteViewSet(BaseViewSet):
             raise exceptions.ValidationError({"item": "Item is required."})
 
         trip = getattr(item, "trip", None)
-        if not trip or not _user_can_access_trip(user, trip):
+        if not trip or not can_access_trip(user, trip):
             raise exceptions.PermissionDenied("No access to this trip.")
 
         serializer.save(user=user)
@@ -1,9 +1,9 @@
 # TripMateFunctions/views/f5_1_views.py
 from rest_framework.exceptions import PermissionDenied
-from django.db.models import Q
 from .base_views import BaseViewSet
 from ..models import TripPhoto
 from ..serializers.f5_1_serializers import F51TripPhotoSerializer
+from ..services.trip_access import can_access_trip, trip_filter
 
 
 class F51TripPhotoViewSet(BaseViewSet):
@@ -20,10 +20,7 @@ class F51TripPhotoViewSet(BaseViewSet):
             return TripPhoto.objects.none()
         
         # Filter by trips where user is owner OR collaborator
-        return TripPhoto.objects.filter(
-            Q(trip__owner=user) |  # Trip owner
-            Q(trip__collaborators__user=user)  # Trip collaborator
-        ).distinct()
+        return TripPhoto.objects.filter(trip_filter(user))
     
     def perform_create(self, serializer):
         """
@@ -34,9 +31,7 @@ class F51TripPhotoViewSet(BaseViewSet):
         
         if trip:
             # Check if user has access
-            has_access = trip.owner == user or trip.collaborators.filter(user=user).exists()
-            
-            if not has_access:
+            if not can_access_trip(user, trip):
                 raise PermissionDenied(f"You don't have access to trip {trip.id}")
         
         serializer.save(user=user)
\ No newline at end of file
@@ -1,12 +1,12 @@
 # TripMateFunctions/views/f5_2_views.py
 from rest_framework.exceptions import PermissionDenied
-from django.db.models import Q
 from .base_views import BaseViewSet
 from ..models import TripMediaHighlight, TripHistoryEntry, AppUser
 from ..serializers.f5_2_serializers import (
     F52TripMediaHighlightSerializer,
     F52TripHistoryEntrySerializer,
 )
+from ..services.trip_access import can_access_trip, trip_filter
 
 
 class F52TripMediaHighlightViewSet(BaseViewSet):
@@ -57,9 +57,7 @@ class F52TripMediaHighlightViewSet(BaseViewSet):
         
         # Check if user has access to trip (same as F51)
         if trip:
-            has_access = trip.owner == app_user or trip.collaborators.filter(user=app_user).exists()
-            
-            if not has_access:
+            if not can_access_trip(app_user, trip):
                 raise PermissionDenied(f"You don't have access to trip {trip.id}")
         
         serializer.save(user=app_user)
@@ -87,10 +85,7 @@ class F52TripHistoryEntryViewSet(BaseViewSet):
             return TripHistoryEntry.objects.none()
         
         # Filter by trips where user is owner OR collaborator
-        return TripHistoryEntry.objects.filter(
-            Q(trip__owner=app_user) |
-            Q(trip__collaborators__user=app_user)
-        ).distinct()
+        return TripHistoryEntry.objects.filter(trip_filter(app_user))
     
     def perform_create(self, serializer):
         """
@@ -113,9 +108,7 @@ class F52TripHistoryEntryViewSet(BaseViewSet):
         
         # Check if user has access to trip
         if trip:
-            has_access = trip.owner == app_user or trip.collaborators.filter(user=app_user).exists()
-            
-            if not has_access:
+            if not can_access_trip(app_user, trip):
                 raise PermissionDenied(f"You don't have access to trip {trip.id}")
         
         serializer.save(user=app_user)
\ No newline at end of file
@@ -1,5 +1,5 @@
 from .base_views import BaseViewSet
-from ..models import AppUser, Trip, DestinationFAQ, DestinationQA, SupportTicket, CommunityFAQ, GeneralFAQ, Profile, UserSession
+from ..models import AppUser, Trip, DestinationFAQ, DestinationQA, SupportTicket, CommunityFAQ, GeneralFAQ, SearchDocument
 from ..serializers.f8_serializers import (
     F8AdminUserSerializer,
     F8AdminTripSerializer,
@@ -10,17 +10,14 @@ from ..serializers.f8_serializers import (
     F8GeneralFAQSerializer,
 )
 from ..permissions import IsAppAdmin
+from ..services.analytics import profile_countries, range_summary, schedule_refresh, top_places, totals
+from ..services.search import reindex_objects
 
-from datetime import datetime, timedelta, time
+from datetime import datetime, timedelta
 
 from django.utils import timezone
-from django.db.models import Count, Avg
-from django.db.models.functions import TruncDate, Coalesce, NullIf, Trim
-from django.db.models import Value
-from django.db.models import TextField
 
 from rest_framework.decorators import api_view, permission_classes, action
-from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.filters import SearchFilter, OrderingFilter
@@ -157,6 +154,8 @@ class F8AdminDestinationFAQViewSet(BaseViewSet):
         updated = DestinationFAQ.objects.filter(id__in=ids).update(
             is_published=bool(is_published)
         )
+        # .update() skips the signals that keep the search index current
+        reindex_objects(SearchDocument.Kind.DESTINATION_FAQ, ids)
 
         return Response(
             {
@@ -193,8 +192,13 @@ def _parse_yyyy_mm_dd(s: str):
 
 
 @api_view(["GET"])
-@permission_classes([AllowAny])
+@permission_classes([IsAppAdmin])
 def admin_analytics(request):
+    """
+    Dashboard metrics for from..to, read from the daily rollups
+    (services/analytics.py) instead of aggregating the source tables.
+    Stale rollups are recomputed by a background job, not in the request.
+    """
     from_str = request.GET.get("from")
     to_str = request.GET.get("to")
 
@@ -208,117 +212,44 @@ def admin_analytics(request):
     if days <= 0:
         return Response({"detail": "to must be >= from"}, status=400)
 
-    start_dt = timezone.make_aware(datetime.combine(start_date, time.min))
-    end_dt = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min))
-
-    prev_end_dt = start_dt
-    prev_start_dt = prev_end_dt - timedelta(days=days)
+    prev_end_date = start_date - timedelta(days=1)
+    prev_start_date = start_date - timedelta(days=days)
 
-    # ---------- User Demographics (public.profiles) ----------
-    profile_total = Profile.objects.count()
-
-    demo_qs = (
-        Profile.objects
-        .annotate(
-            country_key=Coalesce(
-                NullIf(Trim("nationality"), Value("", output_field=TextField())),
-                NullIf(Trim("location"), Value("", output_field=TextField())),
-                Value("Others", output_field=TextField()),
-                output_field=TextField(),
-            )
-        )
-        .values("country_key")
-        .annotate(cnt=Count("id"))
-        .order_by("-cnt")[:5]
-    )
+    schedule_refresh()
+    summary = range_summary(start_date, end_date)
+    all_time = totals()
 
+    # ---------- User Demographics (public.profiles snapshot) ----------
+    profile_total, top_countries = profile_countries(limit=5)
     country_stats = []
-    for row in demo_qs:
-        cnt = int(row["cnt"])
+    for country, cnt in top_countries:
         percent = int(round((cnt * 100.0) / profile_total, 0)) if profile_total > 0 else 0
-        country_stats.append({"country": row["country_key"], "percent": percent})
+        country_stats.append({"country": country, "percent": percent})
 
     # ---------- Popular Itineraries (public.trip) ----------
     # ✅ Relaxed: only exclude demo; DO NOT filter out flagged/pending (else it becomes empty)
-    trip_base_qs = (
-        Trip.objects
-        .filter(created_at__gte=start_dt, created_at__lt=end_dt)
-        .filter(is_demo=False)
-    )
-    trip_total = trip_base_qs.count()
-
-    pop_qs = (
-        trip_base_qs
-        .annotate(
-            place_key=Coalesce(
-                NullIf(Trim("main_country"), Value("", output_field=TextField())),
-                NullIf(Trim("main_city"), Value("", output_field=TextField())),
-                Value("Others", output_field=TextField()),
-                output_field=TextField(),
-            )
-        )
-        .values("place_key")
-        .annotate(cnt=Count("id"))
-        .order_by("-cnt")[:5]
-    )
-
+    trip_total = summary["itineraries_created"] - summary["demo_itineraries_created"]
     popular_itineraries = []
-    for row in pop_qs:
-        cnt = int(row["cnt"])
+    for place, cnt in top_places(start_date, end_date, limit=5, include_demo=False):
         percent = int(round((cnt * 100.0) / trip_total, 0)) if trip_total > 0 else 0
-        popular_itineraries.append({"name": row["place_key"], "percent": percent})
-
-    # ---------- Existing metrics ----------
-    new_signups = AppUser.objects.filter(created_at__gte=start_dt, created_at__lt=end_dt).count()
-    itineraries_created = Trip.objects.filter(created_at__gte=start_dt, created_at__lt=end_dt).count()
-
-    total_users = AppUser.objects.count()
-    total_itineraries = Trip.objects.count()
-
-    active_users = AppUser.objects.filter(last_active_at__gte=start_dt, last_active_at__lt=end_dt).count()
-    
-    # Previous period total active users (for % change)
-    active_users_prev_total = AppUser.objects.filter(
-        last_active_at__gte=prev_start_dt,
-        last_active_at__lt=prev_end_dt
-    ).count()
-
-    qs = (
-        AppUser.objects
-        .filter(last_active_at__gte=start_dt, last_active_at__lt=end_dt)
-        .annotate(day=TruncDate("last_active_at"))
-        .values("day")
-        .annotate(cnt=Count("id"))
-        .order_by("day")
-    )
-    by_day = {row["day"]: row["cnt"] for row in qs}
-    active_users_series = [int(by_day.get(start_date + timedelta(days=i), 0)) for i in range(days)]
-
-    avg_session_length_min = (
-        UserSession.objects
-        .filter(session_start__gte=start_dt, session_start__lt=end_dt)
-        .exclude(duration_sec__isnull=True)
-        .aggregate(avg=Avg("duration_sec"))
-        .get("avg")
-    )
-    avg_session_length_min = round((avg_session_length_min or 0) / 60.0, 1)
+        popular_itineraries.append({"name": place, "percent": percent})
 
     return Response({
-        "active_users": active_users,
-        "new_signups": new_signups,
-        "avg_session_length_min": avg_session_length_min,
-        "itineraries_created": itineraries_created,
-        "total_users": total_users,
-        "total_itineraries": total_itineraries,
-        "active_users_series": active_users_series,
-        "active_users_prev_total": active_users_prev_total,
+        "active_users": summary["active_users"],
+        "new_signups": summary["signups"],
+        "avg_session_length_min": summary["avg_session_length_min"],
+        "itineraries_created": summary["itineraries_created"],
+        "total_users": all_time["users"],
+        "total_itineraries": all_time["itineraries"],
+        "active_users_series": summary["active_users_series"],
+        "active_users_prev_total": range_summary(prev_start_date, prev_end_date)["active_users"],
         "country_stats": country_stats,
         "popular_itineraries": popular_itineraries,
     })
 
 
 @api_view(["GET"])
-@permission_classes([AllowAny])
+@permission_classes([IsAppAdmin])
 def admin_report_preview(request):
     report_type = (request.GET.get("type") or "user_activity").strip().lower()
     from_str = request.GET.get("from")
@@ -334,69 +265,29 @@ def admin_report_preview(request):
     if days <= 0:
         return Response({"detail": "to must be >= from"}, status=400)
 
-    start_dt = timezone.make_aware(datetime.combine(start_date, time.min))
-    end_dt = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min))
-
-    # Base metrics
-    new_signups = AppUser.objects.filter(created_at__gte=start_dt, created_at__lt=end_dt).count()
-    active_users = AppUser.objects.filter(last_active_at__gte=start_dt, last_active_at__lt=end_dt).count()
-    itineraries_created = Trip.objects.filter(created_at__gte=start_dt, created_at__lt=end_dt).count()
-    total_users = AppUser.objects.count()
-    total_itineraries = Trip.objects.count()
-    demo_itineraries = Trip.objects.filter(is_demo=True).count()
-
-    avg_session_length_min = (
-        UserSession.objects
-        .filter(session_start__gte=start_dt, session_start__lt=end_dt)
-        .exclude(duration_sec__isnull=True)
-        .aggregate(avg=Avg("duration_sec"))
-        .get("avg")
-    )
-    avg_session_length_min = round((avg_session_length_min or 0) / 60.0, 1)
+    # Base metrics (daily rollups, see services/analytics.py)
+    schedule_refresh()
+    summary = range_summary(start_date, end_date)
+    all_time = totals()
+
+    new_signups = summary["signups"]
+    active_users = summary["active_users"]
+    itineraries_created = summary["itineraries_created"]
+    total_users = all_time["users"]
+    total_itineraries = all_time["itineraries"]
+    demo_itineraries = all_time["demo_itineraries"]
+    avg_session_length_min = summary["avg_session_length_min"]
 
     # Moderation metrics (date-range scoped)
-    approved = Trip.objects.filter(
-        moderation_status="APPROVED",
-        moderated_at__gte=start_dt,
-        moderated_at__lt=end_dt,
-    ).count()
-    rejected = Trip.objects.filter(
-        moderation_status="REJECTED",
-        moderated_at__gte=start_dt,
-        moderated_at__lt=end_dt,
-    ).count()
-
-    # There is no flagged_at field; use updated_at as a best-effort proxy.
-    flagged = Trip.objects.filter(
-        is_flagged=True,
-        updated_at__gte=start_dt,
-        updated_at__lt=end_dt,
-    ).count()
-    pending = Trip.objects.filter(
-        is_flagged=True,
-        moderation_status__isnull=True,
-        updated_at__gte=start_dt,
-        updated_at__lt=end_dt,
-    ).count()
+    approved = summary["approved"]
+    rejected = summary["rejected"]
+    # There is no flagged_at field; the rollup buckets flagged trips by updated_at.
+    flagged = summary["flagged"]
+    pending = summary["flagged_pending"]
 
     # Top destination (simple)
-    top_place = (
-        Trip.objects
-        .filter(created_at__gte=start_dt, created_at__lt=end_dt)
-        .annotate(
-            place_key=Coalesce(
-                NullIf(Trim("main_country"), Value("", output_field=TextField())),
-                NullIf(Trim("main_city"), Value("", output_field=TextField())),
-                Value("Others", output_field=TextField()),
-                output_field=TextField(),
-            )
-        )
-        .values("place_key")
-        .annotate(cnt=Count("id"))
-        .order_by("-cnt")
-        .first()
-    )
-    top_destination = top_place["place_key"] if top_place else "Others"
+    top_place = top_places(start_date, end_date, limit=1)
+    top_destination = top_place[0][0] if top_place else "Others"
 
     def card(label: str, value: str, tone: str = "neutral"):
         return {"label": label, "value": value, "tone": tone}
@@ -520,6 +411,7 @@ class F8AdminCommunityFAQViewSet(BaseViewSet):
         updated = CommunityFAQ.objects.filter(id__in=ids).update(
             is_published=bool(is_published)
         )
+        reindex_objects(SearchDocument.Kind.COMMUNITY_FAQ, ids)
 
         return Response(
             {
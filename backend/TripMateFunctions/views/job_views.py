@@ -0,0 +1,46 @@
+# backend/TripMateFunctions/views/job_views.py
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from ..models import BackgroundJob
+from ..services.trip_access import can_access_trip
+
+
+class JobStatusView(APIView):
+    """
+    GET /api/jobs/{job_id}/
+    Status and progress of a background job (AI itinerary generation, emails).
+    Visible to the user who queued it and to the trip's owner / active collaborators.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        job = BackgroundJob.objects.select_related("trip").filter(id=job_id).first()
+        if job is None or not self._can_view(request.user, job):
+            return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        return Response({
+            "id": job.id,
+            "kind": job.kind,
+            "status": job.status,
+            "progress": job.progress,
+            "progress_message": job.progress_message,
+            "attempts": job.attempts,
+            "result": job.result,
+            "error": job.error,
+            "trip": job.trip_id,
+            "created_at": job.created_at,
+            "finished_at": job.finished_at,
+        })
+
+    def _can_view(self, user, job):
+        user_id = getattr(user, "id", None)
+        if user_id is None:
+            return False
+        if job.created_by_id == user_id:
+            return True
+        if job.trip_id is None:
+            return False
+        return can_access_trip(user_id, job.trip_id, active_only=True)
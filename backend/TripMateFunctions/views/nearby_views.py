@@ -0,0 +1,79 @@
+# backend/TripMateFunctions/views/nearby_views.py
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from ..models import TripPhoto
+from ..serializers.f1_1_serializers import NearbyPlacesQuerySerializer
+from ..services.nearby import MAX_RADIUS_M, haversine_m, nearby_places, nearest
+from ..services.trip_access import can_access_trip
+
+
+def _box_center_radius(south, west, north, east):
+    """Centre of a bbox (may cross the date line) and the radius (m) reaching its corners."""
+    span = (east - west) % 360 or (360 if east != west else 0)
+    lat = (south + north) / 2
+    lon = (west + span / 2 + 180) % 360 - 180
+    corners = haversine_m(lat, lon, [south, south, north, north], [west, east, west, east])
+    return lat, lon, float(corners.max())
+
+
+def _in_box(place, south, west, north, east):
+    if not south <= place["lat"] <= north:
+        return False
+    if west <= east:
+        return west <= place["lon"] <= east
+    return place["lon"] >= west or place["lon"] <= east
+
+
+class NearbyPlacesView(APIView):
+    """
+    GET /api/f1/places/nearby/?lat=35.01&lon=135.77&radius_m=2000&limit=20
+    GET /api/f1/places/nearby/?bbox=34.98,135.73,35.04,135.80
+
+    Places we already store (destinations and stops of public trips), nearest
+    first, from the geohash index (services/nearby.py) - no external calls.
+    With ?trip_id= the trip's own geotagged photos are returned too (owner /
+    collaborators only). A bbox wider than ~100 km is cut to the 50 km around
+    its centre.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        ser = NearbyPlacesQuerySerializer(data=request.query_params)
+        ser.is_valid(raise_exception=True)
+        data = ser.validated_data
+        limit = data["limit"]
+
+        bbox = data.get("bbox")
+        if bbox:
+            lat, lon, radius_m = _box_center_radius(*bbox)
+        else:
+            lat, lon, radius_m = data["lat"], data["lon"], data["radius_m"]
+        radius_m = min(radius_m, MAX_RADIUS_M)
+
+        places = nearby_places(lat, lon, radius_m, limit=limit)
+        if bbox:
+            places = [p for p in places if _in_box(p, *bbox)]
+        payload = {"center": {"lat": lat, "lon": lon}, "radius_m": round(radius_m), "places": places}
+
+        trip_id = data.get("trip_id")
+        if trip_id is not None:
+            if not can_access_trip(request.user, trip_id):
+                return Response({"detail": "Trip not found"}, status=status.HTTP_404_NOT_FOUND)
+            photos = nearest(TripPhoto.objects.filter(trip_id=trip_id), lat, lon, radius_m, limit=limit)
+            payload["photos"] = [
+                {
+                    "id": photo.id,
+                    "file_url": photo.file_url,
+                    "caption": photo.caption,
+                    "lat": photo.lat,
+                    "lon": photo.lon,
+                    "dist_m": round(dist),
+                }
+                for photo, dist in photos
+                if not bbox or _in_box({"lat": photo.lat, "lon": photo.lon}, *bbox)
+            ]
+
+        return Response(payload, status=status.HTTP_200_OK)
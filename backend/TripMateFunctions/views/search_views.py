@@ -0,0 +1,35 @@
+# backend/TripMateFunctions/views/search_views.py
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from ..models import SearchDocument
+from ..services.search import SEARCH_LIMIT, search
+
+
+class SearchView(APIView):
+    """
+    GET /api/search/?q=<text>&kind=trip,community_faq&limit=20
+    Ranked full-text search over public trips, community FAQs and destination
+    FAQ / Q&A. Words match as prefixes and a misspelt word is corrected.
+
+    Response: {"results": [{"kind", "id", "title", "snippet", "rank"}, ...]}
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        query = (request.query_params.get("q") or "").strip()
+        kinds = [k.strip() for k in (request.query_params.get("kind") or "").split(",") if k.strip()]
+        unknown = [k for k in kinds if k not in SearchDocument.Kind.values]
+        if unknown:
+            return Response(
+                {"detail": f"Unknown kind: {', '.join(unknown)}. Use {', '.join(SearchDocument.Kind.values)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            limit = min(max(int(request.query_params.get("limit") or SEARCH_LIMIT), 1), SEARCH_LIMIT)
+        except ValueError:
+            return Response({"detail": "limit must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({"results": search(query, kinds or None, limit)})
@@ -12,10 +12,13 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
+import importlib.util
 import os
+import tempfile
 from dotenv import load_dotenv
 import environ
 import ssl
+from django.core.exceptions import ImproperlyConfigured
 
 ssl._create_default_https_context = ssl._create_unverified_context
 
@@ -102,30 +105,82 @@ DATABASES = {
     )
 }
 
-# Supabase requires SSL; enforce if not already in the URL
+# Supabase requires SSL; enforce if not already in the URL (Postgres only:
+# sqlite3.connect() rejects these options)
+_DB_ENGINE = DATABASES["default"]["ENGINE"]
 DATABASES["default"].setdefault("OPTIONS", {})
-DATABASES["default"]["OPTIONS"].update({
-    "sslmode": "require",
-    "connect_timeout": 10,        
-    "keepalives": 1,              
-    "keepalives_idle": 30,       
-    "keepalives_interval": 10,    
-    "keepalives_count": 5,      
-})
-
-# Use CONN_MAX_AGE=0 for Supabase transaction mode pooler (port 6543)
-# Transaction mode doesn't support persistent connections
-DATABASES["default"]["CONN_MAX_AGE"] = 0        
-DATABASES["default"]["CONN_HEALTH_CHECKS"] = True  
-
-# Cache: in-memory (swap to Redis in prod if needed)
-CACHES = {
-    "default": {
-        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
-        "LOCATION": "tripmate-cache",
-        "TIMEOUT": None,
+if "postgresql" in _DB_ENGINE:
+    DATABASES["default"]["OPTIONS"].setdefault("sslmode", env("DB_SSLMODE", default="require"))
+    DATABASES["default"]["OPTIONS"].update({
+        "connect_timeout": 10,
+        "keepalives": 1,
+        "keepalives_idle": 30,
+        "keepalives_interval": 10,
+        "keepalives_count": 5,
+    })
+
+# Connection reuse, selected with DB_POOL_MODE:
+#   none       - new connection per request. Required for the Supabase
+#                transaction-mode pooler (port 6543), which can't hold
+#                persistent connections. Default.
+#   persistent - keep one connection per worker thread for DB_CONN_MAX_AGE
+#                seconds, health-checked before reuse. Use with the session
+#                pooler (port 5432) or a direct connection.
+#   pool       - Django's built-in psycopg 3 pool (needs `psycopg[pool]`),
+#                shared by the request threads and the background generation
+#                threads of one process. DB_POOL_MIN_SIZE/DB_POOL_MAX_SIZE/
+#                DB_POOL_TIMEOUT size it.
+# `python manage.py bench_db_connections` compares the modes.
+DB_POOL_MODE = env("DB_POOL_MODE", default="none").lower()
+
+DATABASES["default"]["CONN_MAX_AGE"] = 0
+DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+
+if DB_POOL_MODE == "persistent":
+    DATABASES["default"]["CONN_MAX_AGE"] = env.int("DB_CONN_MAX_AGE", default=60)
+elif DB_POOL_MODE == "pool":
+    if "postgresql" not in _DB_ENGINE:
+        raise ImproperlyConfigured("DB_POOL_MODE=pool needs a PostgreSQL DATABASE_URL")
+    if importlib.util.find_spec("psycopg") is None or importlib.util.find_spec("psycopg_pool") is None:
+        # Django would fall back to psycopg2, which has no pool
+        raise ImproperlyConfigured("DB_POOL_MODE=pool needs psycopg 3 with its pool: pip install 'psycopg[binary,pool]'")
+    DATABASES["default"]["OPTIONS"]["pool"] = {
+        "min_size": env.int("DB_POOL_MIN_SIZE", default=2),
+        "max_size": env.int("DB_POOL_MAX_SIZE", default=10),
+        "timeout": env.int("DB_POOL_TIMEOUT", default=10),
+    }
+elif DB_POOL_MODE != "none":
+    raise ImproperlyConfigured(f"Unknown DB_POOL_MODE {DB_POOL_MODE!r} (none, persistent or pool)")
+
+# Cache: shared by all gunicorn workers.
+# File-based by default: past MAX_ENTRIES a random 1/CULL_FREQUENCY of the files
+# is deleted (not LRU), and every set lists the cache directory, so keep
+# MAX_ENTRIES modest. Set REDIS_URL to use Redis (needs the `redis` package).
+REDIS_URL = env("REDIS_URL", default="")
+CACHE_MAX_ENTRIES = env.int("CACHE_MAX_ENTRIES", default=5000)
+CACHE_DEFAULT_TIMEOUT = env.int("CACHE_DEFAULT_TIMEOUT", default=60 * 60)
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+            "TIMEOUT": CACHE_DEFAULT_TIMEOUT,
+            "KEY_PREFIX": "tripmate",
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": env("CACHE_DIR", default=os.path.join(tempfile.gettempdir(), "tripmate-cache")),
+            "TIMEOUT": CACHE_DEFAULT_TIMEOUT,
+            "OPTIONS": {
+                "MAX_ENTRIES": CACHE_MAX_ENTRIES,
+                "CULL_FREQUENCY": 4,
+            },
+        }
     }
-}
 
 
 # Password validation
@@ -253,6 +308,8 @@ SUPABASE_ANON_KEY = env("SUPABASE_ANON_KEY")
 
 # NEW: Supabase JWT secret for verifying access tokens from frontend
 SUPABASE_JWT_SECRET = env("SUPABASE_JWT_SECRET", default="")
+# How long validated tokens / resolved users are reused by SupabaseJWTAuthentication
+AUTH_CACHE_SECONDS = env.int("AUTH_CACHE_SECONDS", default=60)
 
 # Sea-Lion settings
 SEA_LION_API_KEY = env("SEA_LION_API_KEY", default=os.environ.get("SEALION_API_KEY", ""))
@@ -283,3 +340,18 @@ BREVO_API_KEY = env("BREVO_API_KEY", default="")
 BREVO_SENDER_EMAIL = env("BREVO_SENDER_EMAIL", default=DEFAULT_FROM_EMAIL)
 BREVO_SENDER_NAME = env("BREVO_SENDER_NAME", default="TripMate")
 BREVO_API_URL = env("BREVO_API_URL", default="https://api.brevo.com/v3/smtp/email")
+
+# Background jobs (services/jobs.py): AI itinerary generation and emails.
+# A small worker pool runs inside each web process unless JOBS_RUN_IN_PROCESS
+# is off, in which case `python manage.py run_jobs` must be running.
+JOBS_RUN_IN_PROCESS = env.bool("JOBS_RUN_IN_PROCESS", default=True)
+JOBS_IN_PROCESS_WORKERS = env.int("JOBS_IN_PROCESS_WORKERS", default=2)
+JOBS_LEASE_SECONDS = env.int("JOBS_LEASE_SECONDS", default=600)
+JOBS_RETRY_BASE_SECONDS = env.int("JOBS_RETRY_BASE_SECONDS", default=10)
+JOBS_RETRY_MAX_SECONDS = env.int("JOBS_RETRY_MAX_SECONDS", default=600)
+
+# Trip presence / co-editing channel (services/presence.py). Long-polls hold a
+# gunicorn thread each; presence and revisions are shared through the cache.
+PRESENCE_TTL_SECONDS = env.int("PRESENCE_TTL_SECONDS", default=20)
+PRESENCE_LONG_POLL_SECONDS = env.int("PRESENCE_LONG_POLL_SECONDS", default=15)
+PRESENCE_ACTIVE_FLUSH_SECONDS = env.int("PRESENCE_ACTIVE_FLUSH_SECONDS", default=30)
@@ -0,0 +1,15 @@
+"""
+Settings for the co-editing channel process (gunicorn_channel.conf.py).
+
+Same project settings, but only the channel URL and only middleware that
+can run async: a sync-only middleware (WhiteNoise) would hold a thread for
+every waiting long-poll.
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import MIDDLEWARE
+
+ROOT_URLCONF = "config.urls_channel"
+MIDDLEWARE = [m for m in MIDDLEWARE if m != "whitenoise.middleware.WhiteNoiseMiddleware"]
+
+# Background jobs run in the web process
+JOBS_RUN_IN_PROCESS = False
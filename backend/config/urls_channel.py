@@ -0,0 +1,8 @@
+"""URLs of the co-editing channel process (config/settings_channel.py)."""
+from django.urls import path
+
+from TripMateFunctions.views.f2_1_views import F21TripChannelView
+
+urlpatterns = [
+    path("api/f2/trips/<int:trip_id>/channel/", F21TripChannelView.as_view(), name="f2-trip-channel"),
+]
@@ -0,0 +1,82 @@
+# backend/gunicorn.conf.py
+"""
+Gunicorn settings for the web process, shared by every launcher (Procfile,
+railway.json, start.sh). The co-editing channel runs in its own process,
+see gunicorn_channel.conf.py.
+
+    GUNICORN_WORKERS        processes (default 4)
+    GUNICORN_THREADS        gthread threads per process (default 8)
+    DB_MAX_CONNECTIONS      connections the database accepts from this app
+                            (default 60, Supabase's smallest direct limit)
+    DB_RESERVED_CONNECTIONS kept free for migrations, run_jobs and the
+                            channel process (default 10)
+
+Requests are short: long-polls are not held here. Each process may use
+(DB_MAX_CONNECTIONS - DB_RESERVED_CONNECTIONS) / workers connections, and
+what has to fit in that share depends on DB_POOL_MODE (config/settings.py):
+
+    none, persistent  one connection per thread running a query, so the
+                      threads plus the in-process job threads
+                      (JOBS_IN_PROCESS_WORKERS) are capped to it
+    pool              DB_POOL_MAX_SIZE per process, whatever the thread
+                      count, so the pool size is capped to it
+
+Each worker starts its in-process background job pool as soon as it boots
+(post_worker_init, services/jobs.py).
+"""
+import logging
+import os
+
+logger = logging.getLogger("gunicorn.error")
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name) or default)
+    except ValueError:
+        return default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if not value:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+worker_class = "gthread"
+workers = max(_env_int("GUNICORN_WORKERS", 4), 1)
+threads = max(_env_int("GUNICORN_THREADS", 8), 1)
+
+_db_budget = _env_int("DB_MAX_CONNECTIONS", 60) - _env_int("DB_RESERVED_CONNECTIONS", 10)
+_per_worker = max(_db_budget // workers, 1)
+_pool_mode = (os.environ.get("DB_POOL_MODE") or "none").lower()
+
+if _pool_mode == "pool":
+    _pool_max = _env_int("DB_POOL_MAX_SIZE", 10)
+    if _pool_max > _per_worker:
+        logger.warning(
+            "DB_POOL_MODE=pool: %d workers x DB_POOL_MAX_SIZE %d exceeds %d connections; using a pool of %d",
+            workers, _pool_max, _db_budget, _per_worker,
+        )
+        # Read by config/settings.py in each worker
+        os.environ["DB_POOL_MAX_SIZE"] = str(_per_worker)
+        os.environ["DB_POOL_MIN_SIZE"] = str(min(_env_int("DB_POOL_MIN_SIZE", 2), _per_worker))
+else:
+    _job_threads = _env_int("JOBS_IN_PROCESS_WORKERS", 2) if _env_bool("JOBS_RUN_IN_PROCESS", True) else 0
+    _max_threads = max(_per_worker - _job_threads, 1)
+    if threads > _max_threads:
+        logger.warning(
+            "DB_POOL_MODE=%s: %d workers x (%d threads + %d job threads) could open more than %d connections; "
+            "using %d threads",
+            _pool_mode, workers, threads, _job_threads, _db_budget, _max_threads,
+        )
+        threads = _max_threads
+
+
+def post_worker_init(worker):
+    # Jobs queued before a restart must not wait for the next enqueue
+    from TripMateFunctions.services.jobs import start_in_process_pool
+
+    start_in_process_pool()
@@ -0,0 +1,35 @@
+# backend/gunicorn_channel.conf.py
+"""
+Gunicorn settings for the co-editing channel process (Procfile "channel",
+railway.channel.json, start.sh with TRIPMATE_PROCESS=channel).
+
+It serves only GET /api/f2/trips/<id>/channel/ (config/urls_channel.py) with
+gunicorn's asyncio ASGI worker: a waiting long-poll is a suspended task, not
+a thread, so a few processes hold thousands of open trip pages while the
+web process (gunicorn.conf.py) keeps its threads for the API. Point the
+frontend at it with VITE_CHANNEL_API_BASE_URL.
+
+    CHANNEL_WORKERS      processes (default 1)
+    CHANNEL_CONNECTIONS  open requests per process (default 2000)
+
+Each process opens at most PRESENCE_CHANNEL_DB_CONNECTIONS database
+connections (default 4, services/presence.py); count them in the web
+process's DB_RESERVED_CONNECTIONS.
+"""
+import os
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name) or default)
+    except ValueError:
+        return default
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8001')}"
+worker_class = "asgi"
+workers = max(_env_int("CHANNEL_WORKERS", 1), 1)
+worker_connections = max(_env_int("CHANNEL_CONNECTIONS", 2000), 1)
+# Django has no lifespan handler
+asgi_lifespan = "off"
+raw_env = ["DJANGO_SETTINGS_MODULE=config.settings_channel"]
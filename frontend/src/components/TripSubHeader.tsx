@@ -3,7 +3,7 @@ import { NavLink, useLocation } from "react-router-dom";
 import { useEffect, useState, useRef } from "react";
 import styled from "styled-components";
 import { MapPin, CalendarDays, Settings, Globe, Lock, BedDouble, Trash2, Users } from "lucide-react";
-import { apiFetch, ensureCsrfToken } from "../lib/apiClient";
+import { apiFetch, ensureCsrfToken, CHANNEL_API_BASE_URL } from "../lib/apiClient";
 import { useTripId } from "../hooks/useDecodedParams";
 import { encodeId } from "../lib/urlObfuscation";
 import ShareTripModal from "./ShareTripModal";
@@ -935,27 +935,39 @@ export default function TripSubHeader({ onExport }: TripSubHeaderProps) {
     if (!tripId) return;
 
     let cancelled = false;
-
-    const pollPresence = async () => {
-      try {
-        const res = await apiFetch(`/f2/trips/${tripId}/presence/`, {
-          method: "POST",
-          body: JSON.stringify({}),
-        });
-        if (!cancelled) {
+    const controller = new AbortController();
+
+    // Long-poll: the channel process holds the request until someone comes
+    // online or leaves (or ~15s pass), so presence updates arrive without a
+    // timer. A server that does not hold polls answers with poll_after.
+    const listen = async () => {
+      let presence = "";
+      while (!cancelled) {
+        try {
+          const query = presence ? `?presence=${encodeURIComponent(presence)}` : "";
+          const res = await apiFetch(`/f2/trips/${tripId}/channel/${query}`, {
+            baseUrl: CHANNEL_API_BASE_URL,
+            signal: controller.signal,
+          });
+          if (cancelled) return;
+          presence = res?.presence || "";
           setOnlineUserIds(res?.online_user_ids || []);
+          if (res?.poll_after) {
+            await new Promise((resolve) => window.setTimeout(resolve, res.poll_after * 1000));
+          }
+        } catch (err) {
+          if (cancelled) return;
+          console.warn("Presence channel failed:", err);
+          await new Promise((resolve) => window.setTimeout(resolve, 5000));
         }
-      } catch (err) {
-        console.warn("Presence poll failed:", err);
       }
     };
 
-    pollPresence();
-    const intervalId = window.setInterval(pollPresence, 8000);
+    listen();
 
     return () => {
       cancelled = true;
-      window.clearInterval(intervalId);
+      controller.abort();
     };
   }, [tripId]);
 
@@ -5,6 +5,10 @@ import { getCookie } from "./csrf.js";  // ƒo. Import CSRF helper
 const API_BASE_URL =
   import.meta.env.VITE_API_BASE_URL || "http://127.0.0.1:8000/api";
 
+// Co-editing channel process (long-polls); the web API answers it too, without waiting
+export const CHANNEL_API_BASE_URL =
+  import.meta.env.VITE_CHANNEL_API_BASE_URL || API_BASE_URL;
+
 // ƒo. In-memory CSRF token storage (for cross-origin scenarios)
 let cachedCsrfToken = null;
 
@@ -26,6 +30,8 @@ function getCSRFToken() {
 export async function apiFetch(path, options = {}) {
   // IMPORTANT: path should be like "/f1/trips/5/overview/"
   // NOT "/api/f1/..." because API_BASE_URL already has "/api"
+  // options.baseUrl overrides API_BASE_URL (e.g. CHANNEL_API_BASE_URL)
+  const { baseUrl = API_BASE_URL, ...fetchOptions } = options;
   
   // Get Supabase session for authentication
   const {
@@ -42,7 +48,7 @@ export async function apiFetch(path, options = {}) {
   // ƒo. Prepare headers
   const headers = {
     "Content-Type": "application/json",
-    ...(options.headers || {}),
+    ...(fetchOptions.headers || {}),
   };
 
   // Add Supabase JWT token if available
@@ -51,7 +57,7 @@ export async function apiFetch(path, options = {}) {
   }
 
   // Add CSRF token for non-GET requests (optional with JWT auth)
-  const method = options.method?.toUpperCase() || 'GET';
+  const method = fetchOptions.method?.toUpperCase() || 'GET';
   if (method !== 'GET' && method !== 'HEAD' && method !== 'OPTIONS') {
     const csrfToken = getCSRFToken();
     if (csrfToken) {
@@ -60,8 +66,8 @@ export async function apiFetch(path, options = {}) {
   }
 
   // ƒo. Make the request with credentials to send/receive cookies
-  const res = await fetch(`${API_BASE_URL}${path}`, {
-    ...options,
+  const res = await fetch(`${baseUrl}${path}`, {
+    ...fetchOptions,
     headers,
     credentials: 'include',  // ƒ+? CRITICAL: This sends cookies!
   });
@@ -104,6 +110,69 @@ export async function apiFetch(path, options = {}) {
   return res.json();
 }
 
+/**
+ * POST and read a server-sent event stream (e.g. "/f1/ai-chatbot/?stream=1").
+ * onEvent(eventName, data) is called for every event as it arrives.
+ */
+export async function apiStream(path, body, onEvent) {
+  const {
+    data: { session },
+  } = await supabase.auth.getSession();
+
+  const headers = {
+    "Content-Type": "application/json",
+    Accept: "text/event-stream",
+  };
+  if (session?.access_token) {
+    headers["Authorization"] = `Bearer ${session.access_token}`;
+  }
+  const csrfToken = getCSRFToken();
+  if (csrfToken) {
+    headers["X-CSRFToken"] = csrfToken;
+  }
+
+  const res = await fetch(`${API_BASE_URL}${path}`, {
+    method: "POST",
+    headers,
+    body: JSON.stringify(body),
+    credentials: "include",
+  });
+  if (!res.ok || !res.body) {
+    throw new Error(`API error ${res.status}`);
+  }
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let sep;
+    while ((sep = buffer.indexOf("\n\n")) !== -1) {
+      const raw = buffer.slice(0, sep);
+      buffer = buffer.slice(sep + 2);
+
+      let event = "message";
+      const dataLines = [];
+      for (const line of raw.split("\n")) {
+        if (line.startsWith("event:")) event = line.slice(6).trim();
+        else if (line.startsWith("data:")) dataLines.push(line.slice(5).trimStart());
+      }
+      if (!dataLines.length) continue;
+      let data = dataLines.join("\n");
+      try {
+        data = JSON.parse(data);
+      } catch (e) {
+        // Plain text payload
+      }
+      onEvent(event, data);
+    }
+  }
+}
+
 /**
  * ƒo. Fetch CSRF token from backend (optional - JWT auth doesn't require it)
  */
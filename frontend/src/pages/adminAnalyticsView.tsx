@@ -3,6 +3,7 @@ import React, { useEffect, useMemo, useRef, useState } from "react";
 import { ArrowDownRight, ArrowUpRight, Calendar } from "lucide-react";
 import { MapContainer, TileLayer, CircleMarker, Tooltip } from "react-leaflet";
 import L from "leaflet";
+import { supabase } from "../lib/supabaseClient";
 
 type Stats = {
   activeUsers: number;
@@ -217,10 +218,17 @@ export default function AnalyticsView({
 
       const url = `${ANALYTICS_ENDPOINT}?from=${encodeURIComponent(from)}&to=${encodeURIComponent(to)}`;
 
+      // Admin-only endpoint: send the Supabase session token
+      const { data: sessionData } = await supabase.auth.getSession();
+      const token = sessionData.session?.access_token;
+
       const res = await fetch(url, {
         method: "GET",
         credentials: "include",
-        headers: { Accept: "application/json" },
+        headers: {
+          Accept: "application/json",
+          ...(token ? { Authorization: `Bearer ${token}` } : {}),
+        },
         signal: controller.signal,
       });
 
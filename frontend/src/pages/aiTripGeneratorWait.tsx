@@ -23,6 +23,19 @@ type WaitState = {
   keywords: string[];
 };
 
+const JOB_POLL_MS = 3000;
+const JOB_POLL_LIMIT = 100; // ~5 minutes
+
+async function waitForJob(jobId: number): Promise<number> {
+  for (let i = 0; i < JOB_POLL_LIMIT; i++) {
+    await new Promise((resolve) => setTimeout(resolve, JOB_POLL_MS));
+    const job = await apiFetch(`/jobs/${jobId}/`);
+    if (job?.status === "succeeded") return job?.result?.trip_id;
+    if (job?.status === "failed") throw new Error(job?.error || "Failed to generate itinerary.");
+  }
+  throw new Error("Itinerary generation is taking too long. Please try again.");
+}
+
 function pickExtraKeywords(text: string, max = 6) {
   const cleaned = (text || "")
     .toLowerCase()
@@ -205,7 +218,11 @@ export default function AITripGeneratorWait() {
             body: JSON.stringify(payload),
         });
 
-        const tripId = res?.trip_id;
+        let tripId = res?.trip_id;
+        if (!tripId && res?.job_id) {
+            // Generation is still running server-side: poll the job
+            tripId = await waitForJob(res.job_id);
+        }
         if (!tripId) throw new Error("No trip_id returned from server");
 
         // Prevent double navigate
@@ -2,7 +2,7 @@
 import React, { useState, useRef, useEffect } from "react";
 import { useNavigate } from "react-router-dom";
 import { useTripId } from "../hooks/useDecodedParams";
-import { apiFetch } from "../lib/apiClient";
+import { apiStream } from "../lib/apiClient";
 import { supabase } from "../lib/supabaseClient";
 import planbotSmall from "../assets/planbotSmall.png";
 import planbotBig from "../assets/planbotBig.png";
@@ -79,15 +79,21 @@ const PlanbotPage: React.FC = () => {
   }, [messages, isSending]);
 
   const appendMessage = (role: ChatRole, content: string) => {
+    const id = `${Date.now()}-${Math.random().toString(16).slice(2)}`;
     setMessages((prev) => [
       ...prev,
       {
-        id: `${Date.now()}-${Math.random().toString(16).slice(2)}`,
+        id,
         role,
         content,
         timestamp: new Date().toISOString(),
       },
     ]);
+    return id;
+  };
+
+  const updateMessage = (id: string, content: string) => {
+    setMessages((prev) => prev.map((m) => (m.id === id ? { ...m, content } : m)));
   };
 
   // Fetch trip context from Supabase so the backend does not hit the DB
@@ -179,16 +185,28 @@ const PlanbotPage: React.FC = () => {
       if (numericTripId) body.trip_id = numericTripId;
       if (tripContext) body.trip_context = tripContext;
 
-      const resp = await apiFetch("/f1/ai-chatbot/", {
-        method: "POST",
-        body: JSON.stringify(body),
+      // Stream the answer so it appears token by token
+      let botId: string | null = null;
+      let streamed = "";
+      let finalReply: string | null = null;
+
+      await apiStream("/f1/ai-chatbot/?stream=1", body, (event, data: any) => {
+        if (event === "token") {
+          streamed += data?.text || "";
+          if (botId) updateMessage(botId, streamed);
+          else botId = appendMessage("bot", streamed);
+        } else if (event === "done" || event === "error") {
+          finalReply = data?.reply || streamed;
+        }
       });
 
       const replyText: string =
-        (resp && resp.reply) ||
+        finalReply ||
+        streamed ||
         "Planbot is thinking… but I couldn't get a clear answer. Try rephrasing your question with a bit more detail.";
 
-      appendMessage("bot", replyText);
+      if (botId) updateMessage(botId, replyText);
+      else appendMessage("bot", replyText);
     } catch (err) {
       console.error("Planbot error:", err);
       appendMessage(
@@ -16,8 +16,8 @@ type TripPreview = {
   tags?: string[]; // ✅ should come from itinerary_item_tag via backend serializer
 };
 
+// Cursor pagination: follow "next" until it is null
 type DRFPage<T> = {
-  count: number;
   next: string | null;
   previous: string | null;
   results: T[];
@@ -157,7 +157,7 @@ export default function DiscoveryInternational() {
         setLoading(true);
         setError(null);
 
-        let url: string | null = COMMUNITY_API;
+        let url: string | null = `${COMMUNITY_API}?page_size=50`;
         const all: TripPreview[] = [];
 
         while (url) {
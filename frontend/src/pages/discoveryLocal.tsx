@@ -16,8 +16,8 @@ type TripPreview = {
   is_flagged?: boolean;
 };
 
+// Cursor pagination: follow "next" until it is null
 type DRFPage<T> = {
-  count: number;
   next: string | null;
   previous: string | null;
   results: T[];
@@ -110,7 +110,7 @@ export default function DiscoveryLocal() {
         setError(null);
 
         let url: string | null =
-          `${COMMUNITY_API}?main_country=Singapore&visibility=public&is_flagged=false`;
+          `${COMMUNITY_API}?main_country=Singapore&page_size=50`;
 
         const all: TripPreview[] = [];
 
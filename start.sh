@@ -8,8 +8,13 @@ cd "$(dirname "$0")/backend"
 pip install --upgrade pip >/dev/null
 pip install -r requirements.txt
 
+# Co-editing channel process (see gunicorn_channel.conf.py); migrations run in the web process
+if [ "${TRIPMATE_PROCESS:-web}" = "channel" ]; then
+  exec gunicorn config.asgi:application --config gunicorn_channel.conf.py
+fi
+
 # Run migrations (no-op if already applied)
 python manage.py migrate --noinput
 
-# Start Gunicorn
-exec gunicorn config.wsgi --workers 4 --bind 0.0.0.0:"${PORT:-8000}"
+# Start Gunicorn (workers / threads from GUNICORN_WORKERS / GUNICORN_THREADS, see gunicorn.conf.py)
+exec gunicorn config.wsgi --config gunicorn.conf.py